@@ -0,0 +1,33 @@
+"""Add keyset index for conversation history
+
+Revision ID: a4c9e2f7b5d1
+Revises: f3b8d1a6c2e7
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a4c9e2f7b5d1"
+down_revision = "f3b8d1a6c2e7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_messages_connection_created_id",
+        "messages",
+        ["connection_id", "created_at", "id"],
+    )
+    # Superseded: the new index serves the same (connection_id, created_at)
+    # lookups and also breaks created_at ties for keyset pagination
+    op.execute("DROP INDEX IF EXISTS ix_messages_connection_created")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_messages_connection_created", "messages", ["connection_id", "created_at"]
+    )
+    op.drop_index("ix_messages_connection_created_id", table_name="messages")
@@ -0,0 +1,45 @@
+"""Add per-user daily engagement buckets
+
+Revision ID: b7d3f1e9a2c4
+Revises: a4c9e2f7b5d1
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d3f1e9a2c4"
+down_revision = "a4c9e2f7b5d1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_engagement_daily",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("event_type", sa.String(), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "day", "event_type"),
+    )
+    op.create_index("ix_user_engagement_daily_day", "user_engagement_daily", ["day"])
+
+    # Backfill the scoring window; new events are rolled up on ingest
+    op.execute(
+        """
+        INSERT INTO user_engagement_daily (user_id, day, event_type, event_count)
+        SELECT user_id, CAST(created_at AS DATE), event_type, COUNT(*)
+        FROM user_engagement_analytics
+        WHERE created_at >= CURRENT_DATE - INTERVAL '31 days'
+        GROUP BY user_id, CAST(created_at AS DATE), event_type
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_engagement_daily_day", table_name="user_engagement_daily")
+    op.drop_table("user_engagement_daily")
@@ -0,0 +1,34 @@
+"""Add user feature snapshots for compatibility feature store
+
+Revision ID: c4e1a7b9d2f0
+Revises: b3300a3ef02f
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4e1a7b9d2f0"
+down_revision = "b3300a3ef02f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_feature_snapshots",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("feature_version", sa.Integer(), nullable=False),
+        sa.Column("source_fingerprint", sa.String(length=64), nullable=False),
+        sa.Column("features", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_feature_snapshots")
@@ -0,0 +1,34 @@
+"""Add indexes used by candidate index incremental sync
+
+Revision ID: d9f3b2c6a1e4
+Revises: c4e1a7b9d2f0
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d9f3b2c6a1e4"
+down_revision = "c4e1a7b9d2f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Candidate index catches up on rows written since its last sync
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_updated_at ON users (updated_at)")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_user_feature_snapshots_updated_at "
+        "ON user_feature_snapshots (updated_at)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_soul_connections_updated_at "
+        "ON soul_connections (updated_at)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_soul_connections_updated_at")
+    op.drop_index("ix_user_feature_snapshots_updated_at")
+    op.drop_index("ix_users_updated_at")
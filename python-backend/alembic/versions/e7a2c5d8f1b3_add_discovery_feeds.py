@@ -0,0 +1,66 @@
+"""Add precomputed discovery feeds
+
+Revision ID: e7a2c5d8f1b3
+Revises: d9f3b2c6a1e4
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e7a2c5d8f1b3"
+down_revision = "d9f3b2c6a1e4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "discovery_feeds",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("stale_since", sa.DateTime(), nullable=True),
+        sa.Column("profile_changed_at", sa.DateTime(), nullable=True),
+        sa.Column("propagated_at", sa.DateTime(), nullable=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("algorithm_version", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "discovery_feed_entries",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("candidate_id", sa.Integer(), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("compatibility", sa.JSON(), nullable=False),
+        sa.Column("candidate_age", sa.Integer(), nullable=True),
+        sa.Column("shares_interests", sa.Boolean(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["candidate_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "candidate_id"),
+    )
+    op.create_index(
+        "ix_discovery_feed_entries_user_score",
+        "discovery_feed_entries",
+        ["user_id", sa.text("score DESC"), "candidate_id"],
+    )
+    op.create_index(
+        "ix_discovery_feed_entries_candidate",
+        "discovery_feed_entries",
+        ["candidate_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_discovery_feed_entries_candidate", table_name="discovery_feed_entries"
+    )
+    op.drop_index(
+        "ix_discovery_feed_entries_user_score", table_name="discovery_feed_entries"
+    )
+    op.drop_table("discovery_feed_entries")
+    op.drop_table("discovery_feeds")
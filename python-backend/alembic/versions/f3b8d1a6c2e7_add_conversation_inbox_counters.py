@@ -0,0 +1,66 @@
+"""Add conversation inbox pointer and unread counters
+
+Revision ID: f3b8d1a6c2e7
+Revises: e7a2c5d8f1b3
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f3b8d1a6c2e7"
+down_revision = "e7a2c5d8f1b3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "soul_connections",
+        sa.Column("last_message_id", sa.Integer(), nullable=True),
+    )
+    op.add_column(
+        "soul_connections",
+        sa.Column(
+            "user1_unread_count", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    op.add_column(
+        "soul_connections",
+        sa.Column(
+            "user2_unread_count", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+
+    # Backfill from existing messages; new messages maintain these on insert
+    op.execute(
+        """
+        UPDATE soul_connections SET
+            last_message_id = (
+                SELECT m.id FROM messages m
+                WHERE m.connection_id = soul_connections.id
+                ORDER BY m.created_at DESC, m.id DESC
+                LIMIT 1
+            ),
+            user1_unread_count = (
+                SELECT COUNT(*) FROM messages m
+                WHERE m.connection_id = soul_connections.id
+                  AND m.sender_id <> soul_connections.user1_id
+                  AND m.is_read IS NOT TRUE
+            ),
+            user2_unread_count = (
+                SELECT COUNT(*) FROM messages m
+                WHERE m.connection_id = soul_connections.id
+                  AND m.sender_id <> soul_connections.user2_id
+                  AND m.is_read IS NOT TRUE
+            )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("soul_connections", "user2_unread_count")
+    op.drop_column("soul_connections", "user1_unread_count")
+    op.drop_column("soul_connections", "last_message_id")
@@ -1,55 +1,50 @@
 import logging
 from typing import Optional
 
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
 from app.core.security import ALGORITHM, SECRET_KEY, oauth2_scheme
 from app.models.user import User
 from fastapi import Depends, HTTPException, Request, status
 from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-async def get_current_user(
-    request: Request = None,
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
-) -> User:
-    """
-    Validate JWT token and return the current authenticated user.
-    This dependency is used to protect API endpoints.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    # Get client info for logging
-    client_host = request.client.host if request else "unknown"
 
+def _token_email(token: str, client_host: str) -> str:
+    """The user email a JWT was issued for; 401 when the token is invalid"""
     try:
         # Decode JWT token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             logger.warning(f"Token missing 'sub' claim from {client_host}")
-            raise credentials_exception
+            raise _credentials_exception()
 
         # Log token validation
         logger.debug(f"Validated token for {email} from {client_host}")
+        return email
 
     except JWTError as e:
         logger.warning(f"JWT validation error from {client_host}: {str(e)}")
-        raise credentials_exception
+        raise _credentials_exception()
 
-    # Get user from database
-    user = db.query(User).filter(User.email == email).first()
+
+def _active_user(user: Optional[User], email: str) -> User:
     if user is None:
         logger.warning(f"User not found for validated token: {email}")
-        raise credentials_exception
+        raise _credentials_exception()
 
     # Check if user is active
     if not user.is_active:
@@ -62,7 +57,44 @@ async def get_current_user(
     return user
 
 
-async def get_current_user_websocket(token: str, db: Session) -> Optional[User]:
+def get_current_user(
+    request: Request = None,
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> User:
+    """
+    Validate JWT token and return the current authenticated user.
+    This dependency is used to protect API endpoints. It is a plain function
+    so FastAPI runs the blocking lookup in its threadpool; endpoints on the
+    async session use get_current_user_async.
+    """
+    # Get client info for logging
+    client_host = request.client.host if request else "unknown"
+    email = _token_email(token, client_host)
+
+    # Get user from database
+    user = db.query(User).filter(User.email == email).first()
+    return _active_user(user, email)
+
+
+async def get_current_user_async(
+    request: Request = None,
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme),
+) -> User:
+    """
+    get_current_user for endpoints on the async session. The user is loaded
+    into the request's AsyncSession, so only its columns may be used; lazy
+    relationships would need I/O.
+    """
+    client_host = request.client.host if request else "unknown"
+    email = _token_email(token, client_host)
+
+    result = await db.execute(select(User).where(User.email == email))
+    return _active_user(result.scalars().first(), email)
+
+
+async def get_current_user_websocket(token: str, db: AsyncSession) -> Optional[User]:
     """
     Validate JWT token for WebSocket connections and return the current user.
     Returns None if authentication fails (no exceptions for WebSocket).
@@ -76,7 +108,8 @@ async def get_current_user_websocket(token: str, db: Session) -> Optional[User]:
             return None
 
         # Get user from database
-        user = db.query(User).filter(User.email == email).first()
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
         if user is None:
             logger.warning(f"WebSocket user not found for validated token: {email}")
             return None
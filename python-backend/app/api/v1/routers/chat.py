@@ -12,6 +12,7 @@ from ....core.database import get_db
 from ....models.message import Message, MessageType
 from ....models.soul_connection import SoulConnection
 from ....models.user import User
+from ....services.conversation_inbox import load_inbox, mark_conversation_read
 from ....services.realtime import manager
 
 router = APIRouter(tags=["messages"])
@@ -146,10 +147,7 @@ def mark_read(
             status_code=403, detail="Not authorized for this connection"
         )
 
-    db.query(Message).filter(
-        Message.connection_id == connection.id,
-        Message.sender_id != current_user.id,
-    ).update({Message.is_read: True})
+    mark_conversation_read(db, connection.id, current_user.id)
     db.commit()
 
     return {"status": "ok"}
@@ -177,48 +175,16 @@ def get_conversations(
 ) -> List[Dict[str, Any]]:
     """Get conversation previews for messages list"""
 
-    # Get all connections for current user
-    connections = (
-        db.query(SoulConnection)
-        .filter(
-            (SoulConnection.user1_id == current_user.id)
-            | (SoulConnection.user2_id == current_user.id)
-        )
-        .all()
-    )
-
+    # All connections with partner, last message and unread count in one query
     conversations = []
-    for connection in connections:
-        # Get partner user
-        partner_id = (
-            connection.user2_id
-            if connection.user1_id == current_user.id
-            else connection.user1_id
-        )
-        partner = db.query(User).filter(User.id == partner_id).first()
+    for entry in load_inbox(db, current_user.id, active_only=False):
+        connection = entry.connection
+        partner = entry.partner
+        last_message = entry.last_message
 
         if not partner:
             continue
 
-        # Get last message
-        last_message = (
-            db.query(Message)
-            .filter(Message.connection_id == connection.id)
-            .order_by(Message.created_at.desc())
-            .first()
-        )
-
-        # Get unread count
-        unread_count = (
-            db.query(Message)
-            .filter(
-                Message.connection_id == connection.id,
-                Message.sender_id != current_user.id,
-                Message.is_read is False,
-            )
-            .count()
-        )
-
         conversations.append(
             {
                 "connectionId": connection.id,
@@ -232,7 +198,7 @@ def get_conversations(
                     if last_message
                     else connection.created_at.isoformat()
                 ),
-                "unreadCount": unread_count,
+                "unreadCount": entry.unread_count,
                 "connectionStage": connection.connection_stage,
                 "revelationDay": connection.reveal_day,
                 "compatibilityScore": connection.compatibility_score,
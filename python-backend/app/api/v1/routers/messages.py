@@ -7,13 +7,15 @@ import logging
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from app.api.v1.deps import get_current_user
-from app.core.database import get_db
+from app.api.v1.deps import get_current_user, get_current_user_async
+from app.core.database import get_async_db, get_db
 from app.models.user import User
 from app.observability import metrics as obs
-from app.services.message_service import message_service
+from app.services.message_service import decode_message_cursor, message_service
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
@@ -70,8 +72,8 @@ class ConversationResponse(BaseModel):
 @router.post("/send", response_model=SendMessageResponse)
 async def send_message(
     message_data: SendMessageRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Send a message in a soul connection with emotional context
@@ -83,6 +85,7 @@ async def send_message(
             content=message_data.content,
             emotional_context=message_data.emotional_context,
             db=db,
+            sender=current_user,
         )
 
         if result.success:
@@ -109,12 +112,24 @@ async def get_conversation_messages(
     connection_id: int,
     limit: int = Query(default=50, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get messages for a conversation with pagination and emotional context
+    Get messages for a conversation, newest page first. Pass
+    pagination.next_cursor back as `cursor` to scroll further back in the
+    history; `offset` is kept for older clients.
     """
+    if cursor:
+        try:
+            decode_message_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid message cursor",
+            )
+
     try:
         result = await message_service.get_conversation_messages(
             user_id=current_user.id,
@@ -122,6 +137,7 @@ async def get_conversation_messages(
             limit=limit,
             offset=offset,
             db=db,
+            cursor=cursor,
         )
 
         if not result["success"]:
@@ -143,8 +159,8 @@ async def get_conversation_messages(
 
 @router.get("/conversations")
 async def get_user_conversations(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get all conversations for the current user with summary information
@@ -175,8 +191,8 @@ async def get_user_conversations(
 @router.post("/typing-status")
 async def update_typing_status(
     typing_data: TypingStatusRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update typing status with real-time broadcast to connection partner
@@ -214,8 +230,8 @@ async def update_typing_status(
 @router.post("/mark-read/{connection_id}")
 async def mark_messages_as_read(
     connection_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Mark all messages in a connection as read
@@ -244,7 +260,7 @@ async def mark_messages_as_read(
 
 
 @router.get("/statistics")
-async def get_message_statistics(
+def get_message_statistics(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -344,8 +360,8 @@ async def get_message_statistics(
 @router.get("/last/{connection_id}")
 async def get_last_message(
     connection_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get the last message for a specific connection
@@ -354,34 +370,32 @@ async def get_last_message(
     try:
         from app.models.message import Message
         from app.models.soul_connection import SoulConnection
-        from sqlalchemy import or_
 
         # Verify user has access to this connection
-        connection = (
-            db.query(SoulConnection)
-            .filter(
+        result = await db.execute(
+            select(SoulConnection.id).where(
                 SoulConnection.id == connection_id,
                 or_(
                     SoulConnection.user1_id == current_user.id,
                     SoulConnection.user2_id == current_user.id,
                 ),
             )
-            .first()
         )
 
-        if not connection:
+        if result.first() is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Connection not found or access denied",
             )
 
         # Get the last message for this connection
-        last_message = (
-            db.query(Message)
-            .filter(Message.connection_id == connection_id)
+        result = await db.execute(
+            select(Message)
+            .where(Message.connection_id == connection_id)
             .order_by(Message.created_at.desc())
-            .first()
+            .limit(1)
         )
+        last_message = result.scalars().first()
 
         if not last_message:
             # No messages yet - return empty state
@@ -393,7 +407,7 @@ async def get_last_message(
             }
 
         # Get sender info
-        sender = db.query(User).filter(User.id == last_message.sender_id).first()
+        sender = await db.get(User, last_message.sender_id)
 
         return {
             "success": True,
@@ -424,7 +438,7 @@ async def get_last_message(
 
 
 @router.get("/search")
-async def search_messages(
+def search_messages(
     query: str = Query(..., min_length=1),
     connection_id: Optional[int] = Query(None),
     limit: int = Query(default=20, ge=1, le=50),
@@ -6,6 +6,9 @@ from app.core.database import get_db
 from app.observability import metrics as obs
 from app.models.user import User
 from app.schemas.auth import User as UserSchema
+from app.services.compatibility_feature_store import compatibility_feature_store
+from app.services.discovery_feed import discovery_feed
+from app.services.pair_score_cache import pair_score_cache
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -92,10 +95,18 @@ def complete_onboarding(
         emotional_depth_score = calculate_emotional_depth_score(onboarding_data)
         current_user.emotional_depth_score = emotional_depth_score
 
+        # Precompute compatibility features once, in the same transaction
+        compatibility_feature_store.refresh_user(db, current_user)
+        # New user: build their discovery feed and enter them into others'
+        discovery_feed.mark_changed(db, current_user.id)
+
         # Commit the changes
         db.commit()
         db.refresh(current_user)
 
+        # Answers changed: drop cached pair scores involving this user
+        pair_score_cache.invalidate_user(current_user.id)
+
         obs.emotional_onboarding_completed_total.inc()
 
         logger.info(f"Onboarding completed successfully for user: {current_user.email}")
@@ -13,8 +13,11 @@ from app.schemas.soul_connection import (
     SoulConnectionResponse,
     SoulConnectionUpdate,
 )
-from app.services.compatibility import get_compatibility_calculator
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.services.compatibility import user_compatibility_data
+from app.services.candidate_index import candidate_index
+from app.services.compatibility_feature_store import compatibility_feature_store
+from app.services.discovery_feed import decode_cursor, discovery_feed
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
@@ -23,133 +26,79 @@ router = APIRouter(tags=["soul-connections"])
 
 @router.get("/discover", response_model=List[DiscoveryResponse])
 def discover_soul_connections(
+    response: Response,
     max_results: int = Query(default=10, ge=1, le=50),
     min_compatibility: float = Query(default=50.0, ge=0, le=100),
     hide_photos: bool = Query(default=True),
     age_range_min: Optional[int] = Query(default=None, ge=18, le=100),
     age_range_max: Optional[int] = Query(default=None, ge=18, le=100),
+    cursor: Optional[str] = Query(default=None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
-    Discover potential soul connections using local compatibility algorithms.
-    Filters out users already connected and applies compatibility scoring.
+    Discover potential soul connections from the user's precomputed feed.
+    Ranking happens ahead of time in the discovery feed worker; this only
+    filters and pages. When more results exist, the X-Next-Cursor response
+    header holds the `cursor` value for the next page.
     """
     try:
-        # Get compatibility calculator
-        calculator = get_compatibility_calculator()
-
-        # Get existing connections to exclude
-        existing_connections = (
-            db.query(SoulConnection)
-            .filter(
-                (SoulConnection.user1_id == current_user.id)
-                | (SoulConnection.user2_id == current_user.id)
-            )
-            .all()
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid discovery cursor",
         )
 
-        excluded_user_ids = set()
-        for conn in existing_connections:
-            excluded_user_ids.add(conn.user1_id)
-            excluded_user_ids.add(conn.user2_id)
-        excluded_user_ids.add(current_user.id)  # Exclude self
-
-        # Build query for potential matches
-        query = db.query(User).filter(
-            User.id.notin_(excluded_user_ids),
-            User.is_active,
-            User.emotional_onboarding_completed,
+    try:
+        entries, next_cursor = discovery_feed.read_page(
+            db,
+            current_user,
+            limit=max_results,
+            min_compatibility=min_compatibility,
+            age_min=age_range_min,
+            age_max=age_range_max,
+            after=after,
         )
 
-        # Apply age filters if specified
-        if age_range_min or age_range_max:
-            # Note: date_of_birth is stored as string, need to calculate age
-            # For MVP, we'll skip age filtering and implement in next iteration
-            pass
-
-        potential_matches = query.limit(max_results * 3).all()  # Get more for filtering
-
-        # Calculate compatibility for each potential match
-        discovery_results = []
-        current_user_data = {
-            "interests": current_user.interests or [],
-            "core_values": current_user.core_values or {},
-            "emotional_responses": current_user.emotional_responses or {},
-            "communication_style": current_user.communication_style or {},
-            "age": 25,  # Default for MVP, calculate from date_of_birth later
-            "location": current_user.location or "",
-        }
-
         logger.info(
-            f"Discovery: Found {len(potential_matches)} potential matches for user {current_user.id}"
+            f"Discovery: Serving {len(entries)} feed entries for user {current_user.id}"
         )
-        logger.info(f"Discovery: Current user interests: {current_user.interests}")
-
-        for user in potential_matches:
-            # Quick compatibility pre-check: skip users with no common interests
-            # Only skip if VERY high compatibility threshold (>80) to allow
-            # algorithm to find matches based on values, not just interests
-            if current_user.interests and user.interests:
-                common_interests = set(current_user.interests).intersection(
-                    set(user.interests)
-                )
-                if not common_interests and min_compatibility > 80:
-                    # Skip detailed calculation only for very high thresholds
-                    continue
-            user_data = {
-                "interests": user.interests or [],
-                "core_values": user.core_values or {},
-                "emotional_responses": user.emotional_responses or {},
-                "communication_style": user.communication_style or {},
-                "age": 25,  # Default for MVP
-                "location": user.location or "",
-            }
-
-            compatibility = calculator.calculate_overall_compatibility(
-                current_user_data, user_data
-            )
 
-            logger.info(
-                f"Discovery: User {user.first_name} (ID:{user.id}) - Compatibility: {compatibility['total_compatibility']}% (min: {min_compatibility}%)"
-            )
+        discovery_results = []
+        for entry, user in entries:
+            # Create profile preview (limited info for soul discovery)
+            profile_preview = {
+                "first_name": user.first_name,
+                "age": 25,  # Calculate from date_of_birth
+                "location": user.location,
+                "bio": (
+                    user.bio[:100] + "..."
+                    if user.bio and len(user.bio) > 100
+                    else user.bio
+                ),
+                "interests": (
+                    user.interests[:3] if user.interests else []
+                ),  # Show only first 3
+                "emotional_depth_score": (
+                    float(user.emotional_depth_score)
+                    if user.emotional_depth_score
+                    else None
+                ),
+            }
 
-            # Filter by minimum compatibility
-            if compatibility["total_compatibility"] >= min_compatibility:
-                # Create profile preview (limited info for soul discovery)
-                profile_preview = {
-                    "first_name": user.first_name,
-                    "age": 25,  # Calculate from date_of_birth
-                    "location": user.location,
-                    "bio": (
-                        user.bio[:100] + "..."
-                        if user.bio and len(user.bio) > 100
-                        else user.bio
-                    ),
-                    "interests": (
-                        user.interests[:3] if user.interests else []
-                    ),  # Show only first 3
-                    "emotional_depth_score": (
-                        float(user.emotional_depth_score)
-                        if user.emotional_depth_score
-                        else None
-                    ),
-                }
-
-                discovery_results.append(
-                    DiscoveryResponse(
-                        user_id=user.id,
-                        compatibility=CompatibilityResponse(**compatibility),
-                        profile_preview=profile_preview,
-                        is_photo_hidden=hide_photos,
-                    )
+            discovery_results.append(
+                DiscoveryResponse(
+                    user_id=user.id,
+                    compatibility=CompatibilityResponse(**entry.compatibility),
+                    profile_preview=profile_preview,
+                    is_photo_hidden=hide_photos,
                 )
+            )
 
-        # Sort by compatibility score and limit results
-        discovery_results.sort(
-            key=lambda x: x.compatibility.total_compatibility, reverse=True
-        )
-        return discovery_results[:max_results]
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return discovery_results
 
     except Exception as e:
         logger.error(f"Error in discover_soul_connections: {str(e)}")
@@ -211,51 +160,15 @@ def initiate_soul_connection(
                 detail="Connection already exists with this user",
             )
 
-        # Calculate initial compatibility
-        calculator = get_compatibility_calculator()
-
-        # Ensure interests are properly formatted as lists of strings
-        current_interests = current_user.interests or []
-        if isinstance(current_interests, list):
-            current_interests = [str(item) for item in current_interests]
-        elif isinstance(current_interests, str):
-            current_interests = [current_interests]
-        else:
-            current_interests = []
-
-        target_interests = target_user.interests or []
-        if isinstance(target_interests, list):
-            target_interests = [str(item) for item in target_interests]
-        elif isinstance(target_interests, str):
-            target_interests = [target_interests]
-        else:
-            target_interests = []
-
-        current_user_data = {
-            "interests": current_interests,
-            "core_values": current_user.core_values or {},
-            "emotional_responses": current_user.emotional_responses or {},
-            "communication_style": current_user.communication_style or {},
-            "age": 25,  # Default for MVP
-            "location": current_user.location or "",
-        }
-        target_user_data = {
-            "interests": target_interests,
-            "core_values": target_user.core_values or {},
-            "emotional_responses": target_user.emotional_responses or {},
-            "communication_style": target_user.communication_style or {},
-            "age": 25,  # Default for MVP
-            "location": target_user.location or "",
-        }
-
+        # Calculate initial compatibility (usually cached from discovery)
         try:
-            compatibility = calculator.calculate_overall_compatibility(
-                current_user_data, target_user_data
-            )
+            compatibility = compatibility_feature_store.score_many(
+                db, current_user, [target_user]
+            )[0]
         except Exception as comp_error:
             logger.error(f"Compatibility calculation error: {str(comp_error)}")
-            logger.error(f"Current user data: {current_user_data}")
-            logger.error(f"Target user data: {target_user_data}")
+            logger.error(f"Current user data: {user_compatibility_data(current_user)}")
+            logger.error(f"Target user data: {user_compatibility_data(target_user)}")
             # Create minimal compatibility for testing
             compatibility = {
                 "total_compatibility": 60.0,
@@ -286,6 +199,8 @@ def initiate_soul_connection(
         db.commit()
         db.refresh(new_connection)
 
+        candidate_index.add_connection(current_user.id, connection_data.user2_id)
+
         obs.soul_connections_initiated_total.inc()
         obs.soul_connections_active.inc()
 
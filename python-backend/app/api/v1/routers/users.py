@@ -10,6 +10,12 @@ from app.models.profile import Profile
 from app.models.user import User
 from app.schemas.auth import User as UserSchema
 from app.schemas.auth import UserProfileUpdate
+from app.services.compatibility_feature_store import (
+    SOURCE_FIELDS,
+    compatibility_feature_store,
+)
+from app.services.discovery_feed import discovery_feed
+from app.services.pair_score_cache import pair_score_cache
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from fastapi.responses import FileResponse
 from sqlalchemy import and_, not_, or_
@@ -44,11 +50,19 @@ def update_current_user_profile(
     # Auto-calculate profile completion
     current_user.is_profile_complete = _calculate_profile_completeness(current_user)
 
+    # Keep precomputed compatibility features in step with matching inputs
+    if any(field in SOURCE_FIELDS for field in update_data):
+        compatibility_feature_store.refresh_user(db, current_user)
+        discovery_feed.mark_changed(db, current_user.id)
+
     # Save to database
     db.add(current_user)
     db.commit()
     db.refresh(current_user)
 
+    # Profile inputs to pair scoring may have changed
+    pair_score_cache.invalidate_user(current_user.id)
+
     return current_user
 
 
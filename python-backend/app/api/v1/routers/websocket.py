@@ -8,25 +8,26 @@ import logging
 from datetime import datetime
 from typing import Any, Dict
 
-from app.api.v1.deps import get_current_user, get_current_user_websocket
-from app.core.database import get_db
+from app.api.v1.deps import get_current_user_async, get_current_user_websocket
+from app.core import database
+from app.core.database import get_async_db
 from app.models.realtime_state import UserPresence, UserPresenceStatus
-from app.models.soul_analytics import AnalyticsEventType, UserEngagementAnalytics
+from app.models.soul_analytics import AnalyticsEventType
 from app.models.user import User
+from app.services.analytics_service import analytics_service
 from app.services.realtime_connection_manager import MessageType, realtime_manager
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["websocket"])
 
 
 @router.websocket("/connect")
-async def websocket_endpoint(
-    websocket: WebSocket, token: str, db: Session = Depends(get_db)
-):
+async def websocket_endpoint(websocket: WebSocket, token: str):
     """Main WebSocket endpoint for real-time connections"""
-    await _handle_websocket_connection(websocket, token, db)
+    await _handle_websocket_connection(websocket, token)
 
 
 @router.websocket("/{user_id}")
@@ -34,39 +35,41 @@ async def websocket_user_endpoint(
     websocket: WebSocket,
     user_id: int,
     token: str,
-    db: Session = Depends(get_db),
 ):
     """WebSocket endpoint with user ID in path (for test compatibility)"""
     # Restore full WebSocket functionality with authentication
-    await _handle_websocket_connection(websocket, token, db)
+    await _handle_websocket_connection(websocket, token)
 
 
-async def _handle_websocket_connection(websocket: WebSocket, token: str, db: Session):
-    """Handle WebSocket connection logic"""
-    user = None
+async def _handle_websocket_connection(websocket: WebSocket, token: str):
+    """
+    Handle WebSocket connection logic. A socket stays open for hours, so each
+    step uses a short AsyncSession rather than holding one, and a pooled
+    connection, for the socket's lifetime.
+    """
+    user_id = None
     try:
-        # Authenticate user from token
-        user = await get_current_user_websocket(token, db)
-        if not user:
-            await websocket.close(code=4001, reason="Authentication failed")
-            return
-
-        # Connect user to real-time system
-        await realtime_manager.connect(websocket, user.id, db)
-
-        # Track connection event
-        engagement_event = UserEngagementAnalytics(
-            user_id=user.id,
-            event_type=AnalyticsEventType.LOGIN.value,
+        async with database.AsyncSessionLocal() as db:
+            # Authenticate user from token
+            user = await get_current_user_websocket(token, db)
+            if not user:
+                await websocket.close(code=4001, reason="Authentication failed")
+                return
+            user_id = user.id
+
+            # Connect user to real-time system
+            await realtime_manager.connect(websocket, user_id, db)
+
+        # Track connection event (buffered, so daily rollups see it too)
+        await analytics_service.track_user_event(
+            user_id=user_id,
+            event_type=AnalyticsEventType.LOGIN,
             event_data={
                 "connection_type": "websocket",
                 "timestamp": datetime.utcnow().isoformat(),
             },
-            session_id=f"ws_{user.id}_{datetime.utcnow().timestamp()}",
-            device_type="unknown",  # Could be enhanced with client info
+            session_id=f"ws_{user_id}_{datetime.utcnow().timestamp()}",
         )
-        db.add(engagement_event)
-        db.commit()
 
         # Message handling loop
         while True:
@@ -76,9 +79,10 @@ async def _handle_websocket_connection(websocket: WebSocket, token: str, db: Ses
                 message_data = json.loads(data)
 
                 # Handle message through realtime manager
-                success = await realtime_manager.handle_message(
-                    user.id, message_data, db
-                )
+                async with database.AsyncSessionLocal() as db:
+                    success = await realtime_manager.handle_message(
+                        user_id, message_data, db
+                    )
 
                 if not success:
                     await websocket.send_text(
@@ -92,10 +96,10 @@ async def _handle_websocket_connection(websocket: WebSocket, token: str, db: Ses
                     )
 
             except WebSocketDisconnect:
-                logger.info(f"WebSocket disconnected for user {user.id}")
+                logger.info(f"WebSocket disconnected for user {user_id}")
                 break
             except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON received from user {user.id}")
+                logger.warning(f"Invalid JSON received from user {user_id}")
                 await websocket.send_text(
                     json.dumps(
                         {
@@ -107,7 +111,7 @@ async def _handle_websocket_connection(websocket: WebSocket, token: str, db: Ses
                 )
             except Exception as e:
                 logger.error(
-                    f"Error handling WebSocket message for user {user.id}: {str(e)}"
+                    f"Error handling WebSocket message for user {user_id}: {str(e)}"
                 )
                 await websocket.send_text(
                     json.dumps(
@@ -126,8 +130,9 @@ async def _handle_websocket_connection(websocket: WebSocket, token: str, db: Ses
 
     finally:
         # Clean up connection
-        if user:
-            await realtime_manager.disconnect(user.id, db)
+        if user_id is not None:
+            async with database.AsyncSessionLocal() as db:
+                await realtime_manager.disconnect(user_id, db)
 
 
 # HTTP endpoints for real-time system management
@@ -135,19 +140,18 @@ async def _handle_websocket_connection(websocket: WebSocket, token: str, db: Ses
 
 @router.get("/status")
 async def get_realtime_status(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get real-time system status for current user
     """
     try:
         # Get user presence
-        presence = (
-            db.query(UserPresence)
-            .filter(UserPresence.user_id == current_user.id)
-            .first()
+        result = await db.execute(
+            select(UserPresence).where(UserPresence.user_id == current_user.id)
         )
+        presence = result.scalars().first()
 
         # Get connection stats
         stats = realtime_manager.get_connection_stats()
@@ -157,7 +161,7 @@ async def get_realtime_status(
 
         return {
             "userId": current_user.id,
-            "isConnected": current_user.id in realtime_manager.active_connections,
+            "isConnected": await realtime_manager.is_user_connected(current_user.id),
             "presence": {
                 "status": (presence.status if presence else UserPresenceStatus.OFFLINE),
                 "lastSeen": (
@@ -229,7 +233,7 @@ async def get_websocket_health():
 @router.post("/channels/subscribe")
 async def subscribe_to_channel(
     channel_data: Dict[str, str],
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_async),
 ):
     """
     Subscribe user to a WebSocket channel (Frontend WebSocket Pool compatibility)
@@ -263,7 +267,7 @@ async def subscribe_to_channel(
 @router.post("/channels/unsubscribe")
 async def unsubscribe_from_channel(
     channel_data: Dict[str, str],
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(get_current_user_async),
 ):
     """
     Unsubscribe user from a WebSocket channel
@@ -297,7 +301,7 @@ async def unsubscribe_from_channel(
 
 
 @router.get("/channels/list")
-async def list_user_channels(current_user: User = Depends(get_current_user)):
+async def list_user_channels(current_user: User = Depends(get_current_user_async)):
     """
     Get list of channels user is subscribed to
     """
@@ -319,8 +323,8 @@ async def list_user_channels(current_user: User = Depends(get_current_user)):
 async def start_typing_indicator(
     connection_id: int,
     typing_data: Dict[str, Any],
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Start typing indicator for a connection
@@ -347,8 +351,8 @@ async def start_typing_indicator(
 @router.post("/typing/stop/{connection_id}")
 async def stop_typing_indicator(
     connection_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Stop typing indicator for a connection
@@ -374,8 +378,8 @@ async def stop_typing_indicator(
 async def update_connection_energy(
     connection_id: int,
     energy_data: Dict[str, str],
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Update connection energy level
@@ -409,8 +413,8 @@ async def update_connection_energy(
 async def trigger_celebration(
     connection_id: int,
     celebration_data: Dict[str, Any],
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Trigger celebration animation
@@ -438,8 +442,8 @@ async def trigger_celebration(
 @router.get("/presence/{user_id}")
 async def get_user_presence(
     user_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get presence status for a specific user (if they're connected to current user)
@@ -448,9 +452,8 @@ async def get_user_presence(
         from app.models.soul_connection import SoulConnection
 
         # Verify users are connected
-        connection = (
-            db.query(SoulConnection)
-            .filter(
+        result = await db.execute(
+            select(SoulConnection.id).where(
                 (
                     (SoulConnection.user1_id == current_user.id)
                     & (SoulConnection.user2_id == user_id)
@@ -461,16 +464,16 @@ async def get_user_presence(
                 ),
                 SoulConnection.status == "active",
             )
-            .first()
         )
 
-        if not connection:
+        if result.first() is None:
             raise HTTPException(status_code=403, detail="Not connected to this user")
 
         # Get presence data
-        presence = (
-            db.query(UserPresence).filter(UserPresence.user_id == user_id).first()
+        result = await db.execute(
+            select(UserPresence).where(UserPresence.user_id == user_id)
         )
+        presence = result.scalars().first()
 
         return {
             "userId": user_id,
@@ -484,7 +487,7 @@ async def get_user_presence(
             ),
             "isTyping": presence.is_typing if presence else False,
             "typingInConnection": (presence.typing_in_connection if presence else None),
-            "isOnline": user_id in realtime_manager.active_connections,
+            "isOnline": await realtime_manager.is_user_connected(user_id),
         }
 
     except HTTPException:
@@ -496,8 +499,8 @@ async def get_user_presence(
 
 @router.get("/connections/active")
 async def get_active_connections(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Get real-time status of user's active connections
@@ -506,29 +509,29 @@ async def get_active_connections(
         from app.models.soul_connection import SoulConnection
 
         # Get user's connections
-        connections = (
-            db.query(SoulConnection)
-            .filter(
+        result = await db.execute(
+            select(SoulConnection).where(
                 (
                     (SoulConnection.user1_id == current_user.id)
                     | (SoulConnection.user2_id == current_user.id)
                 ),
                 SoulConnection.status == "active",
             )
-            .all()
         )
+        connections = result.scalars().all()
 
-        connection_statuses = []
+        # Every partner's presence in one query
+        partner_ids = [c.get_partner_id(current_user.id) for c in connections]
+        result = await db.execute(
+            select(UserPresence).where(UserPresence.user_id.in_(partner_ids))
+        )
+        presence_by_user = {p.user_id: p for p in result.scalars().all()}
 
-        for connection in connections:
-            partner_id = connection.get_partner_id(current_user.id)
+        connection_statuses = []
 
+        for connection, partner_id in zip(connections, partner_ids):
             # Get partner presence
-            partner_presence = (
-                db.query(UserPresence)
-                .filter(UserPresence.user_id == partner_id)
-                .first()
-            )
+            partner_presence = presence_by_user.get(partner_id)
 
             connection_statuses.append(
                 {
@@ -542,7 +545,9 @@ async def get_active_connections(
                             if partner_presence
                             else UserPresenceStatus.OFFLINE.value
                         ),
-                        "isOnline": partner_id in realtime_manager.active_connections,
+                        "isOnline": await realtime_manager.is_user_connected(
+                            partner_id
+                        ),
                         "isTyping": (
                             partner_presence.is_typing if partner_presence else False
                         ),
@@ -579,8 +584,8 @@ async def get_active_connections(
 @router.post("/notify/revelation")
 async def notify_revelation_shared(
     notification_data: Dict[str, Any],
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Notify about a new revelation being shared (called by revelation endpoints)
@@ -609,7 +614,7 @@ async def notify_revelation_shared(
 
 
 @router.get("/admin/stats")
-async def get_system_stats(current_user: User = Depends(get_current_user)):
+async def get_system_stats(current_user: User = Depends(get_current_user_async)):
     """
     Get comprehensive real-time system statistics (admin only)
     """
@@ -621,8 +626,8 @@ async def get_system_stats(current_user: User = Depends(get_current_user)):
 
 @router.post("/admin/cleanup")
 async def cleanup_stale_sessions(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Manually trigger cleanup of stale sessions (admin only)
@@ -4,16 +4,26 @@ Intelligent caching with L1 (Redis), L2 (Database), predictive warming, and perf
 """
 
 import asyncio
+import json
 import time
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import structlog
 from app.core.event_publisher import EventPublisher, EventType
+from app.core.memory_cache import MemoryCache
 
 # Import our Redis cluster manager and event publisher
 from app.core.redis_cluster_manager import DatabaseType, RedisClusterManager
+from app.core.single_flight import (
+    AsyncSingleFlight,
+    acquire_lock_async,
+    encode_refresh_meta,
+    refresh_meta_key,
+    release_lock_async,
+    should_refresh_early,
+)
 from prometheus_client import Counter, Gauge, Histogram
 
 logger = structlog.get_logger(__name__)
@@ -157,6 +167,38 @@ class CacheAnalytics:
 
         CACHE_EVICTIONS.labels(cache_level=cache_level.value, reason=reason).inc()
 
+    def record_counts(
+        self,
+        cache_level: CacheLevel,
+        hits: int,
+        misses: int,
+        evictions: Dict[str, int],
+    ):
+        """Fold counts accumulated by a tier since the last call into metrics"""
+        metrics = self.performance_metrics[cache_level]
+        metrics["hit_count"] += hits
+        metrics["miss_count"] += misses
+        metrics["total_requests"] += hits + misses
+
+        if hits:
+            CACHE_REQUESTS.labels(
+                cache_level=cache_level.value, operation="get", status="hit"
+            ).inc(hits)
+        if misses:
+            CACHE_REQUESTS.labels(
+                cache_level=cache_level.value, operation="get", status="miss"
+            ).inc(misses)
+        if metrics["total_requests"]:
+            CACHE_HIT_RATIO.labels(cache_level=cache_level.value).set(
+                metrics["hit_count"] / metrics["total_requests"]
+            )
+
+        for reason, count in evictions.items():
+            metrics["eviction_count"] += count
+            CACHE_EVICTIONS.labels(cache_level=cache_level.value, reason=reason).inc(
+                count
+            )
+
     async def _record_usage_pattern(
         self, key: str, result: str, response_time: float = 0.0
     ):
@@ -399,9 +441,14 @@ class IntelligentCacheManager:
         ]
 
         # In-memory cache (L3)
-        self.memory_cache: Dict[str, Dict[str, Any]] = {}
-        self.memory_cache_ttl: Dict[str, datetime] = {}
-        self.max_memory_cache_size = 1000  # Maximum number of items
+        self.memory_cache = MemoryCache(max_bytes=64 * 1024 * 1024)
+
+        # Stampede protection: one recompute per key across tasks and nodes
+        self._flights = AsyncSingleFlight()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self.recompute_lock_ms = 10000  # Expiry of the cross-node recompute lock
+        self.recompute_wait_seconds = 2.0  # How long to wait for another node
+        self.recompute_poll_interval = 0.05
 
         # Performance thresholds
         self.slow_query_threshold = 1.0  # 1 second
@@ -436,30 +483,46 @@ class IntelligentCacheManager:
             cache_levels = self.cache_levels
 
         try:
-            # Try L3 (Memory) cache first
+            # Try L3 (Memory) cache first; it counts its own hits and misses.
+            # Hot keys are served from here, so it needs the same early
+            # refresh check as Redis or they would only refresh on expiry
             if CacheLevel.L3_MEMORY in cache_levels:
-                value = await self._get_from_memory_cache(key)
+                value, refresh_meta = self.memory_cache.get_with_meta(key)
                 if value is not None:
-                    response_time = time.time() - start_time
-                    await self.cache_analytics.record_hit(
-                        CacheLevel.L3_MEMORY, key, response_time
-                    )
+                    if (
+                        fallback_func
+                        and not self._flights.in_flight(key)
+                        and should_refresh_early(refresh_meta)
+                    ):
+                        self._schedule_refresh(
+                            key, value, fallback_func, ttl, cache_levels, database_type
+                        )
                     return value
-                else:
-                    await self.cache_analytics.record_miss(CacheLevel.L3_MEMORY, key)
 
             # Try L1 (Redis) cache
             if CacheLevel.L1_REDIS in cache_levels:
-                value = await self._get_from_redis_cache(key, database_type)
+                value, refresh_meta = await self._get_from_redis_cache(
+                    key, database_type
+                )
                 if value is not None:
                     response_time = time.time() - start_time
                     await self.cache_analytics.record_hit(
                         CacheLevel.L1_REDIS, key, response_time
                     )
 
+                    # Close to expiry: refresh in the background, serve stale
+                    if (
+                        fallback_func
+                        and not self._flights.in_flight(key)
+                        and should_refresh_early(refresh_meta)
+                    ):
+                        self._schedule_refresh(
+                            key, value, fallback_func, ttl, cache_levels, database_type
+                        )
+
                     # Promote to L3 if enabled
                     if CacheLevel.L3_MEMORY in cache_levels:
-                        await self._set_memory_cache(key, value, ttl)
+                        self.memory_cache.set(key, value, ttl, meta=refresh_meta)
 
                     return value
                 else:
@@ -478,28 +541,21 @@ class IntelligentCacheManager:
                     if CacheLevel.L1_REDIS in cache_levels:
                         await self._set_redis_cache(key, value, ttl, database_type)
                     if CacheLevel.L3_MEMORY in cache_levels:
-                        await self._set_memory_cache(key, value, ttl)
+                        self.memory_cache.set(key, value, ttl)
 
                     return value
                 else:
                     await self.cache_analytics.record_miss(CacheLevel.L2_DATABASE, key)
 
-            # All cache levels missed - use fallback function
+            # All cache levels missed - use fallback function, once per key
             if fallback_func:
-                fresh_value = await fallback_func()
-
-                response_time = time.time() - start_time
-
-                # Store in all requested cache levels
-                await self._store_in_all_levels(
-                    key, fresh_value, ttl, cache_levels, database_type
+                return await self._flights.do(
+                    key,
+                    lambda: self._recompute(
+                        key, fallback_func, ttl, cache_levels, database_type
+                    ),
                 )
 
-                # Check if we should trigger cache warming
-                await self._check_warming_triggers(key, response_time)
-
-                return fresh_value
-
             return None
 
         except Exception as e:
@@ -572,10 +628,7 @@ class IntelligentCacheManager:
 
             # Delete from memory cache
             if CacheLevel.L3_MEMORY in cache_levels:
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                if key in self.memory_cache_ttl:
-                    del self.memory_cache_ttl[key]
+                self.memory_cache.delete(key)
 
             # Delete from Redis
             if CacheLevel.L1_REDIS in cache_levels:
@@ -644,78 +697,131 @@ class IntelligentCacheManager:
             logger.error(f"Batch cache operations failed: {e}")
             return []
 
-    async def _get_from_memory_cache(self, key: str) -> Optional[Any]:
-        """Get value from in-memory cache"""
-        try:
-            # Check if key exists and is not expired
-            if key in self.memory_cache and key in self.memory_cache_ttl:
-                if datetime.utcnow() < self.memory_cache_ttl[key]:
-                    return self.memory_cache[key]["value"]
-                else:
-                    # Expired, remove from cache
-                    del self.memory_cache[key]
-                    del self.memory_cache_ttl[key]
-                    await self.cache_analytics.record_eviction(
-                        CacheLevel.L3_MEMORY, key, "ttl"
-                    )
-
-            return None
-
-        except Exception as e:
-            await self.cache_analytics.record_error(CacheLevel.L3_MEMORY, key, str(e))
-            return None
+    def _collect_memory_cache_counts(self):
+        """Move the L3 tier's hit/miss/eviction counts into cache analytics"""
+        hits, misses, evictions = self.memory_cache.drain_counters()
+        self.cache_analytics.record_counts(
+            CacheLevel.L3_MEMORY, hits, misses, evictions
+        )
+        CACHE_MEMORY_USAGE.labels(cache_level=CacheLevel.L3_MEMORY.value).set(
+            self.memory_cache.size_bytes
+        )
 
-    async def _set_memory_cache(self, key: str, value: Any, ttl: int):
-        """Set value in in-memory cache"""
+    async def _get_from_redis_cache(
+        self, key: str, database_type: DatabaseType
+    ) -> Tuple[Optional[Any], Optional[Any]]:
+        """Get value and its early-refresh metadata from Redis cache"""
         try:
-            # Check cache size limit
-            if len(self.memory_cache) >= self.max_memory_cache_size:
-                await self._evict_memory_cache_lru()
-
-            # Store value with metadata
-            self.memory_cache[key] = {
-                "value": value,
-                "created_at": datetime.utcnow(),
-                "access_count": 0,
-            }
-            self.memory_cache_ttl[key] = datetime.utcnow() + timedelta(seconds=ttl)
-
+            client = await self.redis_manager.get_client(database_type)
+            value, refresh_meta = await client.mget(key, refresh_meta_key(key))
+            if isinstance(value, (str, bytes)):
+                try:
+                    value = json.loads(value)
+                except (json.JSONDecodeError, TypeError):
+                    # Return raw value if JSON decode fails
+                    pass
+            return value, refresh_meta
         except Exception as e:
-            await self.cache_analytics.record_error(CacheLevel.L3_MEMORY, key, str(e))
+            await self.cache_analytics.record_error(CacheLevel.L1_REDIS, key, str(e))
+            return None, None
+
+    async def _recompute(
+        self,
+        key: str,
+        fallback_func: Callable,
+        ttl: int,
+        cache_levels: List[CacheLevel],
+        database_type: DatabaseType,
+        stale: Optional[Any] = None,
+    ) -> Optional[Any]:
+        """
+        Run the fallback and store the result unless another node holds the
+        recompute lock. Then wait for that node's value, or for an early
+        refresh of a `stale` value, leave the refresh to it.
+        """
+        client = None
+        token = None
+        if CacheLevel.L1_REDIS in cache_levels:
+            try:
+                client = await self.redis_manager.get_client(database_type)
+                token = await acquire_lock_async(client, key, self.recompute_lock_ms)
+                if token is None:
+                    if stale is not None:
+                        return stale
+                    value = await self._wait_for_value(key, database_type)
+                    if value is not None:
+                        return value
+                    # The lock holder is slow or gone; compute it here as well
+            except Exception as e:
+                logger.warning(f"Cache lock unavailable for key {key}: {e}")
 
-    async def _evict_memory_cache_lru(self):
-        """Evict least recently used items from memory cache"""
         try:
-            if not self.memory_cache:
-                return
+            start_time = time.time()
+            fresh_value = await fallback_func()
+            response_time = time.time() - start_time
 
-            # Find oldest item by creation time
-            oldest_key = min(
-                self.memory_cache.keys(),
-                key=lambda k: self.memory_cache[k]["created_at"],
+            # Store in all requested cache levels
+            refresh_meta = encode_refresh_meta(ttl, response_time)
+            stored = await self._store_in_all_levels(
+                key, fresh_value, ttl, cache_levels, database_type, refresh_meta
             )
+            if stored and client is not None:
+                await client.setex(refresh_meta_key(key), ttl, refresh_meta)
 
-            # Remove oldest item
-            del self.memory_cache[oldest_key]
-            if oldest_key in self.memory_cache_ttl:
-                del self.memory_cache_ttl[oldest_key]
+            # Check if we should trigger cache warming
+            await self._check_warming_triggers(key, response_time)
 
-            await self.cache_analytics.record_eviction(
-                CacheLevel.L3_MEMORY, oldest_key, "lru"
-            )
+            return fresh_value
 
-        except Exception as e:
-            logger.error(f"Memory cache LRU eviction failed: {e}")
+        finally:
+            if token is not None:
+                try:
+                    await release_lock_async(client, key, token)
+                except Exception as e:
+                    logger.warning(f"Failed to release cache lock for key {key}: {e}")
 
-    async def _get_from_redis_cache(
+    async def _wait_for_value(
         self, key: str, database_type: DatabaseType
     ) -> Optional[Any]:
-        """Get value from Redis cache"""
-        try:
-            return await self.redis_manager.get(database_type, key)
-        except Exception as e:
-            await self.cache_analytics.record_error(CacheLevel.L1_REDIS, key, str(e))
-            return None
+        """Poll Redis while another node recomputes `key`"""
+        deadline = time.time() + self.recompute_wait_seconds
+        while time.time() < deadline:
+            await asyncio.sleep(self.recompute_poll_interval)
+            value, _ = await self._get_from_redis_cache(key, database_type)
+            if value is not None:
+                return value
+        return None
+
+    def _schedule_refresh(
+        self,
+        key: str,
+        stale: Any,
+        fallback_func: Callable,
+        ttl: int,
+        cache_levels: List[CacheLevel],
+        database_type: DatabaseType,
+    ):
+        """Refresh a key in the background while readers get the cached value"""
+
+        async def refresh():
+            try:
+                await self._flights.do(
+                    key,
+                    lambda: self._recompute(
+                        key,
+                        fallback_func,
+                        ttl,
+                        cache_levels,
+                        database_type,
+                        stale=stale,
+                    ),
+                )
+            except Exception as e:
+                logger.error(f"Early refresh failed for key {key}: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
 
     async def _set_redis_cache(
         self, key: str, value: Any, ttl: int, database_type: DatabaseType
@@ -760,6 +866,7 @@ class IntelligentCacheManager:
         ttl: int,
         cache_levels: List[CacheLevel],
         database_type: DatabaseType,
+        refresh_meta: Optional[str] = None,
     ) -> bool:
         """Store value in all requested cache levels"""
         success = True
@@ -767,7 +874,7 @@ class IntelligentCacheManager:
         try:
             # Store in memory cache
             if CacheLevel.L3_MEMORY in cache_levels:
-                await self._set_memory_cache(key, value, ttl)
+                self.memory_cache.set(key, value, ttl, meta=refresh_meta)
 
             # Store in Redis cache
             if CacheLevel.L1_REDIS in cache_levels:
@@ -808,19 +915,17 @@ class IntelligentCacheManager:
     async def get_cache_statistics(self) -> Dict[str, Any]:
         """Get comprehensive cache statistics"""
         try:
+            self._collect_memory_cache_counts()
             performance_metrics = self.cache_analytics.get_performance_metrics()
             usage_patterns = self.cache_analytics.get_usage_patterns()
 
             # Memory cache statistics
             memory_stats = {
                 "total_items": len(self.memory_cache),
-                "max_capacity": self.max_memory_cache_size,
-                "utilization": len(self.memory_cache) / self.max_memory_cache_size,
-                "expired_items": sum(
-                    1
-                    for key in self.memory_cache_ttl
-                    if datetime.utcnow() > self.memory_cache_ttl[key]
-                ),
+                "size_bytes": self.memory_cache.size_bytes,
+                "max_bytes": self.memory_cache.max_bytes,
+                "utilization": self.memory_cache.size_bytes
+                / self.memory_cache.max_bytes,
             }
 
             return {
@@ -879,21 +984,10 @@ class IntelligentCacheManager:
         """Clean up expired cache entries"""
         try:
             # Clean memory cache
-            expired_keys = [
-                key
-                for key, ttl in self.memory_cache_ttl.items()
-                if datetime.utcnow() > ttl
-            ]
-
-            for key in expired_keys:
-                if key in self.memory_cache:
-                    del self.memory_cache[key]
-                del self.memory_cache_ttl[key]
-                await self.cache_analytics.record_eviction(
-                    CacheLevel.L3_MEMORY, key, "ttl"
-                )
+            expired_count = self.memory_cache.purge_expired()
+            self._collect_memory_cache_counts()
 
-            logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
+            logger.info(f"Cleaned up {expired_count} expired cache entries")
 
         except Exception as e:
             logger.error(f"Cache cleanup failed: {e}")
@@ -12,11 +12,12 @@ from .security import decode_access_token, oauth2_scheme
 logger = logging.getLogger(__name__)
 
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ) -> User:
     """
-    Get the current authenticated user from JWT token.
+    Get the current authenticated user from JWT token. A plain function, so
+    FastAPI runs the blocking lookup in its threadpool, off the event loop.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
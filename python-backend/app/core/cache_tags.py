@@ -0,0 +1,81 @@
+"""
+Cache Tags
+Tag index for cache invalidation. Each tag is a Redis sorted set of the cache
+keys written with it, scored by the key's expiry time, so invalidating a tag
+costs as much as the keys it carries rather than a scan of the keyspace.
+Invalidated and overwritten keys are announced on a pub/sub channel so every
+other process can drop its in-memory copies.
+"""
+
+import json
+import logging
+import time
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidations"
+UNLINK_BATCH_SIZE = 500
+
+
+def tag_key(tag: str) -> str:
+    return f"cache:tag:{tag}"
+
+
+def add_tags(pipe, key: str, tags: Iterable[str], ttl: float) -> None:
+    """Queue index updates for a key written with `ttl` on a Redis pipeline"""
+    now = time.time()
+    for tag in tags:
+        index = tag_key(tag)
+        pipe.zadd(index, {key: now + ttl})
+        # Members whose keys have expired on their own are dropped on write
+        pipe.zremrangebyscore(index, "-inf", now)
+
+
+def invalidate_tags(client, tags: Iterable[str]) -> List[str]:
+    """Unlink every live key carrying any of `tags`; returns those keys"""
+    indexes = [tag_key(tag) for tag in tags]
+    if not indexes:
+        return []
+
+    pipe = client.pipeline(transaction=False)
+    for index in indexes:
+        pipe.zrange(index, 0, -1)
+    members_per_tag = pipe.execute()
+
+    keys = set()
+    pipe = client.pipeline(transaction=False)
+    for index, members in zip(indexes, members_per_tag):
+        if not members:
+            continue
+        # Only the members read here; keys tagged meanwhile stay indexed
+        pipe.zrem(index, *members)
+        keys.update(
+            member.decode() if isinstance(member, bytes) else member
+            for member in members
+        )
+
+    keys = sorted(keys)
+    for start in range(0, len(keys), UNLINK_BATCH_SIZE):
+        pipe.unlink(*keys[start : start + UNLINK_BATCH_SIZE])
+    pipe.execute()
+    return keys
+
+
+def publish_invalidation(client, keys: List[str], origin: Optional[str] = None) -> None:
+    """
+    Tell every process to drop its in-memory copies of `keys`. The publishing
+    process passes its `origin` so it can skip its own message. `client` may
+    be a pipeline, in which case the message goes out on its execute().
+    """
+    for start in range(0, len(keys), UNLINK_BATCH_SIZE):
+        try:
+            client.publish(
+                INVALIDATION_CHANNEL,
+                json.dumps(
+                    {"origin": origin, "keys": keys[start : start + UNLINK_BATCH_SIZE]}
+                ),
+            )
+        except Exception as e:
+            logger.error(f"Failed to publish cache invalidation: {e}")
+            return
@@ -13,6 +13,7 @@ from functools import wraps
 from typing import Any, Dict, Generator, List, Optional
 
 import redis
+from app.core.cache_tags import UNLINK_BATCH_SIZE, add_tags, invalidate_tags
 from redis.exceptions import ConnectionError as RedisConnectionError
 from redis.exceptions import RedisError
 from sqlalchemy import create_engine, event, text
@@ -362,8 +363,14 @@ class DatabaseOptimizer:
         finally:
             session.close()
 
-    def query_with_cache(self, cache_key: str, query_func, ttl: int = None) -> Any:
-        """Execute query with Redis caching"""
+    def query_with_cache(
+        self,
+        cache_key: str,
+        query_func,
+        ttl: int = None,
+        tags: Optional[List[str]] = None,
+    ) -> Any:
+        """Execute query with Redis caching, indexing the result under `tags`"""
         ttl = ttl or self.config["query_cache_ttl"]
 
         try:
@@ -392,9 +399,11 @@ class DatabaseOptimizer:
                 if result is not None:
 
                     def set_cache_operation():
-                        return self.redis_client.set(
-                            cache_key, json.dumps(result, default=str), ex=ttl
-                        )
+                        pipe = self.redis_client.pipeline(transaction=False)
+                        pipe.set(cache_key, json.dumps(result, default=str), ex=ttl)
+                        if tags:
+                            add_tags(pipe, cache_key, tags, ttl)
+                        return pipe.execute()[0]
 
                     cache_result = self._safe_redis_operation(
                         "set_cache", set_cache_operation
@@ -411,16 +420,46 @@ class DatabaseOptimizer:
             logger.error(f"Error in cached query {cache_key}: {e}")
             raise
 
+    def invalidate_cache_tags(self, tags: List[str]) -> int:
+        """Invalidate cached query results indexed under any of `tags`"""
+        try:
+            keys = self._safe_redis_operation(
+                "invalidate_cache_tags", invalidate_tags, self.redis_client, tags
+            )
+
+            if keys is not None:
+                logger.info(f"Invalidated {len(keys)} cache entries for tags {tags}")
+                return len(keys)
+
+            logger.debug(
+                f"Cache invalidation skipped for tags {tags} - Redis unavailable"
+            )
+            return 0
+
+        except Exception as e:
+            logger.error(f"Failed to invalidate cache tags {tags}: {e}")
+            return 0
+
     def invalidate_cache_pattern(self, pattern: str):
-        """Invalidate cache entries matching pattern"""
+        """
+        Invalidate cache entries matching pattern. Walks the keyspace with
+        SCAN, so prefer tagging results and invalidate_cache_tags.
+        """
         try:
 
             def invalidate_operation():
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    deleted_count = self.redis_client.delete(*keys)
-                    return deleted_count
-                return 0
+                deleted_count = 0
+                batch = []
+                for key in self.redis_client.scan_iter(
+                    match=pattern, count=UNLINK_BATCH_SIZE
+                ):
+                    batch.append(key)
+                    if len(batch) >= UNLINK_BATCH_SIZE:
+                        deleted_count += self.redis_client.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted_count += self.redis_client.unlink(*batch)
+                return deleted_count
 
             deleted_count = self._safe_redis_operation(
                 "invalidate_cache_pattern", invalidate_operation
@@ -981,7 +1020,9 @@ def init_database_optimizer(
 
 
 # Decorator for cached database queries
-def cached_query(cache_key_prefix: str, ttl: int = 300):
+def cached_query(
+    cache_key_prefix: str, ttl: int = 300, tags: Optional[List[str]] = None
+):
     """Decorator for caching database query results"""
 
     def decorator(func):
@@ -995,6 +1036,7 @@ def cached_query(cache_key_prefix: str, ttl: int = 300):
                 cache_key,
                 lambda session: func(session, *args[1:], **kwargs),
                 ttl,
+                tags,
             )
 
         return wrapper
@@ -0,0 +1,122 @@
+"""
+Memory Cache
+Byte-bounded in-process LRU cache with per-entry TTL, used as the L3 tier of
+IntelligentCacheManager. Lookups, inserts and evictions are O(1); hit, miss
+and eviction counts are plain integers that callers drain periodically
+instead of reporting on every access.
+"""
+
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached value in bytes"""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class MemoryCache:
+    """LRU cache bounded by the total estimated size of its values"""
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        sizer: Callable[[Any], int] = estimate_size,
+    ):
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self.size_bytes = 0
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, value, meta); least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, int, Any, Any]]" = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_with_meta(key)[0]
+
+    def get_with_meta(self, key: str) -> Tuple[Optional[Any], Optional[Any]]:
+        """(value, meta stored with it), or (None, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[2], entry[3]
+                self._discard(key, "ttl")
+            self._misses += 1
+            return None, None
+
+    def set(self, key: str, value: Any, ttl: float, meta: Any = None) -> bool:
+        """
+        Store a value, with optional caller metadata that is not counted
+        against the budget; False if the value alone exceeds the budget
+        """
+        size = self.sizer(value)
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            if size > self.max_bytes:
+                return False
+
+            self._entries[key] = (time.monotonic() + ttl, size, value, meta)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)), "lru")
+            return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def purge_expired(self) -> int:
+        """Drop every expired entry; returns how many were dropped"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry[0] <= now]
+            for key in expired:
+                self._discard(key, "ttl")
+        return len(expired)
+
+    def drain_counters(self) -> Tuple[int, int, Dict[str, int]]:
+        """(hits, misses, evictions by reason) since the last drain"""
+        with self._lock:
+            counters = (self._hits, self._misses, self._evictions)
+            self._hits = 0
+            self._misses = 0
+            self._evictions = {}
+        return counters
+
+    def _discard(self, key: str, reason: Optional[str] = None) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size_bytes -= entry[1]
+        if reason:
+            self._evictions[reason] = self._evictions.get(reason, 0) + 1
+        return True
@@ -0,0 +1,155 @@
+"""
+Single Flight
+Cache stampede protection for read-through caches:
+
+- SingleFlight / AsyncSingleFlight coalesce concurrent recomputes of a key in
+  one process, so followers share the leader's result
+- a Redis lock (SET NX PX) elects one recomputing process across nodes
+- should_refresh_early implements probabilistic early expiration (XFetch):
+  a reader occasionally refreshes a hot key shortly before it expires while
+  everyone else keeps serving the cached copy
+"""
+
+import asyncio
+import json
+import math
+import random
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Only the holder of the token may release the lock
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+def refresh_meta_key(key: str) -> str:
+    return f"{key}:refresh"
+
+
+def encode_refresh_meta(ttl: float, compute_seconds: float) -> str:
+    """Metadata stored next to a value: when it expires, how long it took"""
+    return json.dumps({"expires_at": time.time() + ttl, "delta": compute_seconds})
+
+
+def should_refresh_early(meta: Optional[Any], beta: float = 1.0) -> bool:
+    """
+    XFetch: refresh when now - delta * beta * ln(rand) >= expiry. Slow values
+    and values close to expiry are refreshed earlier; with many readers one
+    of them almost surely refreshes before the key actually expires.
+    """
+    if not meta:
+        return False
+    try:
+        if isinstance(meta, bytes):
+            meta = meta.decode("utf-8")
+        data = json.loads(meta) if isinstance(meta, str) else meta
+        expires_at = float(data["expires_at"])
+        delta = float(data["delta"])
+    except (ValueError, KeyError, TypeError):
+        return False
+    jitter = -delta * beta * math.log(1.0 - random.random())
+    return time.time() + jitter >= expires_at
+
+
+def acquire_lock(client, key: str, ttl_ms: int) -> Optional[str]:
+    """Take the recompute lock for `key`; returns the release token or None"""
+    token = secrets.token_hex(8)
+    if client.set(lock_key(key), token, nx=True, px=ttl_ms):
+        return token
+    return None
+
+
+def release_lock(client, key: str, token: str) -> None:
+    client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key(key), token)
+
+
+async def acquire_lock_async(client, key: str, ttl_ms: int) -> Optional[str]:
+    token = secrets.token_hex(8)
+    if await client.set(lock_key(key), token, nx=True, px=ttl_ms):
+        return token
+    return None
+
+
+async def release_lock_async(client, key: str, token: str) -> None:
+    await client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key(key), token)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls per key across threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+
+        if not leader:
+            return call.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent awaits per key on one event loop"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is not None:
+            # A cancelled follower must not cancel the shared call
+            return await asyncio.shield(call)
+
+        call = asyncio.get_running_loop().create_future()
+        self._calls[key] = call
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            call.cancel()
+            raise
+        except BaseException as e:
+            call.set_exception(e)
+            # Followers may not exist; don't log the error as unretrieved
+            call.exception()
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
@@ -1,6 +1,5 @@
 import logging
-
-# import os
+import os
 from pathlib import Path
 
 from app.api.v1.routers import (  # enhanced_communication,  # Temporarily disabled - file missing; social_proof,  # Temporarily disabled - file missing; advanced_ai_matching_router,  # Temporarily disabled - file missing
@@ -30,13 +29,19 @@ from app.api.v1.routers import (  # enhanced_communication,  # Temporarily disab
 )
 
 # from app.api.v1.routers import analytics as analytics_router  # Temporarily disabled due to missing clickhouse
-from app.core.database import create_tables
+from app.core.database import async_engine, create_tables
 from app.middleware.middleware import log_requests_middleware
 from app.middleware.security_headers import (
     get_secure_cors_config,
     security_headers_middleware,
 )
+from app.services.analytics_service import analytics_service
+from app.services.candidate_index import candidate_index
+from app.services.discovery_feed import discovery_feed_worker
+from app.services.message_write_behind import message_write_behind
+from app.services.profile_ann_index import profile_ann_index
 from app.services.realtime import manager
+from app.services.realtime_connection_manager import realtime_manager
 from app.utils.error_handler import validation_error_handler
 from dotenv import load_dotenv
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
@@ -251,6 +256,76 @@ uploads_dir.mkdir(exist_ok=True)
 # File access will be handled through authenticated endpoints in users router
 
 
+# The discovery candidate index is built and kept in sync in the background;
+# requests only read it
+@app.on_event("startup")
+async def start_candidate_index():
+    await candidate_index.start()
+
+
+@app.on_event("shutdown")
+async def stop_candidate_index():
+    await candidate_index.stop()
+
+
+# Likewise the AI recommendations' profile ANN index
+@app.on_event("startup")
+async def start_profile_ann_index():
+    await profile_ann_index.start()
+
+
+@app.on_event("shutdown")
+async def stop_profile_ann_index():
+    await profile_ann_index.stop()
+
+
+# Precomputed discovery feeds are ranked by a background worker so the
+# discover endpoint stays a cheap read. Deployments that run the dedicated
+# worker process (python -m app.services.discovery_feed) switch this off;
+# feeds are leased with SKIP LOCKED, so several workers never collide
+@app.on_event("startup")
+async def start_discovery_feed_worker():
+    if os.getenv("DISCOVERY_FEED_WORKER_ENABLED", "true").lower() == "true":
+        await discovery_feed_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_discovery_feed_worker():
+    await discovery_feed_worker.stop()
+
+
+# Join the realtime backplane so messages for users connected to other
+# workers/pods are routed here and delivered
+@app.on_event("startup")
+async def start_realtime_manager():
+    await realtime_manager.start()
+
+
+@app.on_event("shutdown")
+async def stop_realtime_manager():
+    await realtime_manager.stop()
+
+
+# Message counters and analytics events are written in batches off the
+# request path; stopping flushes whatever is still buffered
+@app.on_event("startup")
+async def start_write_behind_buffers():
+    await message_write_behind.start()
+    await analytics_service.event_buffer.start()
+
+
+@app.on_event("shutdown")
+async def stop_write_behind_buffers():
+    await message_write_behind.stop()
+    await analytics_service.event_buffer.stop()
+
+
+# Pooled asyncpg connections belong to this event loop; close them with it
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
+
+
 @app.get("/")
 async def root():
     """
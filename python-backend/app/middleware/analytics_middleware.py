@@ -237,7 +237,6 @@ class AnalyticsMiddleware(BaseHTTPMiddleware):
                 "user_agent": request.headers.get("User-Agent"),
                 "ip_address": self._get_client_ip(request),
             },
-            db=None,  # Would need to pass db session
             session_id=session_id,
         )
 
@@ -306,7 +305,6 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
             metric_name="slow_request",
             value=process_time * 1000,  # Convert to milliseconds
             component=request.url.path,
-            db=None,  # Would need to pass db session
         )
 
     async def _track_error_response(
@@ -322,7 +320,6 @@ class PerformanceTrackingMiddleware(BaseHTTPMiddleware):
             metric_name=f"error_{response.status_code}",
             value=process_time * 1000,  # Convert to milliseconds
             component=request.url.path,
-            db=None,  # Would need to pass db session
         )
 
     def _extract_user_id(self, request: Request) -> Optional[int]:
@@ -23,7 +23,9 @@ from app.models.ai_models import (
     TrainingStatus,
     UserProfile,
 )
+from app.models.compatibility_features import UserFeatureSnapshot
 from app.models.daily_revelation import DailyRevelation, RevelationType
+from app.models.discovery_feed import DiscoveryFeed, DiscoveryFeedEntry
 from app.models.match import Match, MatchStatus
 from app.models.message import Message, MessageType
 from app.models.personalization_models import (
@@ -66,6 +68,7 @@ from app.models.soul_analytics import (
     SoulConnectionAnalytics,
     SystemPerformanceMetrics,
     UserEngagementAnalytics,
+    UserEngagementDaily,
     UserRetentionMetrics,
 )
 from app.models.soul_connection import ConnectionStage, SoulConnection
@@ -122,8 +125,14 @@ __all__ = [
     "BehavioralPattern",
     "ModelType",
     "TrainingStatus",
+    # Compatibility feature store
+    "UserFeatureSnapshot",
+    # Precomputed discovery feeds
+    "DiscoveryFeed",
+    "DiscoveryFeedEntry",
     # Analytics models
     "UserEngagementAnalytics",
+    "UserEngagementDaily",
     "SoulConnectionAnalytics",
     "EmotionalJourneyTracking",
     "SystemPerformanceMetrics",
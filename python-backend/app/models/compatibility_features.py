@@ -0,0 +1,30 @@
+"""
+Compatibility Feature Store Models
+Persisted per-user derived features used by the compatibility scorers
+"""
+
+from datetime import datetime
+
+from app.core.database import Base
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String
+
+
+class UserFeatureSnapshot(Base):
+    """Versioned snapshot of a user's precomputed compatibility features"""
+
+    __tablename__ = "user_feature_snapshots"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    # Bumped whenever feature extraction logic changes
+    feature_version = Column(Integer, nullable=False)
+    # Hash of the profile/onboarding fields the features were derived from
+    source_fingerprint = Column(String(64), nullable=False)
+
+    # {"calculator": {...}, "soul": {...}}
+    features = Column(JSON, nullable=False)
+
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
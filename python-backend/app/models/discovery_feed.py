@@ -0,0 +1,80 @@
+"""
+Discovery Feed Models
+Per-user ranked discovery candidates, precomputed off the request path
+"""
+
+from datetime import datetime
+
+from app.core.database import Base
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+)
+
+
+class DiscoveryFeed(Base):
+    """Refresh bookkeeping for one user's precomputed discovery feed"""
+
+    __tablename__ = "discovery_feeds"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    # Set when the feed must be re-ranked (profile or preference change)
+    stale_since = Column(DateTime, nullable=True)
+    # Set when this user's own answers changed, so their entries in other
+    # users' feeds must be rescored; cleared via propagated_at
+    profile_changed_at = Column(DateTime, nullable=True)
+    propagated_at = Column(DateTime, nullable=True)
+
+    refreshed_at = Column(DateTime, nullable=True)
+    # Worker lease so concurrent workers never rank the same feed twice
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    # COMPATIBILITY_ALGORITHM_VERSION the entries were scored with
+    algorithm_version = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DiscoveryFeedEntry(Base):
+    """One ranked candidate in a user's discovery feed"""
+
+    __tablename__ = "discovery_feed_entries"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    candidate_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+
+    # total_compatibility, the feed's sort key
+    score = Column(Float, nullable=False)
+    # Full CompatibilityResponse payload
+    compatibility = Column(JSON, nullable=False)
+
+    # Read-time filters, captured when the entry was scored
+    candidate_age = Column(Integer, nullable=True)
+    shares_interests = Column(Boolean, nullable=False, default=True)
+
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Keyset pagination: WHERE user_id = ? ORDER BY score DESC, candidate_id
+        Index(
+            "ix_discovery_feed_entries_user_score",
+            "user_id",
+            score.desc(),
+            "candidate_id",
+        ),
+        # Incremental refresh: which feeds list a given candidate
+        Index("ix_discovery_feed_entries_candidate", "candidate_id"),
+    )
@@ -2,7 +2,18 @@ import enum
 from datetime import datetime
 
 from app.core.database import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    case,
+    event,
+)
 from sqlalchemy.orm import relationship
 
 
@@ -31,3 +42,44 @@ class Message(Base):
     # Relationships
     connection = relationship("SoulConnection", back_populates="messages")
     sender = relationship("User", foreign_keys=[sender_id])
+
+    __table_args__ = (
+        # History keyset pagination:
+        # WHERE connection_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_messages_connection_created_id", "connection_id", "created_at", "id"),
+    )
+
+
+@event.listens_for(Message, "after_insert")
+def _update_connection_inbox(mapper, connection, target):
+    """
+    Keep the connection's last-message pointer and the recipient's unread
+    counter current in the same transaction as the insert, whichever code
+    path wrote the message
+    """
+    soul_connections = target.metadata.tables["soul_connections"]
+    columns = soul_connections.c
+    unread_increment = 0 if target.is_read else 1
+
+    connection.execute(
+        soul_connections.update()
+        .where(columns.id == target.connection_id)
+        .values(
+            last_message_id=target.id,
+            last_message_at=target.created_at or datetime.utcnow(),
+            user1_unread_count=case(
+                (
+                    columns.user1_id != target.sender_id,
+                    columns.user1_unread_count + unread_increment,
+                ),
+                else_=columns.user1_unread_count,
+            ),
+            user2_unread_count=case(
+                (
+                    columns.user2_id != target.sender_id,
+                    columns.user2_unread_count + unread_increment,
+                ),
+                else_=columns.user2_unread_count,
+            ),
+        )
+    )
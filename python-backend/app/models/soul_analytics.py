@@ -12,8 +12,10 @@ from sqlalchemy import (
     JSON,
     Boolean,
     Column,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -42,6 +44,9 @@ class AnalyticsEventType(str, enum.Enum):
     CONNECTION_ACCEPTED = "connection_accepted"
     CONNECTION_STAGE_ADVANCED = "connection_stage_advanced"
 
+    # AI matching
+    AI_RECOMMENDATIONS_GENERATED = "ai_recommendations_generated"
+
     # App interaction
     HAPTIC_FEEDBACK_TRIGGERED = "haptic_feedback_triggered"
     ANIMATION_VIEWED = "animation_viewed"
@@ -76,6 +81,28 @@ class UserEngagementAnalytics(Base):
     user = relationship("User", foreign_keys=[user_id])
 
 
+class UserEngagementDaily(Base):
+    """
+    Per-user, per-day event counts, rolled up from UserEngagementAnalytics as
+    events are ingested so engagement scoring never reads raw events
+    """
+
+    __tablename__ = "user_engagement_daily"
+
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    day = Column(Date, primary_key=True)
+    event_type = Column(String, primary_key=True)
+
+    event_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Whole-user-base scoring scans a window of days
+        Index("ix_user_engagement_daily_day", "day"),
+    )
+
+
 class SoulConnectionAnalytics(Base):
     """Analytics specific to soul connections and their quality"""
 
@@ -77,6 +77,14 @@ class SoulConnection(Base):
     # Timeline tracking
     first_message_at = Column(DateTime, nullable=True)
     last_message_at = Column(DateTime, nullable=True)
+
+    # Inbox denormalization, maintained on every message insert (see
+    # app.models.message) and reset when a user reads the conversation.
+    # last_message_id is a plain pointer: a foreign key back to messages
+    # would make the messages relationship ambiguous
+    last_message_id = Column(Integer, nullable=True)
+    user1_unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    user2_unread_count = Column(Integer, nullable=False, default=0, server_default="0")
     revelation_started_at = Column(DateTime, nullable=True)
     stage_progression_dates = Column(
         JSON, nullable=True
@@ -135,6 +143,12 @@ class SoulConnection(Base):
         """Get the partner's user ID"""
         return self.user2_id if self.user1_id == current_user_id else self.user1_id
 
+    def get_unread_count(self, user_id: int) -> int:
+        """Messages from the partner that `user_id` has not read yet"""
+        if user_id == self.user1_id:
+            return self.user1_unread_count or 0
+        return self.user2_unread_count or 0
+
     def has_mutual_photo_consent(self) -> bool:
         """Check if both users have given photo consent"""
         return self.user1_photo_consent and self.user2_photo_consent
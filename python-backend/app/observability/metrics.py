@@ -44,6 +44,36 @@ login_attempts_total = Counter(
     labelnames=("result",),
 )
 
+pair_score_cache_requests_total = Counter(
+    "dapp_pair_score_cache_requests_total",
+    "Pair compatibility score cache lookups, by scorer and result (hit|miss).",
+    labelnames=("scorer", "result"),
+)
+
+discovery_feed_refreshes_total = Counter(
+    "dapp_discovery_feed_refreshes_total",
+    "Precomputed discovery feed refreshes, by trigger (read|worker) and result.",
+    labelnames=("trigger", "result"),
+)
+
+realtime_backplane_envelopes_total = Counter(
+    "dapp_realtime_backplane_envelopes_total",
+    "Realtime envelopes routed to another node, by status (published|dropped).",
+    labelnames=("status",),
+)
+
+realtime_send_drops_total = Counter(
+    "dapp_realtime_send_drops_total",
+    "Realtime frames not written to a local socket, by reason (timeout|error). "
+    "Timed-out frames are buffered for reconnect and the socket evicted.",
+    labelnames=("reason",),
+)
+
+analytics_buffer_full_total = Counter(
+    "dapp_analytics_buffer_full_total",
+    "Analytics events that found the event buffer full and flushed it inline.",
+)
+
 # ---- Gauges -----------------------------------------------------------------
 
 soul_connections_active = Gauge(
@@ -59,6 +89,19 @@ compatibility_calc_seconds = Histogram(
     buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
 )
 
+discovery_feed_refresh_seconds = Histogram(
+    "dapp_discovery_feed_refresh_seconds",
+    "Time spent ranking and storing one user's discovery feed.",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+
+realtime_broadcast_seconds = Histogram(
+    "dapp_realtime_broadcast_seconds",
+    "Time to fan one realtime message out, by scope (channel|connection).",
+    labelnames=("scope",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+
 # ---- Setup ------------------------------------------------------------------
 
 
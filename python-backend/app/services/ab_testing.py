@@ -1,19 +1,29 @@
 # A/B Testing Framework for Dinner First
 # Feature optimization and experimentation platform
 
-# import asyncio
+import asyncio
 import json
 import logging
 import uuid
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional
 
-import numpy as np
 import redis
+from app.services.experiment_analysis import (
+    ClickHouseAnalysisBackend,
+    ExperimentAnalysis,
+    ExperimentAnalysisBackend,
+    analyze_experiment,
+)
+from app.services.experiment_registry import (
+    EXPERIMENTS_KEY,
+    VERSION_KEY,
+    AssignmentRecorder,
+    ExperimentRegistry,
+)
 from clickhouse_driver import Client
-from scipy import stats
 
 logger = logging.getLogger(__name__)
 
@@ -97,9 +107,22 @@ class ABTestingService:
     Comprehensive A/B testing framework for dating platform optimization
     """
 
-    def __init__(self, clickhouse_client: Client, redis_client: redis.Redis):
+    def __init__(
+        self,
+        clickhouse_client: Client,
+        redis_client: redis.Redis,
+        analysis_backend: Optional[ExperimentAnalysisBackend] = None,
+    ):
         self.clickhouse = clickhouse_client
         self.redis = redis_client
+        self.analysis_backend = analysis_backend or ClickHouseAnalysisBackend(
+            clickhouse_client
+        )
+
+        # Assignment is evaluated locally from compiled configs; the
+        # resulting records are written behind in batches
+        self.registry = ExperimentRegistry(redis_client)
+        self.assignment_recorder = AssignmentRecorder(clickhouse_client, redis_client)
 
         # Predefined experiments for dating platform
         self.platform_experiments = {
@@ -125,6 +148,15 @@ class ABTestingService:
             },
         }
 
+    async def start(self):
+        """Load the experiment registry and start the background workers"""
+        await self.registry.start()
+        await self.assignment_recorder.start()
+
+    async def stop(self):
+        await self.registry.stop()
+        await self.assignment_recorder.stop()
+
     async def create_experiment(self, experiment_data: Dict[str, Any]) -> str:
         """
         Create a new A/B test experiment
@@ -206,46 +238,28 @@ class ABTestingService:
             return False
 
     async def assign_user_to_experiment(
-        self, user_id: int, experiment_id: str
+        self,
+        user_id: int,
+        experiment_id: str,
+        user_attributes: Optional[Dict[str, Any]] = None,
     ) -> Optional[str]:
         """
         Assign a user to an experiment variant
+
+        The variant is a pure function of the user ID and the experiment's
+        compiled configuration, so repeat calls return the same variant
+        without any lookups. Returns None if the experiment is not active or
+        the user is outside its target audience.
         """
         try:
-            # Check if user is already assigned
-            existing_assignment = await self._get_user_assignment(
-                user_id, experiment_id
-            )
-            if existing_assignment:
-                return existing_assignment.variant_id
-
-            experiment = await self._get_experiment(experiment_id)
-
-            if experiment.status != ExperimentStatus.ACTIVE:
-                return None
-
-            # Check if user meets target audience criteria
-            if not await self._user_meets_criteria(user_id, experiment.target_audience):
+            await self.registry.ensure_loaded()
+            experiment = self.registry.get(experiment_id)
+            if experiment is None:
                 return None
 
-            # Assign to variant based on traffic allocation
-            variant_id = self._determine_variant(user_id, experiment)
-
-            # Create assignment record
-            assignment = UserAssignment(
-                assignment_id=str(uuid.uuid4()),
-                user_id=user_id,
-                experiment_id=experiment_id,
-                variant_id=variant_id,
-                assigned_at=datetime.utcnow(),
-            )
-
-            # Store assignment
-            await self._store_user_assignment(assignment)
-
-            # Track assignment event
-            await self._track_assignment_event(assignment)
-
+            variant_id = experiment.assign(user_id, user_attributes)
+            if variant_id is not None:
+                self.assignment_recorder.record(user_id, experiment_id, variant_id)
             return variant_id
 
         except Exception as e:
@@ -254,6 +268,28 @@ class ABTestingService:
             )
             return None
 
+    async def assign_all(
+        self, user_id: int, user_attributes: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, str]:
+        """
+        Evaluate every active experiment for a user
+
+        Returns {experiment_id: variant_id} for the experiments the user is
+        in. Only the in-process registry is consulted.
+        """
+        await self.registry.ensure_loaded()
+
+        assignments = {}
+        for experiment in self.registry.active():
+            variant_id = experiment.assign(user_id, user_attributes)
+            if variant_id is None:
+                continue
+            assignments[experiment.experiment_id] = variant_id
+            self.assignment_recorder.record(
+                user_id, experiment.experiment_id, variant_id
+            )
+        return assignments
+
     async def track_experiment_event(
         self,
         user_id: int,
@@ -262,14 +298,17 @@ class ABTestingService:
         metric_name: str,
         metric_value: float,
         properties: Dict[str, Any] = None,
+        user_attributes: Optional[Dict[str, Any]] = None,
     ) -> bool:
         """
-        Track an event for A/B test analysis
+        Track an event for A/B test analysis. `user_attributes` are the ones
+        passed at assignment; users outside the audience are not recorded.
         """
         try:
-            # Get user's variant assignment
-            assignment = await self._get_user_assignment(user_id, experiment_id)
-            if not assignment or not assignment.is_active:
+            variant_id = await self._current_variant(
+                user_id, experiment_id, user_attributes
+            )
+            if variant_id is None:
                 return False
 
             # Create event record
@@ -277,7 +316,7 @@ class ABTestingService:
                 event_id=str(uuid.uuid4()),
                 user_id=user_id,
                 experiment_id=experiment_id,
-                variant_id=assignment.variant_id,
+                variant_id=variant_id,
                 event_type=event_type,
                 metric_name=metric_name,
                 metric_value=metric_value,
@@ -304,13 +343,10 @@ class ABTestingService:
         try:
             experiment = await self._get_experiment(experiment_id)
 
-            # Get raw data for analysis
-            variant_data = await self._get_variant_data(experiment_id)
+            # Aggregate and test every variant and metric in one pass
+            analysis = await self._run_analysis(experiment)
 
-            # Perform statistical analysis
-            results = await self._analyze_experiment_results(experiment, variant_data)
-
-            return results
+            return await self._analyze_experiment_results(experiment, analysis)
 
         except Exception as e:
             logger.error(f"Failed to get experiment results for {experiment_id}: {e}")
@@ -323,6 +359,7 @@ class ABTestingService:
         metric_name: str,
         conversion_value: float = 1.0,
         properties: Optional[Dict[str, Any]] = None,
+        user_attributes: Optional[Dict[str, Any]] = None,
     ) -> bool:
         """
         Track a conversion event for A/B testing analysis
@@ -333,24 +370,21 @@ class ABTestingService:
             metric_name: Name of the metric being tracked
             conversion_value: Value of the conversion (default 1.0 for binary)
             properties: Additional event properties
+            user_attributes: Attributes used at assignment, for the audience check
 
         Returns:
             bool: True if event was tracked successfully
         """
         try:
-            # Get user's variant assignment
-            assignment_key = f"user_assignment:{user_id}:{experiment_id}"
-            assignment_data = self.redis.get(assignment_key)
-
-            if not assignment_data:
+            variant_id = await self._current_variant(
+                user_id, experiment_id, user_attributes
+            )
+            if variant_id is None:
                 logger.warning(
-                    f"No assignment found for user {user_id} in experiment {experiment_id}"
+                    f"User {user_id} is not in active experiment {experiment_id}; conversion not tracked"
                 )
                 return False
 
-            assignment = json.loads(assignment_data)
-            variant_id = assignment["variant_id"]
-
             # Create conversion event
             event = ExperimentEvent(
                 event_id=str(uuid.uuid4()),
@@ -398,106 +432,12 @@ class ABTestingService:
         """
         try:
             experiment = await self._get_experiment(experiment_id)
-            variant_data = await self._get_variant_data(experiment_id)
-
-            if not variant_data:
-                return {
-                    "statistically_significant": False,
-                    "reason": "Insufficient data",
-                    "p_value": 1.0,
-                    "confidence_level": confidence_level,
-                }
-
-            # Get control variant data
-            control_variant = next(
-                v for v in experiment.variants if v.variant_type == VariantType.CONTROL
+            analysis = await self._run_analysis(
+                experiment,
+                extra_metrics=[metric_name],
+                confidence_level=confidence_level,
             )
-            control_data = variant_data.get(control_variant.variant_id, {})
-            control_conversions = control_data.get(f"{metric_name}_conversions", 0)
-            control_exposures = control_data.get("exposures", 0)
-
-            if control_exposures == 0:
-                return {
-                    "statistically_significant": False,
-                    "reason": "No control group data",
-                    "p_value": 1.0,
-                    "confidence_level": confidence_level,
-                }
-
-            results = {
-                "experiment_id": experiment_id,
-                "metric_name": metric_name,
-                "confidence_level": confidence_level,
-                "control_variant": {
-                    "variant_id": control_variant.variant_id,
-                    "conversions": control_conversions,
-                    "exposures": control_exposures,
-                    "conversion_rate": (
-                        control_conversions / control_exposures
-                        if control_exposures > 0
-                        else 0
-                    ),
-                },
-                "treatment_results": [],
-                "overall_significance": False,
-            }
-
-            # Test each treatment variant against control
-            for variant in experiment.variants:
-                if variant.variant_type == VariantType.TREATMENT:
-                    treatment_data = variant_data.get(variant.variant_id, {})
-                    treatment_conversions = treatment_data.get(
-                        f"{metric_name}_conversions", 0
-                    )
-                    treatment_exposures = treatment_data.get("exposures", 0)
-
-                    if treatment_exposures > 0:
-                        # Perform statistical test
-                        z_stat, p_value = self._two_proportion_z_test(
-                            treatment_conversions,
-                            treatment_exposures,
-                            control_conversions,
-                            control_exposures,
-                        )
-
-                        # Calculate confidence interval and lift
-                        treatment_rate = treatment_conversions / treatment_exposures
-                        control_rate = control_conversions / control_exposures
-                        lift = (
-                            ((treatment_rate - control_rate) / control_rate)
-                            if control_rate > 0
-                            else 0
-                        )
-
-                        ci_lower, ci_upper = self._confidence_interval(
-                            treatment_conversions,
-                            treatment_exposures,
-                            confidence_level,
-                        )
-
-                        is_significant = p_value < (1 - confidence_level)
-
-                        treatment_result = {
-                            "variant_id": variant.variant_id,
-                            "variant_name": variant.name,
-                            "conversions": treatment_conversions,
-                            "exposures": treatment_exposures,
-                            "conversion_rate": treatment_rate,
-                            "lift": lift,
-                            "p_value": p_value,
-                            "z_statistic": z_stat,
-                            "statistically_significant": is_significant,
-                            "confidence_interval": [ci_lower, ci_upper],
-                            "sample_size_adequate": treatment_exposures
-                            >= experiment.minimum_sample_size,
-                        }
-
-                        results["treatment_results"].append(treatment_result)
-
-                        if is_significant:
-                            results["overall_significance"] = True
-
-            return results
+            return self._significance_report(experiment, analysis, metric_name)
 
         except Exception as e:
             logger.error(f"Failed to calculate statistical significance: {e}")
@@ -617,12 +557,14 @@ class ABTestingService:
         """
         try:
             experiment = await self._get_experiment(experiment_id)
-            variant_data = await self._get_variant_data(experiment_id)
+            # One aggregation and one vectorized test for every metric
+            analysis = await self._run_analysis(experiment)
+            exposures = dict(
+                zip(analysis.aggregates.variants, analysis.aggregates.exposures)
+            )
 
             # Get overall experiment health
-            total_users = sum(
-                data.get("exposures", 0) for data in variant_data.values()
-            )
+            total_users = int(sum(exposures.values()))
 
             # Calculate experiment duration
             experiment_duration = None
@@ -631,8 +573,8 @@ class ABTestingService:
                 experiment_duration = (end_date - experiment.start_date).days
 
             # Primary metric analysis
-            primary_analysis = await self.calculate_statistical_significance(
-                experiment_id, experiment.primary_metric
+            primary_analysis = self._significance_report(
+                experiment, analysis, experiment.primary_metric
             )
 
             analysis_results = {
@@ -646,7 +588,7 @@ class ABTestingService:
                     "minimum_sample_size_met": total_users
                     >= experiment.minimum_sample_size,
                     "traffic_allocation_balanced": self._check_traffic_balance(
-                        variant_data, experiment
+                        exposures, experiment
                     ),
                 },
                 "primary_metric_analysis": primary_analysis,
@@ -658,44 +600,47 @@ class ABTestingService:
             # Analyze secondary metrics if requested
             if include_secondary_metrics and experiment.secondary_metrics:
                 for metric in experiment.secondary_metrics:
-                    secondary_analysis = await self.calculate_statistical_significance(
-                        experiment_id, metric
-                    )
                     analysis_results["secondary_metrics_analysis"].append(
-                        {"metric_name": metric, "analysis": secondary_analysis}
+                        {
+                            "metric_name": metric,
+                            "analysis": self._significance_report(
+                                experiment, analysis, metric
+                            ),
+                        }
                     )
 
             # Detailed variant performance
+            reports = {
+                metric: {r["variant_id"]: r for r in analysis.metric_report(metric)}
+                for metric in analysis.aggregates.metrics
+            }
             for variant in experiment.variants:
-                variant_stats = variant_data.get(variant.variant_id, {})
-                exposures = variant_stats.get("exposures", 0)
-
-                # Calculate conversion rates for all metrics
-                metrics = {}
-                all_metrics = [experiment.primary_metric] + (
-                    experiment.secondary_metrics or []
-                )
-
-                for metric in all_metrics:
-                    conversions = variant_stats.get(f"{metric}_conversions", 0)
-                    metrics[metric] = {
-                        "conversions": conversions,
-                        "conversion_rate": (
-                            conversions / exposures if exposures > 0 else 0
-                        ),
+                variant_exposures = int(exposures.get(variant.variant_id, 0))
+
+                # Conversion rates and per-user means for all metrics
+                metrics = {
+                    metric: {
+                        "conversions": report[variant.variant_id]["conversions"],
+                        "conversion_rate": report[variant.variant_id][
+                            "conversion_rate"
+                        ],
+                        "mean": report[variant.variant_id]["mean"],
                     }
+                    for metric, report in reports.items()
+                }
 
                 variant_performance = {
                     "variant_id": variant.variant_id,
                     "variant_name": variant.name,
                     "variant_type": variant.variant_type.value,
-                    "exposures": exposures,
+                    "exposures": variant_exposures,
                     "traffic_allocation": variant.traffic_allocation,
                     "actual_traffic_percentage": (
-                        (exposures / total_users) if total_users > 0 else 0
+                        (variant_exposures / total_users) if total_users > 0 else 0
                     ),
                     "metrics": metrics,
-                    "sample_size_adequate": exposures >= experiment.minimum_sample_size,
+                    "sample_size_adequate": variant_exposures
+                    >= experiment.minimum_sample_size,
                 }
 
                 analysis_results["variant_performance"].append(variant_performance)
@@ -716,21 +661,16 @@ class ABTestingService:
             }
 
     def _check_traffic_balance(
-        self, variant_data: Dict[str, Any], experiment: Experiment
+        self, exposures: Dict[str, float], experiment: Experiment
     ) -> bool:
         """Check if traffic allocation is reasonably balanced"""
-        total_exposures = sum(
-            data.get("exposures", 0) for data in variant_data.values()
-        )
+        total_exposures = sum(exposures.values())
 
         if total_exposures == 0:
             return False
 
         for variant in experiment.variants:
-            actual_percentage = (
-                variant_data.get(variant.variant_id, {}).get("exposures", 0)
-                / total_exposures
-            )
+            actual_percentage = exposures.get(variant.variant_id, 0) / total_exposures
             expected_percentage = variant.traffic_allocation
 
             # Allow 10% deviation from expected allocation
@@ -831,7 +771,7 @@ class ABTestingService:
                 "hypothesis": experiment.hypothesis,
                 "primary_metric": experiment.primary_metric,
                 "secondary_metrics": experiment.secondary_metrics,
-                "variants": [asdict(v) for v in experiment.variants],
+                "variants": [self._variant_config(v) for v in experiment.variants],
                 "target_audience": experiment.target_audience,
                 "status": experiment.status.value,
                 "minimum_sample_size": experiment.minimum_sample_size,
@@ -845,11 +785,16 @@ class ABTestingService:
             # Store in experiments table (this would need to be created)
             # For now, store in Redis as JSON
             self.redis.hset(
-                "experiments",
+                EXPERIMENTS_KEY,
                 experiment.experiment_id,
                 json.dumps(experiment_data, default=str),
             )
 
+            # Other processes reload their registries when the version moves
+            self.redis.incr(VERSION_KEY)
+            if self.registry.loaded:
+                self.registry.refresh(force=True)
+
         except Exception as e:
             logger.error(f"Failed to store experiment: {e}")
             raise
@@ -857,7 +802,7 @@ class ABTestingService:
     async def _get_experiment(self, experiment_id: str) -> Experiment:
         """Retrieve experiment from storage"""
         try:
-            experiment_json = self.redis.hget("experiments", experiment_id)
+            experiment_json = self.redis.hget(EXPERIMENTS_KEY, experiment_id)
             if not experiment_json:
                 raise ValueError(f"Experiment {experiment_id} not found")
 
@@ -908,82 +853,29 @@ class ABTestingService:
             logger.error(f"Failed to get experiment {experiment_id}: {e}")
             raise
 
-    def _determine_variant(self, user_id: int, experiment: Experiment) -> str:
-        """Determine which variant a user should be assigned to"""
-        # Use user ID as seed for consistent assignment
-        import hashlib
-
-        seed = int(
-            hashlib.md5(f"{user_id}_{experiment.experiment_id}".encode()).hexdigest()[
-                :8
-            ],
-            16,
-        )
-        random_value = (seed % 10000) / 10000.0  # 0.0 to 1.0
-
-        cumulative_allocation = 0.0
-        for variant in experiment.variants:
-            cumulative_allocation += variant.traffic_allocation
-            if random_value <= cumulative_allocation:
-                return variant.variant_id
-
-        # Fallback to control variant
-        control_variant = next(
-            v for v in experiment.variants if v.variant_type == VariantType.CONTROL
-        )
-        return control_variant.variant_id
-
-    async def _get_user_assignment(
-        self, user_id: int, experiment_id: str
-    ) -> Optional[UserAssignment]:
-        """Get user's current assignment for an experiment"""
-        try:
-            assignment_key = f"assignment:{experiment_id}:{user_id}"
-            assignment_json = self.redis.get(assignment_key)
-
-            if assignment_json:
-                assignment_data = json.loads(assignment_json)
-                return UserAssignment(**assignment_data)
+    def _variant_config(self, variant: ExperimentVariant) -> Dict[str, Any]:
+        """JSON-ready variant; the type is stored by value"""
+        config = asdict(variant)
+        config["variant_type"] = VariantType(variant.variant_type).value
+        return config
 
+    async def _current_variant(
+        self,
+        user_id: int,
+        experiment_id: str,
+        user_attributes: Optional[Dict[str, Any]] = None,
+    ) -> Optional[str]:
+        """
+        The variant a user's events belong to, computed the same way as at
+        assignment (audience check included), or None if the user is not in
+        the experiment. The `assignment:` records in Redis only feed exposure
+        counts and analysis; they expire and are never read back here.
+        """
+        await self.registry.ensure_loaded()
+        experiment = self.registry.get(experiment_id)
+        if experiment is None:
             return None
-
-        except Exception as e:
-            logger.error(f"Failed to get user assignment: {e}")
-            return None
-
-    async def _store_user_assignment(self, assignment: UserAssignment):
-        """Store user assignment"""
-        try:
-            assignment_key = (
-                f"assignment:{assignment.experiment_id}:{assignment.user_id}"
-            )
-            assignment_data = asdict(assignment)
-
-            self.redis.set(
-                assignment_key,
-                json.dumps(assignment_data, default=str),
-                ex=86400 * 90,  # 90 days expiry
-            )
-
-            # Also store in ClickHouse for analysis
-            assignment_record = {
-                "assignment_id": assignment.assignment_id,
-                "user_id": assignment.user_id,
-                "experiment_id": assignment.experiment_id,
-                "variant": assignment.variant_id,
-                "assignment_date": assignment.assigned_at.date(),
-                "is_active": assignment.is_active,
-                "timestamp": assignment.assigned_at,
-            }
-
-            self.clickhouse.execute(
-                "INSERT INTO experiment_assignments VALUES",
-                [assignment_record],
-            )
-
-        except Exception as e:
-            logger.error(f"Failed to store user assignment: {e}")
-            raise
+        return experiment.assign(user_id, user_attributes)
 
     async def _store_experiment_event(self, event: ExperimentEvent):
         """Store experiment event in ClickHouse"""
@@ -1010,9 +902,9 @@ class ABTestingService:
             raise
 
     async def _analyze_experiment_results(
-        self, experiment: Experiment, variant_data: Dict
+        self, experiment: Experiment, analysis: ExperimentAnalysis
     ) -> Dict[str, Any]:
-        """Perform statistical analysis on experiment results"""
+        """Summarize the primary metric of an analysed experiment"""
         try:
             results = {
                 "experiment_id": experiment.experiment_id,
@@ -1025,76 +917,40 @@ class ABTestingService:
                 "recommendation": "Continue experiment",
             }
 
-            # Get control variant data
-            control_variant = next(
-                v for v in experiment.variants if v.variant_type == VariantType.CONTROL
-            )
-            control_data = variant_data.get(control_variant.variant_id, {})
-
-            for variant in experiment.variants:
-                variant_stats = variant_data.get(variant.variant_id, {})
-
-                # Calculate conversion rate for primary metric
-                conversions = variant_stats.get(
-                    f"{experiment.primary_metric}_conversions", 0
-                )
-                exposures = variant_stats.get("exposures", 0)
-                conversion_rate = conversions / exposures if exposures > 0 else 0
-
+            names = {v.variant_id: v for v in experiment.variants}
+            for report in analysis.metric_report(experiment.primary_metric):
+                variant = names[report["variant_id"]]
                 variant_result = {
                     "variant_id": variant.variant_id,
                     "variant_name": variant.name,
                     "variant_type": variant.variant_type.value,
-                    "exposures": exposures,
-                    "conversions": conversions,
-                    "conversion_rate": conversion_rate,
+                    "exposures": report["exposures"],
+                    "conversions": report["conversions"],
+                    "conversion_rate": report["conversion_rate"],
                     "confidence_interval": None,
                     "statistical_significance": False,
                     "lift": 0.0,
                 }
 
                 # Statistical test against control (if this is a treatment variant)
-                if variant.variant_type == VariantType.TREATMENT and control_data:
-                    control_conversions = control_data.get(
-                        f"{experiment.primary_metric}_conversions", 0
+                if (
+                    variant.variant_type == VariantType.TREATMENT
+                    and report["exposures"] > 0
+                ):
+                    variant_result.update(
+                        {
+                            "confidence_interval": report["confidence_interval"],
+                            "statistical_significance": report[
+                                "statistically_significant"
+                            ],
+                            "lift": report["lift"],
+                            "p_value": report["p_value"],
+                            "z_statistic": report["z_statistic"],
+                        }
                     )
-                    control_exposures = control_data.get("exposures", 0)
-
-                    if control_exposures > 0 and exposures > 0:
-                        # Perform two-proportion z-test
-                        z_stat, p_value = self._two_proportion_z_test(
-                            conversions,
-                            exposures,
-                            control_conversions,
-                            control_exposures,
-                        )
-
-                        # Calculate confidence interval
-                        ci_lower, ci_upper = self._confidence_interval(
-                            conversions, exposures, experiment.confidence_level
-                        )
-
-                        # Calculate lift
-                        control_rate = control_conversions / control_exposures
-                        lift = (
-                            (conversion_rate - control_rate) / control_rate
-                            if control_rate > 0
-                            else 0
-                        )
-
-                        variant_result.update(
-                            {
-                                "confidence_interval": [ci_lower, ci_upper],
-                                "statistical_significance": p_value
-                                < (1 - experiment.confidence_level),
-                                "lift": lift,
-                                "p_value": p_value,
-                                "z_statistic": z_stat,
-                            }
-                        )
-
-                        if variant_result["statistical_significance"]:
-                            results["statistical_significance"] = True
+
+                    if variant_result["statistical_significance"]:
+                        results["statistical_significance"] = True
 
                 results["variants"].append(variant_result)
 
@@ -1109,52 +965,101 @@ class ABTestingService:
             logger.error(f"Failed to analyze experiment results: {e}")
             return {}
 
-    def _two_proportion_z_test(
-        self, x1: int, n1: int, x2: int, n2: int
-    ) -> Tuple[float, float]:
-        """Perform two-proportion z-test"""
-        try:
-            p1 = x1 / n1
-            p2 = x2 / n2
-
-            # Pooled proportion
-            p_pool = (x1 + x2) / (n1 + n2)
-
-            # Standard error
-            se = np.sqrt(p_pool * (1 - p_pool) * (1 / n1 + 1 / n2))
-
-            # Z-statistic
-            z = (p1 - p2) / se if se > 0 else 0
-
-            # Two-tailed p-value
-            p_value = 2 * (1 - stats.norm.cdf(abs(z)))
-
-            return z, p_value
+    async def _run_analysis(
+        self,
+        experiment: Experiment,
+        extra_metrics: Optional[List[str]] = None,
+        confidence_level: Optional[float] = None,
+    ) -> ExperimentAnalysis:
+        """Aggregate all variants and metrics in one backend pass, then test"""
+        metrics = list(
+            dict.fromkeys(
+                [experiment.primary_metric]
+                + (experiment.secondary_metrics or [])
+                + (extra_metrics or [])
+            )
+        )
+        variants = [v.variant_id for v in experiment.variants]
+        control = next(
+            v for v in experiment.variants if v.variant_type == VariantType.CONTROL
+        )
 
-        except (ZeroDivisionError, ValueError):
-            return 0.0, 1.0
+        # The ClickHouse driver is synchronous
+        aggregates = await asyncio.to_thread(
+            self.analysis_backend.aggregate,
+            experiment.experiment_id,
+            variants,
+            metrics,
+        )
+        return analyze_experiment(
+            aggregates,
+            control.variant_id,
+            confidence_level or experiment.confidence_level,
+        )
 
-    def _confidence_interval(
-        self, conversions: int, exposures: int, confidence_level: float
-    ) -> Tuple[float, float]:
-        """Calculate confidence interval for conversion rate"""
-        try:
-            if exposures == 0:
-                return 0.0, 0.0
+    def _significance_report(
+        self, experiment: Experiment, analysis: ExperimentAnalysis, metric_name: str
+    ) -> Dict[str, Any]:
+        """Treatment-vs-control significance for one metric of an analysis"""
+        confidence_level = analysis.confidence_level
+        reports = analysis.metric_report(metric_name)
+        control = next(r for r in reports if r["is_control"])
 
-            p = conversions / exposures
-            z_score = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+        if control["exposures"] == 0:
+            return {
+                "statistically_significant": False,
+                "reason": (
+                    "Insufficient data"
+                    if not any(r["exposures"] for r in reports)
+                    else "No control group data"
+                ),
+                "p_value": 1.0,
+                "confidence_level": confidence_level,
+            }
 
-            se = np.sqrt(p * (1 - p) / exposures)
-            margin_of_error = z_score * se
+        results = {
+            "experiment_id": experiment.experiment_id,
+            "metric_name": metric_name,
+            "confidence_level": confidence_level,
+            "control_variant": {
+                "variant_id": control["variant_id"],
+                "conversions": control["conversions"],
+                "exposures": control["exposures"],
+                "conversion_rate": control["conversion_rate"],
+                "mean": control["mean"],
+            },
+            "treatment_results": [],
+            "overall_significance": False,
+        }
 
-            ci_lower = max(0, p - margin_of_error)
-            ci_upper = min(1, p + margin_of_error)
+        names = {v.variant_id: v.name for v in experiment.variants}
+        for report in reports:
+            if report["is_control"] or report["exposures"] == 0:
+                continue
+
+            treatment_result = {
+                "variant_id": report["variant_id"],
+                "variant_name": names[report["variant_id"]],
+                "conversions": report["conversions"],
+                "exposures": report["exposures"],
+                "conversion_rate": report["conversion_rate"],
+                "lift": report["lift"],
+                "p_value": report["p_value"],
+                "z_statistic": report["z_statistic"],
+                "statistically_significant": report["statistically_significant"],
+                "confidence_interval": report["confidence_interval"],
+                "mean": report["mean"],
+                "mean_lift": report["mean_lift"],
+                "mean_p_value": report["mean_p_value"],
+                "sample_size_adequate": report["exposures"]
+                >= experiment.minimum_sample_size,
+            }
+            results["treatment_results"].append(treatment_result)
 
-            return ci_lower, ci_upper
+            if report["statistically_significant"]:
+                results["overall_significance"] = True
 
-        except (ZeroDivisionError, ValueError):
-            return 0.0, 0.0
+        return results
 
     def _generate_recommendation(self, results: Dict, experiment: Experiment) -> str:
         """Generate recommendation based on results"""
@@ -1184,42 +1089,35 @@ class ABTestingService:
 
         return "Continue monitoring"
 
-    async def _get_variant_data(self, experiment_id: str) -> Dict[str, Any]:
-        """Get aggregated data for each variant"""
-        try:
-            # This would query ClickHouse for experiment data
-            # For now, return mock data structure
-            _ = """
-            SELECT
-                variant,
-                count(DISTINCT user_id) as exposures,
-                countIf(metric_name = %(primary_metric)s AND metric_value > 0) as conversions
-            FROM experiment_events
-            WHERE experiment_id = %(experiment_id)s
-            GROUP BY variant
-            """
-
-            # Placeholder for actual ClickHouse query
-            return {}
-
-        except Exception as e:
-            logger.error(f"Failed to get variant data: {e}")
-            return {}
-
-    async def _user_meets_criteria(
-        self, user_id: int, target_audience: Dict[str, Any]
-    ) -> bool:
-        """Check if user meets experiment targeting criteria"""
-        # Implement targeting logic based on user attributes
-        # For now, return True (no targeting)
-        return True
+    def _check_allocation_unchanged(self, experiment: Experiment):
+        """
+        Assignment is recomputed from the traffic allocation on every call,
+        so changing it after an experiment has started would silently move
+        users between variants. Allocation is frozen once out of draft.
+        """
+        stored_json = self.redis.hget(EXPERIMENTS_KEY, experiment.experiment_id)
+        if not stored_json:
+            return
+        stored = json.loads(stored_json)
+        if stored["status"] == ExperimentStatus.DRAFT.value:
+            return
+
+        allocation = [(v.variant_id, v.traffic_allocation) for v in experiment.variants]
+        stored_allocation = [
+            (v["variant_id"], v["traffic_allocation"]) for v in stored["variants"]
+        ]
+        if allocation != stored_allocation:
+            raise ValueError(
+                f"Cannot change variants or traffic allocation of experiment "
+                f"{experiment.experiment_id} in {stored['status']} status"
+            )
 
     async def _cache_experiment_config(self, experiment: Experiment):
         """Cache experiment configuration for fast lookup"""
         config_key = f"experiment_config:{experiment.experiment_id}"
         config = {
             "status": experiment.status.value,
-            "variants": [asdict(v) for v in experiment.variants],
+            "variants": [self._variant_config(v) for v in experiment.variants],
         }
 
         self.redis.set(config_key, json.dumps(config, default=str), ex=3600)
@@ -1247,14 +1145,6 @@ class ABTestingService:
         if event.metric_value > 0:
             self.redis.hincrby(metrics_key, f"{event.variant_id}_conversions", 1)
 
-    async def _track_assignment_event(self, assignment: UserAssignment):
-        """Track user assignment as an event"""
-        self.redis.hincrby(
-            f"experiment_metrics:{assignment.experiment_id}",
-            f"{assignment.variant_id}_exposures",
-            1,
-        )
-
     async def _validate_experiment_ready(self, experiment: Experiment):
         """Validate experiment is ready to start"""
         # Check that all required configurations are in place
@@ -1267,5 +1157,6 @@ class ABTestingService:
 
     async def _update_experiment(self, experiment: Experiment):
         """Update experiment in storage"""
+        self._check_allocation_unchanged(experiment)
         await self._store_experiment(experiment)
         await self._cache_experiment_config(experiment)
@@ -10,7 +10,7 @@ import math
 import random
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from app.models.ai_models import CompatibilityPrediction, UserProfile
 from app.models.daily_revelation import DailyRevelation
@@ -19,11 +19,19 @@ from app.models.soul_analytics import AnalyticsEventType
 from app.models.soul_connection import SoulConnection
 from app.models.user import User
 from app.services.analytics_service import analytics_service
-from sqlalchemy import and_, or_
+from app.services.pair_score_cache import pair_score_cache
+from app.services.profile_ann_index import profile_ann_index, profile_embedding
+from sqlalchemy import and_, case, func, or_
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+# Stored on each CompatibilityPrediction; also versions cached pair scores
+PREDICTION_VERSION = "v1.0"
+
+# Pair score cache namespace for this service's results
+AI_SCORER = "ai"
+
 
 @dataclass
 class MatchRecommendation:
@@ -161,6 +169,11 @@ class AIMatchingService:
             db.commit()
             db.refresh(profile)
 
+            # Keep the nearest-neighbour index current for this worker; other
+            # workers pick the change up on their next sync
+            profile_ann_index.upsert_profile(profile)
+            pair_score_cache.invalidate_user(user_id)
+
             logger.info(f"Generated AI profile embeddings for user {user_id}")
             return profile
 
@@ -177,64 +190,29 @@ class AIMatchingService:
             profile1 = await self._ensure_user_profile(user1_id, db)
             profile2 = await self._ensure_user_profile(user2_id, db)
 
-            # Calculate compatibility components
-            personality_compat = self._calculate_personality_compatibility(
-                profile1, profile2
-            )
-            interests_compat = self._calculate_interests_compatibility(
-                profile1, profile2
-            )
-            values_compat = self._calculate_values_compatibility(profile1, profile2)
-            communication_compat = self._calculate_communication_compatibility(
-                profile1, profile2
-            )
+            behavior1 = await self.analyze_user_behavior(user1_id, db=db)
+            behavior2 = await self.analyze_user_behavior(user2_id, db=db)
+            summary1 = (behavior1.engagement_score, behavior1.communication_style)
+            summary2 = (behavior2.engagement_score, behavior2.communication_style)
 
-            # Advanced compatibility factors
-            lifestyle_compat = await self._calculate_lifestyle_compatibility(
-                user1_id, user2_id, db
+            stamps = (
+                self._pair_stamp(profile1, summary1),
+                self._pair_stamp(profile2, summary2),
             )
-            growth_potential = await self._calculate_growth_potential(
-                profile1, profile2, db
-            )
-            conflict_prediction = await self._predict_conflict_likelihood(
-                profile1, profile2, db
-            )
-
-            # Overall compatibility with weighted average
-            weights = {
-                "personality": 0.25,
-                "interests": 0.20,
-                "values": 0.25,
-                "communication": 0.15,
-                "lifestyle": 0.15,
-            }
-
-            overall_compatibility = (
-                personality_compat * weights["personality"]
-                + interests_compat * weights["interests"]
-                + values_compat * weights["values"]
-                + communication_compat * weights["communication"]
-                + lifestyle_compat * weights["lifestyle"]
-            )
-
-            # Calculate confidence level
-            confidence = self._calculate_prediction_confidence(profile1, profile2)
-
-            # Generate insights and recommendations
-            compatibility_reasons = self._generate_compatibility_reasons(
-                personality_compat,
-                interests_compat,
-                values_compat,
-                communication_compat,
-            )
-
-            potential_challenges = self._generate_potential_challenges(
-                profile1, profile2, conflict_prediction
-            )
-
-            conversation_starters = await self._generate_conversation_starters(
-                profile1, profile2, db
+            scores = pair_score_cache.get(
+                AI_SCORER, user1_id, user2_id, PREDICTION_VERSION, stamps
             )
+            cache_hit = scores is not None
+            if not cache_hit:
+                lifestyle_compat = self._lifestyle_compatibility_from_behavior(
+                    summary1, summary2
+                )
+                scores = await self._score_profile_pair(
+                    profile1, profile2, lifestyle_compat, db
+                )
+                pair_score_cache.set(
+                    AI_SCORER, user1_id, user2_id, PREDICTION_VERSION, scores, stamps
+                )
 
             # Create or update compatibility prediction
             prediction = (
@@ -255,31 +233,17 @@ class AIMatchingService:
                     model_id=1,  # Default model ID for now
                 )
                 db.add(prediction)
+            elif cache_hit and self._prediction_is_current(prediction, scores):
+                # Unchanged since it was last written; skip the transaction
+                return prediction
 
-            # Update prediction with AI results
-            prediction.overall_compatibility = overall_compatibility
-            prediction.confidence_level = confidence
-            prediction.personality_compatibility = personality_compat
-            prediction.values_compatibility = values_compat
-            prediction.interests_compatibility = interests_compat
-            prediction.communication_compatibility = communication_compat
-            prediction.lifestyle_compatibility = lifestyle_compat
-            prediction.conversation_quality_prediction = (
-                await self._predict_conversation_quality(profile1, profile2, db)
-            )
-            prediction.long_term_potential = growth_potential
-            prediction.conflict_likelihood = conflict_prediction
-            prediction.compatibility_reasons = compatibility_reasons
-            prediction.potential_challenges = potential_challenges
-            prediction.conversation_starters = conversation_starters
-            prediction.prediction_version = "v1.0"
-            prediction.prediction_date = datetime.utcnow()
+            self._apply_prediction_scores(prediction, scores)
 
             db.commit()
             db.refresh(prediction)
 
             logger.info(
-                f"Calculated AI compatibility: {overall_compatibility:.3f} for users {user1_id}-{user2_id}"
+                f"Calculated AI compatibility: {scores['overall_compatibility']:.3f} for users {user1_id}-{user2_id}"
             )
             return prediction
 
@@ -287,12 +251,116 @@ class AIMatchingService:
             logger.error(f"Error calculating AI compatibility: {str(e)}")
             raise
 
+    async def calculate_ai_compatibility_batch(
+        self,
+        profile: UserProfile,
+        candidate_profiles: List[UserProfile],
+        db: Session,
+    ) -> Dict[int, CompatibilityPrediction]:
+        """
+        Score one user's profile against many candidate profiles with a
+        constant number of queries: behavior aggregates, existing predictions
+        and one bulk upsert in a single transaction. Candidate profiles are
+        scored as loaded rather than regenerated. Returns predictions keyed
+        by candidate user id.
+        """
+        if not candidate_profiles:
+            return {}
+
+        user_id = profile.user_id
+        try:
+            behaviors = await self._bulk_behavior_summaries(
+                [user_id] + [c.user_id for c in candidate_profiles], db
+            )
+            stamp = self._pair_stamp(profile, behaviors[user_id])
+
+            # Serve unchanged pairs from the pair score cache
+            cached_scores = {}
+            for candidate in candidate_profiles:
+                scores = pair_score_cache.get(
+                    AI_SCORER,
+                    user_id,
+                    candidate.user_id,
+                    PREDICTION_VERSION,
+                    (stamp, self._pair_stamp(candidate, behaviors[candidate.user_id])),
+                )
+                if scores is not None:
+                    cached_scores[candidate.user_id] = scores
+
+            existing = {
+                prediction.user2_profile_id: prediction
+                for prediction in db.query(CompatibilityPrediction)
+                .filter(
+                    CompatibilityPrediction.user1_profile_id == profile.id,
+                    CompatibilityPrediction.user2_profile_id.in_(
+                        [c.id for c in candidate_profiles]
+                    ),
+                )
+                .all()
+            }
+
+            predictions = {}
+            for candidate in candidate_profiles:
+                scores = cached_scores.get(candidate.user_id)
+                if scores is None:
+                    lifestyle_compat = self._lifestyle_compatibility_from_behavior(
+                        behaviors[user_id], behaviors[candidate.user_id]
+                    )
+                    scores = await self._score_profile_pair(
+                        profile, candidate, lifestyle_compat, db
+                    )
+                    pair_score_cache.set(
+                        AI_SCORER,
+                        user_id,
+                        candidate.user_id,
+                        PREDICTION_VERSION,
+                        scores,
+                        (
+                            stamp,
+                            self._pair_stamp(candidate, behaviors[candidate.user_id]),
+                        ),
+                    )
+
+                prediction = existing.get(candidate.id)
+                if prediction is None:
+                    prediction = CompatibilityPrediction(
+                        user1_profile_id=profile.id,
+                        user2_profile_id=candidate.id,
+                        model_id=1,  # Default model ID for now
+                    )
+                    db.add(prediction)
+                elif self._prediction_is_current(prediction, scores):
+                    predictions[candidate.user_id] = prediction
+                    continue
+                self._apply_prediction_scores(prediction, scores)
+                predictions[candidate.user_id] = prediction
+
+            db.flush()
+            prediction_ids = [prediction.id for prediction in predictions.values()]
+            db.commit()
+
+            # Reload committed rows in one query rather than one refresh each
+            db.query(CompatibilityPrediction).filter(
+                CompatibilityPrediction.id.in_(prediction_ids)
+            ).all()
+
+            logger.info(
+                f"Calculated AI compatibility for user {user_id} "
+                f"against {len(predictions)} candidates"
+            )
+            return predictions
+
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error calculating batch AI compatibility: {str(e)}")
+            raise
+
     async def generate_personalized_recommendations(
         self, user_id: int, limit: int = 10, db: Session = None
     ) -> List[MatchRecommendation]:
         """Generate AI-powered personalized match recommendations"""
         try:
-            await self._ensure_user_profile(user_id, db)
+            profile = await self._ensure_user_profile(user_id, db)
 
             # Get potential matches (users not already connected)
             existing_connections = (
@@ -312,28 +380,53 @@ class AIMatchingService:
                 excluded_user_ids.add(conn.user2_id)
             excluded_user_ids.discard(user_id)  # Remove self
 
-            # Get potential match candidates with AI profiles
-            potential_matches = (
-                db.query(UserProfile)
-                .filter(
-                    and_(
-                        UserProfile.user_id != user_id,
-                        ~UserProfile.user_id.in_(excluded_user_ids),
-                        UserProfile.ai_confidence_level
-                        > 0.3,  # Only users with decent AI confidence
+            if profile_ann_index.ready:
+                # Get the nearest profiles by embedding, then load just those
+                nearest_user_ids = profile_ann_index.search(
+                    profile_embedding(profile),
+                    k=50,
+                    exclude=excluded_user_ids | {user_id},
+                    min_confidence=0.3,  # Only users with decent AI confidence
+                )
+                profiles_by_user = {
+                    match_profile.user_id: match_profile
+                    for match_profile in db.query(UserProfile)
+                    .filter(
+                        and_(
+                            UserProfile.user_id.in_(nearest_user_ids),
+                            UserProfile.ai_confidence_level > 0.3,
+                        )
+                    )
+                    .all()
+                }
+                potential_matches = [
+                    profiles_by_user[match_user_id]
+                    for match_user_id in nearest_user_ids
+                    if match_user_id in profiles_by_user
+                ]
+            else:
+                # Index still building in the background
+                potential_matches = (
+                    db.query(UserProfile)
+                    .filter(
+                        and_(
+                            UserProfile.user_id != user_id,
+                            ~UserProfile.user_id.in_(excluded_user_ids),
+                            UserProfile.ai_confidence_level
+                            > 0.3,  # Only users with decent AI confidence
+                        )
                     )
+                    .limit(50)
+                    .all()
                 )
-                .limit(50)
-                .all()
-            )  # Get broader set for analysis
 
             recommendations = []
 
-            # Calculate compatibility with each potential match
-            for match_profile in potential_matches:
-                compatibility_pred = await self.calculate_ai_compatibility(
-                    user_id, match_profile.user_id, db
-                )
+            # Score all potential matches in one batch
+            predictions = await self.calculate_ai_compatibility_batch(
+                profile, potential_matches, db
+            )
+            for recommended_user_id, compatibility_pred in predictions.items():
 
                 if (
                     compatibility_pred.overall_compatibility
@@ -346,7 +439,7 @@ class AIMatchingService:
 
                     recommendation = MatchRecommendation(
                         user_id=user_id,
-                        recommended_user_id=match_profile.user_id,
+                        recommended_user_id=recommended_user_id,
                         compatibility_score=compatibility_pred.overall_compatibility,
                         confidence_level=compatibility_pred.confidence_level,
                         match_reasons=compatibility_pred.compatibility_reasons or [],
@@ -516,6 +609,90 @@ class AIMatchingService:
                 recommendations=[],
             )
 
+    @staticmethod
+    def _pair_stamp(profile: UserProfile, behavior: Tuple[float, str]) -> Tuple:
+        """
+        Pair-cache stamp covering everything a pair score reads for one user:
+        the profile row and the behavior summary derived from their recent
+        messages, revelations and connections (which never touch the profile)
+        """
+        return (profile.updated_at, behavior)
+
+    async def _bulk_behavior_summaries(
+        self, user_ids: List[int], db: Session, days_back: int = 30
+    ) -> Dict[int, Tuple[float, str]]:
+        """
+        (engagement_score, communication_style) for many users, matching
+        analyze_user_behavior, from three grouped queries instead of three
+        queries per user.
+        """
+        cutoff_date = datetime.utcnow() - timedelta(days=days_back)
+        user_ids = list(set(user_ids))
+
+        message_counts = dict(
+            db.query(Message.sender_id, func.count(Message.id))
+            .filter(
+                Message.sender_id.in_(user_ids),
+                Message.created_at >= cutoff_date,
+            )
+            .group_by(Message.sender_id)
+            .all()
+        )
+
+        has_content = and_(
+            DailyRevelation.content.isnot(None), DailyRevelation.content != ""
+        )
+        revelation_stats = {
+            sender_id: (count, content_count or 0, content_length or 0)
+            for sender_id, count, content_count, content_length in db.query(
+                DailyRevelation.sender_id,
+                func.count(DailyRevelation.id),
+                func.sum(case((has_content, 1), else_=0)),
+                func.sum(
+                    case(
+                        (has_content, func.length(DailyRevelation.content)),
+                        else_=0,
+                    )
+                ),
+            )
+            .filter(
+                DailyRevelation.sender_id.in_(user_ids),
+                DailyRevelation.created_at >= cutoff_date,
+            )
+            .group_by(DailyRevelation.sender_id)
+            .all()
+        }
+
+        connected = set()
+        for user1_id, user2_id in db.query(
+            SoulConnection.user1_id, SoulConnection.user2_id
+        ).filter(
+            or_(
+                SoulConnection.user1_id.in_(user_ids),
+                SoulConnection.user2_id.in_(user_ids),
+            ),
+            SoulConnection.created_at >= cutoff_date,
+        ):
+            connected.update((user1_id, user2_id))
+
+        summaries = {}
+        for user_id in user_ids:
+            revelation_count, content_count, content_length = revelation_stats.get(
+                user_id, (0, 0, 0)
+            )
+            summaries[user_id] = (
+                self._engagement_score_from_counts(
+                    message_counts.get(user_id, 0),
+                    1 if user_id in connected else 0,
+                    revelation_count,
+                    days_back,
+                ),
+                # Messages carry no `content` attribute, so only revelation
+                # text informs the style (as in _determine_communication_style)
+                self._communication_style_from_lengths(content_length, content_count),
+            )
+        return summaries
+
     # Helper methods for AI processing
 
     async def _analyze_personality_from_revelations(
@@ -1130,23 +1307,119 @@ class AIMatchingService:
         behavior1 = await self.analyze_user_behavior(user1_id, db=db)
         behavior2 = await self.analyze_user_behavior(user2_id, db=db)
 
-        # Compare activity levels
-        activity_compat = 1.0 - abs(
-            behavior1.engagement_score - behavior2.engagement_score
+        return self._lifestyle_compatibility_from_behavior(
+            (behavior1.engagement_score, behavior1.communication_style),
+            (behavior2.engagement_score, behavior2.communication_style),
         )
 
+    def _lifestyle_compatibility_from_behavior(
+        self, behavior1: Tuple[float, str], behavior2: Tuple[float, str]
+    ) -> float:
+        """Lifestyle compatibility from (engagement_score, communication_style)"""
+        engagement1, style1 = behavior1
+        engagement2, style2 = behavior2
+
+        # Compare activity levels
+        activity_compat = 1.0 - abs(engagement1 - engagement2)
+
         # Compare communication styles
-        style_compat = (
-            0.8
-            if behavior1.communication_style == behavior2.communication_style
-            else 0.5
-        )
+        style_compat = 0.8 if style1 == style2 else 0.5
 
         # Overall lifestyle compatibility
         lifestyle_compat = (activity_compat * 0.6) + (style_compat * 0.4)
 
         return min(1.0, max(0.0, lifestyle_compat))
 
+    async def _score_profile_pair(
+        self,
+        profile1: UserProfile,
+        profile2: UserProfile,
+        lifestyle_compat: float,
+        db: Session,
+    ) -> Dict[str, Any]:
+        """Compute every CompatibilityPrediction field for a pair of profiles"""
+        # Calculate compatibility components
+        personality_compat = self._calculate_personality_compatibility(
+            profile1, profile2
+        )
+        interests_compat = self._calculate_interests_compatibility(profile1, profile2)
+        values_compat = self._calculate_values_compatibility(profile1, profile2)
+        communication_compat = self._calculate_communication_compatibility(
+            profile1, profile2
+        )
+
+        # Advanced compatibility factors
+        growth_potential = await self._calculate_growth_potential(
+            profile1, profile2, db
+        )
+        conflict_prediction = await self._predict_conflict_likelihood(
+            profile1, profile2, db
+        )
+
+        # Overall compatibility with weighted average
+        weights = {
+            "personality": 0.25,
+            "interests": 0.20,
+            "values": 0.25,
+            "communication": 0.15,
+            "lifestyle": 0.15,
+        }
+
+        overall_compatibility = (
+            personality_compat * weights["personality"]
+            + interests_compat * weights["interests"]
+            + values_compat * weights["values"]
+            + communication_compat * weights["communication"]
+            + lifestyle_compat * weights["lifestyle"]
+        )
+
+        return {
+            "overall_compatibility": overall_compatibility,
+            "confidence_level": self._calculate_prediction_confidence(
+                profile1, profile2
+            ),
+            "personality_compatibility": personality_compat,
+            "values_compatibility": values_compat,
+            "interests_compatibility": interests_compat,
+            "communication_compatibility": communication_compat,
+            "lifestyle_compatibility": lifestyle_compat,
+            "conversation_quality_prediction": (
+                await self._predict_conversation_quality(profile1, profile2, db)
+            ),
+            "long_term_potential": growth_potential,
+            "conflict_likelihood": conflict_prediction,
+            # Generate insights and recommendations
+            "compatibility_reasons": self._generate_compatibility_reasons(
+                personality_compat,
+                interests_compat,
+                values_compat,
+                communication_compat,
+            ),
+            "potential_challenges": self._generate_potential_challenges(
+                profile1, profile2, conflict_prediction
+            ),
+            "conversation_starters": await self._generate_conversation_starters(
+                profile1, profile2, db
+            ),
+        }
+
+    def _prediction_is_current(
+        self, prediction: CompatibilityPrediction, scores: Dict[str, Any]
+    ) -> bool:
+        """Whether a stored prediction already holds these scores"""
+        return prediction.prediction_version == PREDICTION_VERSION and all(
+            getattr(prediction, field) == value for field, value in scores.items()
+        )
+
+    def _apply_prediction_scores(
+        self, prediction: CompatibilityPrediction, scores: Dict[str, Any]
+    ) -> None:
+        """Update prediction with AI results"""
+        for field, value in scores.items():
+            setattr(prediction, field, value)
+        prediction.prediction_version = PREDICTION_VERSION
+        prediction.prediction_date = datetime.utcnow()
+
     def _calculate_prediction_confidence(
         self, profile1: UserProfile, profile2: UserProfile
     ) -> float:
@@ -1236,17 +1509,13 @@ class AIMatchingService:
             if min_agreeableness < 0.3:
                 conflict_factors.append(0.3)
 
-        # Communication style mismatches
-        if (
-            profile1.communication_style
-            and profile2.communication_style
-            and profile1.communication_style != profile2.communication_style
-        ):
-            if (
-                profile1.communication_style == "direct"
-                and profile2.communication_style == "diplomatic"
-            ):
-                conflict_factors.append(0.2)
+        # Communication style mismatches (order-independent, so a pair's
+        # prediction is the same whichever user is asking)
+        if {profile1.communication_style, profile2.communication_style} == {
+            "direct",
+            "diplomatic",
+        }:
+            conflict_factors.append(0.2)
 
         # Calculate average conflict likelihood
         if conflict_factors:
@@ -1476,10 +1745,18 @@ class AIMatchingService:
                 if content:
                     total_content.append(content)
 
-        if not total_content:
+        return self._communication_style_from_lengths(
+            sum(len(content) for content in total_content), len(total_content)
+        )
+
+    def _communication_style_from_lengths(
+        self, total_length: int, content_count: int
+    ) -> str:
+        """Communication style from the total and count of non-empty contents"""
+        if not content_count:
             return "thoughtful"
 
-        avg_length = sum(len(content) for content in total_content) / len(total_content)
+        avg_length = total_length / content_count
 
         # Map length to communication style categories
         if avg_length > 200:
@@ -1497,24 +1774,35 @@ class AIMatchingService:
         self, messages, connections, revelations, days_back
     ) -> float:
         """Calculate user engagement score based on behavior"""
+        return self._engagement_score_from_counts(
+            len(messages) if messages else 0,
+            len(connections) if connections else 0,
+            len(revelations) if revelations else 0,
+            days_back,
+        )
+
+    def _engagement_score_from_counts(
+        self, message_count, connection_count, revelation_count, days_back
+    ) -> float:
+        """Engagement score from message, connection and revelation counts"""
         engagement_factors = []
 
         # Message frequency
-        if messages:
-            msg_per_day = len(messages) / days_back
+        if message_count:
+            msg_per_day = message_count / days_back
             engagement_factors.append(
                 min(1.0, msg_per_day / 5.0)
             )  # Normalize to 5 messages/day = 1.0
 
         # Revelation participation
-        if revelations:
-            rev_per_week = len(revelations) / (days_back / 7)
+        if revelation_count:
+            rev_per_week = revelation_count / (days_back / 7)
             engagement_factors.append(
                 min(1.0, rev_per_week / 2.0)
             )  # 2 revelations/week = 1.0
 
         # Connection activity
-        if connections:
+        if connection_count:
             engagement_factors.append(0.7)  # Base engagement for having connections
 
         if engagement_factors:
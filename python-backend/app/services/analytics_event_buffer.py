@@ -0,0 +1,269 @@
+"""
+Analytics Event Buffer
+In-process buffer behind AnalyticsService.track_user_event and
+track_system_performance. Recording an event is a list append; a background
+loop flushes by size or time (see app.services.write_behind) with:
+
+- one bulk insert for engagement events and one for performance metrics
+- one executemany that adds each user's swipe/message/revelation counts
+- one upsert into the per-user daily event-count buckets used for scoring
+- one lookup plus bulk insert/update for emotional journey stages
+
+The buffer is bounded: once `max_buffered` items are waiting, callers flush
+on their own request (backpressure) instead of growing memory without limit.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models.soul_analytics import (
+    AnalyticsEventType,
+    EmotionalJourneyTracking,
+    SystemPerformanceMetrics,
+    UserEngagementAnalytics,
+    UserEngagementDaily,
+)
+from app.models.user import User
+from app.services.write_behind import WriteBehindBuffer
+from sqlalchemy import bindparam, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Event type -> User counter it increments
+USER_COUNTERS = {
+    AnalyticsEventType.SWIPE_ACTION.value: "total_swipes",
+    AnalyticsEventType.MESSAGE_SENT.value: "total_messages_sent",
+    AnalyticsEventType.REVELATION_SHARED.value: "total_revelations_shared",
+}
+
+# Event type -> emotional journey stage it counts towards
+JOURNEY_STAGES = {
+    AnalyticsEventType.CONNECTION_INITIATED.value: "discovery",
+    AnalyticsEventType.REVELATION_SHARED.value: "revelation",
+    AnalyticsEventType.PHOTO_CONSENT_GIVEN.value: "connection",
+}
+
+JourneyKey = Tuple[int, int, str]
+DailyKey = Tuple[int, date, str]
+
+
+@dataclass
+class AnalyticsBatch:
+    """Everything recorded between two flushes"""
+
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    metrics: List[Dict[str, Any]] = field(default_factory=list)
+    # user_id -> {counter column: increment}
+    user_counters: Dict[int, Dict[str, int]] = field(default_factory=dict)
+    # (user_id, day, event_type) -> events
+    daily_counts: Dict[DailyKey, int] = field(default_factory=dict)
+    # (user_id, connection_id, stage) -> (interactions, first emotional state)
+    journeys: Dict[JourneyKey, Tuple[int, Optional[str]]] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.events) + len(self.metrics)
+
+
+class AnalyticsEventBuffer(WriteBehindBuffer):
+    """Bounded buffer of analytics writes, flushed in bulk"""
+
+    name = "Analytics event buffer"
+
+    def __init__(
+        self,
+        flush_interval_seconds: float = 2.0,
+        max_pending: int = 100,
+        max_buffered: int = 10000,
+    ):
+        super().__init__(flush_interval_seconds, max_pending)
+        self.max_buffered = max_buffered
+        self._batch = AnalyticsBatch()
+
+    def pending(self) -> int:
+        return len(self._batch)
+
+    def is_full(self) -> bool:
+        return len(self._batch) >= self.max_buffered
+
+    def record_event(
+        self,
+        user_id: int,
+        event_type: AnalyticsEventType,
+        event_data: Dict[str, Any],
+        session_id: Optional[str] = None,
+        connection_id: Optional[int] = None,
+    ) -> None:
+        row = {
+            "user_id": user_id,
+            "event_type": event_type.value,
+            "event_data": event_data,
+            "session_id": session_id,
+            "device_type": event_data.get("device_type", "unknown"),
+            "browser_info": event_data.get("browser_info"),
+            "timezone": event_data.get("timezone"),
+            "country_code": event_data.get("country_code"),
+            "created_at": datetime.utcnow(),
+        }
+        counter = USER_COUNTERS.get(event_type.value)
+        stage = JOURNEY_STAGES.get(event_type.value)
+        daily_key = (user_id, row["created_at"].date(), event_type.value)
+
+        with self._lock:
+            batch = self._batch
+            batch.events.append(row)
+            daily = batch.daily_counts
+            daily[daily_key] = daily.get(daily_key, 0) + 1
+            if counter:
+                counters = batch.user_counters.setdefault(user_id, {})
+                counters[counter] = counters.get(counter, 0) + 1
+            if connection_id and stage:
+                key = (user_id, connection_id, stage)
+                count, state = batch.journeys.get(
+                    key, (0, event_data.get("emotional_state"))
+                )
+                batch.journeys[key] = (count + 1, state)
+            pending = len(batch)
+
+        self._notify_pending(pending)
+
+    def record_metric(
+        self, metric_name: str, value: float, metric_unit: str, component: str
+    ) -> None:
+        row = {
+            "metric_name": metric_name,
+            "metric_value": value,
+            "metric_unit": metric_unit,
+            "component": component,
+            "measured_at": datetime.utcnow(),
+        }
+        with self._lock:
+            self._batch.metrics.append(row)
+            pending = len(self._batch)
+
+        self._notify_pending(pending)
+
+    def _take(self) -> Optional[AnalyticsBatch]:
+        if not len(self._batch):
+            return None
+        batch, self._batch = self._batch, AnalyticsBatch()
+        return batch
+
+    def _write(self, db: Session, batch: AnalyticsBatch) -> int:
+        if batch.events:
+            db.execute(UserEngagementAnalytics.__table__.insert(), batch.events)
+        if batch.metrics:
+            db.execute(SystemPerformanceMetrics.__table__.insert(), batch.metrics)
+        if batch.user_counters:
+            self._write_user_counters(db, batch.user_counters)
+        if batch.daily_counts:
+            self._write_daily_counts(db, batch.daily_counts)
+        if batch.journeys:
+            self._write_journeys(db, batch.journeys)
+        db.commit()
+        return len(batch)
+
+    def _write_user_counters(
+        self, db: Session, user_counters: Dict[int, Dict[str, int]]
+    ) -> None:
+        users = User.__table__
+        columns = sorted(set(USER_COUNTERS.values()))
+        db.execute(
+            users.update()
+            .where(users.c.id == bindparam("b_id"))
+            .values(
+                {
+                    column: func.coalesce(users.c[column], 0) + bindparam(f"b_{column}")
+                    for column in columns
+                }
+            ),
+            [
+                {
+                    "b_id": user_id,
+                    **{f"b_{column}": counters.get(column, 0) for column in columns},
+                }
+                for user_id, counters in user_counters.items()
+            ],
+        )
+
+    def _write_daily_counts(
+        self, db: Session, daily_counts: Dict[DailyKey, int]
+    ) -> None:
+        # Upsert so concurrent flushes from several workers add up
+        insert = pg_insert(UserEngagementDaily.__table__)
+        db.execute(
+            insert.on_conflict_do_update(
+                index_elements=["user_id", "day", "event_type"],
+                set_={
+                    "event_count": UserEngagementDaily.__table__.c.event_count
+                    + insert.excluded.event_count
+                },
+            ),
+            [
+                {
+                    "user_id": user_id,
+                    "day": day,
+                    "event_type": event_type,
+                    "event_count": count,
+                }
+                for (user_id, day, event_type), count in daily_counts.items()
+            ],
+        )
+
+    def _write_journeys(
+        self, db: Session, journeys: Dict[JourneyKey, Tuple[int, Optional[str]]]
+    ) -> None:
+        existing = {
+            (row.user_id, row.connection_id, row.journey_stage): row.id
+            for row in db.query(
+                EmotionalJourneyTracking.id,
+                EmotionalJourneyTracking.user_id,
+                EmotionalJourneyTracking.connection_id,
+                EmotionalJourneyTracking.journey_stage,
+            ).filter(
+                tuple_(
+                    EmotionalJourneyTracking.user_id,
+                    EmotionalJourneyTracking.connection_id,
+                    EmotionalJourneyTracking.journey_stage,
+                ).in_(list(journeys))
+            )
+        }
+
+        updates = [
+            {"b_id": existing[key], "b_count": count}
+            for key, (count, _) in journeys.items()
+            if key in existing
+        ]
+        if updates:
+            journey_table = EmotionalJourneyTracking.__table__
+            db.execute(
+                journey_table.update()
+                .where(journey_table.c.id == bindparam("b_id"))
+                .values(
+                    interaction_count=func.coalesce(
+                        journey_table.c.interaction_count, 0
+                    )
+                    + bindparam("b_count")
+                ),
+                updates,
+            )
+
+        now = datetime.utcnow()
+        inserts = [
+            {
+                "user_id": user_id,
+                "connection_id": connection_id,
+                "journey_stage": stage,
+                "emotional_state": state or "curious",
+                "interaction_count": count,
+                "haptic_triggers": 0,
+                "stage_entered_at": now,
+            }
+            for (user_id, connection_id, stage), (count, state) in journeys.items()
+            if (user_id, connection_id, stage) not in existing
+        ]
+        if inserts:
+            db.execute(EmotionalJourneyTracking.__table__.insert(), inserts)
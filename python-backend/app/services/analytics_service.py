@@ -4,6 +4,7 @@ Comprehensive analytics system for user behavior, engagement, and system optimiz
 """
 
 # import json
+import asyncio
 import logging
 from collections import Counter, defaultdict
 from dataclasses import dataclass
@@ -13,18 +14,28 @@ from typing import Any, Dict, List, Optional
 from app.models.daily_revelation import DailyRevelation
 from app.models.soul_analytics import (
     AnalyticsEventType,
-    EmotionalJourneyTracking,
     SystemPerformanceMetrics,
     UserEngagementAnalytics,
+    UserEngagementDaily,
     UserRetentionMetrics,
 )
 from app.models.soul_connection import SoulConnection
 from app.models.user import User
-from sqlalchemy import func, or_
+from app.observability import metrics as obs
+from app.services.analytics_event_buffer import AnalyticsEventBuffer
+from sqlalchemy import case, distinct, func, or_
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+ENGAGEMENT_WINDOW_DAYS = 30
+ENGAGEMENT_RECENT_DAYS = 7
+DEEP_ENGAGEMENT_EVENTS = [
+    AnalyticsEventType.REVELATION_SHARED.value,
+    AnalyticsEventType.MESSAGE_SENT.value,
+    AnalyticsEventType.CONNECTION_ACCEPTED.value,
+]
+
 
 @dataclass
 class EngagementMetrics:
@@ -80,8 +91,8 @@ class AnalyticsService:
     """Comprehensive analytics and engagement tracking service"""
 
     def __init__(self):
-        self.event_cache = {}  # In-memory cache for high-frequency events
-        self.batch_size = 100  # Batch size for bulk operations
+        # High-frequency events are buffered and written in bulk
+        self.event_buffer = AnalyticsEventBuffer()
         logger.info("Analytics Service initialized")
 
     async def track_user_event(
@@ -89,111 +100,60 @@ class AnalyticsService:
         user_id: int,
         event_type: AnalyticsEventType,
         event_data: Dict[str, Any],
-        db: Session,
+        db: Optional[Session] = None,
         session_id: Optional[str] = None,
         connection_id: Optional[int] = None,
     ) -> bool:
-        """Track individual user engagement event"""
+        """
+        Track individual user engagement event. The event, the user's counters
+        and the emotional journey are written by the next buffer flush; `db`
+        is no longer used and kept for existing callers.
+        """
+        if user_id is None:
+            # Anonymous requests have no engagement row to attach to
+            return False
         try:
-            analytics_event = UserEngagementAnalytics(
-                user_id=user_id,
-                event_type=event_type.value,
-                event_data=event_data,
-                session_id=session_id,
-                device_type=event_data.get("device_type", "unknown"),
-                browser_info=event_data.get("browser_info"),
-                timezone=event_data.get("timezone"),
-                country_code=event_data.get("country_code"),
-                created_at=datetime.utcnow(),
+            await self._reserve_buffer_space()
+            self.event_buffer.record_event(
+                user_id, event_type, event_data, session_id, connection_id
             )
-
-            db.add(analytics_event)
-
-            # Update user's total counters
-            user = db.query(User).filter(User.id == user_id).first()
-            if user:
-                if event_type == AnalyticsEventType.SWIPE_ACTION:
-                    user.total_swipes += 1
-                elif event_type == AnalyticsEventType.MESSAGE_SENT:
-                    user.total_messages_sent += 1
-                elif event_type == AnalyticsEventType.REVELATION_SHARED:
-                    user.total_revelations_shared += 1
-
-            # Update emotional journey if connection-related
-            if connection_id:
-                await self._update_emotional_journey(
-                    user_id, connection_id, event_type, event_data, db
-                )
-
-            db.commit()
             return True
 
         except Exception as e:
             logger.error(f"Error tracking user event: {str(e)}")
-            db.rollback()
             return False
 
     async def calculate_user_engagement_score(self, user_id: int, db: Session) -> float:
         """Calculate comprehensive engagement score for a user"""
         try:
-            # Get recent activity (last 30 days)
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-
-            events = (
-                db.query(UserEngagementAnalytics)
-                .filter(
-                    UserEngagementAnalytics.user_id == user_id,
-                    UserEngagementAnalytics.created_at >= cutoff_date,
-                )
-                .all()
+            features = self._engagement_features_query(db).filter(
+                UserEngagementDaily.user_id == user_id
             )
-
-            if not events:
-                return 0.0
-
-            # Calculate various engagement factors
-            factors = {}
-
-            # Activity frequency (0-25 points)
-            unique_days = len(set(event.created_at.date() for event in events))
-            factors["frequency"] = min(25.0, (unique_days / 30.0) * 25.0)
-
-            # Action diversity (0-20 points)
-            event_types = set(event.event_type for event in events)
-            factors["diversity"] = min(20.0, (len(event_types) / 10.0) * 20.0)
-
-            # Deep engagement actions (0-25 points)
-            deep_actions = [
-                AnalyticsEventType.REVELATION_SHARED,
-                AnalyticsEventType.MESSAGE_SENT,
-                AnalyticsEventType.CONNECTION_ACCEPTED,
-            ]
-            deep_count = sum(
-                1
-                for event in events
-                if event.event_type in [e.value for e in deep_actions]
-            )
-            factors["depth"] = min(25.0, (deep_count / 20.0) * 25.0)
-
-            # Session quality (0-15 points)
-            # Would calculate based on session duration data
-            factors["quality"] = 10.0  # Placeholder
-
-            # Recent activity bonus (0-15 points)
-            recent_events = [
-                e
-                for e in events
-                if e.created_at >= datetime.utcnow() - timedelta(days=7)
-            ]
-            factors["recency"] = min(15.0, (len(recent_events) / 10.0) * 15.0)
-
-            total_score = sum(factors.values())
-            return min(100.0, total_score)
+            row = features.first()
+            return self._score_engagement(*row[1:]) if row else 0.0
 
         except Exception as e:
             logger.error(f"Error calculating engagement score: {str(e)}")
             return 0.0
 
+    async def calculate_engagement_scores(
+        self, db: Session, user_ids: Optional[List[int]] = None
+    ) -> Dict[int, float]:
+        """
+        Engagement scores for many users (the whole user base by default) in
+        one grouped query over the daily buckets. Users with no activity in
+        the window are omitted; their score is 0.
+        """
+        try:
+            features = self._engagement_features_query(db)
+            if user_ids is not None:
+                features = features.filter(UserEngagementDaily.user_id.in_(user_ids))
+            return {row[0]: self._score_engagement(*row[1:]) for row in features.all()}
+
+        except Exception as e:
+            logger.error(f"Error calculating engagement scores: {str(e)}")
+            return {}
+
     async def get_user_journey_funnel(
         self, db: Session, days: int = 30
     ) -> UserJourneyAnalytics:
@@ -564,25 +524,25 @@ class AnalyticsService:
             return {}
 
     async def track_system_performance(
-        self, metric_name: str, value: float, component: str, db: Session
+        self,
+        metric_name: str,
+        value: float,
+        component: str,
+        db: Optional[Session] = None,
     ) -> bool:
-        """Track system performance metric"""
+        """Track system performance metric (buffered like user events)"""
         try:
-            metric = SystemPerformanceMetrics(
+            await self._reserve_buffer_space()
+            self.event_buffer.record_metric(
                 metric_name=metric_name,
-                metric_value=value,
+                value=value,
                 metric_unit="ms" if "time" in metric_name else "count",
                 component=component,
-                measured_at=datetime.utcnow(),
             )
-
-            db.add(metric)
-            db.commit()
             return True
 
         except Exception as e:
             logger.error(f"Error tracking system performance: {str(e)}")
-            db.rollback()
             return False
 
     async def update_user_retention_metrics(self, user_id: int, db: Session) -> bool:
@@ -702,56 +662,77 @@ class AnalyticsService:
 
     # Helper methods
 
-    async def _update_emotional_journey(
-        self,
-        user_id: int,
-        connection_id: int,
-        event_type: AnalyticsEventType,
-        event_data: Dict,
-        db: Session,
-    ):
-        """Update emotional journey tracking"""
+    async def _reserve_buffer_space(self) -> None:
+        """Backpressure: a caller that finds the buffer full flushes it"""
+        if not self.event_buffer.is_full():
+            return
+        obs.analytics_buffer_full_total.inc()
         try:
-            # Determine journey stage based on event
-            stage_mapping = {
-                AnalyticsEventType.CONNECTION_INITIATED: "discovery",
-                AnalyticsEventType.REVELATION_SHARED: "revelation",
-                AnalyticsEventType.PHOTO_CONSENT_GIVEN: "connection",
-            }
-
-            stage = stage_mapping.get(event_type)
-            if not stage:
-                return
-
-            # Get or create journey record
-            journey = (
-                db.query(EmotionalJourneyTracking)
-                .filter(
-                    EmotionalJourneyTracking.user_id == user_id,
-                    EmotionalJourneyTracking.connection_id == connection_id,
-                    EmotionalJourneyTracking.journey_stage == stage,
-                )
-                .first()
+            await asyncio.to_thread(self.event_buffer.flush)
+        except Exception as e:
+            # The batch is dropped; memory stays bounded either way
+            logger.error(f"Error flushing full analytics buffer: {str(e)}")
+
+    def _engagement_features_query(self, db: Session):
+        """
+        (user_id, active days, distinct event types, deep actions, recent
+        events) over the last 30 days, read from the daily buckets that event
+        ingestion maintains, so the cost per user is bounded by the window
+        rather than by how many events they generated
+        """
+        today = datetime.utcnow().date()
+        window_start = today - timedelta(days=ENGAGEMENT_WINDOW_DAYS)
+        recent_start = today - timedelta(days=ENGAGEMENT_RECENT_DAYS)
+        count = UserEngagementDaily.event_count
+
+        return (
+            db.query(
+                UserEngagementDaily.user_id,
+                func.count(distinct(UserEngagementDaily.day)),
+                func.count(distinct(UserEngagementDaily.event_type)),
+                func.coalesce(
+                    func.sum(
+                        case(
+                            (
+                                UserEngagementDaily.event_type.in_(
+                                    DEEP_ENGAGEMENT_EVENTS
+                                ),
+                                count,
+                            ),
+                            else_=0,
+                        )
+                    ),
+                    0,
+                ),
+                func.coalesce(
+                    func.sum(
+                        case((UserEngagementDaily.day >= recent_start, count), else_=0)
+                    ),
+                    0,
+                ),
             )
+            .filter(UserEngagementDaily.day >= window_start)
+            .group_by(UserEngagementDaily.user_id)
+        )
 
-            if not journey:
-                journey = EmotionalJourneyTracking(
-                    user_id=user_id,
-                    connection_id=connection_id,
-                    journey_stage=stage,
-                    emotional_state=event_data.get("emotional_state", "curious"),
-                    stage_entered_at=datetime.utcnow(),
-                )
-                db.add(journey)
-
-            # Update interaction count
-            journey.interaction_count += 1
-
-            if event_type == AnalyticsEventType.HAPTIC_FEEDBACK_TRIGGERED:
-                journey.haptic_triggers += 1
-
-        except Exception as e:
-            logger.error(f"Error updating emotional journey: {str(e)}")
+    def _score_engagement(
+        self, active_days: int, event_types: int, deep_count: int, recent_count: int
+    ) -> float:
+        """Score (0-100) from the aggregated 30-day engagement features"""
+        factors = {
+            # Activity frequency (0-25 points)
+            "frequency": min(25.0, (active_days / 30.0) * 25.0),
+            # Action diversity (0-20 points)
+            "diversity": min(20.0, (event_types / 10.0) * 20.0),
+            # Deep engagement actions (0-25 points)
+            "depth": min(25.0, (deep_count / 20.0) * 25.0),
+            # Session quality (0-15 points)
+            # Would calculate based on session duration data
+            "quality": 10.0,  # Placeholder
+            # Recent activity bonus (0-15 points)
+            "recency": min(15.0, (recent_count / 10.0) * 15.0),
+        }
+        return min(100.0, sum(factors.values()))
 
     async def _calculate_retention_rates(self, db: Session) -> Dict[str, float]:
         """Calculate user retention rates"""
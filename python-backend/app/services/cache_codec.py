@@ -0,0 +1,246 @@
+"""
+Cache Codec
+Binary encoding of CacheService values: a one-byte header naming the
+serializer and compressor, followed by the raw payload (no base64).
+
+msgpack/orjson and zstd/lz4 are used when installed; json and zlib from the
+standard library are the fallbacks. Headers are all below 0x20, which no
+value written by the older text format starts with (JSON, base64 frames,
+pickle), so both formats can be told apart during a rollout.
+"""
+
+import json
+import logging
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+# Payloads at or below this size are not worth compressing
+MIN_COMPRESS_SIZE = 1000
+
+# Header byte: serializer id in bits 2-4, compressor id in bits 0-1
+HEADER_LIMIT = 0x20
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson is not None
+    else 0
+)
+
+
+class Serializer(ABC):
+    """Turns cache values into bytes and back"""
+
+    id = 0
+    name = ""
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes: ...
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any: ...
+
+
+class JsonSerializer(Serializer):
+    id = 1
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        if orjson is not None:
+            try:
+                # Same output as json.dumps(default=str) for dates and dataclasses
+                return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+            except TypeError:
+                pass  # e.g. integers beyond 64 bits
+        return json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+def _msgpack_default(value: Any) -> Any:
+    """
+    Dates are written as json's default=str writes them. Anything else msgpack
+    cannot represent (ints beyond 64 bits, Decimal, sets, ...) raises, so
+    encode() falls back to json instead of silently stringifying it.
+    """
+    if isinstance(value, date):  # datetime included
+        return str(value)
+    raise TypeError(f"msgpack cannot encode {type(value).__name__}")
+
+
+class MsgpackSerializer(Serializer):
+    id = 2
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class PickleSerializer(Serializer):
+    id = 3
+    name = "pickle"
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class Compressor:
+    """Byte-level compression applied after serialization"""
+
+    id = 0
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZlibCompressor(Compressor):
+    id = 1
+    name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 3)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    id = 2
+    name = "zstd"
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    id = 3
+    name = "lz4"
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+_json = JsonSerializer()
+_no_compression = Compressor()
+
+SERIALIZERS: Dict[int, Serializer] = {
+    _json.id: _json,
+    PickleSerializer.id: PickleSerializer(),
+}
+if msgpack is not None:
+    SERIALIZERS[MsgpackSerializer.id] = MsgpackSerializer()
+
+COMPRESSORS: Dict[int, Compressor] = {
+    _no_compression.id: _no_compression,
+    ZlibCompressor.id: ZlibCompressor(),
+}
+if zstandard is not None:
+    COMPRESSORS[ZstdCompressor.id] = ZstdCompressor()
+if lz4_frame is not None:
+    COMPRESSORS[Lz4Compressor.id] = Lz4Compressor()
+
+_SERIALIZERS_BY_NAME = {s.name: s for s in SERIALIZERS.values()}
+
+
+def serializer_for(name: str) -> Serializer:
+    """Serializer for a policy setting; "auto" picks msgpack when installed"""
+    if name == "auto":
+        return SERIALIZERS.get(MsgpackSerializer.id, _json)
+    return _SERIALIZERS_BY_NAME.get(name, _json)
+
+
+def compressor_for(enabled: bool) -> Compressor:
+    """Best installed compressor: zstd, then lz4, then zlib"""
+    if not enabled:
+        return _no_compression
+    for compressor_id in (ZstdCompressor.id, Lz4Compressor.id, ZlibCompressor.id):
+        if compressor_id in COMPRESSORS:
+            return COMPRESSORS[compressor_id]
+    return _no_compression
+
+
+def is_framed(data: bytes) -> bool:
+    return bool(data) and data[0] < HEADER_LIMIT
+
+
+def encode(
+    value: Any,
+    serializer: Serializer,
+    compressor: Optional[Compressor] = None,
+    min_compress_size: int = MIN_COMPRESS_SIZE,
+) -> bytes:
+    try:
+        payload = serializer.dumps(value)
+    except (TypeError, ValueError, OverflowError) as e:
+        if serializer is _json:
+            raise
+        logger.debug(f"{serializer.name} cannot encode value, using json: {e}")
+        serializer = _json
+        payload = serializer.dumps(value)
+
+    used = _no_compression
+    if compressor is not None and compressor.id and len(payload) > min_compress_size:
+        compressed = compressor.compress(payload)
+        if len(compressed) < len(payload):
+            payload = compressed
+            used = compressor
+
+    return bytes(((serializer.id << 2) | used.id,)) + payload
+
+
+def decode(data: bytes) -> Any:
+    header = data[0]
+    serializer = SERIALIZERS.get(header >> 2)
+    compressor = COMPRESSORS.get(header & 0x03)
+    if serializer is None or compressor is None:
+        raise ValueError(f"Cache value encoded with an unavailable codec: {header:#x}")
+    return serializer.loads(compressor.decompress(data[1:]))
@@ -8,6 +8,8 @@ import hashlib
 import json
 import logging
 import pickle
+import secrets
+import threading
 import time
 from dataclasses import dataclass
 from datetime import datetime
@@ -16,11 +18,32 @@ from functools import wraps
 from typing import Any, Callable, Dict, List, Optional, TypeVar
 
 import redis
+from app.core.cache_tags import (
+    INVALIDATION_CHANNEL,
+    add_tags,
+    invalidate_tags,
+    publish_invalidation,
+)
+from app.core.single_flight import (
+    SingleFlight,
+    acquire_lock,
+    encode_refresh_meta,
+    refresh_meta_key,
+    release_lock,
+    should_refresh_early,
+)
+from app.services import cache_codec
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+_MISSING = object()
+
+# Start of compressed values in the pre-codec format, base64("COMPRESSED:" +
+# gzip data); only the first 14 characters are fixed by the 11-byte marker
+_LEGACY_COMPRESSED_PREFIX = base64.b64encode(b"COMPRESSED:")[:14]
+
 
 class CacheLevel(Enum):
     L1_MEMORY = "l1_memory"  # In-memory cache (fastest)
@@ -40,7 +63,7 @@ class CachePolicy:
     ttl: int  # Time to live in seconds
     max_size: Optional[int] = None  # Maximum cache size
     compression: bool = False  # Enable compression for large objects
-    serialization: str = "json"  # json, pickle, or msgpack
+    serialization: str = "auto"  # auto, json, msgpack or pickle (see cache_codec)
     invalidation_tags: List[str] = None  # Tags for cache invalidation
 
 
@@ -62,15 +85,32 @@ class CacheService:
     def __init__(self, redis_client: redis.Redis):
         self.redis_client = redis_client
         self.l1_cache: Dict[str, Any] = {}  # In-memory cache
+        # Early-refresh metadata of L1 values written through get_or_set
+        self.l1_refresh_meta: Dict[str, Any] = {}
         self.cache_policies: Dict[str, CachePolicy] = {}
         self.metrics = CacheMetrics()
 
+        # Stampede protection for get_or_set
+        self._flights = SingleFlight()
+        self.recompute_lock_ms = 10000  # Expiry of the cross-node recompute lock
+        self.recompute_wait_seconds = 2.0  # How long to wait for another node
+        self.recompute_poll_interval = 0.05
+
         # Dating platform specific cache configurations
         self._setup_cache_policies()
 
         # Cache warming for frequently accessed data
         self._setup_cache_warming()
 
+        # Drops L1 entries invalidated or overwritten by other processes;
+        # started explicitly (see init_cache_service) so short-lived instances
+        # spawn no thread. Our own messages are recognised by instance_id.
+        self.instance_id = secrets.token_hex(8)
+        self.invalidation_retry_seconds = 5.0
+        self._invalidation_thread: Optional[threading.Thread] = None
+        self._invalidation_stop = threading.Event()
+        self._invalidation_pubsub = None
+
     def _setup_cache_policies(self):
         """Setup cache policies for different data types"""
 
@@ -102,6 +142,7 @@ class CacheService:
             # Conversation threads - frequently accessed
             "conversation_threads": CachePolicy(
                 ttl=600,
+                compression=True,
                 invalidation_tags=[
                     "new_messages",
                     "user_blocks",
@@ -155,6 +196,64 @@ class CacheService:
         thread = threading.Thread(target=cache_warmer, daemon=True)
         thread.start()
 
+    def start_invalidation_listener(self):
+        """Listen for keys invalidated anywhere and drop them from L1"""
+        if self._invalidation_thread is not None:
+            return
+        self._invalidation_stop.clear()
+        self._invalidation_thread = threading.Thread(
+            target=self._listen_for_invalidations, daemon=True
+        )
+        self._invalidation_thread.start()
+
+    def stop_invalidation_listener(self):
+        self._invalidation_stop.set()
+        pubsub = self._invalidation_pubsub
+        if pubsub is not None:
+            try:
+                pubsub.close()  # unblocks listen()
+            except Exception:
+                pass
+        if self._invalidation_thread is not None:
+            self._invalidation_thread.join(timeout=self.invalidation_retry_seconds)
+            self._invalidation_thread = None
+
+    def _listen_for_invalidations(self):
+        while not self._invalidation_stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                self._invalidation_pubsub = pubsub
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    if self._invalidation_stop.is_set():
+                        break
+                    self._apply_invalidation(message.get("data"))
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {e}")
+            finally:
+                self._invalidation_pubsub = None
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            # Back off before resubscribing, however listen() ended
+            self._invalidation_stop.wait(self.invalidation_retry_seconds)
+
+    def _apply_invalidation(self, data: Any):
+        """Drop the keys of one invalidation message from L1"""
+        try:
+            message = json.loads(data)
+            if isinstance(message, list):  # published before origins were added
+                message = {"keys": message}
+            if message.get("origin") == self.instance_id:
+                return  # our own write; the L1 copy is the new value
+            for key in message["keys"]:
+                self._drop_l1_cache(key)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring malformed cache invalidation: {e}")
+
     def _warm_popular_profiles(self):
         """Warm cache with popular user profiles"""
         try:
@@ -220,8 +319,13 @@ class CacheService:
         value: Any,
         ttl: Optional[int] = None,
         policy_name: Optional[str] = None,
+        tags: Optional[List[str]] = None,
     ) -> bool:
-        """Set value in multi-layer cache"""
+        """
+        Set value in multi-layer cache. The key is indexed under its policy's
+        invalidation tags plus any extra `tags`, and other processes are told
+        to drop their L1 copies of the old value.
+        """
 
         try:
             # Get cache policy
@@ -231,8 +335,14 @@ class CacheService:
             # Serialize and potentially compress
             serialized_value = self._serialize(value, policy)
 
-            # Store in Redis (L2)
-            self.redis_client.set(key, serialized_value, ex=cache_ttl)
+            # Store in Redis (L2), indexing the key under its tags
+            all_tags = (policy.invalidation_tags or []) + (tags or [])
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.set(key, serialized_value, ex=cache_ttl)
+            if all_tags:
+                add_tags(pipe, key, all_tags, cache_ttl)
+            publish_invalidation(pipe, [key], self.instance_id)
+            pipe.execute()
 
             # Store in L1 cache if not too large
             if len(str(value)) < 10000:  # 10KB limit for L1 cache
@@ -248,10 +358,13 @@ class CacheService:
         """Delete from all cache layers"""
         try:
             # Remove from L1 cache
-            self.l1_cache.pop(key, None)
+            self._drop_l1_cache(key)
 
             # Remove from Redis
-            self.redis_client.delete(key)
+            self.redis_client.delete(key, refresh_meta_key(key))
+
+            # Remove from other processes' L1 caches
+            publish_invalidation(self.redis_client, [key], self.instance_id)
 
             return True
 
@@ -273,25 +386,15 @@ class CacheService:
 
     def invalidate_by_tags(self, tags: List[str]) -> int:
         """Invalidate cache entries by tags"""
-        invalidated_count = 0
-
         try:
-            # Get all keys that match the tags
-            for tag in tags:
-                pattern = f"*{tag}*"
-                keys = self.redis_client.keys(pattern)
+            keys = invalidate_tags(self.redis_client, tags)
 
-                for key in keys:
-                    if isinstance(key, bytes):
-                        key = key.decode()
+            for key in keys:
+                self._drop_l1_cache(key)
+            publish_invalidation(self.redis_client, keys, self.instance_id)
 
-                    self.delete(key)
-                    invalidated_count += 1
-
-            logger.info(
-                f"Invalidated {invalidated_count} cache entries for tags: {tags}"
-            )
-            return invalidated_count
+            logger.info(f"Invalidated {len(keys)} cache entries for tags: {tags}")
+            return len(keys)
 
         except Exception as e:
             logger.error(f"Cache invalidation error for tags {tags}: {e}")
@@ -304,24 +407,131 @@ class CacheService:
         ttl: Optional[int] = None,
         policy_name: Optional[str] = None,
     ) -> T:
-        """Get from cache or set using factory function"""
+        """
+        Get from cache or set using factory function. Concurrent misses run
+        the factory once: threads share the in-process call and other nodes
+        wait for the holder of the Redis lock. A hit close to expiry is
+        sometimes refreshed early while other readers keep the cached value.
+        """
+        start_time = time.time()
+
+        value = self.l1_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self._update_metrics(hit=True, response_time=time.time() - start_time)
+            # Hot keys live in L1, so they must be refreshed early from here too
+            return self._maybe_refresh_early(
+                key,
+                value,
+                self.l1_refresh_meta.get(key),
+                factory_func,
+                ttl,
+                policy_name,
+            )
+
+        try:
+            redis_value, refresh_meta = self.redis_client.mget(
+                [key, refresh_meta_key(key)]
+            )
+        except Exception as e:
+            logger.error(f"Cache get error for key {key}: {e}")
+            redis_value = refresh_meta = None
 
-        # Try to get from cache first
-        value = self.get(key)
+        if redis_value:
+            value = self._deserialize(redis_value, key)
+            if value is not None:
+                self._store_l1_cache(key, value, refresh_meta)
+                self._update_metrics(hit=True, response_time=time.time() - start_time)
+                return self._maybe_refresh_early(
+                    key, value, refresh_meta, factory_func, ttl, policy_name
+                )
+
+        self._update_metrics(hit=False, response_time=time.time() - start_time)
+        return self._flights.do(
+            key, lambda: self._recompute(key, factory_func, ttl, policy_name)
+        )
+
+    def _maybe_refresh_early(
+        self,
+        key: str,
+        value: T,
+        refresh_meta: Optional[Any],
+        factory_func: Callable[[], T],
+        ttl: Optional[int],
+        policy_name: Optional[str],
+    ) -> T:
+        """Return a cached hit, recomputing it first when XFetch says so"""
+        if should_refresh_early(refresh_meta) and not self._flights.in_flight(key):
+            return self._flights.do(
+                key,
+                lambda: self._recompute(
+                    key, factory_func, ttl, policy_name, stale=value
+                ),
+            )
+        return value
 
-        if value is not None:
-            return value
+    def _recompute(
+        self,
+        key: str,
+        factory_func: Callable[[], T],
+        ttl: Optional[int],
+        policy_name: Optional[str],
+        stale: Any = _MISSING,
+    ) -> T:
+        """Run the factory unless another node holds the recompute lock"""
+        try:
+            token = acquire_lock(self.redis_client, key, self.recompute_lock_ms)
+            locked_elsewhere = token is None
+        except Exception as e:
+            logger.warning(f"Cache lock unavailable for key {key}: {e}")
+            token = None
+            locked_elsewhere = False
+
+        if locked_elsewhere:
+            if stale is not _MISSING:
+                return stale
+            value = self._wait_for_value(key)
+            if value is not None:
+                return value
+            # The lock holder is slow or gone; compute it here as well
 
-        # Generate value using factory function
         try:
+            started = time.time()
             new_value = factory_func()
-            self.set(key, new_value, ttl, policy_name)
+            cache_ttl = ttl or self._get_cache_policy(key, policy_name).ttl
+            if self.set(key, new_value, cache_ttl, policy_name):
+                refresh_meta = encode_refresh_meta(cache_ttl, time.time() - started)
+                self.redis_client.set(refresh_meta_key(key), refresh_meta, ex=cache_ttl)
+                if key in self.l1_cache:
+                    self.l1_refresh_meta[key] = refresh_meta
             return new_value
 
         except Exception as e:
             logger.error(f"Factory function error for key {key}: {e}")
             raise
 
+        finally:
+            if token is not None:
+                try:
+                    release_lock(self.redis_client, key, token)
+                except Exception as e:
+                    logger.warning(f"Failed to release cache lock for key {key}: {e}")
+
+    def _wait_for_value(self, key: str) -> Optional[Any]:
+        """Poll Redis while another node recomputes `key`"""
+        deadline = time.time() + self.recompute_wait_seconds
+        while time.time() < deadline:
+            time.sleep(self.recompute_poll_interval)
+            try:
+                redis_value = self.redis_client.get(key)
+            except Exception:
+                return None
+            if redis_value:
+                value = self._deserialize(redis_value, key)
+                if value is not None:
+                    self._store_l1_cache(key, value)
+                    return value
+        return None
+
     def mget(self, keys: List[str]) -> Dict[str, Any]:
         """Get multiple keys efficiently"""
         results = {}
@@ -356,25 +566,27 @@ class CacheService:
         """Set multiple key-value pairs efficiently"""
         try:
             redis_pairs = {}
+            pipe = self.redis_client.pipeline()
 
             for key, value in key_value_pairs.items():
                 policy = self._get_cache_policy(key)
                 serialized_value = self._serialize(value, policy)
                 redis_pairs[key] = serialized_value
 
+                # Set TTL and index tags after the MSET below
+                if ttl:
+                    pipe.expire(key, ttl)
+                if policy.invalidation_tags:
+                    add_tags(pipe, key, policy.invalidation_tags, ttl or float("inf"))
+
                 # Store in L1 cache if small enough
                 if len(str(value)) < 10000:
                     self._store_l1_cache(key, value)
 
-            # Set all in Redis
+            # Set all in Redis, then drop stale L1 copies elsewhere
             self.redis_client.mset(redis_pairs)
-
-            # Set TTL for all keys
-            if ttl:
-                pipe = self.redis_client.pipeline()
-                for key in redis_pairs.keys():
-                    pipe.expire(key, ttl)
-                pipe.execute()
+            publish_invalidation(pipe, list(redis_pairs), self.instance_id)
+            pipe.execute()
 
             return True
 
@@ -386,7 +598,7 @@ class CacheService:
         """Atomic increment operation"""
         try:
             # Remove from L1 cache to avoid inconsistency
-            self.l1_cache.pop(key, None)
+            self._drop_l1_cache(key)
 
             # Increment in Redis
             new_value = self.redis_client.incr(key, amount)
@@ -450,7 +662,7 @@ class CacheService:
         if len(self.l1_cache) > 1000:
             keys_to_remove = list(self.l1_cache.keys())[:250]
             for key in keys_to_remove:
-                self.l1_cache.pop(key, None)
+                self._drop_l1_cache(key)
                 self.metrics.evictions += 1
 
     # Private helper methods
@@ -471,69 +683,59 @@ class CacheService:
         return CachePolicy(ttl=300)
 
     def _serialize(self, value: Any, policy: CachePolicy) -> bytes:
-        """Serialize value based on cache policy"""
+        """Encode value with the codec chosen by its cache policy"""
         try:
-            if policy.serialization == "json":
-                serialized = json.dumps(value, default=str)
-            elif policy.serialization == "pickle":
-                serialized = pickle.dumps(value)
-            else:
-                serialized = json.dumps(value, default=str)
-
-            # Apply compression if enabled
-            if (
-                policy.compression and len(serialized) > 1000
-            ):  # Only compress large objects
-                if isinstance(serialized, str):
-                    serialized = serialized.encode("utf-8")
-
-                compressed = gzip.compress(serialized)
-                return base64.b64encode(b"COMPRESSED:" + compressed)
-
-            if isinstance(serialized, str):
-                return serialized.encode("utf-8")
-
-            return serialized
+            return cache_codec.encode(
+                value,
+                cache_codec.serializer_for(policy.serialization),
+                cache_codec.compressor_for(policy.compression),
+            )
 
         except Exception as e:
             logger.error(f"Serialization error: {e}")
             raise
 
     def _deserialize(self, data: bytes, key: str) -> Any:
-        """Deserialize value based on cache policy"""
+        """Decode a value written by _serialize (or the older text format)"""
         try:
-            # Check if data is compressed
-            if data.startswith(base64.b64encode(b"COMPRESSED:")):
-                compressed_data = base64.b64decode(data)
-                decompressed = gzip.decompress(
-                    compressed_data[11:]
-                )  # Remove 'COMPRESSED:' prefix
-                data = decompressed
-
-            # Determine serialization method
-            policy = self._get_cache_policy(key)
-
-            if policy.serialization == "pickle":
-                return pickle.loads(data)
-            else:
-                return json.loads(data.decode("utf-8"))
+            if cache_codec.is_framed(data):
+                return cache_codec.decode(data)
+            return self._deserialize_legacy(data, key)
 
         except Exception as e:
             logger.error(f"Deserialization error for key {key}: {e}")
             return None
 
-    def _store_l1_cache(self, key: str, value: Any):
-        """Store value in L1 cache with size limits"""
+    def _deserialize_legacy(self, data: bytes, key: str) -> Any:
+        """Values written before the binary codec; they age out with their TTL"""
+        if data.startswith(_LEGACY_COMPRESSED_PREFIX):
+            # Remove 'COMPRESSED:' prefix
+            data = gzip.decompress(base64.b64decode(data)[11:])
+
+        if self._get_cache_policy(key).serialization == "pickle":
+            return pickle.loads(data)
+        return json.loads(data.decode("utf-8"))
+
+    def _store_l1_cache(self, key: str, value: Any, refresh_meta: Optional[Any] = None):
+        """Store value (and its early-refresh metadata) in L1 with size limits"""
         try:
             # Check size limits
             if len(self.l1_cache) >= 1000:
                 self.cleanup_expired_l1_cache()
 
             self.l1_cache[key] = value
+            if refresh_meta:
+                self.l1_refresh_meta[key] = refresh_meta
+            else:
+                self.l1_refresh_meta.pop(key, None)
 
         except Exception as e:
             logger.error(f"L1 cache store error: {e}")
 
+    def _drop_l1_cache(self, key: str):
+        self.l1_cache.pop(key, None)
+        self.l1_refresh_meta.pop(key, None)
+
     def _update_metrics(self, hit: bool, response_time: float):
         """Update cache metrics"""
         self.metrics.total_requests += 1
@@ -639,4 +841,5 @@ def init_cache_service(redis_client: redis.Redis) -> CacheService:
     """Initialize global cache service"""
     global _cache_service
     _cache_service = CacheService(redis_client)
+    _cache_service.start_invalidation_listener()
     return _cache_service
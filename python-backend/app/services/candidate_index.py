@@ -0,0 +1,424 @@
+"""
+Candidate Generation Index for Soul Discovery
+In-process inverted index from interests, value categories, location and
+age buckets to users, so discovery only scores promising candidates and
+never scans the users table on the request path.
+
+Each process builds its index in the background (see `start`) and then
+keeps it in sync incrementally; requests only ever read it.
+"""
+
+import asyncio
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.core import database
+from app.models.compatibility_features import UserFeatureSnapshot
+from app.models.soul_connection import SoulConnection
+from app.models.user import User
+from app.services.compatibility import UserCompatibilityFeatures
+from app.services.compatibility_feature_store import compatibility_feature_store
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Relative importance of each term kind when ranking candidates
+TERM_WEIGHTS = {
+    "interest": 1.0,
+    "value": 0.8,
+    "city": 1.0,
+    "state": 0.4,
+    "age": 0.5,
+}
+
+AGE_BUCKET_YEARS = 5
+
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Connection states after which the pair no longer excludes each other
+ENDED_CONNECTION_STATES = frozenset({"ended", "archived", "closed", "inactive"})
+
+
+def connection_is_live(status: Optional[str], stage: Optional[str]) -> bool:
+    return (
+        status not in ENDED_CONNECTION_STATES and stage not in ENDED_CONNECTION_STATES
+    )
+
+
+def live_connection_filter():
+    """SQL counterpart of connection_is_live for SoulConnection queries"""
+    return and_(
+        or_(
+            SoulConnection.status.is_(None),
+            SoulConnection.status.notin_(ENDED_CONNECTION_STATES),
+        ),
+        or_(
+            SoulConnection.connection_stage.is_(None),
+            SoulConnection.connection_stage.notin_(ENDED_CONNECTION_STATES),
+        ),
+    )
+
+
+def age_from_date_of_birth(date_of_birth: Optional[str]) -> Optional[int]:
+    """Age in whole years from a YYYY-MM-DD string, or None if unknown"""
+    if not date_of_birth:
+        return None
+    try:
+        birth = datetime.strptime(str(date_of_birth)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+    today = date.today()
+    return (
+        today.year - birth.year - ((today.month, today.day) < (birth.month, birth.day))
+    )
+
+
+class CandidateIndex:
+    """Inverted index used as the candidate-generation stage of discovery"""
+
+    def __init__(self, sync_interval_seconds: float = 30.0, build_chunk_size=1000):
+        self.sync_interval_seconds = sync_interval_seconds
+        self.build_chunk_size = build_chunk_size
+
+        self._lock = threading.RLock()
+        # Held for a whole build so concurrent callers do not build twice
+        self._build_lock = threading.Lock()
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._user_terms: Dict[int, Set[str]] = {}
+        self._ages: Dict[int, Optional[int]] = {}
+        self._partners: Dict[int, Set[int]] = defaultdict(set)
+
+        self._built = False
+        self._synced_at: Optional[datetime] = None
+        self._last_sync_check = 0.0
+
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the initial build has completed"""
+        return self._built
+
+    # ---- Term extraction -------------------------------------------------
+
+    def user_terms(
+        self, features: UserCompatibilityFeatures, age: Optional[int]
+    ) -> Set[str]:
+        """Index terms for a user's precomputed compatibility features"""
+        terms = {f"interest:{interest}" for interest in features.interests if interest}
+
+        for question_key, (answered, mask) in features.value_hits.items():
+            bit = 0
+            while answered and mask >> bit:
+                if mask & (1 << bit):
+                    terms.add(f"value:{question_key}:{bit}")
+                bit += 1
+
+        location = features.location.lower().strip()
+        if location:
+            terms.add(f"city:{location.split(',')[0].strip()}")
+            if "," in location:
+                terms.add(f"state:{location.split(',')[-1].strip()}")
+
+        if age is not None:
+            terms.add(f"age:{age // AGE_BUCKET_YEARS}")
+
+        return terms
+
+    # ---- Maintenance -----------------------------------------------------
+
+    def upsert_user(
+        self,
+        user_id: int,
+        features: UserCompatibilityFeatures,
+        age: Optional[int] = None,
+        eligible: bool = True,
+    ) -> None:
+        """Insert, update or (if no longer eligible) remove a user"""
+        with self._lock:
+            self._remove_terms(user_id)
+            if not eligible:
+                return
+
+            terms = self.user_terms(features, age)
+            for term in terms:
+                self._postings[term].add(user_id)
+            self._user_terms[user_id] = terms
+            self._ages[user_id] = age
+
+    def remove_user(self, user_id: int) -> None:
+        with self._lock:
+            self._remove_terms(user_id)
+
+    def add_connection(self, user1_id: int, user2_id: int) -> None:
+        """Exclude both users from each other's future candidates"""
+        with self._lock:
+            self._partners[user1_id].add(user2_id)
+            self._partners[user2_id].add(user1_id)
+
+    def remove_connection(self, user1_id: int, user2_id: int) -> None:
+        """Let both users be candidates for each other again"""
+        with self._lock:
+            for user_id, partner_id in ((user1_id, user2_id), (user2_id, user1_id)):
+                partners = self._partners.get(user_id)
+                if partners is not None:
+                    partners.discard(partner_id)
+                    if not partners:
+                        del self._partners[user_id]
+
+    def _remove_terms(self, user_id: int) -> None:
+        for term in self._user_terms.pop(user_id, ()):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.discard(user_id)
+                if not posting:
+                    del self._postings[term]
+        self._ages.pop(user_id, None)
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Build if never built, then catch up with other workers' writes at
+        most every `sync_interval_seconds`. For background callers only:
+        a build scans the users table.
+        """
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    self.build(db)
+            return
+
+        now = time.monotonic()
+        if now - self._last_sync_check >= self.sync_interval_seconds:
+            self._last_sync_check = now
+            self.sync(db)
+
+    def build(self, db: Session) -> None:
+        """
+        Full (re)build from users, feature snapshots and live connections.
+        The new index is assembled on the side and swapped in, so readers
+        are only blocked for the swap.
+        """
+        started = datetime.utcnow()
+        fresh = CandidateIndex()
+
+        last_id = 0
+        while True:
+            users = (
+                db.query(User)
+                .filter(
+                    User.id > last_id,
+                    User.is_active,
+                    User.emotional_onboarding_completed,
+                )
+                .order_by(User.id)
+                .limit(self.build_chunk_size)
+                .all()
+            )
+            if not users:
+                break
+            fresh._index_users(db, users)
+            last_id = users[-1].id
+
+        for user1_id, user2_id, status, stage in db.query(
+            SoulConnection.user1_id,
+            SoulConnection.user2_id,
+            SoulConnection.status,
+            SoulConnection.connection_stage,
+        ).yield_per(self.build_chunk_size):
+            if connection_is_live(status, stage):
+                fresh.add_connection(user1_id, user2_id)
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._user_terms = fresh._user_terms
+            self._ages = fresh._ages
+            self._partners = fresh._partners
+            self._built = True
+            self._synced_at = started
+            self._last_sync_check = time.monotonic()
+
+        logger.info(
+            f"Candidate index built: {len(self._user_terms)} users, "
+            f"{len(self._postings)} terms"
+        )
+
+    def sync(self, db: Session) -> None:
+        """Apply user, feature snapshot and connection writes since last sync"""
+        started = datetime.utcnow()
+        # Overlap windows so rows committed just after the previous sync read
+        # (with earlier timestamps) are not missed; re-indexing is idempotent
+        since = (self._synced_at or datetime.min + SYNC_OVERLAP) - SYNC_OVERLAP
+
+        users = {
+            user.id: user
+            for user in db.query(User).filter(User.updated_at > since).all()
+        }
+        for user in (
+            db.query(User)
+            .join(UserFeatureSnapshot, UserFeatureSnapshot.user_id == User.id)
+            .filter(UserFeatureSnapshot.updated_at > since)
+            .all()
+        ):
+            users[user.id] = user
+        # Created, ended or reopened since the last sync
+        connections = (
+            db.query(
+                SoulConnection.user1_id,
+                SoulConnection.user2_id,
+                SoulConnection.status,
+                SoulConnection.connection_stage,
+            )
+            .filter(SoulConnection.updated_at > since)
+            .all()
+        )
+
+        self._index_users(db, list(users.values()))
+        with self._lock:
+            for user1_id, user2_id, status, stage in connections:
+                if connection_is_live(status, stage):
+                    self.add_connection(user1_id, user2_id)
+                else:
+                    self.remove_connection(user1_id, user2_id)
+            self._synced_at = started
+
+    def _index_users(self, db: Session, users: List[User]) -> None:
+        if not users:
+            return
+        features = compatibility_feature_store.get_many(db, users)
+        for user in users:
+            self.upsert_user(
+                user.id,
+                features[user.id].calculator,
+                age=age_from_date_of_birth(user.date_of_birth),
+                eligible=bool(user.is_active and user.emotional_onboarding_completed),
+            )
+
+    # ---- Background maintenance ------------------------------------------
+
+    async def start(self) -> None:
+        """Build in the background, then keep the index in sync"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Candidate index maintenance started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info("Candidate index maintenance stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Candidate index maintenance error: {e}")
+            await asyncio.sleep(self.sync_interval_seconds)
+
+    def refresh(self) -> None:
+        """ensure_fresh on a session of its own"""
+        with database.SessionLocal() as db:
+            self.ensure_fresh(db)
+
+    # ---- Retrieval -------------------------------------------------------
+
+    def candidates(
+        self,
+        seeker_id: int,
+        features: UserCompatibilityFeatures,
+        limit: int,
+        seeker_age: Optional[int] = None,
+        age_min: Optional[int] = None,
+        age_max: Optional[int] = None,
+        exclude: Iterable[int] = (),
+    ) -> List[int]:
+        """
+        Top candidate user ids for a seeker, ranked by IDF-weighted term
+        overlap. Self, existing connection partners and anyone outside the
+        requested age range are never returned.
+        """
+        with self._lock:
+            excluded = set(exclude) | self._partners.get(seeker_id, set())
+            excluded.add(seeker_id)
+            total_users = max(1, len(self._user_terms))
+            # Keep more than `limit` so strong multi-term matches found in
+            # later (larger) postings can still outrank early single hits
+            pool_size = max(limit * 10, 100)
+
+            def admissible(user_id: int) -> bool:
+                if user_id in excluded:
+                    return False
+                if age_min is None and age_max is None:
+                    return True
+                age = self._ages.get(user_id)
+                if age is None:
+                    return False
+                return (age_min is None or age >= age_min) and (
+                    age_max is None or age <= age_max
+                )
+
+            seeker_terms = self.user_terms(features, seeker_age)
+            postings = [
+                (term, self._postings[term])
+                for term in seeker_terms
+                if term in self._postings
+            ]
+            # Rare terms first: they are the most selective and cheapest
+            postings.sort(key=lambda item: len(item[1]))
+
+            scores: Dict[int, float] = {}
+            for term, posting in postings:
+                kind = term.split(":", 1)[0]
+                weight = TERM_WEIGHTS.get(kind, 0.5) * math.log(
+                    1 + total_users / len(posting)
+                )
+
+                if len(posting) <= pool_size:
+                    for user_id in posting:
+                        if user_id in scores:
+                            scores[user_id] += weight
+                        elif admissible(user_id):
+                            scores[user_id] = weight
+                    continue
+
+                # Large posting: credit pooled users by membership, then top
+                # up the pool without walking the whole posting
+                for user_id in scores:
+                    if user_id in posting:
+                        scores[user_id] += weight
+                if len(scores) < pool_size:
+                    for user_id in posting:
+                        if user_id not in scores and admissible(user_id):
+                            scores[user_id] = weight
+                            if len(scores) >= pool_size:
+                                break
+
+            # Cold start: seeker shares no terms with anyone yet
+            if len(scores) < limit:
+                for user_id in self._user_terms:
+                    if user_id not in scores and admissible(user_id):
+                        scores[user_id] = 0.0
+                        if len(scores) >= limit:
+                            break
+
+            return [
+                user_id
+                for user_id, _ in heapq.nlargest(
+                    limit, scores.items(), key=lambda item: (item[1], -item[0])
+                )
+            ]
+
+
+# Global candidate index instance (one per worker process)
+candidate_index = CandidateIndex()
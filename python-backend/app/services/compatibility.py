@@ -1,7 +1,173 @@
 # import re
-from typing import Any, Dict, List
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
 
+import numpy as np
 from app.observability import metrics as obs
+from app.services.keyword_matcher import KeywordMatcher, keyword_matcher
+
+# Bump whenever scoring logic or weights change so cached pair results
+# (see pair_score_cache) are not served across versions
+COMPATIBILITY_ALGORITHM_VERSION = 2
+# Keywords indicating communication styles
+COMMUNICATION_INDICATORS = {
+    "expressive": [
+        "express",
+        "share",
+        "open",
+        "communicate",
+        "talk",
+        "discuss",
+    ],
+    "reflective": ["think", "consider", "reflect", "contemplate", "understand"],
+    "supportive": ["support", "listen", "care", "help", "encourage", "comfort"],
+    "direct": ["direct", "honest", "straightforward", "clear", "upfront"],
+    "gentle": ["gentle", "kind", "patient", "calm", "peaceful", "soft"],
+}
+
+# Keywords indicating personality traits in free-text onboarding responses
+PERSONALITY_INDICATORS = {
+    "openness": [
+        "new",
+        "experience",
+        "creative",
+        "curious",
+        "explore",
+        "learn",
+        "adventure",
+    ],
+    "conscientiousness": [
+        "organized",
+        "responsible",
+        "plan",
+        "goal",
+        "dedicated",
+        "reliable",
+    ],
+    "extraversion": [
+        "people",
+        "social",
+        "outgoing",
+        "energy",
+        "talk",
+        "connect",
+        "friends",
+    ],
+    "agreeableness": [
+        "help",
+        "kind",
+        "compassionate",
+        "understanding",
+        "empathy",
+        "care",
+    ],
+    "emotional_stability": [
+        "calm",
+        "stable",
+        "confident",
+        "peaceful",
+        "balanced",
+        "strong",
+    ],
+}
+
+# Compiled once; each response is scanned in a single pass for every category
+COMMUNICATION_MATCHER = keyword_matcher(COMMUNICATION_INDICATORS)
+PERSONALITY_MATCHER = keyword_matcher(PERSONALITY_INDICATORS)
+
+BIG_FIVE_TRAITS = (
+    "openness",
+    "conscientiousness",
+    "extraversion",
+    "agreeableness",
+    "neuroticism",
+)
+
+# Set bits per byte value, used to popcount packed bitsets
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@dataclass
+class UserCompatibilityFeatures:
+    """Per-user derived data used by the batch scoring path.
+
+    Everything here depends on a single user, so it can be computed once and
+    reused against any number of counterparts.
+    """
+
+    interests: FrozenSet[str] = frozenset()
+    # question_key -> (answered, bitmask over that question's value categories)
+    value_hits: Dict[str, Tuple[bool, int]] = field(default_factory=dict)
+    age: Optional[int] = None
+    location: str = ""
+    has_communication: bool = False
+    preferred_style: str = ""
+    response_preference: str = ""
+    has_emotional_responses: bool = False
+    # Bitmask over COMMUNICATION_INDICATORS keys
+    emotional_styles: int = 0
+    # Big Five scores when explicit personality_traits exist, else None
+    personality_traits: Optional[Tuple[float, ...]] = None
+    # 0-100 score per PERSONALITY_INDICATORS trait derived from free text
+    response_traits: Tuple[int, ...] = (0, 0, 0, 0, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form for the feature store."""
+        return {
+            "interests": sorted(self.interests),
+            "value_hits": {
+                key: [answered, mask]
+                for key, (answered, mask) in self.value_hits.items()
+            },
+            "age": self.age,
+            "location": self.location,
+            "has_communication": self.has_communication,
+            "preferred_style": self.preferred_style,
+            "response_preference": self.response_preference,
+            "has_emotional_responses": self.has_emotional_responses,
+            "emotional_styles": self.emotional_styles,
+            "personality_traits": (
+                list(self.personality_traits)
+                if self.personality_traits is not None
+                else None
+            ),
+            "response_traits": list(self.response_traits),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "UserCompatibilityFeatures":
+        personality_traits = data.get("personality_traits")
+        return cls(
+            interests=frozenset(data.get("interests", [])),
+            value_hits={
+                key: (bool(answered), int(mask))
+                for key, (answered, mask) in data.get("value_hits", {}).items()
+            },
+            age=data.get("age"),
+            location=data.get("location", ""),
+            has_communication=data.get("has_communication", False),
+            preferred_style=data.get("preferred_style", ""),
+            response_preference=data.get("response_preference", ""),
+            has_emotional_responses=data.get("has_emotional_responses", False),
+            emotional_styles=data.get("emotional_styles", 0),
+            personality_traits=(
+                tuple(personality_traits) if personality_traits is not None else None
+            ),
+            response_traits=tuple(data.get("response_traits", (0, 0, 0, 0, 0))),
+        )
+
+
+def _value_text(response: Any) -> str:
+    """Core values answer as text; some profiles store a list of value names"""
+    if isinstance(response, list):
+        return " ".join(str(value) for value in response)
+    return response if isinstance(response, str) else ""
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    """Number of set bits per element of an int64 bitmask array."""
+    as_bytes = masks.astype(np.int64).view(np.uint8).reshape(masks.shape[0], 8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=1).astype(np.float64)
 
 
 class CompatibilityCalculator:
@@ -502,6 +668,18 @@ class CompatibilityCalculator:
                 ],
             },
         }
+        # A category's own name counts as one of its keywords: list answers
+        # name values directly ("commitment"), which no keyword spells out
+        self.value_matchers = {
+            question_key: keyword_matcher(
+                {
+                    category: [category, *keywords]
+                    for category, keywords in categories.items()
+                }
+            )
+            for question_key, categories in self.value_keywords.items()
+        }
+        self._no_value_keywords = keyword_matcher({})
 
     def calculate_interest_similarity(
         self, user1_interests: List[str], user2_interests: List[str]
@@ -542,7 +720,7 @@ class CompatibilityCalculator:
                 score = self._compare_response_values(
                     user1_responses[question_key],
                     user2_responses[question_key],
-                    self.value_keywords.get(question_key, {}),
+                    self.value_matchers.get(question_key, self._no_value_keywords),
                 )
                 compatibility_scores.append(score)
 
@@ -553,12 +731,13 @@ class CompatibilityCalculator:
         )
 
     def _compare_response_values(
-        self, response1: str, response2: str, keywords: Dict
+        self, response1: str, response2: str, matcher: KeywordMatcher
     ) -> float:
         """
         Compare two text responses using keyword matching.
         Returns: 0.0 to 1.0 based on shared value indicators
         """
+        response1, response2 = _value_text(response1), _value_text(response2)
         if not response1 or not response2:
             return 0.0
 
@@ -567,15 +746,8 @@ class CompatibilityCalculator:
         resp2_lower = response2.lower()
 
         # Find matching value categories
-        user1_values = set()
-        user2_values = set()
-
-        for value_category, keyword_list in keywords.items():
-            for keyword in keyword_list:
-                if keyword in resp1_lower:
-                    user1_values.add(value_category)
-                if keyword in resp2_lower:
-                    user2_values.add(value_category)
+        user1_values = matcher.categories(resp1_lower)
+        user2_values = matcher.categories(resp2_lower)
 
         # Calculate overlap
         if not user1_values and not user2_values:
@@ -745,39 +917,17 @@ class CompatibilityCalculator:
         self, responses1: Dict, responses2: Dict
     ) -> float:
         """Analyze emotional communication compatibility from onboarding responses."""
-        # Keywords indicating communication styles
-        communication_indicators = {
-            "expressive": [
-                "express",
-                "share",
-                "open",
-                "communicate",
-                "talk",
-                "discuss",
-            ],
-            "reflective": ["think", "consider", "reflect", "contemplate", "understand"],
-            "supportive": ["support", "listen", "care", "help", "encourage", "comfort"],
-            "direct": ["direct", "honest", "straightforward", "clear", "upfront"],
-            "gentle": ["gentle", "kind", "patient", "calm", "peaceful", "soft"],
-        }
-
         user1_styles = set()
         user2_styles = set()
 
         # Analyze all emotional responses for communication style indicators
         for response in responses1.values():
             if isinstance(response, str):
-                response_lower = response.lower()
-                for style, keywords in communication_indicators.items():
-                    if any(keyword in response_lower for keyword in keywords):
-                        user1_styles.add(style)
+                user1_styles.update(COMMUNICATION_MATCHER.counts(response.lower()))
 
         for response in responses2.values():
             if isinstance(response, str):
-                response_lower = response.lower()
-                for style, keywords in communication_indicators.items():
-                    if any(keyword in response_lower for keyword in keywords):
-                        user2_styles.add(style)
+                user2_styles.update(COMMUNICATION_MATCHER.counts(response.lower()))
 
         # Calculate overlap and complementarity
         if not user1_styles or not user2_styles:
@@ -862,72 +1012,24 @@ class CompatibilityCalculator:
         self, responses1: Dict, responses2: Dict
     ) -> float:
         """Extract personality indicators from emotional onboarding responses."""
-        personality_indicators = {
-            "openness": [
-                "new",
-                "experience",
-                "creative",
-                "curious",
-                "explore",
-                "learn",
-                "adventure",
-            ],
-            "conscientiousness": [
-                "organized",
-                "responsible",
-                "plan",
-                "goal",
-                "dedicated",
-                "reliable",
-            ],
-            "extraversion": [
-                "people",
-                "social",
-                "outgoing",
-                "energy",
-                "talk",
-                "connect",
-                "friends",
-            ],
-            "agreeableness": [
-                "help",
-                "kind",
-                "compassionate",
-                "understanding",
-                "empathy",
-                "care",
-            ],
-            "emotional_stability": [
-                "calm",
-                "stable",
-                "confident",
-                "peaceful",
-                "balanced",
-                "strong",
-            ],
-        }
-
         user1_traits = {}
         user2_traits = {}
 
+        hits1 = [
+            PERSONALITY_MATCHER.counts(response.lower())
+            for response in responses1.values()
+            if isinstance(response, str)
+        ]
+        hits2 = [
+            PERSONALITY_MATCHER.counts(response.lower())
+            for response in responses2.values()
+            if isinstance(response, str)
+        ]
+
         # Analyze responses for personality indicators
-        for trait, keywords in personality_indicators.items():
-            count1 = 0
-            count2 = 0
-
-            for response in responses1.values():
-                if isinstance(response, str):
-                    response_lower = response.lower()
-                    count1 += sum(
-                        1 for keyword in keywords if keyword in response_lower
-                    )
-
-            for response in responses2.values():
-                if isinstance(response, str):
-                    response_lower = response.lower()
-                    count2 += sum(
-                        1 for keyword in keywords if keyword in response_lower
-                    )
+        for trait in PERSONALITY_INDICATORS:
+            count1 = sum(hits.get(trait, 0) for hits in hits1)
+            count2 = sum(hits.get(trait, 0) for hits in hits2)
 
             # Normalize scores (0-100 scale)
             user1_traits[trait] = min(100, count1 * 20)
@@ -935,7 +1037,7 @@ class CompatibilityCalculator:
 
         # Calculate compatibility using similar logic as above
         compatibility_scores = []
-        for trait in personality_indicators.keys():
+        for trait in PERSONALITY_INDICATORS.keys():
             score1 = user1_traits.get(trait, 30)
             score2 = user2_traits.get(trait, 30)
 
@@ -1022,6 +1124,410 @@ class CompatibilityCalculator:
                 ),
             }
 
+    def extract_features(self, user_data: Dict) -> UserCompatibilityFeatures:
+        """
+        Precompute everything the pair scorer derives from a single user.
+        Mirrors the text processing done by the scalar methods above.
+        """
+        interests = frozenset(
+            interest.lower().strip() for interest in user_data.get("interests") or []
+        )
+
+        value_hits = {}
+        for question_key, response in (user_data.get("core_values") or {}).items():
+            response = _value_text(response)
+            mask = 0
+            if response:
+                hits = self.value_matchers.get(
+                    question_key, self._no_value_keywords
+                ).counts(response.lower())
+                categories = self.value_keywords.get(question_key, {})
+                for bit, category in enumerate(categories):
+                    if category in hits:
+                        mask |= 1 << bit
+            value_hits[question_key] = (bool(response), mask)
+
+        comm = user_data.get("communication_style") or {}
+        emotional_responses = user_data.get("emotional_responses") or {}
+        text_responses = [
+            response.lower()
+            for response in emotional_responses.values()
+            if isinstance(response, str)
+        ]
+        style_hits = [COMMUNICATION_MATCHER.counts(text) for text in text_responses]
+        trait_hits = [PERSONALITY_MATCHER.counts(text) for text in text_responses]
+
+        emotional_styles = 0
+        for bit, style in enumerate(COMMUNICATION_INDICATORS):
+            if any(style in hits for hits in style_hits):
+                emotional_styles |= 1 << bit
+
+        response_traits = tuple(
+            min(100, sum(hits.get(trait, 0) for hits in trait_hits) * 20)
+            for trait in PERSONALITY_INDICATORS
+        )
+
+        traits = user_data.get("personality_traits") or {}
+        personality_traits = (
+            tuple(traits.get(trait, 50) for trait in BIG_FIVE_TRAITS)
+            if traits
+            else None
+        )
+
+        return UserCompatibilityFeatures(
+            interests=interests,
+            value_hits=value_hits,
+            age=user_data.get("age") or None,
+            location=user_data.get("location") or "",
+            has_communication=bool(comm),
+            preferred_style=(comm.get("preferred_style") or "").lower(),
+            response_preference=(comm.get("response_preference") or "").lower(),
+            has_emotional_responses=bool(emotional_responses),
+            emotional_styles=emotional_styles,
+            personality_traits=personality_traits,
+            response_traits=response_traits,
+        )
+
+    def score_many(
+        self, seeker: Any, candidates: Sequence[Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Score one seeker against many candidates in a single vectorized pass.
+
+        Args:
+            seeker: user data dict or precomputed UserCompatibilityFeatures
+            candidates: user data dicts or precomputed UserCompatibilityFeatures
+
+        Returns:
+            Results in candidate order, each matching what
+            calculate_overall_compatibility returns for the same pair
+        """
+        if not candidates:
+            return []
+
+        with obs.compatibility_calc_seconds.time():
+            seeker_features = self._as_features(seeker)
+            candidate_features = [self._as_features(c) for c in candidates]
+
+            interest_scores = self._batch_interest_scores(
+                seeker_features, candidate_features
+            )
+            values_scores = self._batch_values_scores(
+                seeker_features, candidate_features
+            )
+            demographic_scores = self._batch_demographic_scores(
+                seeker_features, candidate_features
+            )
+            communication_scores = self._batch_communication_scores(
+                seeker_features, candidate_features
+            )
+            personality_scores = self._batch_personality_scores(
+                seeker_features, candidate_features
+            )
+
+            total_scores = (
+                interest_scores * self.weights["interests"]
+                + values_scores * self.weights["values"]
+                + demographic_scores * self.weights["demographics"]
+                + communication_scores * self.weights["communication"]
+                + personality_scores * self.weights["personality"]
+            )
+
+            results = []
+            for i in range(len(candidate_features)):
+                total_score = float(total_scores[i])
+                interest_score = float(interest_scores[i])
+                values_score = float(values_scores[i])
+                demographic_score = float(demographic_scores[i])
+                results.append(
+                    {
+                        "total_compatibility": round(total_score * 100, 1),
+                        "breakdown": {
+                            "interests": round(interest_score * 100, 1),
+                            "values": round(values_score * 100, 1),
+                            "demographics": round(demographic_score * 100, 1),
+                            "communication": round(
+                                float(communication_scores[i]) * 100, 1
+                            ),
+                            "personality": round(float(personality_scores[i]) * 100, 1),
+                        },
+                        "match_quality": self._get_match_quality_label(total_score),
+                        "explanation": self._generate_compatibility_explanation(
+                            total_score, interest_score, values_score, demographic_score
+                        ),
+                    }
+                )
+            return results
+
+    def _as_features(self, user: Any) -> UserCompatibilityFeatures:
+        if isinstance(user, UserCompatibilityFeatures):
+            return user
+        return self.extract_features(user)
+
+    def _batch_interest_scores(
+        self,
+        seeker: UserCompatibilityFeatures,
+        candidates: List[UserCompatibilityFeatures],
+    ) -> np.ndarray:
+        """Jaccard similarity from popcounts over seeker-vocabulary bitsets."""
+        n = len(candidates)
+        if not seeker.interests:
+            return np.zeros(n)
+
+        # Only the seeker's interests can contribute to an intersection
+        vocabulary = {interest: bit for bit, interest in enumerate(seeker.interests)}
+        bitsets = np.zeros((n, (len(vocabulary) + 7) // 8), dtype=np.uint8)
+        sizes = np.empty(n)
+        for row, features in enumerate(candidates):
+            sizes[row] = len(features.interests)
+            for interest in features.interests:
+                bit = vocabulary.get(interest)
+                if bit is not None:
+                    bitsets[row, bit >> 3] |= 0x80 >> (bit & 7)
+
+        intersection = _POPCOUNT_TABLE[bitsets].sum(axis=1).astype(np.float64)
+        union = len(seeker.interests) + sizes - intersection
+        return np.where(sizes > 0, intersection / np.maximum(union, 1), 0.0)
+
+    def _batch_values_scores(
+        self,
+        seeker: UserCompatibilityFeatures,
+        candidates: List[UserCompatibilityFeatures],
+    ) -> np.ndarray:
+        """Average per-question value-category Jaccard over shared questions."""
+        n = len(candidates)
+        totals = np.zeros(n)
+        counts = np.zeros(n)
+        if not seeker.value_hits:
+            return totals
+
+        for question_key, (seeker_answered, seeker_mask) in seeker.value_hits.items():
+            present = np.zeros(n, dtype=bool)
+            answered = np.zeros(n, dtype=bool)
+            masks = np.zeros(n, dtype=np.int64)
+            for row, features in enumerate(candidates):
+                hit = features.value_hits.get(question_key)
+                if hit is not None:
+                    present[row] = True
+                    answered[row], masks[row] = hit
+
+            if seeker_answered:
+                intersection = _popcount(masks & seeker_mask)
+                union = _popcount(masks | seeker_mask)
+                # Neutral 0.5 when neither response hits any category
+                question_scores = np.where(
+                    union > 0, intersection / np.maximum(union, 1), 0.5
+                )
+                question_scores = np.where(answered, question_scores, 0.0)
+            else:
+                question_scores = np.zeros(n)
+
+            totals = totals + np.where(present, question_scores, 0.0)
+            counts = counts + present
+
+        return np.where(counts > 0, totals / np.maximum(counts, 1), 0.0)
+
+    def _batch_demographic_scores(
+        self,
+        seeker: UserCompatibilityFeatures,
+        candidates: List[UserCompatibilityFeatures],
+    ) -> np.ndarray:
+        """Age and location scores, evaluated once per distinct candidate value."""
+        n = len(candidates)
+        age_scores = np.full(n, 0.5)
+        location_scores = np.full(n, 0.5)
+
+        if seeker.age:
+            age_cache: Dict[int, float] = {}
+            for row, features in enumerate(candidates):
+                if features.age:
+                    if features.age not in age_cache:
+                        age_cache[features.age] = self.calculate_age_compatibility(
+                            seeker.age, features.age
+                        )
+                    age_scores[row] = age_cache[features.age]
+
+        if seeker.location:
+            location_cache: Dict[str, float] = {}
+            for row, features in enumerate(candidates):
+                if features.location:
+                    if features.location not in location_cache:
+                        location_cache[features.location] = (
+                            self.calculate_location_compatibility(
+                                seeker.location, features.location
+                            )
+                        )
+                    location_scores[row] = location_cache[features.location]
+
+        return (age_scores * 0.4) + (location_scores * 0.6)
+
+    def _batch_communication_scores(
+        self,
+        seeker: UserCompatibilityFeatures,
+        candidates: List[UserCompatibilityFeatures],
+    ) -> np.ndarray:
+        """Communication factors averaged per candidate, 0.6 when data is missing."""
+        n = len(candidates)
+        if not seeker.has_communication:
+            return np.full(n, 0.6)
+
+        totals = np.zeros(n)
+        counts = np.zeros(n)
+
+        if seeker.preferred_style:
+            style_cache: Dict[str, float] = {}
+            style_scores = np.zeros(n)
+            for row, features in enumerate(candidates):
+                style = features.preferred_style
+                if not style:
+                    continue
+                if style not in style_cache:
+                    if style == seeker.preferred_style:
+                        style_cache[style] = 1.0
+                    elif self._are_complementary_styles(seeker.preferred_style, style):
+                        style_cache[style] = 0.8
+                    else:
+                        style_cache[style] = 0.5
+                style_scores[row] = style_cache[style]
+                counts[row] += 1
+            totals = totals + style_scores
+
+        if seeker.response_preference:
+            response_cache: Dict[str, float] = {}
+            response_scores = np.zeros(n)
+            has_response = np.zeros(n, dtype=bool)
+            for row, features in enumerate(candidates):
+                response = features.response_preference
+                if not response:
+                    continue
+                if response not in response_cache:
+                    if response == seeker.response_preference:
+                        response_cache[response] = 0.9
+                    elif self._are_compatible_response_styles(
+                        seeker.response_preference, response
+                    ):
+                        response_cache[response] = 0.7
+                    else:
+                        response_cache[response] = 0.4
+                response_scores[row] = response_cache[response]
+                has_response[row] = True
+            totals = totals + response_scores
+            counts = counts + has_response
+
+        if seeker.has_emotional_responses:
+            has_emotional = np.array(
+                [c.has_emotional_responses for c in candidates], dtype=bool
+            )
+            emotional_scores = self._batch_emotional_style_scores(
+                seeker.emotional_styles,
+                np.array([c.emotional_styles for c in candidates], dtype=np.int64),
+            )
+            totals = totals + np.where(has_emotional, emotional_scores, 0.0)
+            counts = counts + has_emotional
+
+        has_communication = np.array(
+            [c.has_communication for c in candidates], dtype=bool
+        )
+        scores = np.where(counts > 0, totals / np.maximum(counts, 1), 0.6)
+        return np.where(has_communication, scores, 0.6)
+
+    def _batch_emotional_style_scores(
+        self, seeker_styles: int, candidate_styles: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized _analyze_emotional_communication_style over style bitmasks."""
+        n = candidate_styles.shape[0]
+        if not seeker_styles:
+            return np.full(n, 0.6)
+
+        overlap = _popcount(candidate_styles & seeker_styles)
+        total_styles = _popcount(candidate_styles | seeker_styles)
+        candidate_count = _popcount(candidate_styles)
+        seeker_count = float(bin(seeker_styles).count("1"))
+
+        scores = 0.6 + (overlap / np.maximum(total_styles, 1)) * 0.3
+        scores = np.where(
+            (overlap == seeker_count) & (candidate_count == seeker_count), 0.8, scores
+        )
+        scores = np.where(overlap == 0, 0.4, scores)
+        return np.where(candidate_styles == 0, 0.6, scores)
+
+    def _batch_personality_scores(
+        self,
+        seeker: UserCompatibilityFeatures,
+        candidates: List[UserCompatibilityFeatures],
+    ) -> np.ndarray:
+        """Big Five scores where both sides have traits, else response-derived."""
+        n = len(candidates)
+        scores = np.full(n, 0.6)
+        has_traits = np.zeros(n, dtype=bool)
+
+        if seeker.personality_traits is not None:
+            has_traits = np.array(
+                [c.personality_traits is not None for c in candidates], dtype=bool
+            )
+            if has_traits.any():
+                traits = np.array(
+                    [c.personality_traits or (50,) * 5 for c in candidates],
+                    dtype=np.float64,
+                )
+                trait_scores = self._batch_big_five_scores(
+                    np.array(seeker.personality_traits, dtype=np.float64), traits
+                )
+                scores = np.where(has_traits, trait_scores, scores)
+
+        if seeker.has_emotional_responses:
+            use_responses = ~has_traits & np.array(
+                [c.has_emotional_responses for c in candidates], dtype=bool
+            )
+            if use_responses.any():
+                response_scores = self._batch_response_trait_scores(
+                    np.array(seeker.response_traits, dtype=np.float64),
+                    np.array([c.response_traits for c in candidates], dtype=np.float64),
+                )
+                scores = np.where(use_responses, response_scores, scores)
+
+        return scores
+
+    def _batch_big_five_scores(
+        self, seeker_traits: np.ndarray, traits: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized Big Five branch of calculate_personality_compatibility."""
+        total = np.zeros(traits.shape[0])
+        for column, trait in enumerate(BIG_FIVE_TRAITS):
+            score1 = seeker_traits[column]
+            score2 = traits[:, column]
+            if trait in ["agreeableness", "conscientiousness"]:
+                trait_compat = 1.0 - np.abs(score1 - score2) / 100.0
+            elif trait == "neuroticism":
+                avg_neuroticism = (score1 + score2) / 2
+                trait_compat = np.maximum(0.3, 1.0 - avg_neuroticism / 100.0)
+            else:
+                diff = np.abs(score1 - score2)
+                trait_compat = np.select(
+                    [diff <= 20, diff <= 40, diff <= 60], [0.9, 0.8, 0.6], 0.4
+                )
+            total = total + trait_compat
+        return total / len(BIG_FIVE_TRAITS)
+
+    def _batch_response_trait_scores(
+        self, seeker_traits: np.ndarray, traits: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized _analyze_personality_from_responses over trait scores."""
+        total = np.zeros(traits.shape[0])
+        for column, trait in enumerate(PERSONALITY_INDICATORS):
+            score1 = seeker_traits[column]
+            score2 = traits[:, column]
+            if trait in ["agreeableness", "conscientiousness"]:
+                trait_compat = 1.0 - np.abs(score1 - score2) / 100.0
+            elif trait == "emotional_stability":
+                avg_stability = (score1 + score2) / 2
+                trait_compat = np.minimum(1.0, avg_stability / 80.0)
+            else:
+                diff = np.abs(score1 - score2)
+                trait_compat = np.select([diff <= 20, diff <= 40], [0.9, 0.7], 0.5)
+            total = total + trait_compat
+        return total / len(PERSONALITY_INDICATORS)
+
     def _get_match_quality_label(self, score: float) -> str:
         """Convert compatibility score to descriptive label."""
         if score >= 0.8:
@@ -1066,6 +1572,27 @@ class CompatibilityCalculator:
         return "This match shows " + " and ".join(explanations) + "."
 
 
+def user_compatibility_data(user: Any) -> Dict[str, Any]:
+    """Build the calculator input dict for a User model instance."""
+    # Ensure interests are properly formatted as lists of strings
+    interests = user.interests or []
+    if isinstance(interests, list):
+        interests = [str(item) for item in interests]
+    elif isinstance(interests, str):
+        interests = [interests]
+    else:
+        interests = []
+
+    return {
+        "interests": interests,
+        "core_values": user.core_values or {},
+        "emotional_responses": user.emotional_responses or {},
+        "communication_style": user.communication_style or {},
+        "age": 25,  # Default for MVP, calculate from date_of_birth later
+        "location": user.location or "",
+    }
+
+
 def get_compatibility_calculator() -> CompatibilityCalculator:
     """Factory function to create compatibility calculator instance."""
     return CompatibilityCalculator()
@@ -0,0 +1,270 @@
+"""
+Compatibility Feature Store
+Persists versioned per-user derived features (normalized interests, value
+keyword hits, communication/personality signals) so pair scoring works on
+cached features instead of re-running text processing for every pair.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.core import database
+from app.models.compatibility_features import UserFeatureSnapshot
+from app.models.user import User
+from app.services.compatibility import (
+    COMPATIBILITY_ALGORITHM_VERSION,
+    CompatibilityCalculator,
+    UserCompatibilityFeatures,
+    user_compatibility_data,
+)
+from app.services.pair_score_cache import field_fingerprint, pair_score_cache
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction logic or keyword tables change so stored
+# snapshots are recomputed on next read
+FEATURE_VERSION = 2
+
+# Pair score cache namespace for CompatibilityCalculator results
+CALCULATOR_SCORER = "calculator"
+
+# User fields that feed feature extraction
+SOURCE_FIELDS = (
+    "interests",
+    "core_values",
+    "emotional_responses",
+    "communication_style",
+    "personality_traits",
+    "location",
+)
+
+
+@dataclass
+class StoredUserFeatures:
+    """Precomputed features for one user, for both compatibility scorers"""
+
+    calculator: UserCompatibilityFeatures
+    soul: Dict[str, Any]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"calculator": self.calculator.to_dict(), "soul": self.soul}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StoredUserFeatures":
+        return cls(
+            calculator=UserCompatibilityFeatures.from_dict(data["calculator"]),
+            soul=data["soul"],
+        )
+
+
+class CompatibilityFeatureStore:
+    """Read-through store of per-user compatibility features"""
+
+    def __init__(self):
+        self.calculator = CompatibilityCalculator()
+        self._soul_service = None
+
+    @property
+    def soul_service(self):
+        # Imported lazily: the soul service reads from this store
+        if self._soul_service is None:
+            from app.services.soul_compatibility_service import compatibility_service
+
+            self._soul_service = compatibility_service
+        return self._soul_service
+
+    def source_fingerprint(self, user: User) -> str:
+        """Hash of the profile/onboarding fields features are derived from"""
+        return field_fingerprint(user, SOURCE_FIELDS)
+
+    def compute(self, user: User) -> StoredUserFeatures:
+        """Run feature extraction for a user without touching storage"""
+        return StoredUserFeatures(
+            calculator=self.calculator.extract_features(user_compatibility_data(user)),
+            soul=self.soul_service.extract_features(user),
+        )
+
+    def get(self, db: Session, user: User) -> StoredUserFeatures:
+        """Get features for a single user, recomputing if stale"""
+        return self.get_many(db, [user])[user.id]
+
+    def get_many(
+        self,
+        db: Session,
+        users: Iterable[User],
+        fingerprints: Optional[Dict[int, str]] = None,
+    ) -> Dict[int, StoredUserFeatures]:
+        """
+        Get features for many users with one snapshot query.
+        Missing or stale snapshots are recomputed and written back on a
+        separate session; the caller's session is only read from.
+        """
+        users_by_id = {user.id: user for user in users}
+        fingerprints = fingerprints or {}
+        if not users_by_id:
+            return {}
+
+        # Plain rows rather than entities, so rows another session wrote back
+        # are seen instead of stale copies in the caller's identity map
+        snapshots = {
+            row.user_id: row
+            for row in db.query(
+                UserFeatureSnapshot.user_id,
+                UserFeatureSnapshot.feature_version,
+                UserFeatureSnapshot.source_fingerprint,
+                UserFeatureSnapshot.features,
+            )
+            .filter(UserFeatureSnapshot.user_id.in_(list(users_by_id)))
+            .all()
+        }
+
+        result = {}
+        stale: List[tuple] = []
+        for user_id, user in users_by_id.items():
+            fingerprint = fingerprints.get(user_id) or self.source_fingerprint(user)
+            snapshot = snapshots.get(user_id)
+            if (
+                snapshot is not None
+                and snapshot.feature_version == FEATURE_VERSION
+                and snapshot.source_fingerprint == fingerprint
+            ):
+                result[user_id] = StoredUserFeatures.from_dict(snapshot.features)
+                continue
+
+            features = self.compute(user)
+            result[user_id] = features
+            stale.append((user_id, fingerprint, features))
+
+        if stale:
+            self._write_back(stale)
+
+        return result
+
+    def score_many(
+        self, db: Session, seeker: User, candidates: List[User]
+    ) -> List[Dict[str, Any]]:
+        """
+        CompatibilityCalculator results for a seeker against each candidate.
+        Pairs whose inputs are unchanged are served from the pair score
+        cache; only the rest are scored, in one batch from stored features.
+        """
+        fingerprints = {
+            user.id: self.source_fingerprint(user) for user in [seeker, *candidates]
+        }
+
+        results: List[Optional[Dict[str, Any]]] = []
+        misses = []
+        for candidate in candidates:
+            result = pair_score_cache.get(
+                CALCULATOR_SCORER,
+                seeker.id,
+                candidate.id,
+                COMPATIBILITY_ALGORITHM_VERSION,
+                stamps=(fingerprints[seeker.id], fingerprints[candidate.id]),
+            )
+            if result is None:
+                misses.append(len(results))
+            results.append(result)
+
+        if misses:
+            features = self.get_many(
+                db, [seeker] + [candidates[i] for i in misses], fingerprints
+            )
+            scored = self.calculator.score_many(
+                features[seeker.id].calculator,
+                [features[candidates[i].id].calculator for i in misses],
+            )
+            for i, result in zip(misses, scored):
+                results[i] = result
+                pair_score_cache.set(
+                    CALCULATOR_SCORER,
+                    seeker.id,
+                    candidates[i].id,
+                    COMPATIBILITY_ALGORITHM_VERSION,
+                    result,
+                    stamps=(fingerprints[seeker.id], fingerprints[candidates[i].id]),
+                )
+
+        return results
+
+    def refresh_user(self, db: Session, user: User) -> StoredUserFeatures:
+        """
+        Recompute and stage a user's snapshot after a profile or onboarding
+        change. The caller's commit persists it with the profile update.
+        """
+        features = self.compute(user)
+        snapshot = db.get(UserFeatureSnapshot, user.id)
+        self._apply(db, user.id, self.source_fingerprint(user), features, snapshot)
+        return features
+
+    def _write_back(self, stale: List[tuple]) -> None:
+        """
+        Upsert snapshots recomputed on a read path. This runs on a session of
+        its own, so the caller's transaction is never committed from here and
+        a failed write cannot leave it unusable.
+        """
+        now = datetime.utcnow()
+        insert = pg_insert(UserFeatureSnapshot.__table__)
+        try:
+            with database.SessionLocal() as session:
+                # The caller may hold the row lock on a snapshot it staged
+                # itself; give up instead of waiting on our own transaction
+                session.execute(text("SET LOCAL lock_timeout = '2s'"))
+                session.execute(
+                    insert.on_conflict_do_update(
+                        index_elements=["user_id"],
+                        set_={
+                            "feature_version": insert.excluded.feature_version,
+                            "source_fingerprint": insert.excluded.source_fingerprint,
+                            "features": insert.excluded.features,
+                            "updated_at": insert.excluded.updated_at,
+                        },
+                    ),
+                    [
+                        {
+                            "user_id": user_id,
+                            "feature_version": FEATURE_VERSION,
+                            "source_fingerprint": fingerprint,
+                            "features": features.to_dict(),
+                            "computed_at": now,
+                            "updated_at": now,
+                        }
+                        for user_id, fingerprint, features in stale
+                    ],
+                )
+                session.commit()
+        except Exception as e:
+            # Snapshots are a cache: the freshly computed features are still
+            # returned to the caller and the next read tries again
+            logger.warning(f"Could not persist feature snapshots: {str(e)}")
+
+    def _apply(
+        self,
+        db: Session,
+        user_id: int,
+        fingerprint: str,
+        features: StoredUserFeatures,
+        snapshot: Optional[UserFeatureSnapshot],
+    ) -> None:
+        if snapshot is None:
+            db.add(
+                UserFeatureSnapshot(
+                    user_id=user_id,
+                    feature_version=FEATURE_VERSION,
+                    source_fingerprint=fingerprint,
+                    features=features.to_dict(),
+                )
+            )
+        else:
+            snapshot.feature_version = FEATURE_VERSION
+            snapshot.source_fingerprint = fingerprint
+            snapshot.features = features.to_dict()
+
+
+# Global feature store instance
+compatibility_feature_store = CompatibilityFeatureStore()
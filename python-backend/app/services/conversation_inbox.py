@@ -0,0 +1,154 @@
+"""
+Conversation Inbox
+Loads a user's whole conversation list (partner, last message and unread
+count) in a single query, independent of how many connections they have.
+
+It reads the per-connection last-message pointer and per-user unread
+counters that Message inserts maintain (see app.models.message); reading a
+conversation resets the reader's counter here. The `_async` variants run the
+same statements on an AsyncSession.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.models.message import Message
+from app.models.soul_connection import SoulConnection
+from app.models.user import User
+from sqlalchemy import case, desc, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import Select, Update
+
+
+@dataclass
+class InboxEntry:
+    """One conversation in a user's inbox"""
+
+    connection: SoulConnection
+    partner_id: int
+    partner: Optional[User]
+    last_message: Optional[Message]
+    unread_count: int
+
+
+def _inbox_statement(user_id: int, active_only: bool) -> Select:
+    partner = aliased(User)
+    last_message = aliased(Message)
+
+    partner_id = case(
+        (SoulConnection.user1_id == user_id, SoulConnection.user2_id),
+        else_=SoulConnection.user1_id,
+    )
+    # Selected as a column so the count is read fresh even when the
+    # connection is already in the session's identity map
+    unread_count = case(
+        (SoulConnection.user1_id == user_id, SoulConnection.user1_unread_count),
+        else_=SoulConnection.user2_unread_count,
+    )
+
+    statement = (
+        select(
+            SoulConnection,
+            partner_id.label("partner_id"),
+            partner,
+            last_message,
+            unread_count.label("unread_count"),
+        )
+        .outerjoin(partner, partner.id == partner_id)
+        .outerjoin(last_message, last_message.id == SoulConnection.last_message_id)
+        .where(
+            or_(
+                SoulConnection.user1_id == user_id,
+                SoulConnection.user2_id == user_id,
+            )
+        )
+    )
+    if active_only:
+        statement = statement.where(SoulConnection.status == "active")
+
+    return statement.order_by(
+        desc(SoulConnection.last_message_at).nulls_last(), desc(SoulConnection.id)
+    )
+
+
+def _inbox_entries(rows) -> List[InboxEntry]:
+    return [
+        InboxEntry(
+            connection=connection,
+            partner_id=row_partner_id,
+            partner=row_partner,
+            last_message=row_message,
+            unread_count=row_unread or 0,
+        )
+        for connection, row_partner_id, row_partner, row_message, row_unread in rows
+    ]
+
+
+def load_inbox(db: Session, user_id: int, active_only: bool = True) -> List[InboxEntry]:
+    """All of the user's conversations, most recently active first"""
+    rows = db.execute(_inbox_statement(user_id, active_only)).all()
+    return _inbox_entries(rows)
+
+
+async def load_inbox_async(
+    db: AsyncSession, user_id: int, active_only: bool = True
+) -> List[InboxEntry]:
+    """load_inbox on an AsyncSession"""
+    result = await db.execute(_inbox_statement(user_id, active_only))
+    return _inbox_entries(result.all())
+
+
+def _mark_read_statements(connection_id: int, reader_id: int) -> Tuple[Update, Update]:
+    messages = (
+        update(Message)
+        .where(
+            Message.connection_id == connection_id,
+            Message.sender_id != reader_id,
+            Message.is_read.isnot(True),
+        )
+        .values({Message.is_read: True})
+        .execution_options(synchronize_session=False)
+    )
+
+    counters = (
+        update(SoulConnection)
+        .where(SoulConnection.id == connection_id)
+        .values(
+            {
+                SoulConnection.user1_unread_count: case(
+                    (SoulConnection.user1_id == reader_id, 0),
+                    else_=SoulConnection.user1_unread_count,
+                ),
+                SoulConnection.user2_unread_count: case(
+                    (SoulConnection.user2_id == reader_id, 0),
+                    else_=SoulConnection.user2_unread_count,
+                ),
+            }
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    return messages, counters
+
+
+def mark_conversation_read(db: Session, connection_id: int, reader_id: int) -> int:
+    """
+    Mark every message the partner sent as read and reset the reader's unread
+    counter, as two bulk statements. Returns the number of messages marked;
+    the caller commits.
+    """
+    messages, counters = _mark_read_statements(connection_id, reader_id)
+    updated = db.execute(messages).rowcount
+    db.execute(counters)
+    return updated
+
+
+async def mark_conversation_read_async(
+    db: AsyncSession, connection_id: int, reader_id: int
+) -> int:
+    """mark_conversation_read on an AsyncSession"""
+    messages, counters = _mark_read_statements(connection_id, reader_id)
+    updated = (await db.execute(messages)).rowcount
+    await db.execute(counters)
+    return updated
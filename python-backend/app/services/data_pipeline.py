@@ -1,19 +1,27 @@
 # Real-Time Data Pipeline for Dinner First Analytics
 # Stream processing and data transformation for analytics and ML
+#
+# Every worker process runs one consumer per stream in a shared consumer
+# group, so Redis splits the stream entries between processes and throughput
+# scales with the number of workers. Entries left pending by a crashed
+# consumer are taken over with XAUTOCLAIM; delivery is at-least-once.
 
 import asyncio
 import json
 import logging
+import os
+import socket
 import time
-from concurrent.futures import ThreadPoolExecutor
+import uuid
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-# import pandas as pd
-import redis
+from app.services.pipeline_sink import STREAM_TABLES, ClickHouseSink, PipelineSink
 from clickhouse_driver import Client
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import ResponseError
 
 logger = logging.getLogger(__name__)
 
@@ -52,15 +60,29 @@ class ProcessingResult:
     processing_time_ms: float
 
 
+def default_consumer_name() -> str:
+    """Consumer identity: PIPELINE_CONSUMER_NAME, else host, pid and a suffix"""
+    return os.getenv("PIPELINE_CONSUMER_NAME") or (
+        f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    )
+
+
 class DataPipelineService:
     """
     Real-time data pipeline for processing analytics events and feeding ML models
     """
 
-    def __init__(self, clickhouse_client: Client, redis_client: redis.Redis):
+    def __init__(
+        self,
+        clickhouse_client: Client,
+        redis_client: AsyncRedis,
+        sink: Optional[PipelineSink] = None,
+        consumer_name: Optional[str] = None,
+    ):
         self.clickhouse = clickhouse_client
         self.redis = redis_client
-        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.sink = sink or ClickHouseSink(clickhouse_client)
+        self.consumer_name = consumer_name or default_consumer_name()
         self.processors = {}
         self.is_running = False
 
@@ -69,6 +91,9 @@ class DataPipelineService:
             "batch_size": 100,
             "processing_interval": 5,  # seconds
             "max_retry_attempts": 3,
+            # Entries idle this long in another consumer are taken over
+            "claim_min_idle_ms": 60000,
+            "claim_interval": 30,  # seconds between reclaim passes
             "dead_letter_ttl": 86400 * 7,  # 7 days
             "aggregation_windows": [60, 300, 3600],  # 1min, 5min, 1hour
         }
@@ -144,14 +169,14 @@ class DataPipelineService:
 
             event_data = {
                 "event_id": event.event_id,
-                "data": event.data,
+                "data": json.dumps(event.data, default=str),
                 "timestamp": event.timestamp.isoformat(),
                 "processing_stage": event.processing_stage.value,
-                "metadata": event.metadata or {},
+                "metadata": json.dumps(event.metadata or {}, default=str),
             }
 
             # Add to Redis stream
-            self.redis.xadd(
+            await self.redis.xadd(
                 stream_key,
                 event_data,
                 maxlen=10000,  # Keep last 10k events per stream
@@ -167,69 +192,116 @@ class DataPipelineService:
             return False
 
     async def _process_stream(self, stream_type: StreamType):
-        """Process events from a specific stream"""
+        """Consume a stream as this process's member of the consumer group"""
         stream_key = f"stream:{stream_type.value}"
         consumer_group = f"pipeline-{stream_type.value}"
-        consumer_name = "processor-1"
 
-        # Create consumer group
         try:
-            self.redis.xgroup_create(stream_key, consumer_group, id="0", mkstream=True)
-        except redis.RedisError:
-            pass  # Group might already exist
+            await self.redis.xgroup_create(
+                stream_key, consumer_group, id="0", mkstream=True
+            )
+        except ResponseError:
+            pass  # Group already exists
+
+        logger.info(
+            f"Consumer {self.consumer_name} processing stream: {stream_type.value}"
+        )
 
-        logger.info(f"Started processing stream: {stream_type.value}")
+        claim_cursor = "0-0"
+        next_claim_at = 0.0
 
         while self.is_running:
             try:
-                # Read events from stream
-                messages = self.redis.xreadgroup(
+                if time.monotonic() >= next_claim_at:
+                    claim_cursor, claimed = await self._claim_stale_messages(
+                        stream_key, consumer_group, claim_cursor
+                    )
+                    if claimed:
+                        await self._handle_messages(
+                            stream_type, stream_key, consumer_group, claimed
+                        )
+                    # Keep paging until a pass over the pending list completes
+                    if claim_cursor == "0-0":
+                        next_claim_at = time.monotonic() + self.config["claim_interval"]
+                    continue
+
+                messages = await self.redis.xreadgroup(
                     consumer_group,
-                    consumer_name,
+                    self.consumer_name,
                     {stream_key: ">"},
                     count=self.config["batch_size"],
                     block=self.config["processing_interval"] * 1000,
                 )
 
-                if not messages:
-                    continue
-
-                # Process batch of events
-                events_to_process = []
-                message_ids = []
-
-                for stream_name, stream_messages in messages:
-                    for message_id, fields in stream_messages:
-                        try:
-                            event = self._parse_stream_event(fields, stream_type)
-                            events_to_process.append(event)
-                            message_ids.append(message_id)
-                        except Exception as e:
-                            logger.error(f"Failed to parse event {message_id}: {e}")
-                            # Acknowledge bad message to prevent reprocessing
-                            self.redis.xack(stream_key, consumer_group, message_id)
-
-                # Process events
-                if events_to_process:
-                    result = await self._process_event_batch(
-                        events_to_process, stream_type
+                for _, stream_messages in messages or []:
+                    await self._handle_messages(
+                        stream_type, stream_key, consumer_group, stream_messages
                     )
 
-                    if result.success:
-                        # Acknowledge processed messages
-                        self.redis.xack(stream_key, consumer_group, *message_ids)
-                        self.metrics["events_processed"] += result.processed_events
-                    else:
-                        # Handle failed processing
-                        await self._handle_processing_failure(
-                            events_to_process, result.errors
-                        )
-                        self.metrics["events_failed"] += len(events_to_process)
-
             except Exception as e:
                 logger.error(f"Error processing {stream_type.value} stream: {e}")
                 await asyncio.sleep(1)  # Brief pause before retry
 
+    async def _claim_stale_messages(
+        self, stream_key: str, consumer_group: str, cursor: str
+    ) -> Tuple[str, List[Tuple[Any, Dict]]]:
+        """Take over entries idle in other (likely crashed) consumers"""
+        result = await self.redis.xautoclaim(
+            stream_key,
+            consumer_group,
+            self.consumer_name,
+            min_idle_time=self.config["claim_min_idle_ms"],
+            start_id=cursor,
+            count=self.config["batch_size"],
+        )
+        next_cursor, messages = result[0], result[1]
+        if isinstance(next_cursor, bytes):
+            next_cursor = next_cursor.decode()
+        # Entries trimmed from the stream come back without fields
+        return next_cursor, [(mid, fields) for mid, fields in messages if fields]
+
+    async def _handle_messages(
+        self,
+        stream_type: StreamType,
+        stream_key: str,
+        consumer_group: str,
+        stream_messages: List[Tuple[Any, Dict]],
+    ):
+        """Process one batch of stream entries and acknowledge the outcome"""
+        events_to_process = []
+        message_ids = []
+        unparseable_ids = []
+
+        for message_id, fields in stream_messages:
+            try:
+                events_to_process.append(self._parse_stream_event(fields, stream_type))
+                message_ids.append(message_id)
+            except Exception as e:
+                logger.error(f"Failed to parse event {message_id}: {e}")
+                unparseable_ids.append(message_id)
+
+        if unparseable_ids:
+            # Acknowledge bad messages to prevent reprocessing
+            await self.redis.xack(stream_key, consumer_group, *unparseable_ids)
+
+        if not events_to_process:
+            return
+
+        result = await self._process_event_batch(events_to_process, stream_type)
+
+        if result.success:
+            await self.redis.xack(stream_key, consumer_group, *message_ids)
+            self.metrics["events_processed"] += result.processed_events
+        else:
+            await self._handle_processing_failure(
+                stream_key,
+                consumer_group,
+                events_to_process,
+                message_ids,
+                result.errors,
+            )
+            self.metrics["events_failed"] += len(events_to_process)
+
     async def _process_event_batch(
         self, events: List[StreamEvent], stream_type: StreamType
     ) -> ProcessingResult:
@@ -607,11 +679,15 @@ class DataPipelineService:
 
     def _parse_stream_event(self, fields: Dict, stream_type: StreamType) -> StreamEvent:
         """Parse Redis stream message into StreamEvent"""
+        data = json.loads(fields.get(b"data", b"{}").decode())
+        timestamp = datetime.fromisoformat(fields.get(b"timestamp", b"").decode())
+        # Stored rows carry the time the event happened, not when it was processed
+        data.setdefault("timestamp", timestamp)
         return StreamEvent(
             event_id=fields.get(b"event_id", b"").decode(),
             stream_type=stream_type,
-            data=json.loads(fields.get(b"data", b"{}").decode()),
-            timestamp=datetime.fromisoformat(fields.get(b"timestamp", b"").decode()),
+            data=data,
+            timestamp=timestamp,
             processing_stage=ProcessingStage(
                 fields.get(b"processing_stage", b"raw").decode()
             ),
@@ -621,29 +697,20 @@ class DataPipelineService:
     async def _store_processed_events(
         self, events: List[Dict[str, Any]], stream_type: StreamType
     ):
-        """Store processed events in ClickHouse"""
+        """Store processed events in ClickHouse with one columnar insert"""
         if not events:
             return
 
         try:
-            # Map stream types to ClickHouse tables
-            table_mapping = {
-                StreamType.USER_EVENTS: "user_events",
-                StreamType.PROFILE_INTERACTIONS: "profile_interactions",
-                StreamType.MATCHING_EVENTS: "matching_events",
-                StreamType.MESSAGE_EVENTS: "message_events",
-                StreamType.REVELATION_EVENTS: "revelation_events",
-                StreamType.BUSINESS_EVENTS: "revenue_events",
-            }
-
-            table_name = table_mapping.get(stream_type)
-            if not table_name:
+            schema = STREAM_TABLES.get(stream_type.value)
+            if not schema:
                 logger.warning(f"No table mapping for {stream_type.value}")
                 return
 
-            # Insert events into ClickHouse
-            # self.clickhouse.execute(f"INSERT INTO {table_name} VALUES", events)
-            logger.debug(f"Stored {len(events)} processed events in {table_name}")
+            columns = schema.to_columns(events)
+            # The ClickHouse driver is synchronous
+            await asyncio.to_thread(self.sink.write, schema, columns)
+            logger.debug(f"Stored {len(events)} processed events in {schema.table}")
 
         except Exception as e:
             logger.error(f"Failed to store processed events: {e}")
@@ -656,14 +723,15 @@ class DataPipelineService:
         try:
             now = datetime.utcnow()
 
-            for window_seconds in self.config["aggregation_windows"]:
-                window_key = f"agg:{stream_type.value}:{window_seconds}:{int(now.timestamp() // window_seconds)}"
+            # One round-trip for every window's counter
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for window_seconds in self.config["aggregation_windows"]:
+                    bucket = int(now.timestamp() // window_seconds)
+                    window_key = f"agg:{stream_type.value}:{window_seconds}:{bucket}"
 
-                # Update aggregation counters
-                pipe = self.redis.pipeline()
-                pipe.hincrby(window_key, "event_count", len(events))
-                pipe.expire(window_key, window_seconds * 2)  # Keep for 2 windows
-                pipe.execute()
+                    pipe.hincrby(window_key, "event_count", len(events))
+                    pipe.expire(window_key, window_seconds * 2)  # Keep for 2 windows
+                await pipe.execute()
 
         except Exception as e:
             logger.error(f"Failed to update real-time aggregations: {e}")
@@ -699,14 +767,14 @@ class DataPipelineService:
 
             # Store hourly aggregations
             hour_key = f"hourly_agg:{int(current_hour.timestamp())}"
-            self.redis.hset(
+            await self.redis.hset(
                 hour_key,
                 mapping={
                     k: v if not isinstance(v, set) else len(v)
                     for k, v in aggregations.items()
                 },
             )
-            self.redis.expire(hour_key, 86400 * 31)  # Keep for 31 days
+            await self.redis.expire(hour_key, 86400 * 31)  # Keep for 31 days
 
         except Exception as e:
             logger.error(f"Failed to run hourly aggregations: {e}")
@@ -721,8 +789,8 @@ class DataPipelineService:
 
             # Store in Redis and ClickHouse
             date_key = f"daily_agg:{current_date.isoformat()}"
-            self.redis.hset(date_key, mapping=daily_metrics)
-            self.redis.expire(date_key, 86400 * 365)  # Keep for 1 year
+            await self.redis.hset(date_key, mapping=daily_metrics)
+            await self.redis.expire(date_key, 86400 * 365)  # Keep for 1 year
 
         except Exception as e:
             logger.error(f"Failed to run daily aggregations: {e}")
@@ -749,7 +817,7 @@ class DataPipelineService:
 
                 # Store metrics in Redis
                 metrics_key = "pipeline_metrics"
-                self.redis.hset(
+                await self.redis.hset(
                     metrics_key,
                     mapping={k: str(v) for k, v in self.metrics.items()},
                 )
@@ -761,9 +829,18 @@ class DataPipelineService:
                 await asyncio.sleep(60)
 
     async def _handle_processing_failure(
-        self, events: List[StreamEvent], errors: List[str]
+        self,
+        stream_key: str,
+        consumer_group: str,
+        events: List[StreamEvent],
+        message_ids: List[Any],
+        errors: List[str],
     ):
-        """Handle failed event processing"""
+        """
+        Leave failed entries pending so a reclaim pass retries them; entries
+        already delivered `max_retry_attempts` times go to the dead letter
+        queue instead
+        """
         try:
             # Log errors
             for error in errors:
@@ -775,15 +852,35 @@ class DataPipelineService:
                     }
                 )
 
-            # Send to dead letter queue for manual review
-            for event in events:
-                dead_letter_key = f"dead_letter:{event.stream_type.value}"
-                event_data = asdict(event)
-                event_data["failure_timestamp"] = datetime.utcnow().isoformat()
-                event_data["errors"] = errors
+            pending = await self.redis.xpending_range(
+                stream_key,
+                consumer_group,
+                min=message_ids[0],
+                max=message_ids[-1],
+                count=len(message_ids),
+                consumername=self.consumer_name,
+            )
+            exhausted = {
+                entry["message_id"]
+                for entry in pending
+                if entry["times_delivered"] >= self.config["max_retry_attempts"]
+            }
+            if not exhausted:
+                return
 
-                self.redis.lpush(dead_letter_key, json.dumps(event_data, default=str))
-                self.redis.expire(dead_letter_key, self.config["dead_letter_ttl"])
+            # Send to dead letter queue for manual review
+            dead_letter_key = f"dead_letter:{events[0].stream_type.value}"
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for event, message_id in zip(events, message_ids):
+                    if message_id not in exhausted:
+                        continue
+                    event_data = asdict(event)
+                    event_data["failure_timestamp"] = datetime.utcnow().isoformat()
+                    event_data["errors"] = errors
+                    pipe.lpush(dead_letter_key, json.dumps(event_data, default=str))
+                pipe.expire(dead_letter_key, self.config["dead_letter_ttl"])
+                pipe.xack(stream_key, consumer_group, *exhausted)
+                await pipe.execute()
 
         except Exception as e:
             logger.error(f"Failed to handle processing failure: {e}")
@@ -821,6 +918,7 @@ class DataPipelineService:
         """Get current pipeline status and metrics"""
         return {
             "is_running": self.is_running,
+            "consumer_name": self.consumer_name,
             "metrics": self.metrics,
             "config": self.config,
             "active_streams": list(StreamType),
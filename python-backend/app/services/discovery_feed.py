@@ -0,0 +1,647 @@
+"""
+Precomputed Discovery Feed
+Ranks each user's discovery candidates ahead of time and stores them in
+discovery_feed_entries, so the discover endpoint is a single indexed read.
+
+Feeds are (re)built by a rate-limited background worker. Profile and
+onboarding changes mark the user's own feed stale and push the user's new
+score into the feeds that list them (or should), instead of rebuilding
+everyone's feed. The worker runs as its own process:
+
+    python -m app.services.discovery_feed
+"""
+
+import asyncio
+import base64
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import database
+from app.models.discovery_feed import DiscoveryFeed, DiscoveryFeedEntry
+from app.models.soul_connection import SoulConnection
+from app.models.user import User
+from app.observability import metrics as obs
+from app.services.candidate_index import (
+    age_from_date_of_birth,
+    candidate_index,
+    live_connection_filter,
+)
+from app.services.compatibility import COMPATIBILITY_ALGORITHM_VERSION
+from app.services.compatibility_feature_store import compatibility_feature_store
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Ranked candidates kept per user
+FEED_SIZE = 200
+
+# Candidates retrieved from the index and scored per feed slot
+CANDIDATE_POOL_FACTOR = 5
+
+# Most candidates scored inline for a page of a feed that is not built yet
+FALLBACK_MAX_SCORED = 60
+
+# Feeds are re-ranked at least this often to pick up drift (new users the
+# incremental path did not reach, aging, deactivations)
+MAX_FEED_AGE = timedelta(hours=6)
+
+
+def encode_cursor(score: float, candidate_id: int) -> str:
+    """Opaque keyset cursor for the entry after which the next page starts"""
+    raw = f"{score!r}:{candidate_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        score, candidate_id = raw.rsplit(":", 1)
+        return float(score), int(candidate_id)
+    except Exception:
+        raise ValueError(f"Invalid discovery cursor: {cursor!r}")
+
+
+def _shares_interests(user: User, candidate: User) -> bool:
+    """False only when both users list interests and none overlap"""
+    if not (user.interests and candidate.interests):
+        return True
+    return bool(set(user.interests).intersection(candidate.interests))
+
+
+class DiscoveryFeedService:
+    """Builds, incrementally maintains and pages precomputed discovery feeds"""
+
+    def __init__(self, feed_size: int = FEED_SIZE):
+        self.feed_size = feed_size
+
+    # ---- Change notification ---------------------------------------------
+
+    def mark_changed(self, db: Session, user_id: int) -> None:
+        """
+        Record that a user's matching inputs changed (onboarding completed or
+        profile/preferences edited). Staged on the caller's session so it
+        commits with the change itself; the worker picks it up from there.
+        """
+        now = datetime.utcnow()
+        feed = db.get(DiscoveryFeed, user_id)
+        if feed is None:
+            feed = DiscoveryFeed(user_id=user_id)
+            db.add(feed)
+        feed.stale_since = feed.stale_since or now
+        feed.profile_changed_at = now
+
+    # ---- Building --------------------------------------------------------
+
+    def rank(self, db: Session, user: User) -> List[Tuple[User, Dict[str, Any]]]:
+        """Top `feed_size` (candidate, compatibility) pairs for a user"""
+        self._require_index()
+        features = compatibility_feature_store.get(db, user)
+        candidate_ids = candidate_index.candidates(
+            user.id,
+            features.calculator,
+            limit=self.feed_size * CANDIDATE_POOL_FACTOR,
+            seeker_age=age_from_date_of_birth(user.date_of_birth),
+        )
+        candidates = (
+            db.query(User)
+            .filter(
+                User.id.in_(candidate_ids),
+                User.is_active,
+                User.emotional_onboarding_completed,
+            )
+            .all()
+            if candidate_ids
+            else []
+        )
+
+        scores = compatibility_feature_store.score_many(db, user, candidates)
+        return heapq.nlargest(
+            self.feed_size,
+            zip(candidates, scores),
+            key=lambda item: (item[1]["total_compatibility"], -item[0].id),
+        )
+
+    def refresh(self, db: Session, user: User, trigger: str = "worker") -> int:
+        """Re-rank and store a user's whole feed; returns the entry count"""
+        started = datetime.utcnow()
+        timer = time.perf_counter()
+        user_id = user.id
+        try:
+            ranked = self.rank(db, user)
+
+            db.query(DiscoveryFeedEntry).filter(
+                DiscoveryFeedEntry.user_id == user_id
+            ).delete(synchronize_session=False)
+            db.add_all(
+                self._entry(user, candidate, compatibility, started)
+                for candidate, compatibility in ranked
+            )
+
+            feed = db.get(DiscoveryFeed, user_id)
+            if feed is None:
+                feed = DiscoveryFeed(user_id=user_id)
+                db.add(feed)
+            feed.refreshed_at = started
+            feed.algorithm_version = COMPATIBILITY_ALGORITHM_VERSION
+            db.flush()
+
+            # Keep the stale mark if the profile changed again mid-refresh
+            db.query(DiscoveryFeed).filter(
+                DiscoveryFeed.user_id == user_id,
+                or_(
+                    DiscoveryFeed.profile_changed_at.is_(None),
+                    DiscoveryFeed.profile_changed_at <= started,
+                ),
+            ).update({"stale_since": None}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            obs.discovery_feed_refreshes_total.labels(trigger, "error").inc()
+            raise
+
+        obs.discovery_feed_refreshes_total.labels(trigger, "success").inc()
+        obs.discovery_feed_refresh_seconds.observe(time.perf_counter() - timer)
+        return len(ranked)
+
+    def propagate(self, db: Session, user: User) -> int:
+        """
+        Push a changed user's new scores into other users' built feeds: rescore
+        the entries that already list them and insert them into the feeds of
+        the users they now rank highly for (evicting the lowest entry of a
+        full feed). Returns the number of feeds touched.
+        """
+        started = datetime.utcnow()
+        user_id = user.id
+        try:
+            listed = {
+                entry.user_id: entry
+                for entry in db.query(DiscoveryFeedEntry)
+                .filter(DiscoveryFeedEntry.candidate_id == user_id)
+                .all()
+            }
+
+            if not (user.is_active and user.emotional_onboarding_completed):
+                db.query(DiscoveryFeedEntry).filter(
+                    DiscoveryFeedEntry.candidate_id == user_id
+                ).delete(synchronize_session=False)
+                touched = len(listed)
+            else:
+                touched = self._propagate_scores(db, user, listed, started)
+
+            db.query(DiscoveryFeed).filter(DiscoveryFeed.user_id == user_id).update(
+                {"propagated_at": started}, synchronize_session=False
+            )
+            db.commit()
+            return touched
+        except Exception:
+            db.rollback()
+            raise
+
+    def _propagate_scores(
+        self,
+        db: Session,
+        user: User,
+        listed: Dict[int, DiscoveryFeedEntry],
+        started: datetime,
+    ) -> int:
+        self._require_index()
+        features = compatibility_feature_store.get(db, user)
+        neighbour_ids = candidate_index.candidates(
+            user.id,
+            features.calculator,
+            limit=self.feed_size,
+            seeker_age=age_from_date_of_birth(user.date_of_birth),
+        )
+
+        owner_ids = set(listed) | set(neighbour_ids)
+        built = [
+            feed_user_id
+            for (feed_user_id,) in db.query(DiscoveryFeed.user_id).filter(
+                DiscoveryFeed.user_id.in_(owner_ids),
+                DiscoveryFeed.refreshed_at.isnot(None),
+            )
+        ]
+        owners = (
+            db.query(User)
+            .filter(
+                User.id.in_(built),
+                User.is_active,
+                User.emotional_onboarding_completed,
+            )
+            .all()
+            if built
+            else []
+        )
+        # Compatibility is symmetric, so one seeker-side batch scores the
+        # user against every owner
+        scores = compatibility_feature_store.score_many(db, user, owners)
+
+        newcomer_ids = [owner.id for owner in owners if owner.id not in listed]
+        floors = (
+            {
+                owner_id: (count, floor)
+                for owner_id, count, floor in db.query(
+                    DiscoveryFeedEntry.user_id,
+                    func.count(DiscoveryFeedEntry.candidate_id),
+                    func.min(DiscoveryFeedEntry.score),
+                )
+                .filter(DiscoveryFeedEntry.user_id.in_(newcomer_ids))
+                .group_by(DiscoveryFeedEntry.user_id)
+            }
+            if newcomer_ids
+            else {}
+        )
+
+        touched = 0
+        for owner, compatibility in zip(owners, scores):
+            entry = listed.get(owner.id)
+            if entry is not None:
+                self._fill_entry(entry, owner, user, compatibility, started)
+                touched += 1
+                continue
+
+            count, floor = floors.get(owner.id, (0, None))
+            if count >= self.feed_size:
+                if compatibility["total_compatibility"] <= floor:
+                    continue
+                lowest = (
+                    db.query(DiscoveryFeedEntry)
+                    .filter(DiscoveryFeedEntry.user_id == owner.id)
+                    .order_by(
+                        DiscoveryFeedEntry.score.asc(),
+                        DiscoveryFeedEntry.candidate_id.desc(),
+                    )
+                    .first()
+                )
+                if lowest is not None:
+                    db.delete(lowest)
+            db.add(self._entry(owner, user, compatibility, started))
+            touched += 1
+
+        return touched
+
+    @staticmethod
+    def _require_index() -> None:
+        # Building scans the users table, which only background work may do
+        if not candidate_index.ready:
+            raise RuntimeError("Discovery candidate index is still building")
+
+    def _entry(
+        self,
+        user: User,
+        candidate: User,
+        compatibility: Dict[str, Any],
+        computed_at: datetime,
+    ) -> DiscoveryFeedEntry:
+        entry = DiscoveryFeedEntry(user_id=user.id, candidate_id=candidate.id)
+        self._fill_entry(entry, user, candidate, compatibility, computed_at)
+        return entry
+
+    @staticmethod
+    def _fill_entry(
+        entry: DiscoveryFeedEntry,
+        user: User,
+        candidate: User,
+        compatibility: Dict[str, Any],
+        computed_at: datetime,
+    ) -> None:
+        entry.score = compatibility["total_compatibility"]
+        entry.compatibility = compatibility
+        entry.candidate_age = age_from_date_of_birth(candidate.date_of_birth)
+        entry.shares_interests = _shares_interests(user, candidate)
+        entry.computed_at = computed_at
+
+    # ---- Worker support --------------------------------------------------
+
+    def claim_due(self, db: Session, limit: int, lease: timedelta) -> List[int]:
+        """
+        Lease up to `limit` feeds needing work (stale, never built, too old,
+        old algorithm version, or unpropagated profile change), oldest
+        staleness first. Rows leased by another worker are skipped.
+        """
+        now = datetime.utcnow()
+        due = or_(
+            DiscoveryFeed.stale_since.isnot(None),
+            DiscoveryFeed.refreshed_at.is_(None),
+            DiscoveryFeed.refreshed_at < now - MAX_FEED_AGE,
+            DiscoveryFeed.algorithm_version != COMPATIBILITY_ALGORITHM_VERSION,
+            and_(
+                DiscoveryFeed.profile_changed_at.isnot(None),
+                or_(
+                    DiscoveryFeed.propagated_at.is_(None),
+                    DiscoveryFeed.propagated_at < DiscoveryFeed.profile_changed_at,
+                ),
+            ),
+        )
+        feeds = (
+            db.query(DiscoveryFeed)
+            .filter(
+                due,
+                or_(
+                    DiscoveryFeed.lease_expires_at.is_(None),
+                    DiscoveryFeed.lease_expires_at < now,
+                ),
+            )
+            .order_by(
+                DiscoveryFeed.stale_since.is_(None),
+                DiscoveryFeed.stale_since,
+                DiscoveryFeed.refreshed_at,
+            )
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        user_ids = [feed.user_id for feed in feeds]
+        for feed in feeds:
+            feed.lease_expires_at = now + lease
+        db.commit()
+        return user_ids
+
+    def process(self, db: Session, user_id: int) -> None:
+        """Do whatever work a leased feed is due for, then release it"""
+        try:
+            feed = db.get(DiscoveryFeed, user_id)
+            user = db.get(User, user_id)
+            if feed is None or user is None:
+                return
+
+            now = datetime.utcnow()
+            needs_rank = (
+                feed.stale_since is not None
+                or feed.refreshed_at is None
+                or feed.refreshed_at < now - MAX_FEED_AGE
+                or feed.algorithm_version != COMPATIBILITY_ALGORITHM_VERSION
+            )
+            needs_propagation = feed.profile_changed_at is not None and (
+                feed.propagated_at is None
+                or feed.propagated_at < feed.profile_changed_at
+            )
+
+            if needs_rank:
+                self.refresh(db, user)
+            if needs_propagation:
+                self.propagate(db, user)
+        except Exception as e:
+            logger.error(f"Error refreshing discovery feed for user {user_id}: {e}")
+            db.rollback()
+        finally:
+            db.query(DiscoveryFeed).filter(DiscoveryFeed.user_id == user_id).update(
+                {"lease_expires_at": None}, synchronize_session=False
+            )
+            db.commit()
+
+    # ---- Reading ---------------------------------------------------------
+
+    def read_page(
+        self,
+        db: Session,
+        user: User,
+        limit: int,
+        min_compatibility: float = 0.0,
+        age_min: Optional[int] = None,
+        age_max: Optional[int] = None,
+        after: Optional[Tuple[float, int]] = None,
+    ) -> Tuple[List[Tuple[DiscoveryFeedEntry, User]], Optional[str]]:
+        """
+        One page of a user's feed, best first, starting after the decoded
+        cursor `after`, with the cursor for the next page (None on the last
+        page). A feed that was never built is queued for the worker and the
+        page is served from the candidate index meanwhile, scoring at most
+        FALLBACK_MAX_SCORED candidates inline; full feeds are only ranked by
+        the worker. Connections that have ended do not hide the pair, as in
+        the candidate index.
+        """
+        feed = db.get(DiscoveryFeed, user.id)
+        if feed is None or feed.refreshed_at is None:
+            if feed is None:
+                self._queue_build(user.id)
+            return self._fallback_page(
+                db, user, limit, min_compatibility, age_min, age_max, after
+            )
+
+        connected = (
+            db.query(SoulConnection.id)
+            .filter(
+                or_(
+                    and_(
+                        SoulConnection.user1_id == user.id,
+                        SoulConnection.user2_id == DiscoveryFeedEntry.candidate_id,
+                    ),
+                    and_(
+                        SoulConnection.user1_id == DiscoveryFeedEntry.candidate_id,
+                        SoulConnection.user2_id == user.id,
+                    ),
+                ),
+                live_connection_filter(),
+            )
+            .exists()
+        )
+
+        query = (
+            db.query(DiscoveryFeedEntry, User)
+            .join(User, User.id == DiscoveryFeedEntry.candidate_id)
+            .filter(
+                DiscoveryFeedEntry.user_id == user.id,
+                DiscoveryFeedEntry.score >= min_compatibility,
+                User.is_active,
+                User.emotional_onboarding_completed,
+                ~connected,
+            )
+        )
+        if age_min is not None:
+            query = query.filter(DiscoveryFeedEntry.candidate_age >= age_min)
+        if age_max is not None:
+            query = query.filter(DiscoveryFeedEntry.candidate_age <= age_max)
+        if min_compatibility > 80:
+            # Very high thresholds only consider users sharing an interest
+            query = query.filter(DiscoveryFeedEntry.shares_interests)
+        if after is not None:
+            score, candidate_id = after
+            query = query.filter(
+                or_(
+                    DiscoveryFeedEntry.score < score,
+                    and_(
+                        DiscoveryFeedEntry.score == score,
+                        DiscoveryFeedEntry.candidate_id > candidate_id,
+                    ),
+                )
+            )
+
+        rows = (
+            query.order_by(
+                DiscoveryFeedEntry.score.desc(), DiscoveryFeedEntry.candidate_id
+            )
+            .limit(limit + 1)
+            .all()
+        )
+
+        return self._paginate(rows, limit)
+
+    @staticmethod
+    def _paginate(
+        rows: List[Tuple[DiscoveryFeedEntry, User]], limit: int
+    ) -> Tuple[List[Tuple[DiscoveryFeedEntry, User]], Optional[str]]:
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1][0]
+            next_cursor = encode_cursor(last.score, last.candidate_id)
+        return rows, next_cursor
+
+    @staticmethod
+    def _queue_build(user_id: int) -> None:
+        """Create the user's feed row, which the worker sees as due"""
+        try:
+            # Own session: a read must not commit the caller's transaction
+            with database.SessionLocal() as session:
+                session.execute(
+                    pg_insert(DiscoveryFeed.__table__)
+                    .values(user_id=user_id)
+                    .on_conflict_do_nothing(index_elements=["user_id"])
+                )
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Could not queue discovery feed for user {user_id}: {e}")
+
+    def _fallback_page(
+        self,
+        db: Session,
+        user: User,
+        limit: int,
+        min_compatibility: float,
+        age_min: Optional[int],
+        age_max: Optional[int],
+        after: Optional[Tuple[float, int]],
+    ) -> Tuple[List[Tuple[DiscoveryFeedEntry, User]], Optional[str]]:
+        """
+        Page for a feed the worker has not built yet: the nearest candidate
+        index matches (at most FALLBACK_MAX_SCORED), scored but not stored.
+        Empty while the index is still building.
+        """
+        if not candidate_index.ready:
+            return [], None
+
+        features = compatibility_feature_store.get(db, user)
+        candidate_ids = candidate_index.candidates(
+            user.id,
+            features.calculator,
+            limit=min((limit + 1) * CANDIDATE_POOL_FACTOR, FALLBACK_MAX_SCORED),
+            seeker_age=age_from_date_of_birth(user.date_of_birth),
+            age_min=age_min,
+            age_max=age_max,
+        )
+        candidates = (
+            db.query(User)
+            .filter(
+                User.id.in_(candidate_ids),
+                User.is_active,
+                User.emotional_onboarding_completed,
+            )
+            .all()
+            if candidate_ids
+            else []
+        )
+        scores = compatibility_feature_store.score_many(db, user, candidates)
+
+        now = datetime.utcnow()
+        rows = []
+        for candidate, compatibility in zip(candidates, scores):
+            entry = self._entry(user, candidate, compatibility, now)
+            if entry.score < min_compatibility:
+                continue
+            if min_compatibility > 80 and not entry.shares_interests:
+                continue
+            if after is not None and (-entry.score, entry.candidate_id) <= (
+                -after[0],
+                after[1],
+            ):
+                continue
+            rows.append((entry, candidate))
+
+        rows.sort(key=lambda row: (-row[0].score, row[0].candidate_id))
+        return self._paginate(rows[: limit + 1], limit)
+
+
+class DiscoveryFeedWorker:
+    """
+    Background loop refreshing due feeds off the request path. Throughput is
+    capped at `max_refreshes_per_second` so ranking never starves the API of
+    database capacity; `run_once` can also be scheduled externally (cron).
+    """
+
+    def __init__(
+        self,
+        feeds: DiscoveryFeedService,
+        batch_size: int = 20,
+        poll_interval_seconds: float = 5.0,
+        max_refreshes_per_second: float = 2.0,
+        lease: timedelta = timedelta(minutes=5),
+    ):
+        self.feeds = feeds
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_refreshes_per_second = max_refreshes_per_second
+        self.lease = lease
+
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Discovery feed worker started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info("Discovery feed worker stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                processed = await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Discovery feed worker error: {e}")
+                processed = 0
+
+            if not processed:
+                await asyncio.sleep(self.poll_interval_seconds)
+
+    def run_once(self) -> int:
+        """Lease and process one batch of due feeds; returns how many"""
+        min_interval = 1.0 / self.max_refreshes_per_second
+        with database.SessionLocal() as db:
+            candidate_index.ensure_fresh(db)
+            user_ids = self.feeds.claim_due(db, self.batch_size, self.lease)
+            for user_id in user_ids:
+                started = time.monotonic()
+                self.feeds.process(db, user_id)
+                remaining = min_interval - (time.monotonic() - started)
+                if remaining > 0:
+                    time.sleep(remaining)
+        return len(user_ids)
+
+    def run_forever(self) -> None:
+        """Run the loop in the foreground, as a dedicated worker process"""
+        self.is_running = True
+        asyncio.run(self._run())
+
+
+# Global discovery feed instances
+discovery_feed = DiscoveryFeedService()
+discovery_feed_worker = DiscoveryFeedWorker(discovery_feed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    discovery_feed_worker.run_forever()
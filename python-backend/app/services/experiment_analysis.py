@@ -0,0 +1,317 @@
+"""
+Experiment Analysis Engine
+Aggregates an A/B experiment's exposures and metrics for every variant and
+metric in one pass, then runs the significance statistics as array
+operations over the whole variant x metric grid.
+
+Backends produce ExperimentAggregates: ClickHouse does the aggregation in a
+single query over experiment_assignments/experiment_events; the in-memory
+backend does the same over recorded events for tests and local runs.
+
+Metrics are analysed per exposed user: users are the unit of assignment, so
+each user's events for a metric are summed first and users without events
+count as zero.
+"""
+
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from scipy import stats
+
+
+@dataclass
+class ExperimentAggregates:
+    """Sufficient statistics for every variant (rows) and metric (columns)"""
+
+    variants: List[str]
+    metrics: List[str]
+    exposures: np.ndarray  # (V,) users exposed to each variant
+    converted: np.ndarray  # (V, M) users with a positive total
+    totals: np.ndarray  # (V, M) sum of per-user totals
+    totals_sq: np.ndarray  # (V, M) sum of squared per-user totals
+
+    @classmethod
+    def from_rows(
+        cls,
+        variants: Sequence[str],
+        metrics: Sequence[str],
+        exposure_rows: Iterable[Tuple[str, int]],
+        metric_rows: Iterable[Tuple[str, str, int, int, float, float]],
+    ) -> "ExperimentAggregates":
+        """
+        Build from (variant, users) exposure rows and (variant, metric,
+        users, converted, total, total_sq) metric rows; rows for unknown
+        variants or metrics are ignored
+        """
+        variant_index = {variant: i for i, variant in enumerate(variants)}
+        metric_index = {metric: j for j, metric in enumerate(metrics)}
+        shape = (len(variants), len(metrics))
+
+        exposures = np.zeros(len(variants))
+        users = np.zeros(shape)
+        converted = np.zeros(shape)
+        totals = np.zeros(shape)
+        totals_sq = np.zeros(shape)
+
+        for variant, count in exposure_rows:
+            if variant in variant_index:
+                exposures[variant_index[variant]] = count
+
+        for variant, metric, n, x, total, total_sq in metric_rows:
+            if variant in variant_index and metric in metric_index:
+                cell = (variant_index[variant], metric_index[metric])
+                users[cell] = n
+                converted[cell] = x
+                totals[cell] = total
+                totals_sq[cell] = total_sq
+
+        # Users with events are exposed even if their assignment is missing
+        if len(metrics):
+            exposures = np.maximum(exposures, users.max(axis=1))
+
+        return cls(
+            variants=list(variants),
+            metrics=list(metrics),
+            exposures=exposures,
+            converted=converted,
+            totals=totals,
+            totals_sq=totals_sq,
+        )
+
+
+class ExperimentAnalysisBackend(ABC):
+    """Source of per-variant, per-metric experiment aggregates"""
+
+    @abstractmethod
+    def aggregate(
+        self, experiment_id: str, variants: Sequence[str], metrics: Sequence[str]
+    ) -> ExperimentAggregates: ...
+
+
+class ClickHouseAnalysisBackend(ExperimentAnalysisBackend):
+    """Aggregates in ClickHouse so only V x M rows leave the database"""
+
+    # Exposure rows carry an empty metric name
+    AGGREGATE_QUERY = """
+        SELECT
+            variant,
+            '' AS metric_name,
+            uniqExact(user_id) AS users,
+            toUInt64(0) AS converted,
+            toFloat64(0) AS total,
+            toFloat64(0) AS total_sq
+        FROM experiment_assignments
+        WHERE experiment_id = %(experiment_id)s AND is_active
+        GROUP BY variant
+
+        UNION ALL
+
+        SELECT
+            variant,
+            metric_name,
+            count() AS users,
+            countIf(user_total > 0) AS converted,
+            sum(user_total) AS total,
+            sum(user_total * user_total) AS total_sq
+        FROM (
+            SELECT variant, metric_name, user_id, sum(metric_value) AS user_total
+            FROM experiment_events
+            WHERE experiment_id = %(experiment_id)s
+              AND metric_name IN %(metrics)s
+            GROUP BY variant, metric_name, user_id
+        )
+        GROUP BY variant, metric_name
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def aggregate(
+        self, experiment_id: str, variants: Sequence[str], metrics: Sequence[str]
+    ) -> ExperimentAggregates:
+        rows = self.client.execute(
+            self.AGGREGATE_QUERY,
+            # A tuple renders as an IN list (a list would be an Array)
+            {"experiment_id": experiment_id, "metrics": tuple(metrics)},
+        )
+        exposure_rows = [(row[0], row[2]) for row in rows if row[1] == ""]
+        metric_rows = [row for row in rows if row[1] != ""]
+        return ExperimentAggregates.from_rows(
+            variants, metrics, exposure_rows, metric_rows
+        )
+
+
+class InMemoryAnalysisBackend(ExperimentAnalysisBackend):
+    """Keeps assignments and events in process; for tests and local runs"""
+
+    def __init__(self):
+        # experiment_id -> user_id -> variant
+        self.assignments: Dict[str, Dict[int, str]] = defaultdict(dict)
+        # experiment_id -> (variant, metric, user_id) -> summed value
+        self.user_totals: Dict[str, Dict[Tuple[str, str, int], float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+
+    def record_assignment(self, experiment_id: str, user_id: int, variant: str):
+        self.assignments[experiment_id][user_id] = variant
+
+    def record_event(
+        self,
+        experiment_id: str,
+        user_id: int,
+        variant: str,
+        metric_name: str,
+        metric_value: float,
+    ):
+        self.user_totals[experiment_id][(variant, metric_name, user_id)] += metric_value
+
+    def aggregate(
+        self, experiment_id: str, variants: Sequence[str], metrics: Sequence[str]
+    ) -> ExperimentAggregates:
+        exposures: Dict[str, int] = defaultdict(int)
+        for variant in self.assignments[experiment_id].values():
+            exposures[variant] += 1
+
+        cells: Dict[Tuple[str, str], List[float]] = defaultdict(
+            lambda: [0, 0, 0.0, 0.0]
+        )
+        for (variant, metric, _), total in self.user_totals[experiment_id].items():
+            cell = cells[(variant, metric)]
+            cell[0] += 1
+            cell[1] += total > 0
+            cell[2] += total
+            cell[3] += total * total
+
+        return ExperimentAggregates.from_rows(
+            variants,
+            metrics,
+            exposures.items(),
+            [(variant, metric, *cell) for (variant, metric), cell in cells.items()],
+        )
+
+
+@dataclass
+class ExperimentAnalysis:
+    """Significance statistics for every variant x metric, against control"""
+
+    aggregates: ExperimentAggregates
+    control_index: int
+    confidence_level: float
+
+    # Conversion (share of exposed users with a positive value)
+    conversion_rate: np.ndarray
+    ci_lower: np.ndarray
+    ci_upper: np.ndarray
+    lift: np.ndarray
+    z_statistic: np.ndarray
+    p_value: np.ndarray
+
+    # Continuous (mean value per exposed user), Welch's t-test
+    mean: np.ndarray
+    std: np.ndarray
+    mean_lift: np.ndarray
+    t_statistic: np.ndarray
+    mean_p_value: np.ndarray
+
+    @property
+    def significant(self) -> np.ndarray:
+        significant = self.p_value < (1 - self.confidence_level)
+        significant[self.control_index] = False
+        return significant
+
+    def metric_report(self, metric: str) -> List[Dict[str, Any]]:
+        """Per-variant results for one metric, as plain Python values"""
+        j = self.aggregates.metrics.index(metric)
+        significant = self.significant
+        return [
+            {
+                "variant_id": variant,
+                "is_control": i == self.control_index,
+                "exposures": int(self.aggregates.exposures[i]),
+                "conversions": int(self.aggregates.converted[i, j]),
+                "conversion_rate": float(self.conversion_rate[i, j]),
+                "confidence_interval": [
+                    float(self.ci_lower[i, j]),
+                    float(self.ci_upper[i, j]),
+                ],
+                "lift": float(self.lift[i, j]),
+                "z_statistic": float(self.z_statistic[i, j]),
+                "p_value": float(self.p_value[i, j]),
+                "statistically_significant": bool(significant[i, j]),
+                "mean": float(self.mean[i, j]),
+                "std": float(self.std[i, j]),
+                "mean_lift": float(self.mean_lift[i, j]),
+                "t_statistic": float(self.t_statistic[i, j]),
+                "mean_p_value": float(self.mean_p_value[i, j]),
+            }
+            for i, variant in enumerate(self.aggregates.variants)
+        ]
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise numerator / denominator, 0 where the denominator is 0"""
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    out = np.zeros(numerator.shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def analyze_experiment(
+    aggregates: ExperimentAggregates,
+    control_variant: str,
+    confidence_level: float = 0.95,
+) -> ExperimentAnalysis:
+    """Test every variant against control on every metric at once"""
+    c = aggregates.variants.index(control_variant)
+    n = aggregates.exposures[:, None]  # (V, 1) broadcasts across metrics
+    n_c = n[c]
+
+    # Two-proportion z-test on conversion
+    p = _ratio(aggregates.converted, n)
+    p_c = p[c]
+    pooled = _ratio(aggregates.converted + aggregates.converted[c], n + n_c)
+    se = np.sqrt(pooled * (1 - pooled) * (_ratio(1.0, n) + _ratio(1.0, n_c)))
+    z = _ratio(p - p_c, se)
+    p_value = np.where(se > 0, 2 * stats.norm.sf(np.abs(z)), 1.0)
+
+    z_critical = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+    margin = z_critical * np.sqrt(_ratio(p * (1 - p), n))
+    ci_lower = np.clip(p - margin, 0.0, 1.0)
+    ci_upper = np.clip(p + margin, 0.0, 1.0)
+
+    # Welch's t-test on the per-user mean
+    mean = _ratio(aggregates.totals, n)
+    variance = np.maximum(
+        _ratio(aggregates.totals_sq - n * mean**2, np.maximum(n - 1, 0)), 0.0
+    )
+    mean_c, variance_c = mean[c], variance[c]
+    se_v, se_c = _ratio(variance, n), _ratio(variance_c, n_c)
+    se_t = np.sqrt(se_v + se_c)
+    t = _ratio(mean - mean_c, se_t)
+    df = _ratio(
+        (se_v + se_c) ** 2,
+        _ratio(se_v**2, np.maximum(n - 1, 0)) + _ratio(se_c**2, np.maximum(n_c - 1, 0)),
+    )
+    mean_p_value = np.where(
+        (se_t > 0) & (df > 0), 2 * stats.t.sf(np.abs(t), np.maximum(df, 1)), 1.0
+    )
+
+    return ExperimentAnalysis(
+        aggregates=aggregates,
+        control_index=c,
+        confidence_level=confidence_level,
+        conversion_rate=p,
+        ci_lower=ci_lower,
+        ci_upper=ci_upper,
+        lift=_ratio(p - p_c, np.broadcast_to(p_c, p.shape)),
+        z_statistic=z,
+        p_value=p_value,
+        mean=mean,
+        std=np.sqrt(variance),
+        mean_lift=_ratio(mean - mean_c, np.broadcast_to(mean_c, mean.shape)),
+        t_statistic=t,
+        mean_p_value=mean_p_value,
+    )
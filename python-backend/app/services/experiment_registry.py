@@ -0,0 +1,318 @@
+"""
+Experiment Registry
+In-process, compiled view of the active A/B experiments so assignment needs
+no network calls on the request path.
+
+Assignment is stateless: a user's variant is a pure function of
+md5(f"{user_id}_{experiment_id}") and the experiment's traffic allocation, so
+every process computes the same answer from its local copy of the configs.
+That is also why traffic allocation is frozen once an experiment leaves
+draft: a new allocation would move users between variants mid-experiment.
+The registry reloads the configs from Redis when the `experiments:version`
+counter changes (bumped on every experiment write), polled in the background.
+
+Assignment records are still needed for exposure counts and analysis; the
+AssignmentRecorder buffers them and writes new ones in batches. They are
+analytics only: event tracking recomputes the variant rather than reading
+them back.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.services.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+EXPERIMENTS_KEY = "experiments"
+VERSION_KEY = "experiments:version"
+ASSIGNMENT_TTL_SECONDS = 86400 * 90
+
+AudiencePredicate = Callable[[Dict[str, Any]], bool]
+
+
+def assignment_point(user_id: int, experiment_id: str) -> float:
+    """Deterministic position of a user in [0, 1) for an experiment"""
+    digest = hashlib.md5(f"{user_id}_{experiment_id}".encode()).hexdigest()
+    seed = int(digest[:8], 16)
+    return (seed % 10000) / 10000.0
+
+
+def compile_audience(target_audience: Dict[str, Any]) -> AudiencePredicate:
+    """
+    Turn targeting criteria into a predicate over user attributes. A list
+    value means membership, a dict means an inclusive {"min", "max"} range
+    and anything else means equality; users missing an attribute don't match
+    """
+    checks: List[Tuple[str, Callable[[Any], bool]]] = []
+    for attribute, criterion in target_audience.items():
+        if isinstance(criterion, (list, tuple, set)):
+            allowed = frozenset(criterion)
+            check = allowed.__contains__
+        elif isinstance(criterion, dict):
+            low, high = criterion.get("min"), criterion.get("max")
+
+            def check(value, low=low, high=high):
+                return (low is None or value >= low) and (high is None or value <= high)
+
+        else:
+
+            def check(value, expected=criterion):
+                return value == expected
+
+        checks.append((attribute, check))
+
+    if not checks:
+        return lambda attributes: True
+
+    def matches(attributes: Dict[str, Any]) -> bool:
+        return all(
+            attribute in attributes and check(attributes[attribute])
+            for attribute, check in checks
+        )
+
+    return matches
+
+
+@dataclass(frozen=True)
+class CompiledExperiment:
+    """An active experiment reduced to what assignment needs"""
+
+    experiment_id: str
+    variant_ids: Tuple[str, ...]
+    cumulative_allocation: Tuple[float, ...]
+    control_variant_id: str
+    audience: AudiencePredicate
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CompiledExperiment":
+        """Compile the JSON form stored by ABTestingService"""
+        variants = config["variants"]
+        cumulative, running = [], 0.0
+        for variant in variants:
+            running += variant["traffic_allocation"]
+            cumulative.append(running)
+
+        control = next(
+            (v for v in variants if v["variant_type"] == "control"), variants[0]
+        )
+        return cls(
+            experiment_id=config["experiment_id"],
+            variant_ids=tuple(v["variant_id"] for v in variants),
+            cumulative_allocation=tuple(cumulative),
+            control_variant_id=control["variant_id"],
+            audience=compile_audience(config.get("target_audience") or {}),
+        )
+
+    def variant_for(self, user_id: int) -> str:
+        point = assignment_point(user_id, self.experiment_id)
+        # First variant whose cumulative allocation reaches the point
+        index = bisect_left(self.cumulative_allocation, point)
+        if index < len(self.variant_ids):
+            return self.variant_ids[index]
+        return self.control_variant_id
+
+    def assign(
+        self, user_id: int, attributes: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        if not self.audience(attributes or {}):
+            return None
+        return self.variant_for(user_id)
+
+
+class ExperimentRegistry:
+    """Process-local copy of the active experiments, refreshed on change"""
+
+    def __init__(self, redis_client, refresh_interval_seconds: float = 5.0):
+        self.redis = redis_client
+        self.refresh_interval_seconds = refresh_interval_seconds
+
+        # Replaced wholesale on refresh, so readers never see a partial load
+        self._experiments: Dict[str, CompiledExperiment] = {}
+        self._version: Optional[bytes] = None
+        self.loaded = False
+
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, experiment_id: str) -> Optional[CompiledExperiment]:
+        return self._experiments.get(experiment_id)
+
+    def active(self) -> List[CompiledExperiment]:
+        return list(self._experiments.values())
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the configs if the version changed; returns True on reload"""
+        version = self.redis.get(VERSION_KEY)
+        if self.loaded and not force and version == self._version:
+            return False
+
+        experiments = {}
+        for payload in self.redis.hgetall(EXPERIMENTS_KEY).values():
+            config = json.loads(payload)
+            if config.get("status") != "active":
+                continue
+            try:
+                compiled = CompiledExperiment.from_config(config)
+            except (KeyError, TypeError, ValueError, IndexError) as e:
+                logger.error(f"Skipping experiment {config.get('experiment_id')}: {e}")
+                continue
+            experiments[compiled.experiment_id] = compiled
+
+        self._experiments = experiments
+        self._version = version
+        self.loaded = True
+        return True
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            await asyncio.to_thread(self.refresh)
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        await self.ensure_loaded()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Experiment registry started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info("Experiment registry stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            await asyncio.sleep(self.refresh_interval_seconds)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Experiment registry refresh error: {e}")
+
+
+class AssignmentRecorder(WriteBehindBuffer):
+    """
+    Buffers assignments and writes the new ones in batches: a pipelined
+    SET NX per assignment decides which are new, then their exposure
+    counters and ClickHouse rows are written in bulk
+    """
+
+    name = "Experiment assignment recorder"
+
+    def __init__(
+        self,
+        clickhouse_client,
+        redis_client,
+        flush_interval_seconds: float = 2.0,
+        max_pending: int = 500,
+        max_seen: int = 100000,
+    ):
+        super().__init__(flush_interval_seconds, max_pending)
+        self.clickhouse = clickhouse_client
+        self.redis = redis_client
+        self.max_seen = max_seen
+
+        # (experiment_id, user_id) -> variant_id
+        self._pending: Dict[Tuple[str, int], str] = {}
+        # Recently recorded pairs, so repeat evaluations are not re-sent
+        self._seen: "OrderedDict[Tuple[str, int], None]" = OrderedDict()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(self, user_id: int, experiment_id: str, variant_id: str) -> None:
+        key = (experiment_id, user_id)
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return
+            self._seen[key] = None
+            if len(self._seen) > self.max_seen:
+                self._seen.popitem(last=False)
+            self._pending[key] = variant_id
+            pending = len(self._pending)
+
+        self._notify_pending(pending)
+
+    def flush(self, db=None) -> int:
+        # Writes go to Redis and ClickHouse, so no database session is opened
+        with self._lock:
+            batch = self._take()
+        if batch is None:
+            return 0
+        try:
+            return self._write(db, batch)
+        except Exception:
+            logger.error(f"{self.name} dropped a batch of buffered writes")
+            raise
+
+    def _take(self) -> Optional[Dict[Tuple[str, int], str]]:
+        if not self._pending:
+            return None
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _write(self, db, batch: Dict[Tuple[str, int], str]) -> int:
+        now = datetime.utcnow()
+        records = [
+            {
+                "assignment_id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "experiment_id": experiment_id,
+                "variant_id": variant_id,
+                "assigned_at": now,
+                "is_active": True,
+            }
+            for (experiment_id, user_id), variant_id in batch.items()
+        ]
+
+        # Another process may have recorded the same user first
+        pipe = self.redis.pipeline(transaction=False)
+        for record in records:
+            pipe.set(
+                f"assignment:{record['experiment_id']}:{record['user_id']}",
+                json.dumps(record, default=str),
+                ex=ASSIGNMENT_TTL_SECONDS,
+                nx=True,
+            )
+        new_records = [
+            record for record, created in zip(records, pipe.execute()) if created
+        ]
+        if not new_records:
+            return 0
+
+        pipe = self.redis.pipeline(transaction=False)
+        for record in new_records:
+            pipe.hincrby(
+                f"experiment_metrics:{record['experiment_id']}",
+                f"{record['variant_id']}_exposures",
+                1,
+            )
+        pipe.execute()
+
+        self.clickhouse.execute(
+            "INSERT INTO experiment_assignments VALUES",
+            [
+                {
+                    "assignment_id": record["assignment_id"],
+                    "user_id": record["user_id"],
+                    "experiment_id": record["experiment_id"],
+                    "variant": record["variant_id"],
+                    "assignment_date": now.date(),
+                    "is_active": True,
+                    "timestamp": now,
+                }
+                for record in new_records
+            ],
+        )
+        return len(new_records)
@@ -0,0 +1,147 @@
+"""
+Keyword Matcher
+Compiles a table of {category: [keywords]} into a single trie-shaped regular
+expression so a response is scanned once for every keyword of every category,
+instead of running one `keyword in text` check per keyword.
+
+Matching keeps plain substring semantics: a keyword hits if it appears anywhere
+in the text, including inside longer words and overlapping other keywords.
+Single-word keywords can only occur inside one run of letters, so those runs
+are matched (and memoized) word by word - onboarding answers reuse a small
+vocabulary, so most words are already known. Per-text results are memoized
+too, and compiled matchers are shared by every service instance using the
+same table.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+# Distinct texts / words memoized per matcher
+DEFAULT_TEXT_CACHE_SIZE = 4096
+DEFAULT_WORD_CACHE_SIZE = 65536
+
+_WORD_RUN = re.compile(r"[a-z]+")
+
+FrozenTable = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """
+    Regex alternation shaped like a trie over `keywords`. Sibling branches
+    start with distinct characters and optional tails are greedy, so a match
+    at a given position is always the longest keyword starting there.
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [
+            re.escape(char) + build(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+def _lookahead_pattern(keywords: List[str]) -> Optional[re.Pattern]:
+    """Overlapping-match scanner reporting the longest keyword per position"""
+    if not keywords:
+        return None
+    return re.compile(f"(?=({_trie_pattern(keywords)}))")
+
+
+class KeywordMatcher:
+    """Single-pass substring matcher over a keyword table"""
+
+    def __init__(
+        self,
+        table: Mapping[str, Iterable[str]],
+        cache_size: int = DEFAULT_TEXT_CACHE_SIZE,
+        word_cache_size: int = DEFAULT_WORD_CACHE_SIZE,
+    ):
+        # keyword -> {category: occurrences in that category's list}
+        self._weights: Dict[str, Dict[str, int]] = {}
+        for category, keywords in table.items():
+            for keyword in keywords:
+                counts = self._weights.setdefault(keyword, {})
+                counts[category] = counts.get(category, 0) + 1
+
+        # The empty keyword is a substring of every text
+        self._always = frozenset(k for k in self._weights if not k)
+        searchable = [k for k in self._weights if k]
+
+        # A longest match also implies every keyword that is a prefix of it
+        self._implied: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset(
+                keyword[:end]
+                for end in range(1, len(keyword) + 1)
+                if keyword[:end] in self._weights
+            )
+            for keyword in searchable
+        }
+
+        words = [k for k in searchable if _WORD_RUN.fullmatch(k)]
+        self._word_pattern = _lookahead_pattern(words)
+        # Keywords spanning punctuation or spaces ("long-term") are rare
+        # enough that direct substring checks beat a second full-text scan
+        self._phrases = [k for k in searchable if not _WORD_RUN.fullmatch(k)]
+
+        self._word_hits = lru_cache(maxsize=word_cache_size)(self._scan_word)
+        self.counts = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _scan_word(self, word: str) -> FrozenSet[str]:
+        """Every single-word keyword occurring in `word`"""
+        found: FrozenSet[str] = frozenset()
+        for longest in {m.group(1) for m in self._word_pattern.finditer(word)}:
+            found |= self._implied[longest]
+        return found
+
+    def _scan(self, text: str) -> Dict[str, int]:
+        """
+        {category: number of its keywords found in `text`}, counting repeated
+        list entries as often as they are listed. Categories without hits are
+        omitted. Callers pass already-normalized (e.g. lowercased) text and
+        must not mutate the returned dict, which is shared via the memo.
+        """
+        found = set(self._always)
+        if text:
+            if self._word_pattern is not None:
+                for word in set(_WORD_RUN.findall(text)):
+                    found.update(self._word_hits(word))
+            found.update(phrase for phrase in self._phrases if phrase in text)
+
+        hits: Dict[str, int] = {}
+        for keyword in found:
+            for category, count in self._weights[keyword].items():
+                hits[category] = hits.get(category, 0) + count
+        return hits
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """Categories with at least one keyword present in `text`"""
+        return frozenset(self.counts(text))
+
+
+def _freeze(table: Mapping[str, Iterable[str]]) -> FrozenTable:
+    return tuple((category, tuple(keywords)) for category, keywords in table.items())
+
+
+@lru_cache(maxsize=256)
+def _compiled(frozen: FrozenTable) -> KeywordMatcher:
+    return KeywordMatcher(dict(frozen))
+
+
+def keyword_matcher(table: Mapping[str, Iterable[str]]) -> KeywordMatcher:
+    """Shared compiled matcher for a keyword table (compiled on first use)"""
+    return _compiled(_freeze(table))
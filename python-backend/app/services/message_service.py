@@ -4,23 +4,120 @@ Soul-themed messaging with emotional context and real-time delivery
 """
 
 # import asyncio
+import base64
 import logging
 from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.models.message import Message
+from app.models.message import MessageType as ChatMessageType
 from app.models.soul_analytics import AnalyticsEventType
 from app.models.soul_connection import SoulConnection
 from app.models.user import User
 from app.services.analytics_service import analytics_service
-from app.services.realtime_connection_manager import MessageType, realtime_manager
-from sqlalchemy import desc, or_
+from app.services.conversation_inbox import (
+    load_inbox_async,
+    mark_conversation_read_async,
+)
+from app.services.message_write_behind import (
+    SlidingWindowRateLimiter,
+    message_write_behind,
+)
+from app.services.realtime_connection_manager import (
+    MessageType,
+    RealtimeMessage,
+    realtime_manager,
+)
+from sqlalchemy import and_, desc, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
 
 logger = logging.getLogger(__name__)
 
 
+def encode_message_cursor(created_at: datetime, message_id: int) -> str:
+    """Opaque keyset cursor for the message before which the next page starts"""
+    raw = f"{created_at.isoformat()}|{message_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_message_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_message_cursor; raises ValueError on malformed input"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except Exception:
+        raise ValueError(f"Invalid message cursor: {cursor!r}")
+
+
+def _message_page_statement(
+    connection_id: int,
+    limit: int,
+    before: Optional[Tuple[datetime, int]],
+    offset: int,
+) -> Select:
+    statement = select(Message).where(Message.connection_id == connection_id)
+    if before is not None:
+        created_at, message_id = before
+        statement = statement.where(
+            or_(
+                Message.created_at < created_at,
+                and_(Message.created_at == created_at, Message.id < message_id),
+            )
+        )
+    elif offset:
+        statement = statement.offset(offset)
+
+    return statement.order_by(desc(Message.created_at), desc(Message.id)).limit(
+        limit + 1
+    )
+
+
+def _split_page(
+    messages: List[Message], limit: int
+) -> Tuple[List[Message], Optional[str]]:
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        oldest = messages[-1]
+        next_cursor = encode_message_cursor(oldest.created_at, oldest.id)
+    return messages, next_cursor
+
+
+def load_message_page(
+    db: Session,
+    connection_id: int,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    offset: int = 0,
+) -> Tuple[List[Message], Optional[str]]:
+    """
+    One page of a conversation, newest first, strictly older than the decoded
+    cursor `before`, with the cursor for the next (older) page or None on the
+    last page. Served from ix_messages_connection_created_id, so a page deep
+    in the history costs the same as the first one. `offset` is only honoured
+    without a cursor, for older clients.
+    """
+    statement = _message_page_statement(connection_id, limit, before, offset)
+    return _split_page(db.execute(statement).scalars().all(), limit)
+
+
+async def load_message_page_async(
+    db: AsyncSession,
+    connection_id: int,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    offset: int = 0,
+) -> Tuple[List[Message], Optional[str]]:
+    """load_message_page on an AsyncSession"""
+    statement = _message_page_statement(connection_id, limit, before, offset)
+    result = await db.execute(statement)
+    return _split_page(result.scalars().all(), limit)
+
+
 @dataclass
 class MessageResult:
     """Result of message sending operation"""
@@ -53,6 +150,9 @@ class MessageService:
     def __init__(self):
         self.max_message_length = 2000
         self.rate_limit_messages_per_minute = 30
+        self.rate_limiter = SlidingWindowRateLimiter(
+            self.rate_limit_messages_per_minute, window_seconds=60
+        )
         logger.info("Message Service initialized")
 
     async def send_message(
@@ -61,9 +161,13 @@ class MessageService:
         connection_id: int,
         content: str,
         emotional_context: Optional[Dict[str, Any]] = None,
-        db: Session = None,
+        db: AsyncSession = None,
+        sender: Optional[User] = None,
     ) -> MessageResult:
-        """Send a message in a soul connection with real-time delivery"""
+        """
+        Send a message in a soul connection with real-time delivery. Pass the
+        already-loaded `sender` to save a lookup.
+        """
         try:
             # Validate message content
             if not content or not content.strip():
@@ -85,17 +189,7 @@ class MessageService:
                 )
 
             # Verify connection exists and user is authorized
-            connection = (
-                db.query(SoulConnection)
-                .filter(
-                    SoulConnection.id == connection_id,
-                    or_(
-                        SoulConnection.user1_id == sender_id,
-                        SoulConnection.user2_id == sender_id,
-                    ),
-                )
-                .first()
-            )
+            connection = await self._member_connection(db, connection_id, sender_id)
 
             if not connection:
                 return MessageResult(
@@ -107,64 +201,47 @@ class MessageService:
                 )
 
             # Check rate limiting
-            rate_limit_check = await self._check_rate_limit(
-                sender_id, connection_id, db
-            )
-            if not rate_limit_check["allowed"]:
+            if not self.rate_limiter.allow((sender_id, connection_id)):
                 return MessageResult(
                     success=False,
                     message_id=None,
-                    message=rate_limit_check["message"],
+                    message="Rate limit exceeded. Please wait before sending more messages.",
                     delivered=False,
                     error="rate_limited",
                 )
 
-            # Get sender info for emotional context
-            sender = db.query(User).filter(User.id == sender_id).first()
+            if sender is None:
+                sender = await db.get(User, sender_id)
             partner_id = connection.get_partner_id(sender_id)
 
-            # Create message with emotional context
+            message_type = (
+                ChatMessageType.REVELATION
+                if emotional_context and emotional_context.get("is_revelation")
+                else ChatMessageType.TEXT
+            )
             message = Message(
                 connection_id=connection_id,
                 sender_id=sender_id,
-                content=content.strip(),
-                emotional_state=(
-                    emotional_context.get("emotional_state")
-                    if emotional_context
-                    else sender.current_emotional_state
-                ),
-                message_energy=(
-                    emotional_context.get("message_energy", "medium")
-                    if emotional_context
-                    else "medium"
-                ),
-                is_soul_revelation=(
-                    emotional_context.get("is_revelation", False)
-                    if emotional_context
-                    else False
-                ),
+                message_text=content.strip(),
+                message_type=message_type,
+                created_at=datetime.utcnow(),
             )
 
+            # The only write on the send path; the inbox pointer and unread
+            # counter are updated by the insert listener in this transaction.
+            # The payload is taken before commit so nothing is reloaded.
             db.add(message)
-
-            # Update connection metrics
-            connection.total_messages_exchanged += 1
-            connection.last_message_at = datetime.utcnow()
-            if not connection.first_message_at:
-                connection.first_message_at = datetime.utcnow()
-
-            # Update user message counter
-            sender.total_messages_sent += 1
-
-            db.commit()
-            db.refresh(message)
+            await db.flush()
+            message_id = message.id
+            sent_at = message.created_at
+            payload = self._realtime_payload(message, sender)
+            await db.commit()
 
             # Send real-time notification to partner
-            delivery_success = await self._deliver_message_realtime(
-                message, partner_id, sender, db
-            )
+            delivery_success = await self._deliver_message_realtime(payload, partner_id)
 
-            # Track analytics
+            # Counters and analytics are buffered and written in batches
+            message_write_behind.record_sent(connection_id, sent_at)
             await analytics_service.track_user_event(
                 user_id=sender_id,
                 event_type=AnalyticsEventType.MESSAGE_SENT,
@@ -172,11 +249,14 @@ class MessageService:
                     "connection_id": connection_id,
                     "partner_id": partner_id,
                     "message_length": len(content),
-                    "emotional_state": message.emotional_state,
-                    "is_revelation": message.is_soul_revelation,
+                    "emotional_state": (
+                        emotional_context.get("emotional_state")
+                        if emotional_context
+                        else None
+                    ),
+                    "is_revelation": message_type == ChatMessageType.REVELATION,
                     "delivered": delivery_success,
                 },
-                db=db,
                 connection_id=connection_id,
             )
 
@@ -184,7 +264,7 @@ class MessageService:
 
             return MessageResult(
                 success=True,
-                message_id=message.id,
+                message_id=message_id,
                 message="Message sent successfully",
                 delivered=delivery_success,
             )
@@ -192,7 +272,7 @@ class MessageService:
         except Exception as e:
             logger.error(f"Error sending message: {str(e)}")
             if db:
-                db.rollback()
+                await db.rollback()
             return MessageResult(
                 success=False,
                 message_id=None,
@@ -207,22 +287,18 @@ class MessageService:
         connection_id: int,
         limit: int = 50,
         offset: int = 0,
-        db: Session = None,
+        db: AsyncSession = None,
+        cursor: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Get messages for a conversation with pagination"""
+        """
+        Get messages for a conversation with keyset pagination: pass the
+        returned pagination.next_cursor as `cursor` to load older messages
+        """
         try:
+            before = decode_message_cursor(cursor) if cursor else None
+
             # Verify user access to connection
-            connection = (
-                db.query(SoulConnection)
-                .filter(
-                    SoulConnection.id == connection_id,
-                    or_(
-                        SoulConnection.user1_id == user_id,
-                        SoulConnection.user2_id == user_id,
-                    ),
-                )
-                .first()
-            )
+            connection = await self._member_connection(db, connection_id, user_id)
 
             if not connection:
                 return {
@@ -230,54 +306,47 @@ class MessageService:
                     "error": "Connection not found or access denied",
                 }
 
-            # Get messages with pagination
-            messages = (
-                db.query(Message)
-                .filter(Message.connection_id == connection_id)
-                .order_by(desc(Message.created_at))
-                .offset(offset)
-                .limit(limit)
-                .all()
+            # Get messages with keyset pagination
+            messages, next_cursor = await load_message_page_async(
+                db, connection_id, limit, before=before, offset=offset
             )
 
             # Reverse to get chronological order (oldest first)
             messages = list(reversed(messages))
 
-            # Mark messages as read
-            unread_messages = [
-                m for m in messages if m.sender_id != user_id and not m.is_read
-            ]
-            for message in unread_messages:
-                message.is_read = True
-                message.read_at = datetime.utcnow()
-
-            if unread_messages:
-                db.commit()
-
             # Get partner info
             partner_id = connection.get_partner_id(user_id)
-            partner = db.query(User).filter(User.id == partner_id).first()
+            partner = await db.get(User, partner_id)
+
+            # Opening the conversation reads everything the partner sent.
+            # The denormalized counter makes this free when nothing is unread,
+            # and older history pages never write
+            mark_read = before is None and connection.get_unread_count(user_id) > 0
 
             # Format messages for frontend
             formatted_messages = []
             for message in messages:
+                is_partner_message = message.sender_id != user_id
                 formatted_messages.append(
                     {
                         "id": message.id,
                         "sender_id": message.sender_id,
-                        "content": message.content,
-                        "emotional_state": message.emotional_state,
-                        "message_energy": message.message_energy,
-                        "is_soul_revelation": message.is_soul_revelation,
-                        "is_read": message.is_read,
-                        "created_at": message.created_at.isoformat(),
-                        "read_at": (
-                            message.read_at.isoformat() if message.read_at else None
+                        "content": message.message_text,
+                        "message_type": message.message_type,
+                        "is_read": bool(
+                            message.is_read or (mark_read and is_partner_message)
                         ),
-                        "is_own_message": message.sender_id == user_id,
+                        "created_at": message.created_at.isoformat(),
+                        "is_own_message": not is_partner_message,
                     }
                 )
 
+            if mark_read:
+                # One bulk UPDATE, committed after formatting so the loaded
+                # messages are not expired and reloaded one by one
+                await mark_conversation_read_async(db, connection_id, user_id)
+                await db.commit()
+
             return {
                 "success": True,
                 "messages": formatted_messages,
@@ -291,12 +360,13 @@ class MessageService:
                         else "Unknown"
                     ),
                     "energy_level": connection.current_energy_level,
-                    "stage": connection.stage,
+                    "stage": connection.connection_stage,
                 },
                 "pagination": {
                     "limit": limit,
                     "offset": offset,
-                    "has_more": len(messages) == limit,
+                    "has_more": next_cursor is not None,
+                    "next_cursor": next_cursor,
                 },
             }
 
@@ -305,51 +375,21 @@ class MessageService:
             return {"success": False, "error": str(e)}
 
     async def get_user_conversations(
-        self, user_id: int, db: Session = None
+        self, user_id: int, db: AsyncSession = None
     ) -> Dict[str, Any]:
         """Get all conversations for a user with summary info"""
         try:
-            # Get all connections for user
-            connections = (
-                db.query(SoulConnection)
-                .filter(
-                    or_(
-                        SoulConnection.user1_id == user_id,
-                        SoulConnection.user2_id == user_id,
-                    ),
-                    SoulConnection.status == "active",
-                )
-                .order_by(desc(SoulConnection.last_message_at))
-                .all()
-            )
-
+            # Partner, last message and unread count for every connection
+            # in one query
             conversations = []
-            for connection in connections:
-                partner_id = connection.get_partner_id(user_id)
-                partner = db.query(User).filter(User.id == partner_id).first()
-
-                # Get last message
-                last_message = (
-                    db.query(Message)
-                    .filter(Message.connection_id == connection.id)
-                    .order_by(desc(Message.created_at))
-                    .first()
-                )
-
-                # Count unread messages
-                unread_count = (
-                    db.query(Message)
-                    .filter(
-                        Message.connection_id == connection.id,
-                        Message.sender_id != user_id,
-                        Message.is_read is False,
-                    )
-                    .count()
-                )
+            for entry in await load_inbox_async(db, user_id):
+                connection = entry.connection
+                partner = entry.partner
+                last_message = entry.last_message
 
                 conversation_summary = ConversationSummary(
                     connection_id=connection.id,
-                    partner_id=partner_id,
+                    partner_id=entry.partner_id,
                     partner_name=(
                         f"{partner.first_name} {partner.last_name}"
                         if partner
@@ -357,10 +397,12 @@ class MessageService:
                     ),
                     total_messages=connection.total_messages_exchanged,
                     last_message_at=connection.last_message_at,
-                    last_message_content=(last_message.content if last_message else ""),
-                    unread_count=unread_count,
+                    last_message_content=(
+                        last_message.message_text if last_message else ""
+                    ),
+                    unread_count=entry.unread_count,
                     emotional_energy=connection.current_energy_level,
-                    conversation_stage=connection.stage,
+                    conversation_stage=connection.connection_stage,
                 )
 
                 conversations.append(
@@ -408,22 +450,12 @@ class MessageService:
         connection_id: int,
         is_typing: bool,
         emotional_state: Optional[str] = None,
-        db: Session = None,
+        db: AsyncSession = None,
     ) -> bool:
         """Update typing status with real-time broadcast"""
         try:
             # Verify connection access
-            connection = (
-                db.query(SoulConnection)
-                .filter(
-                    SoulConnection.id == connection_id,
-                    or_(
-                        SoulConnection.user1_id == user_id,
-                        SoulConnection.user2_id == user_id,
-                    ),
-                )
-                .first()
-            )
+            connection = await self._member_connection(db, connection_id, user_id)
 
             if not connection:
                 return False
@@ -445,31 +477,19 @@ class MessageService:
             return False
 
     async def mark_messages_as_read(
-        self, user_id: int, connection_id: int, db: Session = None
+        self, user_id: int, connection_id: int, db: AsyncSession = None
     ) -> bool:
         """Mark all messages in a connection as read"""
         try:
-            # Update unread messages
-            updated = (
-                db.query(Message)
-                .filter(
-                    Message.connection_id == connection_id,
-                    Message.sender_id != user_id,
-                    Message.is_read is False,
-                )
-                .update({"is_read": True, "read_at": datetime.utcnow()})
-            )
+            # Update unread messages and the inbox counter
+            updated = await mark_conversation_read_async(db, connection_id, user_id)
 
-            db.commit()
+            await db.commit()
 
             if updated > 0:
                 # Notify sender that messages were read
-                partner_id = (
-                    db.query(SoulConnection)
-                    .filter(SoulConnection.id == connection_id)
-                    .first()
-                    .get_partner_id(user_id)
-                )
+                connection = await db.get(SoulConnection, connection_id)
+                partner_id = connection.get_partner_id(user_id)
 
                 await realtime_manager.send_to_user(
                     user_id=partner_id,
@@ -489,64 +509,51 @@ class MessageService:
 
     # Helper methods
 
-    async def _check_rate_limit(
-        self, user_id: int, connection_id: int, db: Session
-    ) -> Dict[str, Any]:
-        """Check if user is within rate limits"""
-        try:
-            # Check messages sent in last minute
-            cutoff = datetime.utcnow() - timedelta(minutes=1)
-            recent_messages = (
-                db.query(Message)
-                .filter(
-                    Message.sender_id == user_id,
-                    Message.connection_id == connection_id,
-                    Message.created_at >= cutoff,
-                )
-                .count()
+    async def _member_connection(
+        self, db: AsyncSession, connection_id: int, user_id: int
+    ) -> Optional[SoulConnection]:
+        """The connection, if `user_id` is one of its two members"""
+        result = await db.execute(
+            select(SoulConnection).where(
+                SoulConnection.id == connection_id,
+                or_(
+                    SoulConnection.user1_id == user_id,
+                    SoulConnection.user2_id == user_id,
+                ),
             )
+        )
+        return result.scalars().first()
 
-            if recent_messages >= self.rate_limit_messages_per_minute:
-                return {
-                    "allowed": False,
-                    "message": "Rate limit exceeded. Please wait before sending more messages.",
-                }
-
-            return {"allowed": True}
-
-        except Exception as e:
-            logger.error(f"Error checking rate limit: {str(e)}")
-            return {"allowed": True}  # Allow on error to avoid blocking users
+    def _realtime_payload(
+        self, message: Message, sender: Optional[User]
+    ) -> Dict[str, Any]:
+        return {
+            "id": message.id,
+            "connection_id": message.connection_id,
+            "sender": {
+                "id": message.sender_id,
+                "name": f"{sender.first_name} {sender.last_name}" if sender else None,
+            },
+            "content": message.message_text,
+            "message_type": message.message_type,
+            "created_at": message.created_at.isoformat(),
+        }
 
     async def _deliver_message_realtime(
-        self, message: Message, recipient_id: int, sender: User, db: Session
+        self, message_data: Dict[str, Any], recipient_id: int
     ) -> bool:
         """Deliver message via real-time WebSocket"""
         try:
-            message_data = {
-                "id": message.id,
-                "connection_id": message.connection_id,
-                "sender": {
-                    "id": sender.id,
-                    "name": f"{sender.first_name} {sender.last_name}",
-                    "emotional_state": message.emotional_state,
-                },
-                "content": message.content,
-                "emotional_state": message.emotional_state,
-                "message_energy": message.message_energy,
-                "is_soul_revelation": message.is_soul_revelation,
-                "created_at": message.created_at.isoformat(),
-            }
-
-            # Send via WebSocket
-            success = await realtime_manager.send_to_user(
-                user_id=recipient_id,
-                message_type=MessageType.NEW_MESSAGE,
-                data=message_data,
+            return await realtime_manager.send_to_user(
+                recipient_id,
+                RealtimeMessage(
+                    type=MessageType.NEW_MESSAGE,
+                    data=message_data,
+                    target_user_id=recipient_id,
+                    connection_id=message_data["connection_id"],
+                ),
             )
 
-            return success
-
         except Exception as e:
             logger.error(f"Error delivering message via WebSocket: {str(e)}")
             return False
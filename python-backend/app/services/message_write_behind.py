@@ -0,0 +1,120 @@
+"""
+Message Write-Behind
+Keeps per-message bookkeeping off the send path. Sending a message only
+inserts it; the connection's message counters are buffered here and written
+by one executemany per flush (see app.services.write_behind). The sender's
+counter and the MESSAGE_SENT event go through the analytics event buffer.
+
+The messages themselves, and the inbox pointer and unread counters
+maintained on insert, are always written synchronously.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+from app.models.soul_connection import SoulConnection
+from app.services.write_behind import WriteBehindBuffer
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import Session
+
+
+class SlidingWindowRateLimiter:
+    """
+    Per-key sliding-window limit kept in process memory, so the check costs
+    no database round-trip. With several workers each enforces the limit on
+    the requests it serves.
+    """
+
+    def __init__(self, limit: int, window_seconds: float = 60.0):
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+        self._lock = threading.Lock()
+        self._hits: Dict[Hashable, Deque[float]] = {}
+        self._last_sweep = time.monotonic()
+
+    def allow(self, key: Hashable) -> bool:
+        """Record a hit for `key` unless it is already at the limit"""
+        now = time.monotonic()
+        cutoff = now - self.window_seconds
+
+        with self._lock:
+            if now - self._last_sweep > self.window_seconds:
+                self._sweep(cutoff)
+                self._last_sweep = now
+
+            hits = self._hits.setdefault(key, deque())
+            while hits and hits[0] <= cutoff:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False
+            hits.append(now)
+            return True
+
+    def _sweep(self, cutoff: float) -> None:
+        # Forget keys that have been idle for a whole window
+        for key in [k for k, hits in self._hits.items() if hits[-1] <= cutoff]:
+            del self._hits[key]
+
+
+ConnectionCounts = Dict[int, Tuple[int, datetime]]
+
+
+class MessageWriteBehind(WriteBehindBuffer):
+    """Buffers per-connection message counters and flushes them in batches"""
+
+    name = "Message write-behind"
+
+    def __init__(self, flush_interval_seconds: float = 1.0, max_pending: int = 500):
+        super().__init__(flush_interval_seconds, max_pending)
+        # connection_id -> (messages sent, earliest sent_at)
+        self._counts: ConnectionCounts = {}
+        self._pending = 0
+
+    def pending(self) -> int:
+        return self._pending
+
+    def record_sent(self, connection_id: int, sent_at: datetime) -> None:
+        """Buffer the counters for one message sent in `connection_id`"""
+        with self._lock:
+            count, first = self._counts.get(connection_id, (0, sent_at))
+            self._counts[connection_id] = (count + 1, min(first, sent_at))
+            self._pending += 1
+            pending = self._pending
+
+        self._notify_pending(pending)
+
+    def _take(self) -> Optional[ConnectionCounts]:
+        if not self._counts:
+            return None
+        counts, self._counts, self._pending = self._counts, {}, 0
+        return counts
+
+    def _write(self, db: Session, counts: ConnectionCounts) -> int:
+        connections = SoulConnection.__table__
+        db.execute(
+            connections.update()
+            .where(connections.c.id == bindparam("b_id"))
+            .values(
+                total_messages_exchanged=func.coalesce(
+                    connections.c.total_messages_exchanged, 0
+                )
+                + bindparam("b_count"),
+                first_message_at=func.coalesce(
+                    connections.c.first_message_at, bindparam("b_first")
+                ),
+            ),
+            [
+                {"b_id": connection_id, "b_count": count, "b_first": first}
+                for connection_id, (count, first) in counts.items()
+            ],
+        )
+        db.commit()
+        return sum(count for count, _ in counts.values())
+
+
+# Global instance
+message_write_behind = MessageWriteBehind()
@@ -0,0 +1,137 @@
+"""
+Pair Score Cache
+Bounded in-process LRU/TTL cache of pairwise compatibility results, keyed
+symmetrically on (scorer, min_user_id, max_user_id, algorithm version).
+
+Entries carry a per-user stamp (a fingerprint of the inputs each scorer reads)
+so results written before another worker's profile update are never served;
+explicit invalidation on profile changes frees the memory promptly.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from app.observability import metrics as obs
+
+logger = logging.getLogger(__name__)
+
+PairKey = Tuple[str, int, int, Hashable]
+
+
+def field_fingerprint(obj: Any, fields: Iterable[str]) -> str:
+    """Stable hash of the given attributes of `obj`"""
+    source = {field: getattr(obj, field, None) for field in fields}
+    payload = json.dumps(source, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PairScoreCache:
+    """Symmetric pair-score cache with LRU eviction and a TTL"""
+
+    def __init__(self, max_entries: int = 100_000, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, (stamp_low, stamp_high), value)
+        self._entries: "OrderedDict[PairKey, Tuple[float, Tuple, Any]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[PairKey]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(
+        scorer: str, user1_id: int, user2_id: int, version: Hashable
+    ) -> Tuple[PairKey, bool]:
+        if user1_id <= user2_id:
+            return (scorer, user1_id, user2_id, version), False
+        return (scorer, user2_id, user1_id, version), True
+
+    def get(
+        self,
+        scorer: str,
+        user1_id: int,
+        user2_id: int,
+        version: Hashable,
+        stamps: Tuple[Any, Any] = (None, None),
+    ) -> Optional[Any]:
+        """
+        Cached result for the pair, or None on a miss. `stamps` are the
+        current (user1, user2) input fingerprints; a mismatch is a miss.
+        A copy is returned so callers may mutate it freely.
+        """
+        key, swapped = self._key(scorer, user1_id, user2_id, version)
+        if swapped:
+            stamps = (stamps[1], stamps[0])
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_stamps, value = entry
+                if expires_at > time.monotonic() and entry_stamps == tuple(stamps):
+                    self._entries.move_to_end(key)
+                    obs.pair_score_cache_requests_total.labels(scorer, "hit").inc()
+                    return copy.deepcopy(value)
+                self._discard(key)
+
+        obs.pair_score_cache_requests_total.labels(scorer, "miss").inc()
+        return None
+
+    def set(
+        self,
+        scorer: str,
+        user1_id: int,
+        user2_id: int,
+        version: Hashable,
+        value: Any,
+        stamps: Tuple[Any, Any] = (None, None),
+    ) -> None:
+        key, swapped = self._key(scorer, user1_id, user2_id, version)
+        if swapped:
+            stamps = (stamps[1], stamps[0])
+
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.ttl_seconds,
+                tuple(stamps),
+                copy.deepcopy(value),
+            )
+            self._entries.move_to_end(key)
+            self._keys_by_user[key[1]].add(key)
+            self._keys_by_user[key[2]].add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached pair involving a user (e.g. after a profile edit)"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _discard(self, key: PairKey) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        for user_id in (key[1], key[2]):
+            keys = self._keys_by_user.get(user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[user_id]
+
+
+# Global pair score cache instance (one per worker process)
+pair_score_cache = PairScoreCache()
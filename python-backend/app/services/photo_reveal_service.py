@@ -10,7 +10,7 @@ import logging
 import secrets
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from app.models.daily_revelation import DailyRevelation
 from app.models.photo_reveal import (
@@ -28,6 +28,7 @@ from app.models.soul_analytics import AnalyticsEventType
 from app.models.soul_connection import SoulConnection
 from app.services.analytics_service import analytics_service
 from fastapi import UploadFile
+from sqlalchemy import func, insert, or_
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
@@ -85,6 +86,7 @@ class PhotoRevealService:
         self.max_file_size = 10 * 1024 * 1024  # 10MB
         self.consent_request_expiry_hours = 48
         self.photo_storage_path = "/secure/photos"  # Encrypted storage
+        self.auto_reveal_chunk_size = 200  # Timelines per sweep transaction
 
         logger.info("Photo Reveal Service initialized")
 
@@ -660,55 +662,27 @@ class PhotoRevealService:
             return {"success": False, "error": str(e)}
 
     async def process_automatic_reveals(self, db: Session) -> Dict[str, int]:
-        """Process automatic photo reveals for eligible timelines"""
-        try:
-            # Get timelines eligible for automatic reveal
-            eligible_timelines = (
-                db.query(PhotoRevealTimeline)
-                .filter(
-                    PhotoRevealTimeline.auto_reveal_enabled,
-                    PhotoRevealTimeline.photos_revealed is False,
-                    PhotoRevealTimeline.current_stage != PhotoRevealStage.DECLINED,
-                )
-                .all()
-            )
-
-            processed = 0
-            revealed = 0
-
-            for timeline in eligible_timelines:
-                processed += 1
-
-                # Check if eligible for reveal
-                if timeline.is_reveal_eligible():
-                    # Check if both users have photos
-                    connection = timeline.connection
-                    user1_photo = (
-                        db.query(UserPhoto)
-                        .filter(
-                            UserPhoto.user_id == connection.user1_id,
-                            UserPhoto.is_profile_primary,
-                        )
-                        .first()
-                    )
-
-                    user2_photo = (
-                        db.query(UserPhoto)
-                        .filter(
-                            UserPhoto.user_id == connection.user2_id,
-                            UserPhoto.is_profile_primary,
-                        )
-                        .first()
-                    )
+        """
+        Reveal photos for every timeline whose cycle is complete, in chunks of
+        `auto_reveal_chunk_size`. Each chunk is locked, revealed and committed
+        as one transaction; rows locked by a concurrent sweep are skipped, so
+        several workers can run this at once.
+        """
+        processed = 0
+        revealed = 0
+        last_id = 0
 
-                    if user1_photo and user2_photo:
-                        # Automatically grant mutual consent
-                        await self._execute_automatic_reveal(timeline, db)
-                        revealed += 1
-
-                        logger.info(
-                            f"Automatic photo reveal executed for connection {timeline.connection_id}"
-                        )
+        try:
+            while True:
+                candidates = self._lock_reveal_candidates(db, last_id)
+                if not candidates:
+                    break
+
+                last_id = candidates[-1].id
+                processed += len(candidates)
+                revealed += self._reveal_chunk(db, candidates)
+                # Releases the chunk's row locks
+                db.commit()
 
             logger.info(
                 f"Processed {processed} timelines, {revealed} automatic reveals executed"
@@ -722,13 +696,125 @@ class PhotoRevealService:
 
         except Exception as e:
             logger.error(f"Error processing automatic reveals: {str(e)}")
+            db.rollback()
             return {
-                "processed": 0,
-                "revealed": 0,
+                "processed": processed,
+                "revealed": revealed,
                 "success": False,
                 "error": str(e),
             }
 
+    def _lock_reveal_candidates(self, db: Session, after_id: int) -> List[Any]:
+        """Lock the next chunk of timelines that are due for automatic reveal"""
+        timeline = PhotoRevealTimeline
+        reveal_at = func.coalesce(
+            timeline.photo_reveal_eligible_at,
+            timeline.connection_started_at
+            + func.make_interval(0, 0, 0, timeline.revelation_cycle_days),
+        )
+        return (
+            db.query(
+                timeline.id,
+                timeline.connection_id,
+                SoulConnection.user1_id,
+                SoulConnection.user2_id,
+            )
+            .join(SoulConnection, SoulConnection.id == timeline.connection_id)
+            .filter(
+                timeline.id > after_id,
+                timeline.auto_reveal_enabled.is_(True),
+                or_(
+                    timeline.photos_revealed.is_(False),
+                    timeline.photos_revealed.is_(None),
+                ),
+                timeline.current_stage != PhotoRevealStage.DECLINED,
+                timeline.revelations_completed >= timeline.min_revelations_required,
+                # Same rule as PhotoRevealTimeline.is_reveal_eligible, which
+                # counts whole days left: less than a day to go is due
+                reveal_at < datetime.utcnow() + timedelta(days=1),
+            )
+            .order_by(timeline.id)
+            .limit(self.auto_reveal_chunk_size)
+            .with_for_update(skip_locked=True, of=timeline)
+            .all()
+        )
+
+    def _reveal_chunk(self, db: Session, candidates: List[Any]) -> int:
+        """Reveal the locked timelines whose users both have a primary photo"""
+        user_ids = {c.user1_id for c in candidates} | {c.user2_id for c in candidates}
+        primary_photos: Dict[int, int] = {}
+        for user_id, photo_id in (
+            db.query(UserPhoto.user_id, UserPhoto.id)
+            .filter(UserPhoto.user_id.in_(user_ids), UserPhoto.is_profile_primary)
+            .order_by(UserPhoto.id)
+        ):
+            primary_photos.setdefault(user_id, photo_id)
+
+        ready = [
+            c
+            for c in candidates
+            if c.user1_id in primary_photos and c.user2_id in primary_photos
+        ]
+        if not ready:
+            return 0
+
+        now = datetime.utcnow()
+        db.query(PhotoRevealTimeline).filter(
+            PhotoRevealTimeline.id.in_([c.id for c in ready])
+        ).update(
+            {
+                "user1_consent_status": "granted",
+                "user2_consent_status": "granted",
+                "mutual_consent_achieved": True,
+                "consent_achieved_at": now,
+                "reveal_method": PhotoConsentType.TIMELINE_BASED,
+                "photos_revealed": True,
+                "photo_reveal_completed_at": now,
+                "current_stage": PhotoRevealStage.REVEALED,
+            },
+            synchronize_session=False,
+        )
+
+        permissions = []
+        events = []
+        for c in ready:
+            for owner_id, viewer_id in (
+                (c.user1_id, c.user2_id),
+                (c.user2_id, c.user1_id),
+            ):
+                permissions.append(
+                    {
+                        "photo_id": primary_photos[owner_id],
+                        "connection_id": c.connection_id,
+                        "viewer_id": viewer_id,
+                        "photo_owner_id": owner_id,
+                        "privacy_level": PhotoPrivacyLevel.FULLY_REVEALED,
+                        "grant_method": PhotoConsentType.MUTUAL_AGREEMENT,
+                    }
+                )
+            events.append(
+                {
+                    "timeline_id": c.id,
+                    "connection_id": c.connection_id,
+                    "event_type": "photos_revealed",
+                    "event_data": {
+                        "reveal_method": "mutual_consent",
+                        "user1_id": c.user1_id,
+                        "user2_id": c.user2_id,
+                    },
+                    "event_description": "Photos mutually revealed",
+                    "system_generated": True,
+                }
+            )
+        db.execute(insert(PhotoRevealPermission), permissions)
+        db.execute(insert(PhotoRevealEvent), events)
+
+        logger.info(
+            "Automatic photo reveal executed for connections "
+            f"{[c.connection_id for c in ready]}"
+        )
+        return len(ready)
+
     # Helper methods
 
     def _validate_photo_file(self, photo_file: UploadFile) -> Dict[str, Any]:
@@ -0,0 +1,217 @@
+"""
+Pipeline Sinks
+Where DataPipelineService writes processed events. Each stream maps to a
+ClickHouse table (analytics/clickhouse/init.sql); a batch is converted to
+columns once and inserted with a single columnar INSERT.
+
+ClickHouseSink is used in deployments; InMemorySink keeps the columnar
+batches in process for tests and local runs.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Value used when an event doesn't carry the column; "datetime" columns fall
+# back to the batch time and "map" columns to an empty map
+KIND_DEFAULTS: Dict[str, Any] = {
+    "int": 0,
+    "float": 0.0,
+    "str": "",
+    "bool": False,
+    "nullable": None,
+}
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """Insertable columns of a table; generated columns are left out"""
+
+    table: str
+    # (column, kind, path into the processed event; defaults to (column,))
+    columns: Tuple[Tuple[str, str, Optional[Tuple[str, ...]]], ...]
+
+    @property
+    def column_names(self) -> List[str]:
+        return [name for name, _, _ in self.columns]
+
+    def to_columns(self, events: Sequence[Dict[str, Any]]) -> List[List[Any]]:
+        """Transpose processed events into one list of values per column"""
+        now = datetime.utcnow()
+        return [
+            [_coerce(_lookup(event, path or (name,)), kind, now) for event in events]
+            for name, kind, path in self.columns
+        ]
+
+
+def _lookup(event: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    value: Any = event
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _coerce(value: Any, kind: str, now: datetime) -> Any:
+    if value is None:
+        if kind == "datetime":
+            return now
+        if kind == "map":
+            return {}
+        return KIND_DEFAULTS[kind]
+    if kind == "datetime" and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "str":
+        return str(value)
+    if kind == "bool":
+        return bool(value)
+    if kind == "map":
+        return {str(k): str(v) for k, v in value.items()}
+    return value
+
+
+def _schema(table: str, *columns) -> TableSchema:
+    return TableSchema(
+        table,
+        tuple(
+            (column[0], column[1], column[2] if len(column) > 2 else None)
+            for column in columns
+        ),
+    )
+
+
+# Stream type value -> target table
+STREAM_TABLES: Dict[str, TableSchema] = {
+    "user_events": _schema(
+        "user_events",
+        ("user_id", "int"),
+        ("session_id", "str"),
+        ("event_type", "str"),
+        ("event_category", "str"),
+        ("page_url", "str"),
+        ("referrer", "str"),
+        ("user_agent", "str"),
+        ("country", "str"),
+        ("city", "str"),
+        ("device_type", "str", ("device_insights", "device_type")),
+        ("browser", "str", ("device_insights", "browser")),
+        ("os", "str", ("device_insights", "os")),
+        ("properties", "map"),
+        ("timestamp", "datetime"),
+    ),
+    "profile_interactions": _schema(
+        "profile_interactions",
+        ("viewer_user_id", "int"),
+        ("viewed_user_id", "int"),
+        ("interaction_type", "str"),
+        ("from_recommendation", "bool"),
+        ("compatibility_score", "float"),
+        ("interaction_duration", "int"),
+        ("timestamp", "datetime"),
+    ),
+    "matching_events": _schema(
+        "matching_events",
+        ("user1_id", "int"),
+        ("user2_id", "int"),
+        ("match_type", "str"),
+        ("compatibility_score", "float"),
+        ("algorithm_version", "str"),
+        ("conversation_started", "bool"),
+        ("first_message_time", "nullable"),
+        ("conversation_length", "int"),
+        ("date_planned", "bool"),
+        ("date_completed", "bool"),
+        ("match_dissolved", "bool"),
+        ("dissolution_reason", "str"),
+        ("timestamp", "datetime"),
+    ),
+    "message_events": _schema(
+        "message_events",
+        ("sender_id", "int"),
+        ("recipient_id", "int"),
+        ("match_id", "int"),
+        ("message_length", "int"),
+        ("message_type", "str"),
+        ("is_first_message", "bool"),
+        ("response_time_seconds", "int"),
+        ("read_time", "nullable"),
+        ("flagged_inappropriate", "bool"),
+        ("timestamp", "datetime"),
+    ),
+    "revelation_events": _schema(
+        "revelation_events",
+        ("user_id", "int"),
+        ("match_id", "int"),
+        ("revelation_day", "int"),
+        ("revelation_type", "str"),
+        ("content_length", "int"),
+        ("response_received", "bool"),
+        ("response_time_hours", "nullable"),
+        ("rating", "nullable"),
+        ("timestamp", "datetime"),
+    ),
+    "business_events": _schema(
+        "revenue_events",
+        ("user_id", "int"),
+        ("event_type", "str"),
+        ("product_type", "str"),
+        ("amount_cents", "int"),
+        ("currency", "str"),
+        ("payment_method", "str"),
+        ("subscription_length_days", "nullable"),
+        ("is_trial", "bool"),
+        ("is_renewal", "bool"),
+        ("timestamp", "datetime"),
+    ),
+}
+
+
+class PipelineSink(ABC):
+    """Destination for processed pipeline batches"""
+
+    @abstractmethod
+    def write(self, schema: TableSchema, columns: List[List[Any]]) -> None:
+        """Insert one columnar batch (one value list per schema column)"""
+
+
+class ClickHouseSink(PipelineSink):
+    """Columnar INSERT through clickhouse_driver"""
+
+    def __init__(self, client):
+        self.client = client
+        # clickhouse_driver clients are not safe for concurrent queries
+        self._lock = threading.Lock()
+
+    def write(self, schema: TableSchema, columns: List[List[Any]]) -> None:
+        column_list = ", ".join(schema.column_names)
+        query = f"INSERT INTO {schema.table} ({column_list}) VALUES"
+        with self._lock:
+            self.client.execute(query, columns, columnar=True)
+
+
+class InMemorySink(PipelineSink):
+    """Keeps written batches in process; for tests and local runs"""
+
+    def __init__(self):
+        self.batches: List[Tuple[str, Dict[str, List[Any]]]] = []
+
+    def write(self, schema: TableSchema, columns: List[List[Any]]) -> None:
+        self.batches.append((schema.table, dict(zip(schema.column_names, columns))))
+
+    def rows(self, table: str) -> List[Dict[str, Any]]:
+        """Written rows of a table, transposed back into dicts"""
+        rows = []
+        for batch_table, columns in self.batches:
+            if batch_table == table:
+                names = list(columns)
+                rows.extend(
+                    dict(zip(names, values)) for values in zip(*columns.values())
+                )
+        return rows
@@ -0,0 +1,521 @@
+"""
+Profile Embedding ANN Index
+In-process approximate nearest-neighbour index (IVF over NumPy arrays) on a
+weighted concatenation of UserProfile personality, interests, values and
+communication vectors, so AI recommendations start from the nearest profiles
+instead of an arbitrary slice of the user_profiles table.
+
+Each process builds (or restores) its index in the background (see `start`)
+and keeps it in sync and trained there; requests only ever search it.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from app.core import database
+from app.models.ai_models import UserProfile
+from app.models.user import User
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# (column, dimensions, weight) - weights mirror AIMatchingService's overall
+# compatibility weights, so the inner product of two embeddings equals the
+# weighted sum of per-component cosine similarities
+EMBEDDING_COMPONENTS = (
+    ("personality_vector", 128, 0.25),
+    ("interests_vector", 64, 0.20),
+    ("values_vector", 64, 0.25),
+    ("communication_vector", 32, 0.15),
+)
+
+EMBEDDING_DIM = sum(dims for _, dims, _ in EMBEDDING_COMPONENTS)
+
+# Snapshots live in a directory owned by this service (created 0700 under the
+# app's data dir, never a shared temp dir another user could pre-create or
+# swap). PROFILE_ANN_SNAPSHOT_PATH moves them; an empty value disables them.
+SNAPSHOT_PATH = (
+    os.getenv(
+        "PROFILE_ANN_SNAPSHOT_PATH", os.path.join("data", "profile_ann", "profiles.npz")
+    )
+    or None
+)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def profile_embedding(profile: UserProfile) -> np.ndarray:
+    """
+    Weighted concatenation of a profile's vectors. Each component is L2
+    normalized and scaled by sqrt(weight); missing or mis-sized components
+    stay zero, matching the neutral score the pairwise path gives them.
+    """
+    embedding = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    offset = 0
+    for column, dims, weight in EMBEDDING_COMPONENTS:
+        vector = getattr(profile, column, None)
+        if vector and len(vector) == dims:
+            component = np.asarray(vector, dtype=np.float32)
+            norm = float(np.linalg.norm(component))
+            if norm > 0:
+                embedding[offset : offset + dims] = component * (
+                    math.sqrt(weight) / norm
+                )
+        offset += dims
+    return embedding
+
+
+class ProfileAnnIndex:
+    """IVF index of profile embeddings, exact below `exact_search_limit`"""
+
+    def __init__(
+        self,
+        snapshot_path: Optional[str] = SNAPSHOT_PATH,
+        sync_interval_seconds: float = 30.0,
+        snapshot_interval_seconds: float = 300.0,
+        reconcile_interval_seconds: float = 600.0,
+        exact_search_limit: int = 5000,
+        nprobe: int = 8,
+        build_chunk_size: int = 1000,
+    ):
+        self.snapshot_path = snapshot_path
+        self.sync_interval_seconds = sync_interval_seconds
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+        self.exact_search_limit = exact_search_limit
+        self.nprobe = nprobe
+        self.build_chunk_size = build_chunk_size
+
+        self._lock = threading.RLock()
+        # Held for a whole build so concurrent callers do not build twice
+        self._build_lock = threading.Lock()
+        self._vectors = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._confidence = np.zeros(0, dtype=np.float32)
+        self._user_ids = np.zeros(0, dtype=np.int64)
+        self._live = np.zeros(0, dtype=bool)
+        self._rows: Dict[int, int] = {}
+        self._free_rows: List[int] = []
+
+        # IVF state: centroids plus one row set per inverted list
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[Set[int]] = []
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+
+        self._built = False
+        self._synced_at: Optional[datetime] = None
+        self._last_sync_check = 0.0
+        self._last_snapshot = 0.0
+        self._last_reconcile = 0.0
+        self._dirty = False
+
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def ready(self) -> bool:
+        """Whether the initial build or snapshot restore has completed"""
+        return self._built
+
+    # ---- Maintenance -----------------------------------------------------
+
+    def upsert_profile(self, profile: UserProfile) -> None:
+        """Insert or update a profile's embedding in place"""
+        self.upsert(
+            profile.user_id,
+            profile_embedding(profile),
+            profile.ai_confidence_level or 0.0,
+        )
+
+    def upsert(self, user_id: int, embedding: np.ndarray, confidence: float) -> None:
+        """
+        Cheap enough for the request path: new rows join their nearest
+        existing list and retraining is left to background maintenance.
+        """
+        with self._lock:
+            row = self._rows.get(user_id)
+            if row is None:
+                row = self._allocate_row()
+                self._rows[user_id] = row
+            elif self._centroids is not None:
+                self._lists[self._assignments[row]].discard(row)
+
+            self._vectors[row] = embedding
+            self._confidence[row] = confidence
+            self._user_ids[row] = user_id
+            self._live[row] = True
+
+            if self._centroids is not None:
+                self._assign([row])
+            self._dirty = True
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            row = self._rows.pop(user_id, None)
+            if row is None:
+                return
+            if self._centroids is not None:
+                self._lists[self._assignments[row]].discard(row)
+            self._live[row] = False
+            self._free_rows.append(row)
+            self._dirty = True
+
+    def _allocate_row(self) -> int:
+        if self._free_rows:
+            return self._free_rows.pop()
+
+        row = len(self._rows)
+        capacity = len(self._vectors)
+        if row >= capacity:
+            new_capacity = max(64, capacity * 2)
+            self._vectors = np.resize(self._vectors, (new_capacity, EMBEDDING_DIM))
+            self._confidence = np.resize(self._confidence, new_capacity)
+            self._user_ids = np.resize(self._user_ids, new_capacity)
+            self._assignments = np.resize(self._assignments, new_capacity)
+            live = np.zeros(new_capacity, dtype=bool)
+            live[:capacity] = self._live
+            self._live = live
+        return row
+
+    @property
+    def retrain_due(self) -> bool:
+        """Past the exact-search limit untrained, or doubled since training"""
+        if self._centroids is None:
+            return len(self._rows) > self.exact_search_limit
+        return len(self._rows) > 2 * self._trained_size
+
+    def retrain(self, iterations: int = 10) -> None:
+        """
+        Spherical k-means over live rows to (re)build the inverted lists.
+        Clustering runs on a copy, so searches are only blocked while the
+        new lists are installed.
+        """
+        with self._lock:
+            data = self._vectors[np.flatnonzero(self._live)]
+        if not len(data):
+            return
+        centroids = self._kmeans(data, iterations)
+
+        with self._lock:
+            self._centroids = centroids
+            self._lists = [set() for _ in range(len(centroids))]
+            rows = np.flatnonzero(self._live)
+            self._trained_size = len(rows)
+            if len(rows):
+                self._assign(rows)
+        logger.info(
+            f"Profile ANN index trained: {len(data)} profiles, {len(centroids)} lists"
+        )
+
+    @staticmethod
+    def _kmeans(data: np.ndarray, iterations: int) -> np.ndarray:
+        nlist = max(1, int(math.sqrt(len(data))))
+        rng = np.random.default_rng(len(data))
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(data @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = data[labels == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm > 0:
+                        centroids[cluster] = centroid / norm
+        return centroids
+
+    def _assign(self, rows: Iterable[int]) -> None:
+        rows = np.asarray(list(rows), dtype=np.int64)
+        labels = np.argmax(self._vectors[rows] @ self._centroids.T, axis=1)
+        self._assignments[rows] = labels
+        for row, label in zip(rows.tolist(), labels.tolist()):
+            self._lists[label].add(row)
+
+    # ---- Persistence -----------------------------------------------------
+
+    def save_snapshot(self) -> None:
+        """Atomically write live embeddings so a restart skips the full build"""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            rows = np.flatnonzero(self._live)
+            synced_at = (self._synced_at or datetime.utcnow()).isoformat()
+            user_ids = self._user_ids[rows]
+            vectors = self._vectors[rows]
+            confidence = self._confidence[rows]
+            self._dirty = False
+            self._last_snapshot = time.monotonic()
+
+        try:
+            directory = self._snapshot_directory()
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npz")
+            with os.fdopen(fd, "wb") as handle:
+                np.savez(
+                    handle,
+                    format_version=SNAPSHOT_FORMAT_VERSION,
+                    dim=EMBEDDING_DIM,
+                    synced_at=synced_at,
+                    user_ids=user_ids,
+                    vectors=vectors,
+                    confidence=confidence,
+                )
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Could not write profile ANN snapshot: {str(e)}")
+
+    def load_snapshot(self) -> bool:
+        """Restore from the snapshot file; returns False if unusable"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            self._snapshot_directory()
+            with np.load(self.snapshot_path) as snapshot:
+                if (
+                    int(snapshot["format_version"]) != SNAPSHOT_FORMAT_VERSION
+                    or int(snapshot["dim"]) != EMBEDDING_DIM
+                ):
+                    return False
+                synced_at = datetime.fromisoformat(str(snapshot["synced_at"]))
+                user_ids = snapshot["user_ids"]
+                vectors = snapshot["vectors"]
+                confidence = snapshot["confidence"]
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Could not read profile ANN snapshot: {str(e)}")
+            return False
+
+        fresh = self._empty_copy()
+        for user_id, vector, conf in zip(user_ids.tolist(), vectors, confidence):
+            fresh.upsert(user_id, vector, float(conf))
+        if fresh.retrain_due:
+            fresh.retrain()
+        fresh._synced_at = synced_at
+        self._swap_in(fresh)
+        self._dirty = False
+        logger.info(f"Profile ANN index restored {len(user_ids)} profiles")
+        return True
+
+    def _snapshot_directory(self) -> str:
+        """Create the snapshot directory 0700; refuse one others can write to"""
+        directory = os.path.dirname(self.snapshot_path) or "."
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.stat(directory)
+        if info.st_uid != os.getuid() or info.st_mode & 0o022:
+            raise OSError(f"snapshot directory {directory} is not private")
+        return directory
+
+    def _empty_copy(self) -> "ProfileAnnIndex":
+        """An empty index with the same tuning, to assemble a rebuild on"""
+        return ProfileAnnIndex(
+            snapshot_path=None,
+            exact_search_limit=self.exact_search_limit,
+            nprobe=self.nprobe,
+        )
+
+    def _swap_in(self, fresh: "ProfileAnnIndex") -> None:
+        with self._lock:
+            self._vectors = fresh._vectors
+            self._confidence = fresh._confidence
+            self._user_ids = fresh._user_ids
+            self._live = fresh._live
+            self._rows = fresh._rows
+            self._free_rows = fresh._free_rows
+            self._centroids = fresh._centroids
+            self._lists = fresh._lists
+            self._assignments = fresh._assignments
+            self._trained_size = fresh._trained_size
+            self._synced_at = fresh._synced_at
+
+    # ---- Database sync ---------------------------------------------------
+
+    def ensure_fresh(self, db: Session) -> None:
+        """
+        Load the snapshot or build if never built, then catch up, reconcile,
+        retrain and snapshot on their intervals. For background callers
+        only: a build scans user_profiles.
+        """
+        if not self._built:
+            with self._build_lock:
+                if not self._built:
+                    if self.load_snapshot():
+                        self.sync(db)
+                        self.reconcile(db)
+                    else:
+                        self.build(db)
+                    self._last_sync_check = time.monotonic()
+                    self._last_reconcile = self._last_sync_check
+                    self._built = True
+            return
+
+        now = time.monotonic()
+        if now - self._last_sync_check >= self.sync_interval_seconds:
+            self._last_sync_check = now
+            self.sync(db)
+        if now - self._last_reconcile >= self.reconcile_interval_seconds:
+            self._last_reconcile = now
+            self.reconcile(db)
+        if self.retrain_due:
+            self.retrain()
+        if self._dirty and now - self._last_snapshot >= self.snapshot_interval_seconds:
+            self.save_snapshot()
+
+    def build(self, db: Session) -> None:
+        """
+        Full rebuild from user_profiles in id-ordered chunks. The new index
+        is assembled (and trained) on the side and swapped in, so searches
+        are only blocked for the swap.
+        """
+        started = datetime.utcnow()
+        fresh = self._empty_copy()
+        last_id = 0
+        while True:
+            profiles = (
+                db.query(UserProfile)
+                .join(User, User.id == UserProfile.user_id)
+                .filter(UserProfile.id > last_id, User.is_active.is_(True))
+                .order_by(UserProfile.id)
+                .limit(self.build_chunk_size)
+                .all()
+            )
+            if not profiles:
+                break
+            for profile in profiles:
+                fresh.upsert_profile(profile)
+            last_id = profiles[-1].id
+        if fresh.retrain_due:
+            fresh.retrain()
+        fresh._synced_at = started
+        self._swap_in(fresh)
+
+        logger.info(f"Profile ANN index built: {len(self)} profiles")
+        self.save_snapshot()
+
+    def sync(self, db: Session) -> None:
+        """
+        Apply profile and account writes made since the last sync (by any
+        worker): changed profiles are upserted, deactivated users removed.
+        """
+        started = datetime.utcnow()
+        # Overlap so rows committed just after the previous read are not
+        # missed; upserts and removals are idempotent
+        since = (self._synced_at or datetime.min + SYNC_OVERLAP) - SYNC_OVERLAP
+        rows = (
+            db.query(UserProfile, User.is_active)
+            .join(User, User.id == UserProfile.user_id)
+            .filter(or_(UserProfile.updated_at > since, User.updated_at > since))
+            .all()
+        )
+        with self._lock:
+            for profile, is_active in rows:
+                if is_active:
+                    self.upsert_profile(profile)
+                else:
+                    self.remove(profile.user_id)
+            self._synced_at = started
+
+    def reconcile(self, db: Session) -> None:
+        """
+        Drop indexed users whose profile or account no longer exists. Hard
+        deletes leave no updated_at for sync() to see, so this compares ids.
+        """
+        live_ids = {
+            user_id
+            for (user_id,) in db.query(UserProfile.user_id)
+            .join(User, User.id == UserProfile.user_id)
+            .filter(User.is_active.is_(True))
+        }
+        with self._lock:
+            for user_id in [uid for uid in self._rows if uid not in live_ids]:
+                self.remove(user_id)
+
+    # ---- Background maintenance ------------------------------------------
+
+    async def start(self) -> None:
+        """Build or restore in the background, then keep the index fresh"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info("Profile ANN index maintenance started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info("Profile ANN index maintenance stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Profile ANN index maintenance error: {e}")
+            await asyncio.sleep(self.sync_interval_seconds)
+
+    def refresh(self) -> None:
+        """ensure_fresh on a session of its own"""
+        with database.SessionLocal() as db:
+            self.ensure_fresh(db)
+
+    # ---- Retrieval -------------------------------------------------------
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        exclude: Iterable[int] = (),
+        min_confidence: float = 0.0,
+    ) -> List[int]:
+        """
+        User ids of the k profiles with the highest inner product to `query`,
+        skipping excluded users and profiles at or below `min_confidence`.
+        """
+        with self._lock:
+            if not self._rows or k <= 0:
+                return []
+
+            if self._centroids is None:
+                rows = np.flatnonzero(self._live)
+            else:
+                centroid_scores = self._centroids @ query
+                nprobe = min(self.nprobe, len(self._lists))
+                probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+                rows = np.fromiter(
+                    (row for probe in probes for row in self._lists[probe]),
+                    dtype=np.int64,
+                )
+
+            excluded = np.fromiter(exclude, dtype=np.int64)
+            mask = self._confidence[rows] > min_confidence
+            if len(excluded):
+                mask &= ~np.isin(self._user_ids[rows], excluded)
+            rows = rows[mask]
+            if not len(rows):
+                return []
+
+            scores = self._vectors[rows] @ query
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(len(rows))
+            # Stable tie-break on user id keeps results deterministic
+            user_ids = self._user_ids[rows[top]]
+            order = np.lexsort((user_ids, -scores[top]))
+            return user_ids[order].tolist()
+
+
+# Global profile ANN index instance (one per worker process)
+profile_ann_index = ProfileAnnIndex()
@@ -0,0 +1,162 @@
+"""
+Push Dispatcher
+Transport for Web Push deliveries. Push services (FCM, Mozilla autopush,
+Apple, WNS) are addressed by the origin of the subscription endpoint; for
+each origin the dispatcher keeps:
+
+- one pooled HTTP session, so deliveries reuse TLS connections
+- a token bucket, so sends to one push service stay under a steady rate
+
+pywebpush is synchronous, so sends run on a dedicated thread pool sized to
+the concurrency limit instead of blocking the event loop.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from pywebpush import WebPushException, webpush
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryStatus(Enum):
+    DELIVERED = "delivered"
+    EXPIRED = "expired"  # 404/410: the subscription is gone
+    FAILED = "failed"
+
+
+def endpoint_origin(endpoint: str) -> str:
+    parts = urlsplit(endpoint)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Waiters queue on the lock, so tokens are handed out in order
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PushDispatcher:
+    """Rate-shaped, connection-pooled Web Push sends"""
+
+    def __init__(
+        self,
+        vapid_private_key: str,
+        vapid_email: str,
+        max_concurrency: int = 64,
+        default_rate_per_second: float = 200.0,
+        provider_rates: Optional[Dict[str, float]] = None,
+    ):
+        self.vapid_private_key = vapid_private_key
+        self.vapid_email = vapid_email
+        self.max_concurrency = max_concurrency
+        self.default_rate_per_second = default_rate_per_second
+        # Push service origin -> sends per second
+        self.provider_rates = provider_rates or {}
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="webpush"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def session_for(self, origin: str) -> requests.Session:
+        session = self._sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+            session.mount("https://", adapter)
+            self._sessions[origin] = session
+        return session
+
+    def bucket_for(self, origin: str) -> TokenBucket:
+        bucket = self._buckets.get(origin)
+        if bucket is None:
+            rate = self.provider_rates.get(origin, self.default_rate_per_second)
+            bucket = TokenBucket(rate)
+            self._buckets[origin] = bucket
+        return bucket
+
+    async def send(
+        self, endpoint: str, keys: Dict[str, str], data: str
+    ) -> DeliveryStatus:
+        """Deliver one push message to a subscription"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        origin = endpoint_origin(endpoint)
+        # Sessions and buckets are created on the loop thread only
+        session = self.session_for(origin)
+        bucket = self.bucket_for(origin)
+
+        async with self._semaphore:
+            await bucket.acquire()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor,
+                self._post,
+                session,
+                origin,
+                {"endpoint": endpoint, "keys": keys},
+                data,
+            )
+
+    def _post(
+        self,
+        session: requests.Session,
+        origin: str,
+        subscription_info: Dict[str, Any],
+        data: str,
+    ) -> DeliveryStatus:
+        try:
+            webpush(
+                subscription_info=subscription_info,
+                data=data,
+                vapid_private_key=self.vapid_private_key,
+                # The VAPID audience is the push service origin (RFC 8292)
+                vapid_claims={"sub": f"mailto:{self.vapid_email}", "aud": origin},
+                requests_session=session,
+            )
+            return DeliveryStatus.DELIVERED
+
+        except WebPushException as e:
+            if e.response is not None and e.response.status_code in (404, 410):
+                return DeliveryStatus.EXPIRED
+            logger.error(f"WebPush error: {e}")
+            return DeliveryStatus.FAILED
+        except Exception as e:
+            logger.error(f"Failed to send to subscription: {e}")
+            return DeliveryStatus.FAILED
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
@@ -7,12 +7,12 @@ import logging
 from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 # import jwt
 import redis
 from app.core.database import Base
-from pywebpush import WebPushException, webpush
+from app.services.push_dispatcher import DeliveryStatus, PushDispatcher
 from sqlalchemy import JSON, Boolean, Column, DateTime, Integer, String, Text
 from sqlalchemy.orm import Session
 
@@ -55,6 +55,10 @@ class NotificationPayload:
     timestamp: int = None
 
 
+# A notification that passed preference checks, ready to be coalesced
+TypedPayload = Tuple[NotificationType, NotificationPayload]
+
+
 class PushSubscription(Base):
     __tablename__ = "push_subscriptions"
 
@@ -100,6 +104,10 @@ class PushNotificationService:
         self.vapid_private_key = vapid_private_key
         self.vapid_public_key = vapid_public_key
         self.vapid_email = vapid_email
+        self.dispatcher = PushDispatcher(vapid_private_key, vapid_email)
+
+        # Users whose subscriptions and preferences are prefetched together
+        self.bulk_batch_size = 500
 
         # Notification templates for dating app
         self.notification_templates = {
@@ -295,76 +303,60 @@ class PushNotificationService:
         db: Session,
     ) -> bool:
         """Send notification to specific subscription"""
-        try:
-            # Prepare webpush data
-            subscription_info = {
-                "endpoint": subscription.endpoint,
-                "keys": {
-                    "p256dh": subscription.p256dh_key,
-                    "auth": subscription.auth_key,
-                },
-            }
-
-            # Create notification data
-            notification_data = {
-                "title": payload.title,
-                "body": payload.body,
-                "icon": payload.icon,
-                "badge": payload.badge,
-                "tag": payload.tag,
-                "data": payload.data or {},
-                "timestamp": payload.timestamp
-                or int(datetime.now().timestamp() * 1000),
-            }
-
-            if payload.image:
-                notification_data["image"] = payload.image
-
-            if payload.actions:
-                notification_data["actions"] = payload.actions
-
-            if payload.require_interaction:
-                notification_data["requireInteraction"] = True
-
-            if payload.silent:
-                notification_data["silent"] = True
-
-            if payload.vibrate:
-                notification_data["vibrate"] = payload.vibrate
-
-            # Send notification
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(notification_data),
-                vapid_private_key=self.vapid_private_key,
-                vapid_claims={
-                    "sub": f"mailto:{self.vapid_email}",
-                    "aud": subscription.endpoint,
-                },
-            )
-
-            # Update subscription last used time
-            subscription.last_used = datetime.utcnow()
-            db.commit()
-
-            return True
-
-        except WebPushException as e:
-            logger.error(f"WebPush error: {e}")
+        status = await self.dispatcher.send(
+            subscription.endpoint,
+            self._subscription_keys(subscription),
+            json.dumps(self._notification_data(payload)),
+        )
 
-            # Handle subscription errors
-            if e.response and e.response.status_code in [404, 410]:
+        try:
+            if status == DeliveryStatus.DELIVERED:
+                # Update subscription last used time
+                subscription.last_used = datetime.utcnow()
+                db.commit()
+            elif status == DeliveryStatus.EXPIRED:
                 # Subscription is no longer valid
                 subscription.is_active = False
                 db.commit()
                 logger.info(
                     f"Deactivated invalid subscription for user {subscription.user_id}"
                 )
-
-            return False
         except Exception as e:
-            logger.error(f"Failed to send to subscription: {e}")
-            return False
+            logger.error(f"Failed to update subscription: {e}")
+
+        return status == DeliveryStatus.DELIVERED
+
+    def _subscription_keys(self, subscription: PushSubscription) -> Dict[str, str]:
+        return {"p256dh": subscription.p256dh_key, "auth": subscription.auth_key}
+
+    def _notification_data(self, payload: NotificationPayload) -> Dict[str, Any]:
+        """Service worker notification options for a payload"""
+        notification_data = {
+            "title": payload.title,
+            "body": payload.body,
+            "icon": payload.icon,
+            "badge": payload.badge,
+            "tag": payload.tag,
+            "data": payload.data or {},
+            "timestamp": payload.timestamp or int(datetime.now().timestamp() * 1000),
+        }
+
+        if payload.image:
+            notification_data["image"] = payload.image
+
+        if payload.actions:
+            notification_data["actions"] = payload.actions
+
+        if payload.require_interaction:
+            notification_data["requireInteraction"] = True
+
+        if payload.silent:
+            notification_data["silent"] = True
+
+        if payload.vibrate:
+            notification_data["vibrate"] = payload.vibrate
+
+        return notification_data
 
     def create_notification_payload(
         self, notification_type: NotificationType, context: Dict[str, Any]
@@ -395,49 +387,227 @@ class PushNotificationService:
 
         return payload
 
+    def create_digest_payload(
+        self, payloads: List[TypedPayload]
+    ) -> NotificationPayload:
+        """Coalesce several notifications for one user into a single push"""
+        if len(payloads) == 1:
+            return payloads[0][1]
+
+        titles = [payload.title for _, payload in payloads]
+        body = "; ".join(titles[:3])
+        if len(titles) > 3:
+            body += f" and {len(titles) - 3} more"
+
+        return NotificationPayload(
+            title=f"You have {len(payloads)} new notifications",
+            body=body,
+            tag="digest",
+            data={
+                "type": "digest",
+                "timestamp": int(datetime.now().timestamp()),
+                "notifications": [payload.data for _, payload in payloads],
+            },
+            require_interaction=any(p.require_interaction for _, p in payloads),
+            vibrate=payloads[0][1].vibrate,
+            timestamp=int(datetime.now().timestamp() * 1000),
+        )
+
     async def send_bulk_notifications(
         self, notifications: List[Dict[str, Any]], db: Session
     ) -> Dict[str, int]:
-        """Send multiple notifications efficiently"""
+        """
+        Send multiple notifications efficiently
+
+        Users are processed in batches: subscriptions and preferences are
+        prefetched for the whole batch, each user's notifications are
+        coalesced into one push, sends are paced per push service by the
+        dispatcher, and subscription updates and logs are written in bulk.
+        """
         results = {"sent": 0, "failed": 0}
 
         # Group notifications by user for efficiency
-        user_notifications = {}
+        user_notifications: Dict[int, List[Dict[str, Any]]] = {}
         for notification in notifications:
-            user_id = notification["user_id"]
-            if user_id not in user_notifications:
-                user_notifications[user_id] = []
-            user_notifications[user_id].append(notification)
-
-        # Send notifications in batches
-        batch_size = 50
-        for i in range(0, len(user_notifications), batch_size):
-            batch_users = list(user_notifications.keys())[i : i + batch_size]
-
-            tasks = []
-            for user_id in batch_users:
-                for notification in user_notifications[user_id]:
-                    task = self.send_notification(
-                        user_id=user_id,
-                        notification_type=NotificationType(notification["type"]),
-                        context=notification.get("context", {}),
-                        db=db,
+            user_notifications.setdefault(notification["user_id"], []).append(
+                notification
+            )
+
+        user_ids = list(user_notifications)
+        for i in range(0, len(user_ids), self.bulk_batch_size):
+            batch = {
+                user_id: user_notifications[user_id]
+                for user_id in user_ids[i : i + self.bulk_batch_size]
+            }
+            sent, failed = await self._send_user_batch(batch, db)
+            results["sent"] += sent
+            results["failed"] += failed
+
+        return results
+
+    async def _send_user_batch(
+        self, user_notifications: Dict[int, List[Dict[str, Any]]], db: Session
+    ) -> Tuple[int, int]:
+        """Send one batch of users' notifications; returns (sent, failed)"""
+        user_ids = list(user_notifications)
+        preferences = self._load_preferences(user_ids, db)
+
+        subscriptions: Dict[int, List[PushSubscription]] = {}
+        for subscription in db.query(PushSubscription).filter(
+            PushSubscription.user_id.in_(user_ids), PushSubscription.is_active
+        ):
+            subscriptions.setdefault(subscription.user_id, []).append(subscription)
+
+        failed = 0
+        user_payloads: Dict[int, List[TypedPayload]] = {}
+        for user_id, items in user_notifications.items():
+            for item in items:
+                notification_type = NotificationType(item["type"])
+                allowed = preferences[user_id].get(notification_type.value, True)
+                if not allowed or not subscriptions.get(user_id):
+                    failed += 1
+                    continue
+                try:
+                    payload = self.create_notification_payload(
+                        notification_type, item.get("context") or {}
                     )
-                    tasks.append(task)
+                except Exception as e:
+                    logger.error(f"Failed to build notification for {user_id}: {e}")
+                    failed += 1
+                    continue
+                user_payloads.setdefault(user_id, []).append(
+                    (notification_type, payload)
+                )
+
+        # One push per user and subscription, whatever the number of items
+        messages = {
+            user_id: json.dumps(
+                self._notification_data(self.create_digest_payload(payloads))
+            )
+            for user_id, payloads in user_payloads.items()
+        }
+        deliveries = [
+            (user_id, subscription)
+            for user_id in user_payloads
+            for subscription in subscriptions[user_id]
+        ]
+        statuses = await asyncio.gather(
+            *(
+                self.dispatcher.send(
+                    subscription.endpoint,
+                    self._subscription_keys(subscription),
+                    messages[user_id],
+                )
+                for user_id, subscription in deliveries
+            )
+        )
 
-            # Execute batch
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+        delivered_users = set()
+        delivered_ids, expired_ids = [], []
+        for (user_id, subscription), status in zip(deliveries, statuses):
+            if status == DeliveryStatus.DELIVERED:
+                delivered_users.add(user_id)
+                delivered_ids.append(subscription.id)
+            elif status == DeliveryStatus.EXPIRED:
+                expired_ids.append(subscription.id)
+
+        sent = 0
+        log_rows = []
+        for user_id, payloads in user_payloads.items():
+            delivered = user_id in delivered_users
+            if delivered:
+                sent += len(payloads)
+            else:
+                failed += len(payloads)
+            log_rows.extend(
+                {
+                    "user_id": user_id,
+                    "notification_type": notification_type.value,
+                    "title": payload.title,
+                    "body": payload.body,
+                    "payload": asdict(payload),
+                    "delivered": delivered,
+                    "sent_at": datetime.utcnow(),
+                }
+                for notification_type, payload in payloads
+            )
 
-            for result in batch_results:
-                if isinstance(result, bool) and result:
-                    results["sent"] += 1
-                else:
-                    results["failed"] += 1
+        self._write_batch_results(db, delivered_ids, expired_ids, log_rows)
+        return sent, failed
 
-            # Small delay between batches to avoid overwhelming the service
-            await asyncio.sleep(0.1)
+    def _load_preferences(
+        self, user_ids: List[int], db: Session
+    ) -> Dict[int, Dict[str, bool]]:
+        """Preferences for a batch: one MGET, then one query for the misses"""
+        cache_keys = [f"notification_prefs:{user_id}" for user_id in user_ids]
+        defaults = {k.value: v for k, v in self.default_preferences.items()}
 
-        return results
+        preferences: Dict[int, Dict[str, bool]] = {}
+        try:
+            cached = self.redis_client.mget(cache_keys)
+        except Exception as e:
+            logger.error(f"Error checking notification preferences: {e}")
+            cached = [None] * len(user_ids)
+
+        missing = []
+        for user_id, value in zip(user_ids, cached):
+            if value:
+                preferences[user_id] = json.loads(value)
+            else:
+                missing.append(user_id)
+
+        if missing:
+            from app.models.user import User
+
+            stored = dict(
+                db.query(User.id, User.notification_preferences).filter(
+                    User.id.in_(missing)
+                )
+            )
+            try:
+                pipe = self.redis_client.pipeline()
+                for user_id in missing:
+                    preferences[user_id] = stored.get(user_id) or defaults
+                    # Cache for 1 hour
+                    pipe.setex(
+                        f"notification_prefs:{user_id}",
+                        3600,
+                        json.dumps(preferences[user_id]),
+                    )
+                pipe.execute()
+            except Exception as e:
+                logger.error(f"Failed to cache notification preferences: {e}")
+
+        return preferences
+
+    def _write_batch_results(
+        self,
+        db: Session,
+        delivered_ids: List[int],
+        expired_ids: List[int],
+        log_rows: List[Dict[str, Any]],
+    ) -> None:
+        """Subscription updates and notification logs for a batch, one commit"""
+        try:
+            if delivered_ids:
+                db.query(PushSubscription).filter(
+                    PushSubscription.id.in_(delivered_ids)
+                ).update(
+                    {PushSubscription.last_used: datetime.utcnow()},
+                    synchronize_session=False,
+                )
+            if expired_ids:
+                db.query(PushSubscription).filter(
+                    PushSubscription.id.in_(expired_ids)
+                ).update({PushSubscription.is_active: False}, synchronize_session=False)
+                logger.info(f"Deactivated {len(expired_ids)} invalid subscriptions")
+            if log_rows:
+                db.execute(NotificationLog.__table__.insert(), log_rows)
+            db.commit()
+
+        except Exception as e:
+            logger.error(f"Failed to record bulk notification results: {e}")
+            db.rollback()
 
     # Dating app specific notification methods
     async def notify_new_message(
@@ -0,0 +1,404 @@
+"""
+Realtime Backplane
+Cluster-wide state and node-to-node delivery for RealtimeConnectionManager.
+
+Each worker/pod is a node holding its own WebSocket sockets. The backplane
+records which node holds each user's socket (presence), the connection and
+channel subscriber sets and the offline message queues, and carries messages
+to the node that can deliver them. RedisBackplane is used in deployments;
+InMemoryBackplane keeps the same semantics inside one process (single node
+setups and tests, where several managers can share one instance).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app.observability import metrics as obs
+
+try:
+    from redis.asyncio import Redis as AsyncRedis
+except ImportError:
+    AsyncRedis = None
+
+logger = logging.getLogger(__name__)
+
+# Envelope handler installed by a node: receives the decoded envelope
+EnvelopeHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Offline messages kept per user; older ones are dropped first
+MAX_OFFLINE_MESSAGES = 100
+
+
+def default_node_id() -> str:
+    """Node identity: REALTIME_NODE_ID, else host, pid and a random suffix"""
+    return os.getenv("REALTIME_NODE_ID") or (
+        f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    )
+
+
+class RealtimeBackplane(ABC):
+    """Interface shared by the backplane implementations"""
+
+    # Nodes refresh presence for their local users at this interval; stores
+    # with expiring presence use a multiple of it as the TTL
+    heartbeat_interval_seconds = 30.0
+
+    @abstractmethod
+    async def start(self, node_id: str, handler: EnvelopeHandler) -> None:
+        """Start receiving envelopes published to `node_id`"""
+
+    @abstractmethod
+    async def stop(self, node_id: str) -> None: ...
+
+    @abstractmethod
+    async def publish(self, node_id: str, envelope: Dict[str, Any]) -> None:
+        """Deliver an envelope to the node `node_id`"""
+
+    # Presence
+
+    @abstractmethod
+    async def register_user(self, user_id: int, node_id: str) -> None: ...
+
+    @abstractmethod
+    async def unregister_user(self, user_id: int, node_id: str) -> None:
+        """Forget the user's node, unless they have since moved to another"""
+
+    @abstractmethod
+    async def refresh_presence(self, node_id: str, user_ids: Iterable[int]) -> None: ...
+
+    @abstractmethod
+    async def locate_users(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Node holding each connected user's socket; absent users omitted"""
+
+    async def locate_user(self, user_id: int) -> Optional[str]:
+        return (await self.locate_users([user_id])).get(user_id)
+
+    # Subscriptions
+
+    @abstractmethod
+    async def add_connection_member(self, connection_id: int, user_id: int) -> None: ...
+
+    @abstractmethod
+    async def remove_connection_member(
+        self, connection_id: int, user_id: int
+    ) -> None: ...
+
+    @abstractmethod
+    async def connection_members(self, connection_id: int) -> Set[int]: ...
+
+    @abstractmethod
+    async def add_channel_member(self, channel: str, user_id: int) -> None: ...
+
+    @abstractmethod
+    async def remove_channel_member(self, channel: str, user_id: int) -> None: ...
+
+    @abstractmethod
+    async def channel_members(self, channel: str) -> Set[int]: ...
+
+    @abstractmethod
+    async def user_channels(self, user_id: int) -> Set[str]: ...
+
+    # Offline queue
+
+    @abstractmethod
+    async def enqueue_offline(self, user_id: int, payload: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    async def drain_offline(self, user_id: int) -> List[Dict[str, Any]]:
+        """Remove and return the user's queued payloads, oldest first"""
+
+    @abstractmethod
+    def queued_message_count(self) -> int:
+        """Cheap (possibly last-known) total of queued offline messages"""
+
+
+class InMemoryBackplane(RealtimeBackplane):
+    """
+    Process-local backplane. Envelopes are round-tripped through JSON so
+    payloads that would not survive Redis fail here too.
+    """
+
+    def __init__(self, max_offline_messages: int = MAX_OFFLINE_MESSAGES):
+        self.max_offline_messages = max_offline_messages
+
+        self._handlers: Dict[str, EnvelopeHandler] = {}
+        self._presence: Dict[int, str] = {}
+        self._connection_members: Dict[int, Set[int]] = defaultdict(set)
+        self._channel_members: Dict[str, Set[int]] = defaultdict(set)
+        self._user_channels: Dict[int, Set[str]] = defaultdict(set)
+        self._offline: Dict[int, List[Dict[str, Any]]] = {}
+
+    async def start(self, node_id: str, handler: EnvelopeHandler) -> None:
+        self._handlers[node_id] = handler
+
+    async def stop(self, node_id: str) -> None:
+        self._handlers.pop(node_id, None)
+
+    async def publish(self, node_id: str, envelope: Dict[str, Any]) -> None:
+        handler = self._handlers.get(node_id)
+        if handler is None:
+            logger.warning(f"Dropped realtime envelope for unknown node {node_id}")
+            obs.realtime_backplane_envelopes_total.labels("dropped").inc()
+            return
+        obs.realtime_backplane_envelopes_total.labels("published").inc()
+        await handler(json.loads(json.dumps(envelope)))
+
+    async def register_user(self, user_id: int, node_id: str) -> None:
+        self._presence[user_id] = node_id
+
+    async def unregister_user(self, user_id: int, node_id: str) -> None:
+        if self._presence.get(user_id) == node_id:
+            del self._presence[user_id]
+
+    async def refresh_presence(self, node_id: str, user_ids: Iterable[int]) -> None:
+        # Entries do not expire in process
+        return None
+
+    async def locate_users(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        return {
+            user_id: self._presence[user_id]
+            for user_id in user_ids
+            if user_id in self._presence
+        }
+
+    async def add_connection_member(self, connection_id: int, user_id: int) -> None:
+        self._connection_members[connection_id].add(user_id)
+
+    async def remove_connection_member(self, connection_id: int, user_id: int) -> None:
+        members = self._connection_members.get(connection_id)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._connection_members[connection_id]
+
+    async def connection_members(self, connection_id: int) -> Set[int]:
+        return set(self._connection_members.get(connection_id, ()))
+
+    async def add_channel_member(self, channel: str, user_id: int) -> None:
+        self._channel_members[channel].add(user_id)
+        self._user_channels[user_id].add(channel)
+
+    async def remove_channel_member(self, channel: str, user_id: int) -> None:
+        members = self._channel_members.get(channel)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self._channel_members[channel]
+        channels = self._user_channels.get(user_id)
+        if channels is not None:
+            channels.discard(channel)
+            if not channels:
+                del self._user_channels[user_id]
+
+    async def channel_members(self, channel: str) -> Set[int]:
+        return set(self._channel_members.get(channel, ()))
+
+    async def user_channels(self, user_id: int) -> Set[str]:
+        return set(self._user_channels.get(user_id, ()))
+
+    async def enqueue_offline(self, user_id: int, payload: Dict[str, Any]) -> None:
+        queue = self._offline.setdefault(user_id, [])
+        queue.append(payload)
+        if len(queue) > self.max_offline_messages:
+            del queue[: len(queue) - self.max_offline_messages]
+
+    async def drain_offline(self, user_id: int) -> List[Dict[str, Any]]:
+        return self._offline.pop(user_id, [])
+
+    def queued_message_count(self) -> int:
+        return sum(len(queue) for queue in self._offline.values())
+
+
+class RedisBackplane(RealtimeBackplane):
+    """
+    Redis-backed backplane. Presence keys expire unless the owning node keeps
+    refreshing them, so a crashed node's users fall back to offline queuing
+    within `presence_ttl_seconds`. Each node listens on its own pub/sub
+    channel; publishing to a node is a single PUBLISH.
+    """
+
+    # Atomically push a payload, trimming the oldest past the cap, and keep
+    # the global counter in step with what is actually stored
+    _ENQUEUE_SCRIPT = """
+    local length = redis.call('RPUSH', KEYS[1], ARGV[1])
+    if length > tonumber(ARGV[2]) then
+        redis.call('LPOP', KEYS[1])
+    else
+        redis.call('INCR', KEYS[2])
+    end
+    return length
+    """
+
+    _DRAIN_SCRIPT = """
+    local items = redis.call('LRANGE', KEYS[1], 0, -1)
+    if #items > 0 then
+        redis.call('DEL', KEYS[1])
+        redis.call('DECRBY', KEYS[2], #items)
+    end
+    return items
+    """
+
+    _UNREGISTER_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        prefix: str = "realtime",
+        presence_ttl_seconds: int = 90,
+        max_offline_messages: int = MAX_OFFLINE_MESSAGES,
+    ):
+        if AsyncRedis is None:
+            raise RuntimeError("redis package is required for RedisBackplane")
+
+        self.prefix = prefix
+        self.presence_ttl_seconds = presence_ttl_seconds
+        self.max_offline_messages = max_offline_messages
+        self.heartbeat_interval_seconds = presence_ttl_seconds / 3
+
+        self._redis = AsyncRedis.from_url(redis_url, decode_responses=True)
+        self._enqueue = self._redis.register_script(self._ENQUEUE_SCRIPT)
+        self._drain = self._redis.register_script(self._DRAIN_SCRIPT)
+        self._unregister = self._redis.register_script(self._UNREGISTER_SCRIPT)
+
+        self._listeners: Dict[str, asyncio.Task] = {}
+        self._queued_count = 0
+
+    def _key(self, *parts: Any) -> str:
+        return ":".join([self.prefix, *(str(part) for part in parts)])
+
+    async def start(self, node_id: str, handler: EnvelopeHandler) -> None:
+        if node_id in self._listeners:
+            return
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self._key("node", node_id))
+        self._listeners[node_id] = asyncio.create_task(self._listen(pubsub, handler))
+        logger.info(f"Realtime backplane listening for node {node_id}")
+
+    async def stop(self, node_id: str) -> None:
+        task = self._listeners.pop(node_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def _listen(self, pubsub, handler: EnvelopeHandler) -> None:
+        try:
+            async for item in pubsub.listen():
+                if item.get("type") != "message":
+                    continue
+                try:
+                    await handler(json.loads(item["data"]))
+                except Exception as e:
+                    logger.error(f"Error handling realtime envelope: {e}")
+        finally:
+            await pubsub.close()
+
+    async def publish(self, node_id: str, envelope: Dict[str, Any]) -> None:
+        receivers = await self._redis.publish(
+            self._key("node", node_id), json.dumps(envelope)
+        )
+        # No subscriber means the node is gone; its presence keys will expire
+        status = "published" if receivers else "dropped"
+        obs.realtime_backplane_envelopes_total.labels(status).inc()
+
+    async def register_user(self, user_id: int, node_id: str) -> None:
+        await self._redis.set(
+            self._key("presence", user_id), node_id, ex=self.presence_ttl_seconds
+        )
+
+    async def unregister_user(self, user_id: int, node_id: str) -> None:
+        await self._unregister(keys=[self._key("presence", user_id)], args=[node_id])
+
+    async def refresh_presence(self, node_id: str, user_ids: Iterable[int]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.set(
+                    self._key("presence", user_id),
+                    node_id,
+                    ex=self.presence_ttl_seconds,
+                )
+            pipe.get(self._key("offline", "count"))
+            results = await pipe.execute()
+        self._queued_count = max(int(results[-1] or 0), 0)
+
+    async def locate_users(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        nodes = await self._redis.mget(
+            [self._key("presence", user_id) for user_id in user_ids]
+        )
+        return {
+            user_id: node for user_id, node in zip(user_ids, nodes) if node is not None
+        }
+
+    async def add_connection_member(self, connection_id: int, user_id: int) -> None:
+        await self._redis.sadd(self._key("connection", connection_id), user_id)
+
+    async def remove_connection_member(self, connection_id: int, user_id: int) -> None:
+        await self._redis.srem(self._key("connection", connection_id), user_id)
+
+    async def connection_members(self, connection_id: int) -> Set[int]:
+        members = await self._redis.smembers(self._key("connection", connection_id))
+        return {int(member) for member in members}
+
+    async def add_channel_member(self, channel: str, user_id: int) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.sadd(self._key("channel", channel), user_id)
+            pipe.sadd(self._key("user_channels", user_id), channel)
+            await pipe.execute()
+
+    async def remove_channel_member(self, channel: str, user_id: int) -> None:
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.srem(self._key("channel", channel), user_id)
+            pipe.srem(self._key("user_channels", user_id), channel)
+            await pipe.execute()
+
+    async def channel_members(self, channel: str) -> Set[int]:
+        members = await self._redis.smembers(self._key("channel", channel))
+        return {int(member) for member in members}
+
+    async def user_channels(self, user_id: int) -> Set[str]:
+        return set(await self._redis.smembers(self._key("user_channels", user_id)))
+
+    async def enqueue_offline(self, user_id: int, payload: Dict[str, Any]) -> None:
+        await self._enqueue(
+            keys=[self._key("offline", user_id), self._key("offline", "count")],
+            args=[json.dumps(payload), self.max_offline_messages],
+        )
+
+    async def drain_offline(self, user_id: int) -> List[Dict[str, Any]]:
+        items = await self._drain(
+            keys=[self._key("offline", user_id), self._key("offline", "count")]
+        )
+        return [json.loads(item) for item in items]
+
+    def queued_message_count(self) -> int:
+        # Refreshed with every presence heartbeat
+        return self._queued_count
+
+
+def create_backplane() -> RealtimeBackplane:
+    """
+    Backplane selected by REALTIME_BACKPLANE ("memory" or "redis"). The Redis
+    URL comes from REALTIME_REDIS_URL, falling back to REDIS_URL.
+    """
+    kind = os.getenv("REALTIME_BACKPLANE", "memory").lower()
+    if kind == "redis":
+        redis_url = os.getenv("REALTIME_REDIS_URL") or os.getenv(
+            "REDIS_URL", "redis://localhost:6379/0"
+        )
+        return RedisBackplane(redis_url)
+    if kind != "memory":
+        logger.warning(f"Unknown REALTIME_BACKPLANE {kind!r}, using in-memory")
+    return InMemoryBackplane()
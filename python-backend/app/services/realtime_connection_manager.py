@@ -1,26 +1,62 @@
 """
 Real-time Connection Manager - Phase 4 Enhanced
 Handles WebSocket connections, presence tracking, and live state management
+
+Sockets live on the node (worker/pod) that accepted them; presence,
+subscriptions and offline queues are kept in a RealtimeBackplane so messages
+reach users connected to any node.
+
+Methods taking `db` accept a Session or an AsyncSession. Their database work
+lives in the sync helpers below, run through run_with_session, so on the
+websocket path it awaits asyncpg rather than blocking the event loop.
 """
 
-# import asyncio
+import asyncio
 import json
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
+from app.core.database import run_with_session
 from app.core.logging_config import get_logger
 from app.models.realtime_state import UserPresence, UserPresenceStatus
-from app.models.soul_analytics import AnalyticsEventType, UserEngagementAnalytics
+from app.models.soul_analytics import AnalyticsEventType
 from app.models.soul_connection import ConnectionEnergyLevel, SoulConnection
 from app.models.user import UserEmotionalState
+from app.observability import metrics as obs
+from app.services.analytics_service import analytics_service
+from app.services.realtime_backplane import (
+    RealtimeBackplane,
+    create_backplane,
+    default_node_id,
+)
 from fastapi import WebSocket
 from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 logger = get_logger("app.services.realtime_connection_manager")
 
+# Local socket writes in flight per fan-out
+MAX_CONCURRENT_SENDS = 64
+
+# A socket that cannot take a frame within this long is a slow consumer
+SEND_TIMEOUT_SECONDS = 5.0
+
+# Close code sent to evicted slow consumers (1013: try again later)
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class LocalSendResult(Enum):
+    """Outcome of writing a frame to a socket held by this node"""
+
+    SENT = "sent"
+    # Slow consumer evicted; the frame went to its offline queue
+    BUFFERED = "buffered"
+    # No socket, or the write failed; the frame was not kept
+    FAILED = "failed"
+
 
 class MessageType(str, Enum):
     """Types of real-time messages"""
@@ -91,11 +127,179 @@ class RealtimeMessage:
         }
 
 
+DbSession = Union[Session, AsyncSession]
+
+
+def _find_connection(
+    db: Session,
+    connection_id: int,
+    member_id: Optional[int] = None,
+    active_only: bool = False,
+) -> Optional[SoulConnection]:
+    query = db.query(SoulConnection).filter(SoulConnection.id == connection_id)
+    if member_id is not None:
+        query = query.filter(
+            or_(
+                SoulConnection.user1_id == member_id,
+                SoulConnection.user2_id == member_id,
+            )
+        )
+    if active_only:
+        query = query.filter(SoulConnection.status == "active")
+    return query.first()
+
+
+def _active_connections(db: Session, user_id: int) -> List[SoulConnection]:
+    return (
+        db.query(SoulConnection)
+        .filter(
+            or_(
+                SoulConnection.user1_id == user_id,
+                SoulConnection.user2_id == user_id,
+            ),
+            SoulConnection.status == "active",
+        )
+        .all()
+    )
+
+
+def _set_connection_energy(
+    db: Session, connection_id: int, new_energy: ConnectionEnergyLevel
+) -> Tuple[bool, Optional[str]]:
+    """Store the new energy level; returns (found, previous level)"""
+    try:
+        connection = _find_connection(db, connection_id)
+        if not connection:
+            return False, None
+
+        # Update energy
+        old_energy = connection.current_energy_level
+        connection.current_energy_level = new_energy
+        connection.last_activity_at = datetime.utcnow()
+
+        # Update energy history
+        if not connection.energy_history:
+            connection.energy_history = []
+
+        connection.energy_history.append(
+            {
+                "timestamp": datetime.utcnow().isoformat(),
+                "old_energy": old_energy,
+                "new_energy": new_energy,
+            }
+        )
+
+        db.commit()
+        return True, old_energy
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _save_message(
+    db: Session, connection_id: int, sender_id: int, content: str, message_type: str
+):
+    from app.models.message import Message
+
+    try:
+        message = Message(
+            connection_id=connection_id,
+            sender_id=sender_id,
+            message_text=content,
+            message_type=message_type,
+        )
+        db.add(message)
+        db.commit()
+        db.refresh(message)
+        return message
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _save_presence(
+    db: Session,
+    user_id: int,
+    status: UserPresenceStatus,
+    connection_id: Optional[int],
+) -> None:
+    try:
+        presence = (
+            db.query(UserPresence).filter(UserPresence.user_id == user_id).first()
+        )
+
+        if not presence:
+            presence = UserPresence(
+                user_id=user_id, status=status, last_seen=datetime.utcnow()
+            )
+            db.add(presence)
+        else:
+            presence.status = status
+            presence.last_seen = datetime.utcnow()
+
+            if status == UserPresenceStatus.TYPING and connection_id:
+                presence.is_typing = True
+                presence.typing_in_connection = connection_id
+                presence.typing_started_at = datetime.utcnow()
+            else:
+                presence.is_typing = False
+                presence.typing_in_connection = None
+                presence.typing_started_at = None
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _stale_presence(db: Session, cutoff_time: datetime) -> List[UserPresence]:
+    return (
+        db.query(UserPresence)
+        .filter(
+            UserPresence.last_seen < cutoff_time,
+            UserPresence.status != UserPresenceStatus.OFFLINE,
+        )
+        .all()
+    )
+
+
+def _mark_offline(
+    db: Session, stale_presence: List[UserPresence], connected: Iterable[int]
+) -> None:
+    try:
+        for presence in stale_presence:
+            if presence.user_id not in connected:
+                presence.status = UserPresenceStatus.OFFLINE
+                presence.is_typing = False
+                presence.typing_in_connection = None
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+
 class RealtimeConnectionManager:
     """Manages WebSocket connections and real-time features"""
 
-    def __init__(self):
-        # Active WebSocket connections: user_id -> WebSocket
+    def __init__(
+        self,
+        backplane: Optional[RealtimeBackplane] = None,
+        node_id: Optional[str] = None,
+        max_concurrent_sends: int = MAX_CONCURRENT_SENDS,
+        send_timeout_seconds: float = SEND_TIMEOUT_SECONDS,
+    ):
+        # Cluster-wide presence, subscriptions and offline queues; a private
+        # in-memory backplane makes a standalone single-node manager
+        self.backplane = backplane or create_backplane()
+        self.node_id = node_id or default_node_id()
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+        # Fan-out limits
+        self.max_concurrent_sends = max_concurrent_sends
+        self.send_timeout_seconds = send_timeout_seconds
+
+        # WebSocket connections held by this node: user_id -> WebSocket
         self.active_connections: Dict[int, WebSocket] = {}
 
         # User presence tracking
@@ -104,6 +308,8 @@ class RealtimeConnectionManager:
         # Typing sessions: connection_id -> {user_id: session_data}
         self.typing_sessions: Dict[int, Dict[int, Dict]] = {}
 
+        # Subscriptions made through this node (the backplane holds the
+        # cluster-wide sets used for delivery)
         # Connection subscribers: connection_id -> set of user_ids
         self.connection_subscribers: Dict[int, Set[int]] = {}
 
@@ -113,10 +319,155 @@ class RealtimeConnectionManager:
         # User channel subscriptions: user_id -> set of channels
         self.user_channels: Dict[int, Set[str]] = {}
 
-        # Message queues for offline users
-        self.offline_message_queue: Dict[int, List[RealtimeMessage]] = {}
+        logger.info(f"Real-time Connection Manager initialized on node {self.node_id}")
+
+    async def start(self):
+        """Join the backplane so other nodes can route messages here"""
+        await self.backplane.start(self.node_id, self._handle_envelope)
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._presence_heartbeat())
+
+    async def stop(self):
+        """Leave the backplane; local users become unreachable from other nodes"""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        for user_id in list(self.active_connections):
+            await self.backplane.unregister_user(user_id, self.node_id)
+        await self.backplane.stop(self.node_id)
+
+    async def _presence_heartbeat(self):
+        """Keep presence of local users alive in backplanes that expire it"""
+        while True:
+            await asyncio.sleep(self.backplane.heartbeat_interval_seconds)
+            try:
+                await self.backplane.refresh_presence(
+                    self.node_id, list(self.active_connections)
+                )
+            except Exception as e:
+                logger.error(f"Error refreshing realtime presence: {str(e)}")
 
-        logger.info("Real-time Connection Manager initialized")
+    async def _handle_envelope(self, envelope: Dict[str, Any]):
+        """Deliver a message routed to this node by another node"""
+        payload = envelope["message"]
+        local = []
+        for user_id in envelope["user_ids"]:
+            if user_id in self.active_connections:
+                local.append(user_id)
+            else:
+                # The user disconnected since the sender looked them up
+                await self.backplane.enqueue_offline(user_id, payload)
+
+        await self._send_local_many(local, json.dumps(payload))
+
+    async def _send_local(self, user_id: int, text: str) -> bool:
+        """Send serialized text to a local socket; True if it was written"""
+        return await self._write_local(user_id, text) is LocalSendResult.SENT
+
+    async def _write_local(self, user_id: int, text: str) -> LocalSendResult:
+        """
+        Send serialized text to a socket held by this node. A socket that
+        does not accept the frame within `send_timeout_seconds` is evicted
+        and the message buffered in its offline queue, so one slow client
+        never holds up a fan-out; it catches up on reconnect.
+        """
+        websocket = self.active_connections.get(user_id)
+        if websocket is None:
+            return LocalSendResult.FAILED
+        try:
+            await asyncio.wait_for(
+                websocket.send_text(text), timeout=self.send_timeout_seconds
+            )
+            return LocalSendResult.SENT
+        except asyncio.TimeoutError:
+            logger.warning(f"Evicting slow realtime consumer {user_id}")
+            obs.realtime_send_drops_total.labels("timeout").inc()
+            await self.backplane.enqueue_offline(user_id, json.loads(text))
+            await self._drop_connection(user_id, websocket)
+            try:
+                await asyncio.wait_for(
+                    websocket.close(code=SLOW_CONSUMER_CLOSE_CODE),
+                    timeout=self.send_timeout_seconds,
+                )
+            except Exception:
+                pass
+            return LocalSendResult.BUFFERED
+        except Exception as e:
+            logger.error(f"Error sending message to user {user_id}: {str(e)}")
+            obs.realtime_send_drops_total.labels("error").inc()
+            # Remove stale connection
+            await self._drop_connection(user_id, websocket)
+            return LocalSendResult.FAILED
+
+    async def _drop_connection(self, user_id: int, websocket: WebSocket):
+        """Forget a local socket unless the user has already reconnected"""
+        if self.active_connections.get(user_id) is websocket:
+            del self.active_connections[user_id]
+            await self.backplane.unregister_user(user_id, self.node_id)
+
+    async def _send_local_many(self, user_ids: List[int], text: str) -> int:
+        """Send the same text to local sockets concurrently; returns successes"""
+        if not user_ids:
+            return 0
+        if len(user_ids) == 1:
+            return int(await self._send_local(user_ids[0], text))
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_sends)
+
+        async def send(user_id: int) -> bool:
+            async with semaphore:
+                return await self._send_local(user_id, text)
+
+        results = await asyncio.gather(*(send(user_id) for user_id in user_ids))
+        return sum(results)
+
+    async def _route(self, user_ids: Iterable[int], message: RealtimeMessage) -> int:
+        """
+        Deliver a message to each user wherever they are connected: local
+        sockets directly, remote users with one envelope per node, and
+        everyone else via the offline queue. Returns how many users were
+        delivered to or handed to their node.
+        """
+        # Serialized once for every recipient and node
+        payload = message.to_dict()
+        text = json.dumps(payload)
+        local = []
+        remote = []
+
+        for user_id in user_ids:
+            if user_id in self.active_connections:
+                local.append(user_id)
+            else:
+                remote.append(user_id)
+
+        delivered = await self._send_local_many(local, text)
+
+        if remote:
+            nodes = await self.backplane.locate_users(remote)
+            by_node: Dict[str, List[int]] = {}
+            for user_id in remote:
+                node_id = nodes.get(user_id)
+                if node_id is None or node_id == self.node_id:
+                    await self.backplane.enqueue_offline(user_id, payload)
+                else:
+                    by_node.setdefault(node_id, []).append(user_id)
+
+            await asyncio.gather(
+                *(
+                    self.backplane.publish(
+                        node_id,
+                        {
+                            "origin": self.node_id,
+                            "user_ids": node_users,
+                            "message": payload,
+                        },
+                    )
+                    for node_id, node_users in by_node.items()
+                )
+            )
+            delivered += sum(len(node_users) for node_users in by_node.values())
+
+        return delivered
 
     @property
     def user_connections(self) -> Dict[int, WebSocket]:
@@ -133,13 +484,14 @@ class RealtimeConnectionManager:
         )
         await self.send_to_user(user_id, realtime_msg)
 
-    async def connect(self, websocket: WebSocket, user_id: int, db: Session):
+    async def connect(self, websocket: WebSocket, user_id: int, db: DbSession):
         """Handle new WebSocket connection"""
         try:
             await websocket.accept()
 
-            # Store connection
+            # Store connection and announce which node holds it
             self.active_connections[user_id] = websocket
+            await self.backplane.register_user(user_id, self.node_id)
 
             # Update presence
             await self.update_user_presence(user_id, UserPresenceStatus.ONLINE, db)
@@ -165,12 +517,13 @@ class RealtimeConnectionManager:
             logger.error(f"Error connecting user {user_id}: {str(e)}")
             raise
 
-    async def disconnect(self, user_id: int, db: Session):
+    async def disconnect(self, user_id: int, db: DbSession):
         """Handle WebSocket disconnection"""
         try:
             # Remove connection
             if user_id in self.active_connections:
                 del self.active_connections[user_id]
+                await self.backplane.unregister_user(user_id, self.node_id)
 
             # Update presence
             await self.update_user_presence(user_id, UserPresenceStatus.OFFLINE, db)
@@ -190,25 +543,17 @@ class RealtimeConnectionManager:
             logger.error(f"Error disconnecting user {user_id}: {str(e)}")
 
     async def send_to_user(self, user_id: int, message: RealtimeMessage):
-        """Send message to a specific user"""
-        websocket = self.active_connections.get(user_id)
+        """Send message to a specific user on whichever node holds their socket"""
+        if user_id in self.active_connections:
+            return await self._send_local(user_id, json.dumps(message.to_dict()))
 
-        if websocket:
-            try:
-                await websocket.send_text(json.dumps(message.to_dict()))
-                return True
-            except Exception as e:
-                logger.error(f"Error sending message to user {user_id}: {str(e)}")
-                # Remove stale connection
-                if user_id in self.active_connections:
-                    del self.active_connections[user_id]
-                return False
-        else:
-            # Queue message for offline user
-            if user_id not in self.offline_message_queue:
-                self.offline_message_queue[user_id] = []
-            self.offline_message_queue[user_id].append(message)
-            return False
+        node_id = await self.backplane.locate_user(user_id)
+        if node_id is not None and node_id != self.node_id:
+            return bool(await self._route([user_id], message))
+
+        # Queue message for offline user
+        await self.backplane.enqueue_offline(user_id, message.to_dict())
+        return False
 
     async def send_to_connection(
         self,
@@ -217,14 +562,13 @@ class RealtimeConnectionManager:
         exclude_user: Optional[int] = None,
     ):
         """Send message to all users in a connection"""
-        subscribers = self.connection_subscribers.get(connection_id, set())
-
-        for user_id in subscribers:
-            if exclude_user and user_id == exclude_user:
-                continue
+        subscribers = await self.backplane.connection_members(connection_id)
+        if exclude_user:
+            subscribers.discard(exclude_user)
 
-            message.connection_id = connection_id
-            await self.send_to_user(user_id, message)
+        message.connection_id = connection_id
+        with obs.realtime_broadcast_seconds.labels("connection").time():
+            await self._route(subscribers, message)
 
     async def subscribe_to_connection(self, user_id: int, connection_id: int):
         """Subscribe user to connection updates"""
@@ -232,6 +576,7 @@ class RealtimeConnectionManager:
             self.connection_subscribers[connection_id] = set()
 
         self.connection_subscribers[connection_id].add(user_id)
+        await self.backplane.add_connection_member(connection_id, user_id)
         logger.debug(f"User {user_id} subscribed to connection {connection_id}")
 
     async def unsubscribe_from_connection(self, user_id: int, connection_id: int):
@@ -243,25 +588,17 @@ class RealtimeConnectionManager:
             if not self.connection_subscribers[connection_id]:
                 del self.connection_subscribers[connection_id]
 
+        await self.backplane.remove_connection_member(connection_id, user_id)
         logger.debug(f"User {user_id} unsubscribed from connection {connection_id}")
 
     async def start_typing(
-        self, user_id: int, connection_id: int, typing_data: Dict, db: Session
+        self, user_id: int, connection_id: int, typing_data: Dict, db: DbSession
     ):
         """Handle user starting to type"""
         try:
             # Get connection to verify access
-            connection = (
-                db.query(SoulConnection)
-                .filter(
-                    SoulConnection.id == connection_id,
-                    or_(
-                        SoulConnection.user1_id == user_id,
-                        SoulConnection.user2_id == user_id,
-                    ),
-                    SoulConnection.status == "active",
-                )
-                .first()
+            connection = await run_with_session(
+                db, _find_connection, connection_id, user_id, True
             )
 
             if not connection:
@@ -321,7 +658,7 @@ class RealtimeConnectionManager:
             logger.error(f"Error starting typing session: {str(e)}")
             return False
 
-    async def stop_typing(self, user_id: int, connection_id: int, db: Session):
+    async def stop_typing(self, user_id: int, connection_id: int, db: DbSession):
         """Handle user stopping typing"""
         try:
             # Remove typing session
@@ -339,16 +676,8 @@ class RealtimeConnectionManager:
                     )
 
                     # Get connection for partner notification
-                    connection = (
-                        db.query(SoulConnection)
-                        .filter(
-                            SoulConnection.id == connection_id,
-                            or_(
-                                SoulConnection.user1_id == user_id,
-                                SoulConnection.user2_id == user_id,
-                            ),
-                        )
-                        .first()
+                    connection = await run_with_session(
+                        db, _find_connection, connection_id, user_id
                     )
 
                     if connection:
@@ -372,38 +701,17 @@ class RealtimeConnectionManager:
         self,
         connection_id: int,
         new_energy: ConnectionEnergyLevel,
-        db: Session,
+        db: DbSession,
     ):
         """Update connection energy level and notify users"""
         try:
-            connection = (
-                db.query(SoulConnection)
-                .filter(SoulConnection.id == connection_id)
-                .first()
+            found, old_energy = await run_with_session(
+                db, _set_connection_energy, connection_id, new_energy
             )
 
-            if not connection:
+            if not found:
                 return False
 
-            # Update energy
-            old_energy = connection.current_energy_level
-            connection.current_energy_level = new_energy
-            connection.last_activity_at = datetime.utcnow()
-
-            # Update energy history
-            if not connection.energy_history:
-                connection.energy_history = []
-
-            connection.energy_history.append(
-                {
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "old_energy": old_energy,
-                    "new_energy": new_energy,
-                }
-            )
-
-            db.commit()
-
             # Notify both users
             await self.send_to_connection(
                 connection_id,
@@ -421,7 +729,6 @@ class RealtimeConnectionManager:
 
         except Exception as e:
             logger.error(f"Error updating connection energy: {str(e)}")
-            db.rollback()
             return False
 
     async def trigger_celebration(
@@ -429,7 +736,7 @@ class RealtimeConnectionManager:
         connection_id: int,
         celebration_type: str,
         data: Dict,
-        db: Session,
+        db: DbSession,
     ):
         """Trigger celebration animation for both users"""
         try:
@@ -446,11 +753,7 @@ class RealtimeConnectionManager:
             )
 
             # Track analytics
-            connection = (
-                db.query(SoulConnection)
-                .filter(SoulConnection.id == connection_id)
-                .first()
-            )
+            connection = await run_with_session(db, _find_connection, connection_id)
 
             if connection:
                 for user_id in [connection.user1_id, connection.user2_id]:
@@ -476,15 +779,11 @@ class RealtimeConnectionManager:
         connection_id: int,
         sender_id: int,
         revelation_data: Dict,
-        db: Session,
+        db: DbSession,
     ):
         """Notify about new revelation sharing"""
         try:
-            connection = (
-                db.query(SoulConnection)
-                .filter(SoulConnection.id == connection_id)
-                .first()
-            )
+            connection = await run_with_session(db, _find_connection, connection_id)
 
             if not connection:
                 return False
@@ -523,7 +822,7 @@ class RealtimeConnectionManager:
             logger.error(f"Error notifying new revelation: {str(e)}")
             return False
 
-    async def handle_message(self, user_id: int, message_data: Dict, db: Session):
+    async def handle_message(self, user_id: int, message_data: Dict, db: DbSession):
         """Handle incoming WebSocket message"""
         try:
             message_type = MessageType(message_data.get("type"))
@@ -609,12 +908,10 @@ class RealtimeConnectionManager:
             return False
 
     async def handle_real_time_message(
-        self, sender_id: int, message_data: Dict, db: Session
+        self, sender_id: int, message_data: Dict, db: DbSession
     ):
         """Handle real-time message sending and delivery"""
         try:
-            from app.models.message import Message
-
             connection_id = message_data.get("connection_id")
             content = message_data.get("content")
             message_type = message_data.get("message_type", "text")
@@ -624,16 +921,8 @@ class RealtimeConnectionManager:
                 return False
 
             # Verify sender has access to this connection
-            connection = (
-                db.query(SoulConnection)
-                .filter(
-                    SoulConnection.id == connection_id,
-                    or_(
-                        SoulConnection.user1_id == sender_id,
-                        SoulConnection.user2_id == sender_id,
-                    ),
-                )
-                .first()
+            connection = await run_with_session(
+                db, _find_connection, connection_id, sender_id
             )
 
             if not connection:
@@ -643,15 +932,9 @@ class RealtimeConnectionManager:
                 return False
 
             # Create message record
-            message = Message(
-                connection_id=connection_id,
-                sender_id=sender_id,
-                message_text=content,
-                message_type=message_type,
+            message = await run_with_session(
+                db, _save_message, connection_id, sender_id, content, message_type
             )
-            db.add(message)
-            db.commit()
-            db.refresh(message)
 
             # Determine recipient
             recipient_id = (
@@ -681,8 +964,8 @@ class RealtimeConnectionManager:
             )
             await self.send_to_user(sender_id, confirmation_message)
 
-            # Deliver message to recipient if online
-            if recipient_id in self.active_connections:
+            # Deliver message to recipient if online on any node
+            if await self.is_user_connected(recipient_id):
                 delivery_message = RealtimeMessage(
                     type=MessageType.NEW_MESSAGE,
                     data={
@@ -737,41 +1020,18 @@ class RealtimeConnectionManager:
         self,
         user_id: int,
         status: UserPresenceStatus,
-        db: Session,
+        db: DbSession,
         connection_id: Optional[int] = None,
     ):
         """Update user presence in database"""
         try:
-            presence = (
-                db.query(UserPresence).filter(UserPresence.user_id == user_id).first()
-            )
-
-            if not presence:
-                presence = UserPresence(
-                    user_id=user_id, status=status, last_seen=datetime.utcnow()
-                )
-                db.add(presence)
-            else:
-                presence.status = status
-                presence.last_seen = datetime.utcnow()
-
-                if status == UserPresenceStatus.TYPING and connection_id:
-                    presence.is_typing = True
-                    presence.typing_in_connection = connection_id
-                    presence.typing_started_at = datetime.utcnow()
-                else:
-                    presence.is_typing = False
-                    presence.typing_in_connection = None
-                    presence.typing_started_at = None
-
-            db.commit()
+            await run_with_session(db, _save_presence, user_id, status, connection_id)
             self.user_presence[user_id] = status
 
         except Exception as e:
             logger.error(f"Error updating user presence: {str(e)}")
-            db.rollback()
 
-    async def stop_all_typing_sessions(self, user_id: int, db: Session):
+    async def stop_all_typing_sessions(self, user_id: int, db: DbSession):
         """Stop all typing sessions for a user"""
         connections_to_update = []
 
@@ -783,22 +1043,12 @@ class RealtimeConnectionManager:
             await self.stop_typing(user_id, connection_id, db)
 
     async def notify_user_connections(
-        self, user_id: int, message_type: MessageType, db: Session
+        self, user_id: int, message_type: MessageType, db: DbSession
     ):
         """Notify all connections about user presence change"""
         try:
             # Get user's active connections
-            connections = (
-                db.query(SoulConnection)
-                .filter(
-                    or_(
-                        SoulConnection.user1_id == user_id,
-                        SoulConnection.user2_id == user_id,
-                    ),
-                    SoulConnection.status == "active",
-                )
-                .all()
-            )
+            connections = await run_with_session(db, _active_connections, user_id)
 
             for connection in connections:
                 partner_id = connection.get_partner_id(user_id)
@@ -822,39 +1072,38 @@ class RealtimeConnectionManager:
 
     async def send_queued_messages(self, user_id: int):
         """Send queued messages to newly connected user"""
-        if user_id in self.offline_message_queue:
-            messages = self.offline_message_queue[user_id]
-
-            for message in messages:
-                await self.send_to_user(user_id, message)
+        payloads = await self.backplane.drain_offline(user_id)
 
-            # Clear queue
-            del self.offline_message_queue[user_id]
+        for index, payload in enumerate(payloads):
+            result = await self._write_local(user_id, json.dumps(payload))
+            if result is LocalSendResult.SENT:
+                continue
+            # Socket went away again; keep the rest for the next connect,
+            # skipping the current message if _write_local already buffered it
+            if result is LocalSendResult.BUFFERED:
+                index += 1
+            for remaining in payloads[index:]:
+                await self.backplane.enqueue_offline(user_id, remaining)
+            break
+
+    async def clear_offline_messages(self, user_id: int):
+        """Drop any messages queued for the user"""
+        await self.backplane.drain_offline(user_id)
 
     async def track_engagement_event(
         self,
         user_id: int,
         event_type: AnalyticsEventType,
         event_data: Dict,
-        db: Session,
+        db: DbSession,
     ):
-        """Track user engagement event"""
-        try:
-            analytics_event = UserEngagementAnalytics(
-                user_id=user_id,
-                event_type=event_type.value,
-                event_data=event_data,
-                created_at=datetime.utcnow(),
-            )
-
-            db.add(analytics_event)
-            db.commit()
-
-        except Exception as e:
-            logger.error(f"Error tracking engagement event: {str(e)}")
-            db.rollback()
+        """
+        Track user engagement event through the analytics buffer, which also
+        feeds the daily rollups; `db` is no longer used
+        """
+        await analytics_service.track_user_event(user_id, event_type, event_data)
 
-    async def cleanup_stale_sessions(self, db: Session):
+    async def cleanup_stale_sessions(self, db: DbSession):
         """Clean up stale typing sessions and presence data"""
         try:
             cutoff_time = datetime.utcnow() - timedelta(minutes=5)
@@ -866,42 +1115,27 @@ class RealtimeConnectionManager:
                         await self.stop_typing(user_id, connection_id, db)
 
             # Update stale presence records
-            stale_presence = (
-                db.query(UserPresence)
-                .filter(
-                    UserPresence.last_seen < cutoff_time,
-                    UserPresence.status != UserPresenceStatus.OFFLINE,
-                )
-                .all()
-            )
-
-            for presence in stale_presence:
-                if presence.user_id not in self.active_connections:
-                    presence.status = UserPresenceStatus.OFFLINE
-                    presence.is_typing = False
-                    presence.typing_in_connection = None
+            stale_presence = await run_with_session(db, _stale_presence, cutoff_time)
 
-            db.commit()
+            connected = await self.backplane.locate_users(
+                [presence.user_id for presence in stale_presence]
+            )
+            await run_with_session(db, _mark_offline, stale_presence, connected)
 
         except Exception as e:
             logger.error(f"Error cleaning up stale sessions: {str(e)}")
-            db.rollback()
 
     async def queue_notification_for_offline_user(
-        self, user_id: int, notification_data: Dict, db: Session
+        self, user_id: int, notification_data: Dict, db: DbSession
     ):
         """Queue notification for offline user"""
         try:
-            # Add to in-memory queue
-            if user_id not in self.offline_message_queue:
-                self.offline_message_queue[user_id] = []
-
             notification_msg = RealtimeMessage(
                 type=MessageType.NEW_MESSAGE,
                 data=notification_data,
                 target_user_id=user_id,
             )
-            self.offline_message_queue[user_id].append(notification_msg)
+            await self.backplane.enqueue_offline(user_id, notification_msg.to_dict())
 
             logger.info(f"Queued notification for offline user {user_id}")
             return True
@@ -911,9 +1145,15 @@ class RealtimeConnectionManager:
             return False
 
     def is_user_online(self, user_id: int) -> bool:
-        """Check if user is currently online"""
+        """Check if user is currently connected to this node"""
         return user_id in self.active_connections
 
+    async def is_user_connected(self, user_id: int) -> bool:
+        """Check if user is currently connected to any node"""
+        if user_id in self.active_connections:
+            return True
+        return await self.backplane.locate_user(user_id) is not None
+
     def get_last_seen(self, user_id: int) -> Optional[str]:
         """Get when user was last seen online"""
         # For test compatibility, return current timestamp if user is online
@@ -950,6 +1190,7 @@ class RealtimeConnectionManager:
 
             self.channel_subscribers[channel].add(user_id)
             self.user_channels[user_id].add(channel)
+            await self.backplane.add_channel_member(channel, user_id)
 
             logger.info(f"User {user_id} subscribed to channel '{channel}'")
             return True
@@ -977,6 +1218,8 @@ class RealtimeConnectionManager:
                 if not self.user_channels[user_id]:
                     del self.user_channels[user_id]
 
+            await self.backplane.remove_channel_member(channel, user_id)
+
             logger.info(f"User {user_id} unsubscribed from channel '{channel}'")
             return True
 
@@ -989,19 +1232,15 @@ class RealtimeConnectionManager:
     async def broadcast_to_channel(self, channel: str, message: RealtimeMessage):
         """Broadcast message to all subscribers of a channel"""
         try:
-            if channel not in self.channel_subscribers:
+            subscribers = await self.backplane.channel_members(channel)
+            if not subscribers:
                 logger.warning(
                     f"Attempted to broadcast to non-existent channel '{channel}'"
                 )
                 return 0
 
-            sent_count = 0
-            for user_id in self.channel_subscribers[
-                channel
-            ].copy():  # Copy to avoid modification during iteration
-                success = await self.send_to_user(user_id, message)
-                if success:
-                    sent_count += 1
+            with obs.realtime_broadcast_seconds.labels("channel").time():
+                sent_count = await self._route(subscribers, message)
 
             logger.debug(
                 f"Broadcast to channel '{channel}': {sent_count} users reached"
@@ -1014,20 +1253,21 @@ class RealtimeConnectionManager:
 
     async def get_channel_subscribers(self, channel: str) -> List[int]:
         """Get list of user IDs subscribed to a channel"""
-        return list(self.channel_subscribers.get(channel, set()))
+        return list(await self.backplane.channel_members(channel))
 
     async def get_user_channels(self, user_id: int) -> List[str]:
         """Get list of channels a user is subscribed to"""
-        return list(self.user_channels.get(user_id, set()))
+        return list(await self.backplane.user_channels(user_id))
 
     async def cleanup_user_channels(self, user_id: int):
         """Clean up all channel subscriptions for a user (called on disconnect)"""
         try:
-            if user_id not in self.user_channels:
+            # Subscriptions may have been made through other nodes
+            channels_to_cleanup = await self.backplane.user_channels(user_id)
+            channels_to_cleanup |= self.user_channels.get(user_id, set())
+            if not channels_to_cleanup:
                 return
 
-            channels_to_cleanup = self.user_channels[user_id].copy()
-
             for channel in channels_to_cleanup:
                 await self.unsubscribe_from_channel(user_id, channel)
 
@@ -1040,7 +1280,7 @@ class RealtimeConnectionManager:
 
     # Soul-specific message handlers
 
-    async def handle_energy_pulse(self, user_id: int, data: Dict, db: Session):
+    async def handle_energy_pulse(self, user_id: int, data: Dict, db: DbSession):
         """Handle energy pulse updates for soul connections"""
         try:
             connection_id = data.get("connectionId")
@@ -1072,7 +1312,7 @@ class RealtimeConnectionManager:
             logger.error(f"Error handling energy pulse: {str(e)}")
             return False
 
-    async def handle_presence_update(self, user_id: int, data: Dict, db: Session):
+    async def handle_presence_update(self, user_id: int, data: Dict, db: DbSession):
         """Handle presence status updates"""
         try:
             status = data.get("status", "online")
@@ -1106,7 +1346,7 @@ class RealtimeConnectionManager:
             return False
 
     async def broadcast_compatibility_update(
-        self, connection_id: int, compatibility_data: Dict, db: Session
+        self, connection_id: int, compatibility_data: Dict, db: DbSession
     ):
         """Broadcast compatibility score updates to subscribers"""
         try:
@@ -1143,7 +1383,7 @@ class RealtimeConnectionManager:
             logger.error(f"Error broadcasting compatibility update: {str(e)}")
             return False
 
-    async def broadcast_new_match(self, user_id: int, match_data: Dict, db: Session):
+    async def broadcast_new_match(self, user_id: int, match_data: Dict, db: DbSession):
         """Broadcast new match notification"""
         try:
             match_message = RealtimeMessage(
@@ -1169,7 +1409,7 @@ class RealtimeConnectionManager:
             return False
 
     async def broadcast_revelation_update(
-        self, connection_id: int, revelation_data: Dict, db: Session
+        self, connection_id: int, revelation_data: Dict, db: DbSession
     ):
         """Broadcast revelation sharing updates"""
         try:
@@ -1215,6 +1455,7 @@ class RealtimeConnectionManager:
     def get_connection_stats(self) -> Dict:
         """Get real-time system statistics"""
         return {
+            "node_id": self.node_id,
             "active_connections": len(self.active_connections),
             "typing_sessions": sum(
                 len(sessions) for sessions in self.typing_sessions.values()
@@ -1224,9 +1465,7 @@ class RealtimeConnectionManager:
             "total_channel_subscriptions": sum(
                 len(subs) for subs in self.channel_subscribers.values()
             ),
-            "queued_messages": sum(
-                len(queue) for queue in self.offline_message_queue.values()
-            ),
+            "queued_messages": self.backplane.queued_message_count(),
             "user_presence_tracked": len(self.user_presence),
         }
 
@@ -298,8 +298,7 @@ class RealtimeIntegrationService:
             await realtime_manager.cleanup_user_channels(user_id)
 
             # Clear message queue
-            if user_id in realtime_manager.offline_message_queue:
-                del realtime_manager.offline_message_queue[user_id]
+            await realtime_manager.clear_offline_messages(user_id)
 
             logger.info(f"Real-time data cleaned up for user {user_id}")
             return True
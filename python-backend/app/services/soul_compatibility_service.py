@@ -8,15 +8,68 @@ import logging
 import math
 from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.models.soul_analytics import CompatibilityAccuracyTracking
 from app.models.soul_connection import ConnectionEnergyLevel
 from app.models.user import User
+from app.services.keyword_matcher import keyword_matcher
+from app.services.pair_score_cache import field_fingerprint, pair_score_cache
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever scoring logic or weights change so cached pair results
+# are not served across versions
+SOUL_ALGORITHM_VERSION = 1
+
+# Pair score cache namespace for this service's results
+SOUL_SCORER = "soul"
+
+# User fields read by calculate_compatibility; cached pair results are only
+# served while both users' fingerprints of these fields are unchanged
+SCORE_SOURCE_FIELDS = (
+    "interests",
+    "core_values",
+    "emotional_responses",
+    "communication_style",
+    "personality_traits",
+    "location",
+    "date_of_birth",
+    "gender",
+    "dietary_preferences",
+    "first_name",
+    "last_name",
+)
+
+# Indicators of emotional self-awareness in onboarding responses
+EMOTIONAL_AWARENESS_INDICATORS = [
+    "feel",
+    "emotion",
+    "aware",
+    "understand",
+    "recognize",
+    "process",
+    "handle",
+    "cope",
+    "manage",
+    "express",
+]
+
+# Indicators of empathy and consideration in onboarding responses
+EMPATHY_INDICATORS = [
+    "understand",
+    "others",
+    "perspective",
+    "feelings",
+    "empathy",
+    "care",
+    "support",
+    "help",
+    "listen",
+    "compassion",
+]
+
 
 @dataclass
 class CompatibilityScore:
@@ -67,6 +120,15 @@ class SoulCompatibilityService:
 
         # Value keywords for semantic matching
         self.value_keywords = self._initialize_value_keywords()
+        self.value_matchers = {
+            category: keyword_matcher(
+                {
+                    value_type: [keyword.lower() for keyword in keywords]
+                    for value_type, keywords in value_types.items()
+                }
+            )
+            for category, value_types in self.value_keywords.items()
+        }
 
         # Personality trait mappings
         self.personality_traits = self._initialize_personality_traits()
@@ -79,16 +141,30 @@ class SoulCompatibilityService:
         """
         Calculate comprehensive compatibility between two users
         """
+        stamps = self._pair_cache_stamps(user1, user2)
+        if stamps is not None:
+            cached = pair_score_cache.get(
+                SOUL_SCORER, user1.id, user2.id, SOUL_ALGORITHM_VERSION, stamps
+            )
+            if cached is not None:
+                return cached
+
         try:
+            features1, features2 = self._load_features(user1, user2, db)
+
             # Individual component scores
             interests_score = self._calculate_interests_compatibility(user1, user2)
-            values_score = self._calculate_values_compatibility(user1, user2)
+            values_score = self._calculate_values_compatibility(
+                user1, user2, features1, features2
+            )
             personality_score = self._calculate_personality_compatibility(user1, user2)
             communication_score = self._calculate_communication_compatibility(
                 user1, user2
             )
             demographic_score = self._calculate_demographic_compatibility(user1, user2)
-            emotional_score = self._calculate_emotional_resonance(user1, user2)
+            emotional_score = self._calculate_emotional_resonance(
+                user1, user2, features1, features2
+            )
 
             # Weighted total score
             total_score = (
@@ -137,7 +213,7 @@ class SoulCompatibilityService:
                 total_score, strengths, growth_areas
             )
 
-            return CompatibilityScore(
+            score = CompatibilityScore(
                 total_score=round(total_score, 1),
                 confidence=round(confidence, 1),
                 interests_score=round(interests_score, 1),
@@ -153,11 +229,68 @@ class SoulCompatibilityService:
                 compatibility_summary=compatibility_summary,
             )
 
+            if stamps is not None:
+                pair_score_cache.set(
+                    SOUL_SCORER,
+                    user1.id,
+                    user2.id,
+                    SOUL_ALGORITHM_VERSION,
+                    score,
+                    stamps,
+                )
+            return score
+
         except Exception as e:
             logger.error(f"Error calculating compatibility: {str(e)}")
             # Return default score on error
             return self._default_compatibility_score()
 
+    def extract_features(self, user: User) -> Dict[str, Any]:
+        """
+        Precompute the text-derived signals this service uses for a single user.
+        Stored by the compatibility feature store and reused across pairs.
+        """
+        values = user.core_values or {}
+        value_signals = {}
+        for category in self.value_keywords.keys():
+            value = values.get(category, "")
+            if isinstance(value, list):
+                value = " ".join(str(v) for v in value)
+            value_signals[category] = self._extract_value_signals(value, category)
+
+        responses = user.emotional_responses or {}
+        return {
+            "value_signals": value_signals,
+            "awareness_indicators": self._count_indicators(
+                responses, EMOTIONAL_AWARENESS_INDICATORS
+            ),
+            "empathy_indicators": self._count_indicators(responses, EMPATHY_INDICATORS),
+        }
+
+    def _pair_cache_stamps(self, user1: User, user2: User) -> Optional[Tuple[str, str]]:
+        """Input fingerprints for the pair cache, or None if not cacheable"""
+        if not (isinstance(user1.id, int) and isinstance(user2.id, int)):
+            return None
+        return (
+            field_fingerprint(user1, SCORE_SOURCE_FIELDS),
+            field_fingerprint(user2, SCORE_SOURCE_FIELDS),
+        )
+
+    def _load_features(
+        self, user1: User, user2: User, db: Session
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Fetch both users' precomputed features, or (None, None) on failure."""
+        try:
+            from app.services.compatibility_feature_store import (
+                compatibility_feature_store,
+            )
+
+            features = compatibility_feature_store.get_many(db, [user1, user2])
+            return features[user1.id].soul, features[user2.id].soul
+        except Exception as e:
+            logger.warning(f"Feature store unavailable, computing inline: {str(e)}")
+            return None, None
+
     def _calculate_interests_compatibility(self, user1: User, user2: User) -> float:
         """Calculate compatibility based on shared interests using Jaccard similarity"""
         try:
@@ -192,7 +325,13 @@ class SoulCompatibilityService:
             logger.error(f"Error calculating interests compatibility: {str(e)}")
             return 50.0
 
-    def _calculate_values_compatibility(self, user1: User, user2: User) -> float:
+    def _calculate_values_compatibility(
+        self,
+        user1: User,
+        user2: User,
+        features1: Optional[Dict[str, Any]] = None,
+        features2: Optional[Dict[str, Any]] = None,
+    ) -> float:
         """Calculate values alignment using semantic keyword matching"""
         try:
             values1 = user1.core_values or {}
@@ -218,8 +357,12 @@ class SoulCompatibilityService:
                 if isinstance(val2, list):
                     val2 = " ".join(str(v) for v in val2)
 
-                score1 = self._extract_value_signals(val1, category)
-                score2 = self._extract_value_signals(val2, category)
+                if features1 is not None and features2 is not None:
+                    score1 = features1["value_signals"].get(category, {})
+                    score2 = features2["value_signals"].get(category, {})
+                else:
+                    score1 = self._extract_value_signals(val1, category)
+                    score2 = self._extract_value_signals(val2, category)
 
                 if score1 and score2:
                     # Calculate similarity between value vectors
@@ -252,12 +395,14 @@ class SoulCompatibilityService:
                                 "family": {"freedom", "independence"},
                             }
 
+                            # Look both ways so the score is symmetric
                             conflict_score = 0
-                            for val in set1:
-                                if val in conflicts and set2.intersection(
-                                    conflicts[val]
-                                ):
-                                    conflict_score += 1
+                            for own, other in ((set1, set2), (set2, set1)):
+                                for val in own:
+                                    if val in conflicts and other.intersection(
+                                        conflicts[val]
+                                    ):
+                                        conflict_score += 1
 
                             if conflict_score > 0:
                                 # Strong conflict - very low compatibility
@@ -414,7 +559,13 @@ class SoulCompatibilityService:
             logger.error(f"Error calculating demographic compatibility: {str(e)}")
             return 50.0
 
-    def _calculate_emotional_resonance(self, user1: User, user2: User) -> float:
+    def _calculate_emotional_resonance(
+        self,
+        user1: User,
+        user2: User,
+        features1: Optional[Dict[str, Any]] = None,
+        features2: Optional[Dict[str, Any]] = None,
+    ) -> float:
         """Calculate emotional intelligence and resonance compatibility"""
         try:
             responses1 = user1.emotional_responses or {}
@@ -429,12 +580,24 @@ class SoulCompatibilityService:
             # Analyze emotional depth and maturity indicators
             emotional_factors = []
 
+            if features1 is not None and features2 is not None:
+                awareness_score = self._score_emotional_awareness(
+                    features1["awareness_indicators"],
+                    features2["awareness_indicators"],
+                )
+                empathy_score = self._score_empathy_levels(
+                    features1["empathy_indicators"], features2["empathy_indicators"]
+                )
+            else:
+                awareness_score = self._compare_emotional_awareness(
+                    responses1, responses2
+                )
+                empathy_score = self._compare_empathy_levels(responses1, responses2)
+
             # Emotional self-awareness
-            awareness_score = self._compare_emotional_awareness(responses1, responses2)
             emotional_factors.append(awareness_score)
 
             # Empathy indicators
-            empathy_score = self._compare_empathy_levels(responses1, responses2)
             emotional_factors.append(empathy_score)
 
             # Emotional expression style
@@ -694,15 +857,12 @@ class SoulCompatibilityService:
         signals = {}
 
         category_keywords = self.value_keywords.get(category, {})
+        matcher = self.value_matchers.get(category)
+        if matcher is None:
+            return signals
 
-        for value_type, keywords in category_keywords.items():
-            score = 0.0
-            for keyword in keywords:
-                if keyword.lower() in text_lower:
-                    score += 1.0
-
-            if score > 0:
-                signals[value_type] = min(1.0, score / len(keywords))
+        for value_type, hits in matcher.counts(text_lower).items():
+            signals[value_type] = min(1.0, hits / len(category_keywords[value_type]))
 
         return signals
 
@@ -1008,22 +1168,12 @@ class SoulCompatibilityService:
     def _compare_emotional_awareness(self, responses1: Dict, responses2: Dict) -> float:
         """Compare emotional self-awareness levels"""
         # Look for indicators of emotional intelligence in responses
-        awareness_indicators = [
-            "feel",
-            "emotion",
-            "aware",
-            "understand",
-            "recognize",
-            "process",
-            "handle",
-            "cope",
-            "manage",
-            "express",
-        ]
-
-        score1 = self._count_indicators(responses1, awareness_indicators)
-        score2 = self._count_indicators(responses2, awareness_indicators)
+        score1 = self._count_indicators(responses1, EMOTIONAL_AWARENESS_INDICATORS)
+        score2 = self._count_indicators(responses2, EMOTIONAL_AWARENESS_INDICATORS)
+        return self._score_emotional_awareness(score1, score2)
 
+    def _score_emotional_awareness(self, score1: int, score2: int) -> float:
+        """Map two awareness indicator counts to a compatibility score"""
         # Both high awareness
         if score1 >= 3 and score2 >= 3:
             return 85.0
@@ -1038,22 +1188,12 @@ class SoulCompatibilityService:
 
     def _compare_empathy_levels(self, responses1: Dict, responses2: Dict) -> float:
         """Compare empathy and consideration levels"""
-        empathy_indicators = [
-            "understand",
-            "others",
-            "perspective",
-            "feelings",
-            "empathy",
-            "care",
-            "support",
-            "help",
-            "listen",
-            "compassion",
-        ]
-
-        score1 = self._count_indicators(responses1, empathy_indicators)
-        score2 = self._count_indicators(responses2, empathy_indicators)
+        score1 = self._count_indicators(responses1, EMPATHY_INDICATORS)
+        score2 = self._count_indicators(responses2, EMPATHY_INDICATORS)
+        return self._score_empathy_levels(score1, score2)
 
+    def _score_empathy_levels(self, score1: int, score2: int) -> float:
+        """Map two empathy indicator counts to a compatibility score"""
         if score1 >= 2 and score2 >= 2:
             return 80.0
         elif score1 >= 1 and score2 >= 1:
@@ -1071,13 +1211,11 @@ class SoulCompatibilityService:
 
     def _count_indicators(self, responses: Dict, indicators: List[str]) -> int:
         """Count occurrence of indicator words in responses"""
+        matcher = keyword_matcher({"indicators": indicators})
         count = 0
         for response in responses.values():
             if isinstance(response, str):
-                response_lower = response.lower()
-                for indicator in indicators:
-                    if indicator in response_lower:
-                        count += 1
+                count += matcher.counts(response.lower()).get("indicators", 0)
         return count
 
     def _identify_strengths(
@@ -0,0 +1,114 @@
+"""
+Write-Behind Buffers
+Base for bookkeeping that is recorded in memory on the request path and
+written to the database in batches by a background loop. A flush runs every
+`flush_interval_seconds`, or as soon as `max_pending` items are buffered.
+
+Buffered work is lost if the process dies between flushes, so only data that
+can tolerate that (counters, analytics) belongs here.
+"""
+
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from app.core import database
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer(ABC):
+    """
+    Subclasses buffer under `self._lock`, call `_notify_pending` after
+    recording, and implement `pending`, `_take` and `_write`
+    """
+
+    name = "write-behind"
+
+    def __init__(self, flush_interval_seconds: float = 1.0, max_pending: int = 500):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @abstractmethod
+    def pending(self) -> int:
+        """Number of items waiting for the next flush"""
+
+    @abstractmethod
+    def _take(self) -> Optional[Any]:
+        """Detach the buffered batch, or None if empty (called under the lock)"""
+
+    @abstractmethod
+    def _write(self, db: Session, batch: Any) -> int:
+        """Write one batch and commit; returns the number of items written"""
+
+    def _notify_pending(self, pending: int) -> None:
+        if pending >= self.max_pending and self._wakeup is not None:
+            # Recording may happen off the loop thread
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"{self.name} started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._wakeup = None
+        # Drain what is buffered so a clean shutdown loses nothing
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception as e:
+            logger.error(f"{self.name} final flush error: {e}")
+        logger.info(f"{self.name} stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"{self.name} flush error: {e}")
+
+    def flush(self, db: Optional[Session] = None) -> int:
+        """Write everything buffered so far; returns the number of items"""
+        with self._lock:
+            batch = self._take()
+        if batch is None:
+            return 0
+
+        if db is not None:
+            return self._write_batch(db, batch)
+        with database.SessionLocal() as session:
+            return self._write_batch(session, batch)
+
+    def _write_batch(self, db: Session, batch: Any) -> int:
+        try:
+            return self._write(db, batch)
+        except Exception:
+            db.rollback()
+            logger.error(f"{self.name} dropped a batch of buffered writes")
+            raise
@@ -0,0 +1,170 @@
+"""
+In-memory test doubles shared across the unit test suites
+"""
+
+import threading
+
+
+class FakePipeline:
+    """Queues any command and replays it on execute() as one round trip"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return queue
+
+    def execute(self):
+        redis = self.redis
+        round_trips = redis.round_trips
+        results = [
+            getattr(redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.commands
+        ]
+        redis.round_trips = round_trips + 1
+        return results
+
+
+class FakeRedis:
+    """
+    Just enough of the redis-py client for the cache, single-flight and
+    experiment suites. TTLs are accepted and ignored; every direct command
+    counts as one round trip.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.sorted_sets = {}
+        self.published = []
+        self.round_trips = 0
+        self._lock = threading.Lock()
+
+    # Strings
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.values.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        self.round_trips += 1
+        with self._lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = value
+            return True
+
+    def mset(self, mapping):
+        self.round_trips += 1
+        self.values.update(mapping)
+        return True
+
+    def incr(self, key, amount=1):
+        self.round_trips += 1
+        with self._lock:
+            self.values[key] = int(self.values.get(key, 0)) + amount
+            return self.values[key]
+
+    # Keys
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        removed = 0
+        with self._lock:
+            for key in keys:
+                for store in (self.values, self.hashes, self.sorted_sets):
+                    if store.pop(key, None) is not None:
+                        removed += 1
+        return removed
+
+    unlink = delete
+
+    def exists(self, key):
+        self.round_trips += 1
+        return int(self._has(key))
+
+    def expire(self, key, seconds):
+        self.round_trips += 1
+        return int(self._has(key))
+
+    def _has(self, key):
+        return key in self.values or key in self.hashes or key in self.sorted_sets
+
+    def keys(self, pattern):
+        raise AssertionError("KEYS must not be used")
+
+    # Hashes
+
+    def hset(self, name, key, value):
+        self.round_trips += 1
+        self.hashes.setdefault(name, {})[key] = value
+        return 1
+
+    def hget(self, name, key):
+        self.round_trips += 1
+        return self.hashes.get(name, {}).get(key)
+
+    def hgetall(self, name):
+        self.round_trips += 1
+        return dict(self.hashes.get(name, {}))
+
+    def hincrby(self, name, key, amount=1):
+        self.round_trips += 1
+        with self._lock:
+            bucket = self.hashes.setdefault(name, {})
+            bucket[key] = bucket.get(key, 0) + amount
+            return bucket[key]
+
+    # Sorted sets
+
+    def zadd(self, name, mapping):
+        self.round_trips += 1
+        self.sorted_sets.setdefault(name, {}).update(mapping)
+        return len(mapping)
+
+    def zremrangebyscore(self, name, low, high):
+        self.round_trips += 1
+        members = self.sorted_sets.get(name, {})
+        expired = [member for member, score in members.items() if score <= high]
+        for member in expired:
+            del members[member]
+        return len(expired)
+
+    def zrange(self, name, start, end):
+        self.round_trips += 1
+        return list(self.sorted_sets.get(name, {}))
+
+    def zrem(self, name, *members):
+        self.round_trips += 1
+        scores = self.sorted_sets.get(name, {})
+        return sum(scores.pop(member, None) is not None for member in members)
+
+    # Pub/sub, scripts, pipelines
+
+    def publish(self, channel, message):
+        self.round_trips += 1
+        self.published.append((channel, message))
+        return 0
+
+    def pubsub(self, **kwargs):
+        raise ConnectionError("no pub/sub in tests")
+
+    def eval(self, script, numkeys, key, token):
+        """Only the compare-and-delete lock release script is supported"""
+        self.round_trips += 1
+        with self._lock:
+            if self.values.get(key) == token:
+                del self.values[key]
+                return 1
+            return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
@@ -6,7 +6,7 @@ Tests if Sprint 8 microservices components can be imported safely in CI environm
 
 import importlib.util
 import sys
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 
 # Mock heavy dependencies for CI
@@ -65,50 +65,55 @@ def mock_heavy_dependencies():
 def test_sprint8_components():
     """Test importing Sprint 8 components"""
 
-    # Mock dependencies first
-    mock_heavy_dependencies()
-
-    # Get the correct path relative to script location
-    import os
-
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    backend_dir = os.path.dirname(os.path.dirname(script_dir))
-
-    # Add backend directory to Python path so 'app' module can be found
-    if backend_dir not in sys.path:
-        sys.path.insert(0, backend_dir)
-
-    test_files = [
-        os.path.join(backend_dir, "app/core/redis_cluster_manager.py"),
-        os.path.join(backend_dir, "app/core/event_publisher.py"),
-        os.path.join(backend_dir, "app/ai/sentiment_analysis.py"),
-        os.path.join(backend_dir, "app/ai/ml_model_registry.py"),
-        os.path.join(backend_dir, "app/core/advanced_caching.py"),
-    ]
-
-    success_count = 0
-    total_count = len(test_files)
-
-    print("Testing Sprint 8 Microservices Components...")
-    print("=" * 50)
-
-    for file_path in test_files:
-        if os.path.exists(file_path):
-            try:
-                spec = importlib.util.spec_from_file_location("test_module", file_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                print(f"✅ {file_path}")
-                success_count += 1
-            except Exception as e:
-                print(f"❌ {file_path}: {e}")
-        else:
-            print(f"⚠️  {file_path}: File not found")
-
-    print("=" * 50)
-    print(f"Results: {success_count}/{total_count} components loaded successfully")
-
-    return success_count == total_count
+    # Restore sys.modules afterwards so the mocks do not leak into tests
+    # that run later in the same process
+    with patch.dict(sys.modules):
+        # Mock dependencies first
+        mock_heavy_dependencies()
+
+        # Get the correct path relative to script location
+        import os
+
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        backend_dir = os.path.dirname(os.path.dirname(script_dir))
+
+        # Add backend directory to Python path so 'app' module can be found
+        if backend_dir not in sys.path:
+            sys.path.insert(0, backend_dir)
+
+        test_files = [
+            os.path.join(backend_dir, "app/core/redis_cluster_manager.py"),
+            os.path.join(backend_dir, "app/core/event_publisher.py"),
+            os.path.join(backend_dir, "app/ai/sentiment_analysis.py"),
+            os.path.join(backend_dir, "app/ai/ml_model_registry.py"),
+            os.path.join(backend_dir, "app/core/advanced_caching.py"),
+        ]
+
+        success_count = 0
+        total_count = len(test_files)
+
+        print("Testing Sprint 8 Microservices Components...")
+        print("=" * 50)
+
+        for file_path in test_files:
+            if os.path.exists(file_path):
+                try:
+                    spec = importlib.util.spec_from_file_location(
+                        "test_module", file_path
+                    )
+                    module = importlib.util.module_from_spec(spec)
+                    spec.loader.exec_module(module)
+                    print(f"✅ {file_path}")
+                    success_count += 1
+                except Exception as e:
+                    print(f"❌ {file_path}: {e}")
+            else:
+                print(f"⚠️  {file_path}: File not found")
+
+        print("=" * 50)
+        print(f"Results: {success_count}/{total_count} components loaded successfully")
+
+        return success_count == total_count
 
 
 if __name__ == "__main__":
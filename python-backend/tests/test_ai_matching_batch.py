@@ -0,0 +1,180 @@
+"""
+Tests for the batched AI compatibility pipeline.
+Batch scoring must produce the same predictions as the per-pair path.
+"""
+
+import random
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+from app.models.ai_models import CompatibilityPrediction, UserProfile
+from app.services.ai_matching_service import AIMatchingService, BehaviorAnalysis
+
+
+@pytest.fixture
+def service():
+    return AIMatchingService()
+
+
+def make_profile(profile_id, seed):
+    rng = random.Random(seed)
+    profile = Mock(spec=UserProfile)
+    profile.id = profile_id
+    profile.user_id = profile_id * 10
+    profile.personality_vector = [rng.random() for _ in range(128)]
+    profile.interests_vector = [rng.random() for _ in range(64)]
+    profile.values_vector = [rng.random() for _ in range(64)]
+    profile.communication_vector = [rng.random() for _ in range(32)]
+    profile.openness_score = rng.random()
+    profile.conscientiousness_score = rng.random()
+    profile.neuroticism_score = rng.random()
+    profile.agreeableness_score = rng.random()
+    profile.emotional_intelligence = rng.random()
+    profile.conversation_depth_preference = rng.random()
+    profile.communication_style = rng.choice(["direct", "diplomatic", "detailed"])
+    profile.ai_confidence_level = 0.5 + rng.random() / 2
+    return profile
+
+
+@pytest.fixture
+def mock_db():
+    db = Mock()
+    db.query.return_value.filter.return_value.all.return_value = []
+    return db
+
+
+class TestBehaviorHelpers:
+    @pytest.mark.parametrize("counts", [(0, 0, 0), (12, 2, 5), (200, 0, 1)])
+    def test_engagement_from_counts_matches_lists(self, service, counts):
+        messages, connections, revelations = ([Mock()] * n for n in counts)
+
+        assert service._engagement_score_from_counts(
+            *counts, 30
+        ) == service._calculate_behavioral_engagement_score(
+            messages, connections, revelations, 30
+        )
+
+    def test_style_from_lengths_matches_contents(self, service):
+        revelations = [{"content": "x" * n} for n in (0, 40, 180, 95)]
+
+        assert service._communication_style_from_lengths(
+            40 + 180 + 95, 3
+        ) == service._determine_communication_style([], revelations)
+        assert service._communication_style_from_lengths(0, 0) == "thoughtful"
+
+
+class TestCalculateAICompatibilityBatch:
+    @pytest.mark.asyncio
+    async def test_matches_per_pair_scores(self, service, mock_db):
+        seeker = make_profile(1, seed=1)
+        candidates = [make_profile(i, seed=i) for i in range(2, 7)]
+        behaviors = {
+            p.user_id: (0.1 * p.id, "deep" if p.id % 2 else "casual")
+            for p in [seeker] + candidates
+        }
+
+        with patch.object(
+            service,
+            "_bulk_behavior_summaries",
+            AsyncMock(return_value=behaviors),
+        ), patch.object(
+            service, "_generate_conversation_starters", AsyncMock(return_value=[])
+        ):
+            predictions = await service.calculate_ai_compatibility_batch(
+                seeker, candidates, mock_db
+            )
+
+            for candidate in candidates:
+                lifestyle = service._lifestyle_compatibility_from_behavior(
+                    behaviors[seeker.user_id], behaviors[candidate.user_id]
+                )
+                expected = await service._score_profile_pair(
+                    seeker, candidate, lifestyle, mock_db
+                )
+                prediction = predictions[candidate.user_id]
+                assert isinstance(prediction, CompatibilityPrediction)
+                for field, value in expected.items():
+                    assert getattr(prediction, field) == value
+
+        assert mock_db.add.call_count == len(candidates)
+        mock_db.commit.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_lifestyle_matches_behavior_analysis(self, service, mock_db):
+        behavior1 = BehaviorAnalysis([], 0.8, "deep", {}, [])
+        behavior2 = BehaviorAnalysis([], 0.3, "deep", {}, [])
+
+        with patch.object(
+            service,
+            "analyze_user_behavior",
+            AsyncMock(side_effect=[behavior1, behavior2]),
+        ):
+            score = await service._calculate_lifestyle_compatibility(1, 2, mock_db)
+
+        assert score == service._lifestyle_compatibility_from_behavior(
+            (0.8, "deep"), (0.3, "deep")
+        )
+
+    @pytest.mark.asyncio
+    async def test_empty_candidates(self, service, mock_db):
+        assert (
+            await service.calculate_ai_compatibility_batch(
+                make_profile(1, seed=1), [], mock_db
+            )
+            == {}
+        )
+        mock_db.commit.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_second_batch_served_from_cache(self, service, mock_db):
+        seeker = make_profile(1, seed=1)
+        candidates = [make_profile(i, seed=i) for i in range(2, 5)]
+        behaviors = {p.user_id: (0.5, "deep") for p in [seeker] + candidates}
+        summaries = AsyncMock(return_value=behaviors)
+
+        score_pair = AsyncMock(wraps=service._score_profile_pair)
+
+        with patch.object(service, "_bulk_behavior_summaries", summaries), patch.object(
+            service, "_score_profile_pair", score_pair
+        ):
+            first = await service.calculate_ai_compatibility_batch(
+                seeker, candidates, mock_db
+            )
+            second = await service.calculate_ai_compatibility_batch(
+                seeker, candidates, mock_db
+            )
+
+        assert score_pair.await_count == len(candidates)
+        for user_id, prediction in first.items():
+            assert (
+                second[user_id].overall_compatibility
+                == prediction.overall_compatibility
+            )
+
+    @pytest.mark.asyncio
+    async def test_behavior_change_misses_cache(self, service, mock_db):
+        seeker = make_profile(1, seed=1)
+        candidates = [make_profile(i, seed=i) for i in range(2, 5)]
+        behaviors = {p.user_id: (0.5, "deep") for p in [seeker] + candidates}
+        summaries = AsyncMock(return_value=behaviors)
+        score_pair = AsyncMock(wraps=service._score_profile_pair)
+
+        with patch.object(service, "_bulk_behavior_summaries", summaries), patch.object(
+            service, "_score_profile_pair", score_pair
+        ):
+            await service.calculate_ai_compatibility_batch(seeker, candidates, mock_db)
+            # New messages change one candidate's engagement, not their profile
+            behaviors[candidates[0].user_id] = (0.9, "deep")
+            await service.calculate_ai_compatibility_batch(seeker, candidates, mock_db)
+
+        assert score_pair.await_count == len(candidates) + 1
+
+    @pytest.mark.asyncio
+    async def test_conflict_prediction_is_symmetric(self, service, mock_db):
+        profile1, profile2 = make_profile(1, seed=1), make_profile(2, seed=2)
+        profile1.communication_style = "direct"
+        profile2.communication_style = "diplomatic"
+
+        assert await service._predict_conflict_likelihood(
+            profile1, profile2, mock_db
+        ) == await service._predict_conflict_likelihood(profile2, profile1, mock_db)
@@ -73,9 +73,10 @@ class TestAnalyticsServiceCore:
             db=mock_db,
         )
 
-        assert isinstance(result, bool)
-        mock_db.add.assert_called()
-        mock_db.commit.assert_called()
+        assert result is True
+        # Buffered; written by the next flush rather than in the request
+        mock_db.commit.assert_not_called()
+        assert service.event_buffer.pending() == 1
 
     @pytest.mark.asyncio
     async def test_get_engagement_metrics(self, service, test_user, mock_db):
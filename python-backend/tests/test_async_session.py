@@ -0,0 +1,107 @@
+"""
+Tests for the async session request path
+"""
+
+import pytest
+from app.api.v1.deps import get_current_user_async, get_current_user_websocket
+from app.core.database import run_with_session
+from app.core.security import create_access_token
+from app.models.message import Message
+from app.models.soul_connection import SoulConnection
+from app.services.conversation_inbox import (
+    load_inbox_async,
+    mark_conversation_read_async,
+)
+from fastapi import HTTPException
+from tests.factories import UserFactory
+
+
+def connect(db_session, user, partner):
+    connection = SoulConnection(
+        user1_id=user.id, user2_id=partner.id, initiated_by=user.id
+    )
+    db_session.add(connection)
+    db_session.commit()
+    return connection
+
+
+def send(db_session, connection, sender, text):
+    message = Message(
+        connection_id=connection.id, sender_id=sender.id, message_text=text
+    )
+    db_session.add(message)
+    db_session.commit()
+    return message
+
+
+def count_messages(db, connection_id):
+    return db.query(Message).filter(Message.connection_id == connection_id).count()
+
+
+@pytest.fixture
+def user(db_session):
+    return UserFactory()
+
+
+class TestAsyncInbox:
+    async def test_inbox_matches_sync(self, db_session, async_db_session, user):
+        partner = UserFactory()
+        connection = connect(db_session, partner, user)
+        send(db_session, connection, partner, "hello")
+        send(db_session, connection, partner, "still there?")
+
+        entries = await load_inbox_async(async_db_session, user.id)
+
+        assert len(entries) == 1
+        assert entries[0].partner.id == partner.id
+        assert entries[0].last_message.message_text == "still there?"
+        assert entries[0].unread_count == 2
+
+    async def test_mark_read(self, db_session, async_db_session, user):
+        partner = UserFactory()
+        connection = connect(db_session, user, partner)
+        send(db_session, connection, partner, "one")
+
+        updated = await mark_conversation_read_async(
+            async_db_session, connection.id, user.id
+        )
+        await async_db_session.commit()
+
+        assert updated == 1
+        db_session.refresh(connection)
+        assert connection.get_unread_count(user.id) == 0
+
+
+class TestAsyncAuth:
+    async def test_token_resolves_user(self, async_db_session, user):
+        token = create_access_token({"sub": user.email})
+
+        current = await get_current_user_async(db=async_db_session, token=token)
+
+        assert current.id == user.id
+
+    async def test_unknown_user_is_rejected(self, async_db_session):
+        token = create_access_token({"sub": "nobody@example.com"})
+
+        with pytest.raises(HTTPException) as exc_info:
+            await get_current_user_async(db=async_db_session, token=token)
+
+        assert exc_info.value.status_code == 401
+
+    async def test_websocket_auth(self, async_db_session, user):
+        token = create_access_token({"sub": user.email})
+
+        assert (await get_current_user_websocket(token, async_db_session)).id == user.id
+        assert await get_current_user_websocket("invalid", async_db_session) is None
+
+
+class TestRunWithSession:
+    async def test_either_session_kind(self, db_session, async_db_session, user):
+        partner = UserFactory()
+        connection = connect(db_session, user, partner)
+        send(db_session, connection, user, "hi")
+
+        assert await run_with_session(db_session, count_messages, connection.id) == 1
+        assert (
+            await run_with_session(async_db_session, count_messages, connection.id) == 1
+        )
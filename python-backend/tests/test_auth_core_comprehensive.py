@@ -49,7 +49,7 @@ class TestGetCurrentUser:
             mock_decode.return_value = {"user_id": 1, "sub": "test@example.com"}
 
             # Call the function
-            result = await get_current_user("valid_token", mock_db)
+            result = get_current_user("valid_token", mock_db)
 
             # Assertions
             assert result == mock_user
@@ -65,7 +65,7 @@ class TestGetCurrentUser:
             mock_decode.return_value = None
 
             with pytest.raises(HTTPException) as exc_info:
-                await get_current_user("invalid_token", mock_db)
+                get_current_user("invalid_token", mock_db)
 
             assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
             assert "Could not validate credentials" in exc_info.value.detail
@@ -79,7 +79,7 @@ class TestGetCurrentUser:
             mock_decode.return_value = {"sub": "test@example.com"}  # Missing user_id
 
             with pytest.raises(HTTPException) as exc_info:
-                await get_current_user("token_without_user_id", mock_db)
+                get_current_user("token_without_user_id", mock_db)
 
             assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
 
@@ -92,7 +92,7 @@ class TestGetCurrentUser:
             mock_decode.side_effect = JWTError("Invalid token")
 
             with pytest.raises(HTTPException) as exc_info:
-                await get_current_user("malformed_token", mock_db)
+                get_current_user("malformed_token", mock_db)
 
             assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
 
@@ -112,7 +112,7 @@ class TestGetCurrentUser:
             mock_decode.return_value = {"user_id": 999, "sub": "missing@example.com"}
 
             with pytest.raises(HTTPException) as exc_info:
-                await get_current_user("valid_token_missing_user", mock_db)
+                get_current_user("valid_token_missing_user", mock_db)
 
             assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
 
@@ -435,7 +435,7 @@ class TestAuthErrorScenarios:
             mock_decode.return_value = {"user_id": 1}
 
             with pytest.raises(Exception):
-                await get_current_user("valid_token", corrupted_db)
+                get_current_user("valid_token", corrupted_db)
 
     def test_sync_auth_with_database_timeout(self):
         """Test synchronous auth function with database timeout"""
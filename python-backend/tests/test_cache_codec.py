@@ -0,0 +1,106 @@
+"""
+Tests for the binary cache codec
+"""
+
+import base64
+import gzip
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from app.services import cache_codec
+from app.services.cache_service import CacheService
+
+
+class StubRedis:
+    def exists(self, key):
+        return 1
+
+    def pubsub(self, **kwargs):
+        raise ConnectionError("no pub/sub in tests")
+
+
+@pytest.fixture
+def service():
+    return CacheService(StubRedis())
+
+
+def profile():
+    return {
+        "user_id": 42,
+        "first_name": "Sam",
+        "bio": "Loves long walks and slow dinners. " * 40,
+        "interests": ["cooking", "hiking", "jazz"],
+        "created_at": datetime(2026, 10, 1, 12, 30),
+    }
+
+
+class TestCodec:
+    @pytest.mark.parametrize("serializer", list(cache_codec.SERIALIZERS.values()))
+    @pytest.mark.parametrize("compressor", list(cache_codec.COMPRESSORS.values()))
+    def test_round_trip(self, serializer, compressor):
+        value = {"id": 1, "tags": ["a", "b"], "score": 0.5, "bio": "x" * 2000}
+
+        data = cache_codec.encode(value, serializer, compressor)
+
+        assert cache_codec.is_framed(data)
+        assert cache_codec.decode(data) == value
+
+    def test_small_payloads_are_not_compressed(self):
+        best = cache_codec.compressor_for(True)
+
+        data = cache_codec.encode({"id": 1}, cache_codec.serializer_for("json"), best)
+
+        assert data[0] & 0x03 == 0
+
+    def test_smaller_than_the_text_format(self):
+        value = profile()
+        legacy = base64.b64encode(
+            b"COMPRESSED:" + gzip.compress(json.dumps(value, default=str).encode())
+        )
+
+        data = cache_codec.encode(
+            value,
+            cache_codec.serializer_for("auto"),
+            cache_codec.compressor_for(True),
+        )
+
+        assert len(data) < len(legacy) * 0.8
+
+    def test_unencodable_values_fall_back_to_json(self):
+        serializer = cache_codec.serializer_for("auto")
+
+        data = cache_codec.encode({"big": 2**70}, serializer)
+
+        assert data[0] >> 2 == cache_codec.JsonSerializer.id
+        assert cache_codec.decode(data) == {"big": 2**70}
+
+    @pytest.mark.parametrize("value", [Decimal("9.99"), {1, 2}])
+    def test_msgpack_never_stringifies_silently(self, value):
+        data = cache_codec.encode({"v": value}, cache_codec.serializer_for("msgpack"))
+
+        assert data[0] >> 2 == cache_codec.JsonSerializer.id
+
+    def test_msgpack_keeps_int_keys(self):
+        data = cache_codec.encode({1: "a"}, cache_codec.serializer_for("msgpack"))
+
+        assert cache_codec.decode(data) == {1: "a"}
+
+
+class TestCacheServiceCodec:
+    def test_policies_use_the_binary_codec(self, service):
+        data = service._serialize(profile(), service._get_cache_policy("user_profile"))
+
+        assert cache_codec.is_framed(data)
+        value = service._deserialize(data, "user_profile:42")
+        assert value["bio"] == profile()["bio"]
+        assert value["created_at"] == "2026-10-01 12:30:00"
+
+    def test_reads_values_in_the_previous_format(self, service):
+        value = {"user_id": 7, "bio": "y" * 2000}
+        plain = json.dumps(value).encode()
+        compressed = base64.b64encode(b"COMPRESSED:" + gzip.compress(plain))
+
+        assert service._deserialize(plain, "user_profile:7") == value
+        assert service._deserialize(compressed, "user_profile:7") == value
@@ -0,0 +1,132 @@
+"""
+Tests for tag-indexed cache invalidation
+"""
+
+import json
+import time
+
+import pytest
+from app.core.cache_tags import INVALIDATION_CHANNEL, invalidate_tags, tag_key
+from app.services.cache_service import CacheService
+from tests.fakes import FakeRedis
+
+
+@pytest.fixture(autouse=True)
+def no_cache_warming(monkeypatch):
+    # The warmer thread would write its mock profiles into the fake Redis
+    monkeypatch.setattr(CacheService, "_setup_cache_warming", lambda self: None)
+
+
+@pytest.fixture
+def service():
+    return CacheService(FakeRedis())
+
+
+class TestTagIndex:
+    def test_set_indexes_policy_and_extra_tags(self, service):
+        service.set("user_profile:1", {"name": "Sam"}, tags=["user:1"])
+
+        redis = service.redis_client
+        for tag in ("user_data", "profile_updates", "user:1"):
+            assert "user_profile:1" in redis.sorted_sets[tag_key(tag)]
+
+    def test_invalidation_touches_only_tagged_keys(self, service):
+        service.set("user_profile:1", {"name": "Sam"})
+        service.set("emotional_profile:1", {"mood": "calm"})
+        service.set("conversation_threads:1", [])
+
+        count = service.invalidate_by_tags(["onboarding", "user_blocks"])
+
+        redis = service.redis_client
+        assert count == 2
+        assert set(redis.values) == {"user_profile:1"}
+        assert "emotional_profile:1" not in service.l1_cache
+        assert redis.sorted_sets[tag_key("onboarding")] == {}
+        # Left in its other tags until it expires; unlinking it again is a no-op
+        assert "emotional_profile:1" in redis.sorted_sets[tag_key("profile_updates")]
+
+        channel, message = redis.published[-1]
+        assert channel == INVALIDATION_CHANNEL
+        assert json.loads(message)["keys"] == [
+            "conversation_threads:1",
+            "emotional_profile:1",
+        ]
+
+    def test_expired_members_are_pruned_on_write(self, service):
+        redis = service.redis_client
+        redis.zadd(tag_key("search"), {"search_results:old": time.time() - 1})
+
+        service.set("search_results:new", ["b"], tags=["search"])
+
+        assert list(redis.sorted_sets[tag_key("search")]) == ["search_results:new"]
+
+    def test_other_processes_drop_invalidated_l1_entries(self, service):
+        service.l1_cache["user_profile:2"] = {"name": "Alex"}
+
+        service._apply_invalidation(json.dumps(["user_profile:2"]))
+
+        assert "user_profile:2" not in service.l1_cache
+
+    def test_overwrites_reach_other_processes_l1(self):
+        redis = FakeRedis()
+        writer, reader = CacheService(redis), CacheService(redis)
+        writer.set("user_profile:4", {"name": "Old"})
+        assert reader.get("user_profile:4") == {"name": "Old"}
+
+        writer.set("user_profile:4", {"name": "New"})
+        for _, message in redis.published:
+            writer._apply_invalidation(message)
+            reader._apply_invalidation(message)
+
+        # The writer keeps the copy it just stored; the reader reloads
+        assert writer.l1_cache["user_profile:4"] == {"name": "New"}
+        assert "user_profile:4" not in reader.l1_cache
+        assert reader.get("user_profile:4") == {"name": "New"}
+
+    def test_unknown_tags_are_a_no_op(self):
+        assert invalidate_tags(FakeRedis(), ["nothing"]) == []
+
+
+class EndingPubSub:
+    """listen() returns at once, as after a dropped connection"""
+
+    def __init__(self, messages=()):
+        self.messages = list(messages)
+        self.closed = False
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        return iter(self.messages)
+
+    def close(self):
+        self.closed = True
+
+
+class TestInvalidationListener:
+    def test_not_started_by_constructor(self, service):
+        assert service._invalidation_thread is None
+
+    def test_resubscribes_with_backoff_and_closes(self):
+        redis = FakeRedis()
+        subscriptions = []
+
+        def pubsub(**kwargs):
+            subscriptions.append(
+                EndingPubSub([{"data": json.dumps(["user_profile:3"])}])
+            )
+            return subscriptions[-1]
+
+        redis.pubsub = pubsub
+        service = CacheService(redis)
+        service.invalidation_retry_seconds = 0.05
+        service.l1_cache["user_profile:3"] = {"name": "Kai"}
+
+        service.start_invalidation_listener()
+        time.sleep(0.2)
+        service.stop_invalidation_listener()
+
+        assert "user_profile:3" not in service.l1_cache
+        assert 1 <= len(subscriptions) <= 6
+        assert all(subscription.closed for subscription in subscriptions)
@@ -0,0 +1,123 @@
+"""
+Tests for the discovery candidate-generation index
+"""
+
+import pytest
+from app.models.soul_connection import SoulConnection
+from app.services.candidate_index import CandidateIndex, age_from_date_of_birth
+from app.services.compatibility import CompatibilityCalculator
+from tests.factories import UserFactory
+
+
+@pytest.fixture
+def calculator():
+    return CompatibilityCalculator()
+
+
+@pytest.fixture
+def index(calculator):
+    index = CandidateIndex()
+    profiles = {
+        1: ({"interests": ["hiking", "music"], "location": "Austin, TX"}, 30),
+        2: ({"interests": ["Hiking", "music", "art"], "location": "Austin, TX"}, 31),
+        3: ({"interests": ["music"], "location": "Dallas, TX"}, 45),
+        4: ({"interests": ["chess"], "location": "Paris"}, 29),
+        5: (
+            {
+                "core_values": {
+                    "relationship_values": "Loyal and committed for the long-term"
+                },
+                "location": "Boston, MA",
+            },
+            None,
+        ),
+    }
+    for user_id, (data, age) in profiles.items():
+        index.upsert_user(user_id, calculator.extract_features(data), age=age)
+    return index
+
+
+class TestCandidateIndex:
+    def test_ranks_by_shared_terms(self, index, calculator):
+        seeker = calculator.extract_features(
+            {"interests": ["hiking", "music"], "location": "Austin, TX"}
+        )
+
+        candidates = index.candidates(1, seeker, limit=3, seeker_age=30)
+
+        assert candidates[0] == 2
+        assert 1 not in candidates
+
+    def test_excludes_connection_partners(self, index, calculator):
+        seeker = calculator.extract_features({"interests": ["hiking", "music"]})
+        index.add_connection(1, 2)
+
+        assert 2 not in index.candidates(1, seeker, limit=5)
+
+    def test_removed_connection_readmits_partner(self, index, calculator):
+        seeker = calculator.extract_features({"interests": ["hiking", "music"]})
+        index.add_connection(1, 2)
+        index.remove_connection(2, 1)
+
+        assert 2 in index.candidates(1, seeker, limit=5)
+
+    def test_age_range_filter(self, index, calculator):
+        seeker = calculator.extract_features({"interests": ["music"]})
+
+        candidates = index.candidates(4, seeker, limit=5, age_min=40, age_max=50)
+
+        assert candidates == [3]
+
+    def test_value_category_terms(self, index, calculator):
+        seeker = calculator.extract_features(
+            {"core_values": {"relationship_values": "I am devoted and faithful"}}
+        )
+
+        assert index.candidates(99, seeker, limit=1) == [5]
+
+    def test_ineligible_user_is_removed(self, index, calculator):
+        seeker = calculator.extract_features({"interests": ["chess"]})
+        index.upsert_user(4, calculator.extract_features({}), eligible=False)
+
+        assert 4 not in index.candidates(99, seeker, limit=5)
+
+    def test_cold_start_fills_from_index(self, index, calculator):
+        seeker = calculator.extract_features({})
+
+        assert len(index.candidates(99, seeker, limit=3)) == 3
+
+    def test_age_from_date_of_birth(self):
+        assert age_from_date_of_birth(None) is None
+        assert age_from_date_of_birth("not-a-date") is None
+        assert age_from_date_of_birth("2000-01-01") >= 25
+
+
+class TestCandidateIndexMaintenance:
+    def test_sync_tracks_connection_state(self, db_session, calculator):
+        user, partner = UserFactory(), UserFactory()
+        index = CandidateIndex()
+        index.build(db_session)
+        seeker = calculator.extract_features({})
+        connection = SoulConnection(
+            user1_id=user.id, user2_id=partner.id, initiated_by=user.id
+        )
+        db_session.add(connection)
+        db_session.commit()
+
+        index.sync(db_session)
+        assert partner.id not in index.candidates(user.id, seeker, limit=100)
+
+        connection.status = "ended"
+        db_session.commit()
+        index.sync(db_session)
+        assert partner.id in index.candidates(user.id, seeker, limit=100)
+
+    def test_build_is_swapped_in(self, db_session):
+        user = UserFactory()
+        index = CandidateIndex()
+        assert not index.ready
+
+        index.build(db_session)
+
+        assert index.ready
+        assert user.id in index._user_terms
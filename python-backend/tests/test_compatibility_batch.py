@@ -0,0 +1,128 @@
+"""
+Tests for the vectorized CompatibilityCalculator.score_many batch path.
+The batch path must return exactly what the scalar path returns per pair.
+"""
+
+import pytest
+from app.services.compatibility import (
+    CompatibilityCalculator,
+    UserCompatibilityFeatures,
+)
+
+
+@pytest.fixture
+def calculator():
+    return CompatibilityCalculator()
+
+
+@pytest.fixture
+def seeker():
+    return {
+        "interests": ["Hiking", "music ", "cooking"],
+        "core_values": {
+            "relationship_values": "I want a loyal, committed partner to grow with",
+            "ideal_evening": "A romantic dinner with wine and music",
+            "feeling_understood": "",
+        },
+        "emotional_responses": {
+            "q1": "I like to talk and share openly, and I try to be kind",
+            "q2": "Friends and new experiences give me energy",
+        },
+        "communication_style": {
+            "preferred_style": "direct",
+            "response_preference": "thoughtful",
+        },
+        "age": 30,
+        "location": "Austin, TX",
+    }
+
+
+@pytest.fixture
+def candidates():
+    return [
+        {
+            "interests": ["hiking", "Music", "travel"],
+            "core_values": {
+                "relationship_values": "Loyal and dedicated, always learning",
+                "ideal_evening": "Exploring somewhere new and exciting",
+            },
+            "emotional_responses": {"q1": "I listen and support, honest always"},
+            "communication_style": {
+                "preferred_style": "understanding",
+                "response_preference": "considered",
+            },
+            "age": 28,
+            "location": "Dallas, TX",
+        },
+        {
+            "interests": [],
+            "core_values": {},
+            "emotional_responses": {},
+            "communication_style": {},
+            "location": "",
+        },
+        {
+            "interests": ["cooking"],
+            "core_values": {"feeling_understood": "Conversation and shared memories"},
+            "emotional_responses": {"q1": 42, "q2": "calm, stable and confident"},
+            "communication_style": {"preferred_style": "direct"},
+            "personality_traits": {"openness": 80, "neuroticism": 20},
+            "age": 45,
+            "location": "austin, tx",
+        },
+    ]
+
+
+class TestScoreMany:
+    def test_matches_scalar_path(self, calculator, seeker, candidates):
+        batch = calculator.score_many(seeker, candidates)
+
+        assert len(batch) == len(candidates)
+        for candidate, result in zip(candidates, batch):
+            assert result == calculator.calculate_overall_compatibility(
+                seeker, candidate
+            )
+
+    def test_accepts_precomputed_features(self, calculator, seeker, candidates):
+        seeker_features = calculator.extract_features(seeker)
+        candidate_features = [calculator.extract_features(c) for c in candidates]
+
+        assert isinstance(seeker_features, UserCompatibilityFeatures)
+        assert calculator.score_many(
+            seeker_features, candidate_features
+        ) == calculator.score_many(seeker, candidates)
+
+    def test_personality_traits_on_both_sides(self, calculator, candidates):
+        seeker = {
+            "personality_traits": {"openness": 70, "agreeableness": 60},
+            "emotional_responses": {"q1": "I love to explore"},
+        }
+
+        batch = calculator.score_many(seeker, candidates)
+
+        for candidate, result in zip(candidates, batch):
+            assert result == calculator.calculate_overall_compatibility(
+                seeker, candidate
+            )
+
+    def test_list_values_match_scalar_path(self, calculator, seeker, candidates):
+        seeker["core_values"]["relationship_values"] = ["loyal", "growth"]
+        candidates[0]["core_values"]["relationship_values"] = ["trust", "learn"]
+
+        batch = calculator.score_many(seeker, candidates)
+
+        for candidate, result in zip(candidates, batch):
+            assert result == calculator.calculate_overall_compatibility(
+                seeker, candidate
+            )
+
+    def test_list_values_match_by_category_name(self, calculator):
+        score = calculator.calculate_values_compatibility(
+            {"relationship_values": ["commitment", "family"]},
+            {"relationship_values": ["commitment"]},
+        )
+
+        assert score == 0.5
+
+    def test_empty_candidate_list(self, calculator, seeker):
+        assert calculator.score_many(seeker, []) == []
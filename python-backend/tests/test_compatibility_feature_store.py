@@ -0,0 +1,115 @@
+"""
+Tests for the persistent compatibility feature store
+"""
+
+import pytest
+from app.models.compatibility_features import UserFeatureSnapshot
+from app.services.compatibility import (
+    get_compatibility_calculator,
+    user_compatibility_data,
+)
+from app.services.compatibility_feature_store import (
+    FEATURE_VERSION,
+    CompatibilityFeatureStore,
+    StoredUserFeatures,
+)
+from app.services.soul_compatibility_service import SoulCompatibilityService
+from tests.factories import UserFactory
+
+
+@pytest.fixture
+def store():
+    return CompatibilityFeatureStore()
+
+
+@pytest.fixture
+def users(db_session):
+    UserFactory._meta.sqlalchemy_session = db_session
+    user1 = UserFactory(
+        interests=["Hiking", "music"],
+        core_values={"relationship_values": "Loyal, committed and always learning"},
+        emotional_responses={"q1": "I feel deeply and try to understand others"},
+        communication_style={"preferred_style": "direct", "frequency": "daily"},
+        location="Austin, TX",
+    )
+    user2 = UserFactory(
+        interests=["hiking", "cooking"],
+        core_values={"relationship_values": "Commitment and growth together"},
+        emotional_responses={"q1": "I listen, support and help people I care about"},
+        communication_style={"preferred_style": "understanding"},
+        location="Dallas, TX",
+    )
+    return user1, user2
+
+
+class TestCompatibilityFeatureStore:
+    def test_round_trip_serialization(self, store, users):
+        features = store.compute(users[0])
+
+        restored = StoredUserFeatures.from_dict(features.to_dict())
+
+        assert restored == features
+
+    def test_get_many_persists_snapshots(self, store, users, db_session):
+        user1, user2 = users
+
+        store.get_many(db_session, [user1, user2])
+
+        snapshots = (
+            db_session.query(UserFeatureSnapshot)
+            .filter(UserFeatureSnapshot.user_id.in_([user1.id, user2.id]))
+            .all()
+        )
+        assert len(snapshots) == 2
+        assert all(s.feature_version == FEATURE_VERSION for s in snapshots)
+
+    def test_cached_features_score_like_raw_profiles(self, store, users, db_session):
+        user1, user2 = users
+        calculator = get_compatibility_calculator()
+
+        features = store.get_many(db_session, [user1, user2])
+        cached = calculator.score_many(
+            features[user1.id].calculator, [features[user2.id].calculator]
+        )[0]
+
+        assert cached == calculator.calculate_overall_compatibility(
+            user_compatibility_data(user1), user_compatibility_data(user2)
+        )
+
+    def test_profile_change_invalidates_snapshot(self, store, users, db_session):
+        user1, _ = users
+        store.get(db_session, user1)
+
+        user1.interests = ["painting"]
+        db_session.commit()
+
+        features = store.get(db_session, user1)
+        assert features.calculator.interests == frozenset({"painting"})
+
+    def test_soul_service_reads_from_store(self, store, users, db_session):
+        user1, user2 = users
+        service = SoulCompatibilityService()
+        features = store.get_many(db_session, [user1, user2])
+
+        assert service._calculate_values_compatibility(
+            user1, user2, features[user1.id].soul, features[user2.id].soul
+        ) == service._calculate_values_compatibility(user1, user2)
+        assert service._calculate_emotional_resonance(
+            user1, user2, features[user1.id].soul, features[user2.id].soul
+        ) == service._calculate_emotional_resonance(user1, user2)
+
+    def test_read_path_never_commits_caller_work(self, store, users, db_session):
+        user1, user2 = users
+        user1.bio = "Flushed but not committed"
+        db_session.flush()
+
+        store.get_many(db_session, [user1, user2])
+        db_session.rollback()
+
+        assert user1.bio != "Flushed but not committed"
+        assert (
+            db_session.query(UserFeatureSnapshot)
+            .filter(UserFeatureSnapshot.user_id.in_([user1.id, user2.id]))
+            .count()
+            == 2
+        )
@@ -0,0 +1,106 @@
+"""
+Tests for the single-query conversation inbox
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from app.models.message import Message
+from app.models.soul_connection import SoulConnection
+from app.services.conversation_inbox import load_inbox, mark_conversation_read
+from sqlalchemy import event
+from tests.factories import UserFactory
+
+
+@contextmanager
+def count_statements(db_session):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def connect(db_session, user, partner):
+    connection = SoulConnection(
+        user1_id=user.id, user2_id=partner.id, initiated_by=user.id
+    )
+    db_session.add(connection)
+    db_session.commit()
+    return connection
+
+
+def send(db_session, connection, sender, text):
+    message = Message(
+        connection_id=connection.id, sender_id=sender.id, message_text=text
+    )
+    db_session.add(message)
+    db_session.commit()
+    return message
+
+
+@pytest.fixture
+def user(db_session):
+    return UserFactory()
+
+
+class TestConversationInbox:
+    def test_inbox_entries(self, db_session, user):
+        quiet, busy = UserFactory(), UserFactory()
+        quiet_connection = connect(db_session, user, quiet)
+        busy_connection = connect(db_session, busy, user)
+        send(db_session, busy_connection, busy, "hello")
+        send(db_session, busy_connection, user, "hi!")
+        send(db_session, busy_connection, busy, "how are you?")
+
+        entries = load_inbox(db_session, user.id)
+
+        assert [e.connection.id for e in entries] == [
+            busy_connection.id,
+            quiet_connection.id,
+        ]
+        assert entries[0].partner.id == busy.id
+        assert entries[0].last_message.message_text == "how are you?"
+        assert entries[0].unread_count == 2
+        assert entries[1].partner.id == quiet.id
+        assert entries[1].last_message is None
+        assert entries[1].unread_count == 0
+        # The other side has only the reply they were sent unread
+        assert load_inbox(db_session, busy.id)[0].unread_count == 1
+
+    def test_mark_read_resets_counter(self, db_session, user):
+        partner = UserFactory()
+        connection = connect(db_session, user, partner)
+        send(db_session, connection, partner, "one")
+        send(db_session, connection, partner, "two")
+
+        assert mark_conversation_read(db_session, connection.id, user.id) == 2
+        db_session.commit()
+
+        assert load_inbox(db_session, user.id)[0].unread_count == 0
+        assert (
+            db_session.query(Message)
+            .filter(Message.connection_id == connection.id, Message.is_read.is_(False))
+            .count()
+            == 0
+        )
+
+    def test_single_query_regardless_of_connections(self, db_session, user):
+        for _ in range(5):
+            partner = UserFactory()
+            send(db_session, connect(db_session, user, partner), partner, "hey")
+        # Read before counting: the commits above expired `user`
+        user_id = user.id
+
+        with count_statements(db_session) as statements:
+            entries = load_inbox(db_session, user_id)
+            [(e.partner.first_name, e.last_message.message_text) for e in entries]
+
+        assert len(entries) == 5
+        assert len(statements) == 1
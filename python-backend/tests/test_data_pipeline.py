@@ -0,0 +1,155 @@
+"""
+Tests for the stream consumers and columnar sinks of the data pipeline
+"""
+
+import json
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from app.services.data_pipeline import DataPipelineService, StreamType
+from app.services.pipeline_sink import STREAM_TABLES, ClickHouseSink, InMemorySink
+
+STREAM = "stream:profile_interactions"
+GROUP = "pipeline-profile_interactions"
+
+
+def make_redis():
+    redis = MagicMock()
+    for command in ("xack", "xautoclaim", "xpending_range", "xadd", "hset"):
+        setattr(redis, command, AsyncMock())
+
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=pipe)
+    context.__aexit__ = AsyncMock(return_value=False)
+    redis.pipeline.return_value = context
+    redis.pipe = pipe
+    return redis
+
+
+def entry(viewer_id, timestamp="2026-10-01T12:00:00"):
+    data = {
+        "viewer_user_id": viewer_id,
+        "viewed_user_id": 99,
+        "interaction_type": "like",
+        "compatibility_score": 0.8,
+        "interaction_duration": 12,
+    }
+    return {
+        b"event_id": f"evt-{viewer_id}".encode(),
+        b"data": json.dumps(data).encode(),
+        b"timestamp": timestamp.encode(),
+        b"processing_stage": b"raw",
+        b"metadata": b"{}",
+    }
+
+
+@pytest.fixture
+def pipeline():
+    return DataPipelineService(
+        MagicMock(), make_redis(), sink=InMemorySink(), consumer_name="worker-a"
+    )
+
+
+class TestTableSchemas:
+    def test_to_columns_is_columnar_with_defaults(self):
+        schema = STREAM_TABLES["user_events"]
+        columns = schema.to_columns(
+            [
+                {
+                    "user_id": "7",
+                    "event_type": "login",
+                    "device_insights": {"device_type": "mobile"},
+                    "properties": {"attempt": 2},
+                    "timestamp": "2026-10-01T08:30:00",
+                },
+                {"user_id": 8},
+            ]
+        )
+        by_name = dict(zip(schema.column_names, columns))
+
+        assert by_name["user_id"] == [7, 8]
+        assert by_name["event_type"] == ["login", ""]
+        assert by_name["device_type"] == ["mobile", ""]
+        assert by_name["properties"] == [{"attempt": "2"}, {}]
+        assert by_name["timestamp"][0] == datetime(2026, 10, 1, 8, 30)
+        assert isinstance(by_name["timestamp"][1], datetime)
+
+    def test_business_events_go_to_revenue_table(self):
+        assert STREAM_TABLES[StreamType.BUSINESS_EVENTS.value].table == (
+            "revenue_events"
+        )
+
+    def test_clickhouse_sink_inserts_columnar(self):
+        client = MagicMock()
+        schema = STREAM_TABLES["profile_interactions"]
+        columns = schema.to_columns([{"viewer_user_id": 1}])
+
+        ClickHouseSink(client).write(schema, columns)
+
+        query, data = client.execute.call_args.args
+        assert query.startswith("INSERT INTO profile_interactions (viewer_user_id, ")
+        assert data == columns
+        assert client.execute.call_args.kwargs == {"columnar": True}
+
+
+class TestConsumer:
+    def test_consumer_names_are_unique(self):
+        names = {DataPipelineService(MagicMock(), make_redis()).consumer_name}
+        names.add(DataPipelineService(MagicMock(), make_redis()).consumer_name)
+        assert len(names) == 2
+
+    async def test_batch_is_written_once_and_acknowledged(self, pipeline):
+        messages = [(b"1-0", entry(1)), (b"2-0", entry(2)), (b"3-0", {b"data": b"{"})]
+
+        await pipeline._handle_messages(
+            StreamType.PROFILE_INTERACTIONS, STREAM, GROUP, messages
+        )
+
+        assert len(pipeline.sink.batches) == 1
+        rows = pipeline.sink.rows("profile_interactions")
+        assert [row["viewer_user_id"] for row in rows] == [1, 2]
+        # Rows keep the event time, not the processing time
+        assert rows[0]["timestamp"] == datetime(2026, 10, 1, 12, 0)
+
+        acked = [c.args[2:] for c in pipeline.redis.xack.await_args_list]
+        assert acked == [(b"3-0",), (b"1-0", b"2-0")]
+        assert pipeline.metrics["events_processed"] == 2
+
+    async def test_failed_batch_stays_pending_until_retries_run_out(self, pipeline):
+        pipeline.sink.write = MagicMock(side_effect=RuntimeError("down"))
+        pipeline.redis.xpending_range.return_value = [
+            {"message_id": b"1-0", "times_delivered": 3},
+            {"message_id": b"2-0", "times_delivered": 1},
+        ]
+
+        await pipeline._handle_messages(
+            StreamType.PROFILE_INTERACTIONS,
+            STREAM,
+            GROUP,
+            [(b"1-0", entry(1)), (b"2-0", entry(2))],
+        )
+
+        pipeline.redis.xack.assert_not_awaited()
+        pipe = pipeline.redis.pipe
+        assert pipe.lpush.call_count == 1
+        assert json.loads(pipe.lpush.call_args.args[1])["event_id"] == "evt-1"
+        pipe.xack.assert_called_once_with(STREAM, GROUP, b"1-0")
+        assert pipeline.metrics["events_failed"] == 2
+
+    async def test_claim_takes_over_stale_entries(self, pipeline):
+        pipeline.redis.xautoclaim.return_value = [
+            b"0-0",
+            [(b"1-0", entry(1)), (b"2-0", None)],
+            [],
+        ]
+
+        cursor, claimed = await pipeline._claim_stale_messages(STREAM, GROUP, "0-0")
+
+        assert cursor == "0-0"
+        assert [message_id for message_id, _ in claimed] == [b"1-0"]
+        kwargs = pipeline.redis.xautoclaim.await_args.kwargs
+        assert pipeline.redis.xautoclaim.await_args.args[2] == "worker-a"
+        assert kwargs["min_idle_time"] == pipeline.config["claim_min_idle_ms"]
@@ -0,0 +1,182 @@
+"""
+Tests for precomputed discovery feeds
+"""
+
+from datetime import timedelta
+
+import pytest
+from app.models.discovery_feed import DiscoveryFeed, DiscoveryFeedEntry
+from app.models.soul_connection import SoulConnection
+from app.services import discovery_feed
+from app.services.candidate_index import candidate_index
+from app.services.compatibility_feature_store import compatibility_feature_store
+from app.services.discovery_feed import (
+    DiscoveryFeedService,
+    decode_cursor,
+    encode_cursor,
+)
+from tests.factories import UserFactory
+
+
+class TestCursor:
+    def test_round_trip(self):
+        assert decode_cursor(encode_cursor(72.35, 9)) == (72.35, 9)
+
+    @pytest.mark.parametrize("cursor", ["", "!!!", "bm90LWEtY3Vyc29y"])
+    def test_malformed_cursor_rejected(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def make_user(**fields):
+    defaults = {
+        "interests": ["hiking", "music", "cooking"],
+        "location": "Austin, TX",
+        "core_values": {"relationship_values": "Loyal and committed"},
+    }
+    defaults.update(fields)
+    return UserFactory(**defaults)
+
+
+@pytest.fixture
+def feeds():
+    return DiscoveryFeedService()
+
+
+@pytest.fixture
+def seeker(db_session):
+    seeker = make_user()
+    for interests in (["hiking"], ["music", "art"], ["cooking", "hiking"], ["chess"]):
+        make_user(interests=interests)
+    # Done at startup in a real process
+    candidate_index.build(db_session)
+    return seeker
+
+
+class TestDiscoveryFeed:
+    def test_built_feed_pages_with_cursor(self, db_session, feeds, seeker):
+        feeds.refresh(db_session, seeker)
+        seen = []
+        after = None
+        while True:
+            rows, cursor = feeds.read_page(
+                db_session, seeker, limit=2, min_compatibility=0, after=after
+            )
+            seen.extend(entry for entry, _ in rows)
+            if cursor is None:
+                break
+            after = decode_cursor(cursor)
+
+        stored = (
+            db_session.query(DiscoveryFeedEntry)
+            .filter(DiscoveryFeedEntry.user_id == seeker.id)
+            .count()
+        )
+        assert len(seen) == stored >= 4
+        assert len({entry.candidate_id for entry in seen}) == len(seen)
+        keys = [(-entry.score, entry.candidate_id) for entry in seen]
+        assert keys == sorted(keys)
+
+    def test_unbuilt_feed_served_from_index_and_queued(self, db_session, feeds, seeker):
+        seen = []
+        after = None
+        while True:
+            rows, cursor = feeds.read_page(
+                db_session, seeker, limit=2, min_compatibility=0, after=after
+            )
+            seen.extend(entry for entry, _ in rows)
+            if cursor is None:
+                break
+            after = decode_cursor(cursor)
+
+        assert len(seen) >= 4
+        assert len({entry.candidate_id for entry in seen}) == len(seen)
+        keys = [(-entry.score, entry.candidate_id) for entry in seen]
+        assert keys == sorted(keys)
+        # Nothing was ranked into the table; the worker is due to build it
+        assert not (
+            db_session.query(DiscoveryFeedEntry)
+            .filter(DiscoveryFeedEntry.user_id == seeker.id)
+            .count()
+        )
+        claimed = feeds.claim_due(db_session, limit=100, lease=timedelta(minutes=5))
+        assert seeker.id in claimed
+
+    def test_connected_users_hidden(self, db_session, feeds, seeker):
+        feeds.refresh(db_session, seeker)
+        rows, _ = feeds.read_page(db_session, seeker, limit=50, min_compatibility=0)
+        partner_id = rows[0][0].candidate_id
+        db_session.add(
+            SoulConnection(
+                user1_id=partner_id, user2_id=seeker.id, initiated_by=partner_id
+            )
+        )
+        db_session.commit()
+
+        rows, _ = feeds.read_page(db_session, seeker, limit=50, min_compatibility=0)
+
+        assert partner_id not in [entry.candidate_id for entry, _ in rows]
+
+    def test_ended_connection_readmits_candidate(self, db_session, feeds, seeker):
+        feeds.refresh(db_session, seeker)
+        rows, _ = feeds.read_page(db_session, seeker, limit=50, min_compatibility=0)
+        partner_id = rows[0][0].candidate_id
+        db_session.add(
+            SoulConnection(
+                user1_id=partner_id,
+                user2_id=seeker.id,
+                initiated_by=partner_id,
+                status="ended",
+            )
+        )
+        db_session.commit()
+
+        rows, _ = feeds.read_page(db_session, seeker, limit=50, min_compatibility=0)
+
+        assert partner_id in [entry.candidate_id for entry, _ in rows]
+
+    def test_unbuilt_feed_scoring_is_capped(
+        self, db_session, feeds, seeker, monkeypatch
+    ):
+        monkeypatch.setattr(discovery_feed, "FALLBACK_MAX_SCORED", 2)
+        scored = []
+        score_many = compatibility_feature_store.score_many
+
+        def counting_score_many(db, user, candidates):
+            scored.append(len(candidates))
+            return score_many(db, user, candidates)
+
+        monkeypatch.setattr(
+            compatibility_feature_store, "score_many", counting_score_many
+        )
+
+        rows, _ = feeds.read_page(db_session, seeker, limit=10, min_compatibility=0)
+
+        assert scored == [2]
+        assert len(rows) == 2
+
+    def test_new_user_propagated_into_built_feeds(self, db_session, feeds, seeker):
+        feeds.refresh(db_session, seeker)
+        newcomer = make_user()
+        feeds.mark_changed(db_session, newcomer.id)
+        db_session.commit()
+
+        feeds.process(db_session, newcomer.id)
+
+        assert db_session.get(DiscoveryFeedEntry, (seeker.id, newcomer.id))
+        feed = db_session.get(DiscoveryFeed, newcomer.id)
+        assert feed.stale_since is None
+        assert feed.refreshed_at is not None
+        assert feed.propagated_at >= feed.profile_changed_at
+
+    def test_due_feeds_leased_once(self, db_session, feeds):
+        user = make_user()
+        feeds.mark_changed(db_session, user.id)
+        db_session.commit()
+
+        claimed = feeds.claim_due(db_session, limit=100, lease=timedelta(minutes=5))
+
+        assert user.id in claimed
+        assert user.id not in feeds.claim_due(
+            db_session, limit=100, lease=timedelta(minutes=5)
+        )
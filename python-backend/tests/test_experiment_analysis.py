@@ -0,0 +1,137 @@
+"""
+Tests for the vectorized experiment analysis engine
+"""
+
+import math
+
+import pytest
+from app.services.experiment_analysis import (
+    ClickHouseAnalysisBackend,
+    InMemoryAnalysisBackend,
+    analyze_experiment,
+)
+from scipy import stats
+
+VARIANTS = ["control", "treatment_a", "treatment_b"]
+METRICS = ["match_rate", "messages_sent"]
+
+
+@pytest.fixture
+def backend():
+    backend = InMemoryAnalysisBackend()
+    # 200 users per variant; conversion 10% / 20% / 11%
+    conversion_every = {"control": 10, "treatment_a": 5, "treatment_b": 9}
+    for offset, variant in enumerate(VARIANTS):
+        for i in range(200):
+            user_id = offset * 1000 + i
+            backend.record_assignment("exp", user_id, variant)
+            if i % conversion_every[variant] == 0:
+                backend.record_event("exp", user_id, variant, "match_rate", 1.0)
+            # Two events for the same user are summed per user
+            backend.record_event("exp", user_id, variant, "messages_sent", i % 4)
+            backend.record_event("exp", user_id, variant, "messages_sent", offset)
+    return backend
+
+
+def scalar_z_test(x1, n1, x2, n2):
+    p1, p2 = x1 / n1, x2 / n2
+    pooled = (x1 + x2) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    z = (p1 - p2) / se
+    return z, 2 * (1 - stats.norm.cdf(abs(z)))
+
+
+class TestInMemoryBackend:
+    def test_aggregates_per_user(self, backend):
+        aggregates = backend.aggregate("exp", VARIANTS, METRICS)
+
+        assert list(aggregates.exposures) == [200, 200, 200]
+        assert list(aggregates.converted[:, 0]) == [20, 40, 23]
+        # Per-user totals: (i % 4) + offset
+        assert aggregates.totals[1, 1] == sum(i % 4 + 1 for i in range(200))
+        assert aggregates.totals_sq[1, 1] == sum((i % 4 + 1) ** 2 for i in range(200))
+
+    def test_unknown_experiment_is_empty(self, backend):
+        aggregates = backend.aggregate("other", VARIANTS, METRICS)
+        assert aggregates.exposures.sum() == 0
+        assert aggregates.converted.sum() == 0
+
+
+class TestAnalyzeExperiment:
+    def test_conversion_matches_scalar_z_test(self, backend):
+        analysis = analyze_experiment(
+            backend.aggregate("exp", VARIANTS, METRICS), "control", 0.95
+        )
+        report = {r["variant_id"]: r for r in analysis.metric_report("match_rate")}
+
+        for variant, conversions in (("treatment_a", 40), ("treatment_b", 23)):
+            z, p_value = scalar_z_test(conversions, 200, 20, 200)
+            assert report[variant]["z_statistic"] == pytest.approx(z)
+            assert report[variant]["p_value"] == pytest.approx(p_value)
+            assert report[variant]["lift"] == pytest.approx(
+                (conversions / 200 - 0.1) / 0.1
+            )
+
+        assert report["treatment_a"]["statistically_significant"]
+        assert not report["treatment_b"]["statistically_significant"]
+        assert not report["control"]["statistically_significant"]
+        lower, upper = report["treatment_a"]["confidence_interval"]
+        assert lower < 0.2 < upper
+
+    def test_continuous_metric_matches_welch_t_test(self, backend):
+        analysis = analyze_experiment(
+            backend.aggregate("exp", VARIANTS, METRICS), "control", 0.95
+        )
+        report = {r["variant_id"]: r for r in analysis.metric_report("messages_sent")}
+
+        control = [i % 4 for i in range(200)]
+        treatment = [i % 4 + 2 for i in range(200)]
+        expected = stats.ttest_ind(treatment, control, equal_var=False)
+
+        assert report["treatment_b"]["mean"] == pytest.approx(3.5)
+        assert report["treatment_b"]["t_statistic"] == pytest.approx(expected.statistic)
+        assert report["treatment_b"]["mean_p_value"] == pytest.approx(expected.pvalue)
+
+    def test_empty_variants_are_not_significant(self):
+        backend = InMemoryAnalysisBackend()
+        backend.record_assignment("exp", 1, "control")
+
+        analysis = analyze_experiment(
+            backend.aggregate("exp", VARIANTS, METRICS), "control"
+        )
+
+        for report in analysis.metric_report("match_rate"):
+            assert report["p_value"] == 1.0
+            assert report["mean_p_value"] == 1.0
+            assert not report["statistically_significant"]
+
+
+class TestClickHouseBackend:
+    def test_single_query_splits_exposure_and_metric_rows(self):
+        class Client:
+            def __init__(self):
+                self.calls = []
+
+            def execute(self, query, params):
+                self.calls.append((query, params))
+                return [
+                    ("control", "", 100, 0, 0.0, 0.0),
+                    ("treatment_a", "", 90, 0, 0.0, 0.0),
+                    ("control", "match_rate", 30, 10, 12.0, 16.0),
+                    ("treatment_a", "match_rate", 95, 20, 20.0, 20.0),
+                    ("unknown", "match_rate", 5, 5, 5.0, 5.0),
+                ]
+
+        client = Client()
+        aggregates = ClickHouseAnalysisBackend(client).aggregate(
+            "exp", ["control", "treatment_a"], ["match_rate"]
+        )
+
+        assert len(client.calls) == 1
+        assert client.calls[0][1] == {
+            "experiment_id": "exp",
+            "metrics": ("match_rate",),
+        }
+        # Users with events but no assignment still count as exposed
+        assert list(aggregates.exposures) == [100, 95]
+        assert list(aggregates.converted[:, 0]) == [10, 20]
@@ -0,0 +1,221 @@
+"""
+Tests for local experiment assignment from the compiled registry
+"""
+
+import hashlib
+import json
+
+import pytest
+from app.services.ab_testing import ABTestingService
+from app.services.experiment_registry import (
+    AssignmentRecorder,
+    CompiledExperiment,
+    ExperimentRegistry,
+    compile_audience,
+)
+from tests.fakes import FakeRedis
+
+
+class FakeClickHouse:
+    def __init__(self):
+        self.inserts = []
+
+    def execute(self, query, rows):
+        self.inserts.append((query, rows))
+
+
+def config(experiment_id="exp", status="active", target_audience=None):
+    return {
+        "experiment_id": experiment_id,
+        "status": status,
+        "target_audience": target_audience or {},
+        "variants": [
+            {
+                "variant_id": variant,
+                "variant_type": variant,
+                "traffic_allocation": 0.5,
+            }
+            for variant in ("control", "treatment")
+        ],
+    }
+
+
+def store(redis, *configs):
+    for c in configs:
+        redis.hset("experiments", c["experiment_id"], json.dumps(c))
+    redis.incr("experiments:version")
+
+
+class TestCompiledExperiment:
+    def test_matches_md5_bucketing(self):
+        experiment = CompiledExperiment.from_config(config())
+
+        for user_id in range(200):
+            digest = hashlib.md5(f"{user_id}_exp".encode()).hexdigest()
+            point = (int(digest[:8], 16) % 10000) / 10000.0
+            expected = "control" if point <= 0.5 else "treatment"
+            assert experiment.variant_for(user_id) == expected
+
+    def test_assignment_is_stable_and_split(self):
+        experiment = CompiledExperiment.from_config(config())
+
+        variants = [experiment.variant_for(user_id) for user_id in range(2000)]
+
+        assert variants == [experiment.variant_for(u) for u in range(2000)]
+        assert 900 < variants.count("control") < 1100
+
+    def test_audience_criteria(self):
+        matches = compile_audience(
+            {"country": ["US", "CA"], "age": {"min": 25, "max": 35}, "premium": True}
+        )
+
+        assert matches({"country": "US", "age": 30, "premium": True})
+        assert not matches({"country": "FR", "age": 30, "premium": True})
+        assert not matches({"country": "US", "age": 40, "premium": True})
+        assert not matches({"country": "US", "age": 30, "premium": False})
+        assert not matches({"country": "US", "age": 30})
+        assert compile_audience({})({})
+
+
+class TestExperimentRegistry:
+    def test_refreshes_only_when_version_changes(self):
+        redis = FakeRedis()
+        store(redis, config("a"), config("paused", status="paused"))
+        registry = ExperimentRegistry(redis)
+
+        assert registry.refresh() is True
+        assert [e.experiment_id for e in registry.active()] == ["a"]
+        assert registry.refresh() is False
+
+        store(redis, config("b"))
+        assert registry.refresh() is True
+        assert registry.get("b") is not None
+
+
+class TestAssignmentRecorder:
+    def test_flush_writes_each_assignment_once(self):
+        redis, clickhouse = FakeRedis(), FakeClickHouse()
+        recorder = AssignmentRecorder(clickhouse, redis)
+
+        recorder.record(1, "exp", "control")
+        recorder.record(1, "exp", "control")
+        recorder.record(2, "exp", "treatment")
+        assert recorder.pending() == 2
+        assert recorder.flush() == 2
+
+        # Recorded by another process already: no exposure, no insert
+        other = AssignmentRecorder(clickhouse, redis)
+        other.record(1, "exp", "control")
+        assert other.flush() == 0
+
+        assert len(clickhouse.inserts) == 1
+        assert [r["user_id"] for r in clickhouse.inserts[0][1]] == [1, 2]
+        assert redis.hashes["experiment_metrics:exp"] == {
+            "control_exposures": 1,
+            "treatment_exposures": 1,
+        }
+        assert json.loads(redis.values["assignment:exp:1"])["variant_id"] == "control"
+
+
+class TestAssignAll:
+    @pytest.fixture
+    def service(self):
+        redis = FakeRedis()
+        store(
+            redis,
+            config("a"),
+            config("b", target_audience={"country": ["US"]}),
+            config("off", status="draft"),
+        )
+        return ABTestingService(FakeClickHouse(), redis)
+
+    async def test_assign_all_is_local_after_load(self, service):
+        await service.assign_all(1, {"country": "US"})
+        round_trips = service.redis.round_trips
+
+        for user_id in range(100):
+            assignments = await service.assign_all(user_id, {"country": "US"})
+            assert set(assignments) == {"a", "b"}
+
+        assert service.redis.round_trips == round_trips
+        assert service.assignment_recorder.pending() == 200
+
+    async def test_assign_all_applies_audience(self, service):
+        assignments = await service.assign_all(1, {"country": "FR"})
+        assert set(assignments) == {"a"}
+
+        variant = await service.assign_user_to_experiment(1, "a")
+        assert variant == assignments["a"]
+        assert await service.assign_user_to_experiment(1, "off") is None
+
+
+class TestExperimentEvents:
+    @pytest.fixture
+    def service(self):
+        redis = FakeRedis()
+        store(redis, config("a"))
+        return ABTestingService(FakeClickHouse(), redis)
+
+    async def test_event_variant_comes_from_registry(self, service):
+        expected = await service.assign_user_to_experiment(1, "a")
+        # A stale or foreign assignment record must not redirect the event
+        service.redis.set(
+            "assignment:a:1", json.dumps({"variant_id": "bogus", "is_active": True})
+        )
+
+        assert await service.track_experiment_event(1, "a", "click", "ctr", 1.0)
+
+        (_, rows) = service.clickhouse.inserts[-1]
+        assert rows[0]["variant"] == expected
+
+    async def test_inactive_experiment_events_dropped(self, service):
+        assert not await service.track_experiment_event(1, "gone", "click", "ctr", 1)
+        assert service.clickhouse.inserts == []
+
+    async def test_out_of_audience_events_dropped(self, service):
+        store(service.redis, config("us", target_audience={"country": ["US"]}))
+        outside, inside = {"country": "FR"}, {"country": "US"}
+
+        assert await service.assign_user_to_experiment(1, "us", outside) is None
+        assert not await service.track_experiment_event(
+            1, "us", "click", "ctr", 1.0, user_attributes=outside
+        )
+        assert not await service.track_conversion_event(
+            1, "us", "ctr", user_attributes=outside
+        )
+        assert service.clickhouse.inserts == []
+
+        expected = await service.assign_user_to_experiment(2, "us", inside)
+        assert await service.track_experiment_event(
+            2, "us", "click", "ctr", 1.0, user_attributes=inside
+        )
+        (_, rows) = service.clickhouse.inserts[-1]
+        assert rows[0]["variant"] == expected
+
+    async def test_allocation_frozen_once_started(self, service):
+        experiment_id = await service.create_experiment(
+            {
+                "name": "Prompt copy",
+                "description": "Shorter onboarding prompt",
+                "hypothesis": "Shorter prompts complete more often",
+                "primary_metric": "completion",
+                "created_by": "tests",
+                "variants": [
+                    {
+                        "variant_id": variant,
+                        "name": variant,
+                        "variant_type": variant,
+                        "traffic_allocation": 0.5,
+                        "configuration": {},
+                    }
+                    for variant in ("control", "treatment")
+                ],
+            }
+        )
+        assert await service.start_experiment(experiment_id)
+        experiment = await service._get_experiment(experiment_id)
+        experiment.variants[0].traffic_allocation = 0.9
+        experiment.variants[1].traffic_allocation = 0.1
+
+        with pytest.raises(ValueError, match="traffic allocation"):
+            await service._update_experiment(experiment)
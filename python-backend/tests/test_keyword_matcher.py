@@ -0,0 +1,169 @@
+"""
+Tests for the compiled keyword matcher.
+Results must match the plain `keyword in text` loops it replaces.
+"""
+
+import random
+
+import pytest
+from app.services.compatibility import (
+    COMMUNICATION_INDICATORS,
+    PERSONALITY_INDICATORS,
+    CompatibilityCalculator,
+)
+from app.services.keyword_matcher import KeywordMatcher, keyword_matcher
+from app.services.soul_compatibility_service import (
+    EMPATHY_INDICATORS,
+    SoulCompatibilityService,
+)
+
+ONBOARDING_ANSWERS = [
+    "Honesty and loyalty matter most to me. I want a partner who is committed, "
+    "communicates openly and supports my growth.",
+    "Trust, kindness and shared adventures. Family is important and I love "
+    "laughing together over a long-term plan.",
+    "Cooking dinner together at home, a glass of wine and a long conversation "
+    "about life and dreams.",
+    "When someone listens without judgment and remembers the small things I share.",
+    "I try to stay calm and understand the other person's perspective before I "
+    "respond, then talk it out honestly.",
+    "New experiences energize me, I'm curious and love to learn and explore "
+    "with friends.",
+]
+
+
+def naive_counts(table, text):
+    """The substring loop the matcher replaces"""
+    hits = {}
+    for category, keywords in table.items():
+        count = sum(1 for keyword in keywords if keyword in text)
+        if count:
+            hits[category] = count
+    return hits
+
+
+def realistic_texts(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.sample(ONBOARDING_ANSWERS, 2)).lower() + f" #{i}"
+        for i in range(count)
+    ]
+
+
+class TestKeywordMatcher:
+    def test_overlapping_and_nested_keywords(self):
+        table = {"a": ["care", "careful", "are"], "b": ["full", "ful", "car"]}
+        matcher = KeywordMatcher(table)
+
+        assert matcher.counts("so careful") == {"a": 3, "b": 2}
+        assert matcher.counts("carefully") == naive_counts(table, "carefully")
+
+    def test_duplicates_phrases_and_misses(self):
+        table = {"values": ["family", "long-term", "family"], "other": ["zebra"]}
+        matcher = KeywordMatcher(table)
+
+        assert matcher.counts("family first, long-term") == {"values": 3}
+        assert matcher.counts("") == {}
+        assert matcher.categories("nothing here") == frozenset()
+
+    def test_results_memoized(self):
+        matcher = KeywordMatcher({"x": ["kind"]})
+
+        first = matcher.counts("be kind")
+        assert matcher.counts("be kind") is first
+        assert matcher.counts.cache_info().hits == 1
+
+    def test_compiled_matchers_shared(self):
+        assert keyword_matcher(COMMUNICATION_INDICATORS) is keyword_matcher(
+            dict(COMMUNICATION_INDICATORS)
+        )
+
+    @pytest.mark.parametrize(
+        "table",
+        [COMMUNICATION_INDICATORS, PERSONALITY_INDICATORS]
+        + list(CompatibilityCalculator().value_keywords.values()),
+    )
+    def test_matches_substring_loop(self, table):
+        matcher = KeywordMatcher(table)
+        vocabulary = [keyword for keywords in table.values() for keyword in keywords]
+        rng = random.Random(7)
+
+        for _ in range(300):
+            text = " ".join(
+                rng.choice(vocabulary + ["the", "and", "-", "ly", "ness"])
+                for _ in range(rng.randint(0, 25))
+            )
+            assert matcher.counts(text) == naive_counts(table, text)
+
+
+class TestServicesUseMatcher:
+    def test_soul_value_signals(self):
+        service = SoulCompatibilityService()
+        text = ONBOARDING_ANSWERS[0]
+        keywords = service.value_keywords["relationship_values"]
+
+        expected = {
+            value_type: min(1.0, hits / len(keywords[value_type]))
+            for value_type, hits in naive_counts(
+                {
+                    value_type: [keyword.lower() for keyword in words]
+                    for value_type, words in keywords.items()
+                },
+                text.lower(),
+            ).items()
+        }
+        assert service._extract_value_signals(text, "relationship_values") == expected
+
+    def test_count_indicators(self):
+        service = SoulCompatibilityService()
+        responses = {f"q{i}": answer for i, answer in enumerate(ONBOARDING_ANSWERS)}
+
+        assert service._count_indicators(responses, EMPATHY_INDICATORS) == sum(
+            1
+            for answer in ONBOARDING_ANSWERS
+            for indicator in EMPATHY_INDICATORS
+            if indicator in answer.lower()
+        )
+
+
+@pytest.mark.benchmark(group="keyword-matching")
+class TestKeywordMatchingBenchmark:
+    """
+    Score one seeker's answers against many candidates, as discovery does.
+    Compare `--benchmark-only` timings of the substring loop and the matcher.
+    """
+
+    table = CompatibilityCalculator().value_keywords["relationship_values"]
+
+    def test_substring_loop(self, benchmark):
+        seeker, *candidates = realistic_texts(200)
+
+        def score():
+            for candidate in candidates:
+                naive_counts(self.table, seeker)
+                naive_counts(self.table, candidate)
+
+        benchmark(score)
+
+    def test_compiled_matcher(self, benchmark):
+        seeker, *candidates = realistic_texts(200)
+        matcher = keyword_matcher(self.table)
+
+        def score():
+            for candidate in candidates:
+                matcher.counts(seeker)
+                matcher.counts(candidate)
+
+        benchmark(score)
+
+    def test_compiled_matcher_cold(self, benchmark):
+        seeker, *candidates = realistic_texts(200)
+
+        def score():
+            # Fresh matcher per round: every text is scanned from scratch
+            matcher = KeywordMatcher(self.table)
+            for candidate in candidates:
+                matcher.counts(seeker)
+                matcher.counts(candidate)
+
+        benchmark(score)
@@ -0,0 +1,78 @@
+"""
+Tests for the byte-bounded LRU memory cache
+"""
+
+import time
+
+import pytest
+from app.core.memory_cache import MemoryCache
+
+
+@pytest.fixture
+def cache():
+    # Every value counts as 10 bytes, so the cache holds three
+    return MemoryCache(max_bytes=30, sizer=lambda value: 10)
+
+
+class TestMemoryCache:
+    def test_least_recently_used_is_evicted(self, cache):
+        for key in ("a", "b", "c"):
+            cache.set(key, key.upper(), ttl=60)
+        cache.get("a")
+
+        cache.set("d", "D", ttl=60)
+
+        assert cache.get("b") is None
+        assert [cache.get(key) for key in ("a", "c", "d")] == ["A", "C", "D"]
+        assert cache.size_bytes == 30
+
+    def test_budget_is_in_bytes(self):
+        cache = MemoryCache(max_bytes=100)
+
+        assert cache.set("big", b"x" * 60, ttl=60)
+        assert cache.set("small", b"x" * 30, ttl=60)
+        assert cache.set("other", b"x" * 30, ttl=60)
+
+        assert "big" not in cache
+        assert cache.size_bytes == 60
+        # A value larger than the whole budget is not cached
+        assert cache.set("huge", b"x" * 101, ttl=60) is False
+        assert len(cache) == 2
+
+    def test_entries_expire(self, cache):
+        cache.set("short", 1, ttl=0.01)
+        cache.set("long", 2, ttl=60)
+        time.sleep(0.02)
+
+        assert cache.get("short") is None
+        cache.set("gone", 3, ttl=0)
+        assert cache.purge_expired() == 1
+        assert len(cache) == 1
+        assert cache.size_bytes == 10
+
+    def test_replacing_a_key_keeps_size_accurate(self, cache):
+        cache.set("a", 1, ttl=60)
+        cache.set("a", 2, ttl=60)
+
+        assert cache.get("a") == 2
+        assert cache.size_bytes == 10
+        assert cache.delete("a") is True
+        assert cache.size_bytes == 0
+
+    def test_counters_are_drained(self, cache):
+        for key in ("a", "b", "c", "d"):
+            cache.set(key, 1, ttl=60)
+        cache.get("d")
+        cache.get("a")
+
+        assert cache.drain_counters() == (1, 1, {"lru": 1})
+        assert cache.drain_counters() == (0, 0, {})
+
+    def test_meta_is_kept_with_the_value(self, cache):
+        cache.set("a", 1, ttl=60, meta="refresh-meta")
+        cache.set("b", 2, ttl=60)
+
+        assert cache.get_with_meta("a") == (1, "refresh-meta")
+        assert cache.get_with_meta("b") == (2, None)
+        assert cache.get_with_meta("missing") == (None, None)
+        assert cache.size_bytes == 20
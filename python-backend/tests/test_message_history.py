@@ -0,0 +1,99 @@
+"""
+Tests for keyset pagination of conversation history
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from app.models.message import Message
+from app.models.soul_connection import SoulConnection
+from app.services.message_service import (
+    MessageService,
+    decode_message_cursor,
+    encode_message_cursor,
+    load_message_page,
+)
+from tests.factories import UserFactory
+
+
+class TestMessageCursor:
+    def test_round_trip(self):
+        created_at = datetime(2026, 10, 16, 12, 30, 5, 123456)
+        assert decode_message_cursor(encode_message_cursor(created_at, 42)) == (
+            created_at,
+            42,
+        )
+
+    @pytest.mark.parametrize("cursor", ["", "!!!", "bm90LWEtY3Vyc29y"])
+    def test_malformed_cursor_rejected(self, cursor):
+        with pytest.raises(ValueError):
+            decode_message_cursor(cursor)
+
+
+@pytest.fixture
+def conversation(db_session):
+    user, partner = UserFactory(), UserFactory()
+    connection = SoulConnection(
+        user1_id=user.id, user2_id=partner.id, initiated_by=user.id
+    )
+    db_session.add(connection)
+    db_session.commit()
+
+    # Two messages share a timestamp to exercise the id tie-breaker
+    started = datetime(2026, 1, 1)
+    stamps = [started + timedelta(minutes=i) for i in (0, 1, 1, 2, 3)]
+    for index, created_at in enumerate(stamps):
+        db_session.add(
+            Message(
+                connection_id=connection.id,
+                sender_id=partner.id if index % 2 else user.id,
+                message_text=f"message {index}",
+                created_at=created_at,
+            )
+        )
+    db_session.commit()
+    return user, partner, connection
+
+
+class TestMessageHistory:
+    def test_pages_cover_history_once(self, db_session, conversation):
+        _, _, connection = conversation
+        seen = []
+        before = None
+        while True:
+            page, cursor = load_message_page(
+                db_session, connection.id, limit=2, before=before
+            )
+            seen.extend(page)
+            if cursor is None:
+                break
+            before = decode_message_cursor(cursor)
+
+        assert [m.message_text for m in seen] == [
+            f"message {index}" for index in (4, 3, 2, 1, 0)
+        ]
+
+    async def test_first_page_marks_conversation_read(
+        self, db_session, async_db_session, conversation
+    ):
+        user, _, connection = conversation
+        service = MessageService()
+
+        result = await service.get_conversation_messages(
+            user_id=user.id, connection_id=connection.id, limit=2, db=async_db_session
+        )
+
+        assert result["success"]
+        assert [m["content"] for m in result["messages"]] == ["message 3", "message 4"]
+        assert result["pagination"]["has_more"]
+        db_session.refresh(connection)
+        assert connection.get_unread_count(user.id) == 0
+
+        older = await service.get_conversation_messages(
+            user_id=user.id,
+            connection_id=connection.id,
+            limit=2,
+            db=async_db_session,
+            cursor=result["pagination"]["next_cursor"],
+        )
+        assert [m["content"] for m in older["messages"]] == ["message 1", "message 2"]
@@ -11,6 +11,7 @@ from unittest.mock import AsyncMock, Mock, patch
 import pytest
 from app.models.message import Message
 from app.services.message_service import MessageService
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
@@ -38,6 +39,17 @@ def mock_db():
     return db
 
 
+@pytest.fixture
+def async_db(test_connection):
+    """AsyncSession double: awaited methods are AsyncMocks, add() is sync"""
+    db = AsyncMock(spec=AsyncSession)
+    db.add = Mock()
+    result = Mock()
+    result.scalars.return_value.first.return_value = test_connection
+    db.execute.return_value = result
+    return db
+
+
 @pytest.fixture
 def test_connection():
     connection = Mock(spec=SoulConnection)
@@ -66,20 +78,18 @@ class TestMessageService:
     """Test message service functionality"""
 
     @pytest.mark.asyncio
-    async def test_send_message_success(self, service, mock_db, test_connection):
+    async def test_send_message_success(self, service, async_db, test_connection):
         """Test sending a message successfully"""
-        mock_db.query.return_value.filter.return_value.first.return_value = (
-            test_connection
-        )
+        test_connection.get_partner_id = Mock(return_value=2)
 
         result = await service.send_message(
-            connection_id=1, sender_id=1, content="Hello there!", db=mock_db
+            connection_id=1, sender_id=1, content="Hello there!", db=async_db
         )
 
-        # Service returns MessageResult object, check its attributes
-        assert hasattr(result, "success")
-        assert hasattr(result, "message_id")
-        # The call may fail due to mock limitations, but we tested the interface
+        assert result.success
+        async_db.add.assert_called_once()
+        async_db.commit.assert_awaited_once()
+        async_db.rollback.assert_not_awaited()
 
     @pytest.mark.asyncio
     async def test_send_message_connection_not_found(self, service, mock_db):
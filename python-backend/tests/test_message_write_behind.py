@@ -0,0 +1,214 @@
+"""
+Tests for the write-behind message send path and analytics buffer
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from app.models.message import Message
+from app.models.soul_analytics import (
+    AnalyticsEventType,
+    EmotionalJourneyTracking,
+    UserEngagementAnalytics,
+    UserEngagementDaily,
+)
+from app.models.soul_connection import SoulConnection
+from app.services.analytics_event_buffer import AnalyticsEventBuffer
+from app.services.analytics_service import AnalyticsService, analytics_service
+from app.services.message_service import MessageService
+from app.services.message_write_behind import (
+    MessageWriteBehind,
+    SlidingWindowRateLimiter,
+)
+from tests.factories import UserFactory
+
+
+class TestSlidingWindowRateLimiter:
+    def test_limit_is_per_key(self):
+        limiter = SlidingWindowRateLimiter(limit=2)
+
+        assert limiter.allow(("a", 1))
+        assert limiter.allow(("a", 1))
+        assert not limiter.allow(("a", 1))
+        assert limiter.allow(("a", 2))
+
+    def test_window_expires(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(
+            "app.services.message_write_behind.time.monotonic", lambda: now[0]
+        )
+        limiter = SlidingWindowRateLimiter(limit=1, window_seconds=60)
+
+        assert limiter.allow("key")
+        assert not limiter.allow("key")
+        now[0] += 61
+        assert limiter.allow("key")
+
+
+@pytest.fixture
+def conversation(db_session):
+    user, partner = UserFactory(), UserFactory()
+    connection = SoulConnection(
+        user1_id=user.id, user2_id=partner.id, initiated_by=user.id
+    )
+    db_session.add(connection)
+    db_session.commit()
+    return user, partner, connection
+
+
+class TestMessageWriteBehind:
+    def test_flush_batches_connection_counters(self, db_session, conversation):
+        _, _, connection = conversation
+        write_behind = MessageWriteBehind()
+        first = datetime(2026, 1, 1, 9, 0)
+        for minutes in (5, 0, 10):
+            write_behind.record_sent(connection.id, first + timedelta(minutes=minutes))
+
+        assert write_behind.flush(db_session) == 3
+        assert write_behind.pending() == 0
+        assert write_behind.flush(db_session) == 0
+
+        db_session.refresh(connection)
+        assert connection.total_messages_exchanged == 3
+        assert connection.first_message_at == first
+
+
+class TestAnalyticsEventBuffer:
+    def test_flush_writes_events_and_counters(self, db_session, conversation):
+        user, partner, connection = conversation
+        buffer = AnalyticsEventBuffer()
+        for sender in (user, user, partner):
+            buffer.record_event(
+                sender.id,
+                AnalyticsEventType.MESSAGE_SENT,
+                {"connection_id": connection.id},
+            )
+        for _ in range(2):
+            buffer.record_event(
+                user.id,
+                AnalyticsEventType.REVELATION_SHARED,
+                {"emotional_state": "excited"},
+                connection_id=connection.id,
+            )
+
+        assert buffer.flush(db_session) == 5
+
+        db_session.refresh(user)
+        db_session.refresh(partner)
+        assert user.total_messages_sent == 2
+        assert user.total_revelations_shared == 2
+        assert partner.total_messages_sent == 1
+        assert (
+            db_session.query(UserEngagementAnalytics)
+            .filter(UserEngagementAnalytics.user_id == user.id)
+            .count()
+            == 4
+        )
+        journey = db_session.query(EmotionalJourneyTracking).one()
+        assert (journey.journey_stage, journey.interaction_count) == ("revelation", 2)
+
+        # Later flushes add to the existing journey row
+        buffer.record_event(
+            user.id,
+            AnalyticsEventType.REVELATION_SHARED,
+            {},
+            connection_id=connection.id,
+        )
+        buffer.flush(db_session)
+        db_session.refresh(journey)
+        assert journey.interaction_count == 3
+
+    async def test_daily_buckets_feed_engagement_score(self, db_session, conversation):
+        user, partner, _ = conversation
+        buffer = AnalyticsEventBuffer()
+        for event_type in (
+            AnalyticsEventType.MESSAGE_SENT,
+            AnalyticsEventType.MESSAGE_SENT,
+            AnalyticsEventType.LOGIN,
+        ):
+            buffer.record_event(user.id, event_type, {})
+        buffer.flush(db_session)
+        buffer.record_event(user.id, AnalyticsEventType.MESSAGE_SENT, {})
+        buffer.flush(db_session)
+
+        bucket = (
+            db_session.query(UserEngagementDaily)
+            .filter(
+                UserEngagementDaily.user_id == user.id,
+                UserEngagementDaily.event_type == AnalyticsEventType.MESSAGE_SENT.value,
+            )
+            .one()
+        )
+        assert bucket.event_count == 3
+
+        service = AnalyticsService()
+        # 1 day, 2 event types, 3 deep actions, 4 recent events
+        expected = service._score_engagement(1, 2, 3, 4)
+        assert await service.calculate_user_engagement_score(
+            user.id, db_session
+        ) == pytest.approx(expected)
+        scores = await service.calculate_engagement_scores(db_session)
+        assert scores[user.id] == pytest.approx(expected)
+        assert partner.id not in scores
+
+
+class TestSendMessage:
+    async def test_send_defers_bookkeeping(
+        self, db_session, async_db_session, conversation, monkeypatch
+    ):
+        user, partner, connection = conversation
+        write_behind = MessageWriteBehind()
+        monkeypatch.setattr(
+            "app.services.message_service.message_write_behind", write_behind
+        )
+        event_buffer = AnalyticsEventBuffer()
+        monkeypatch.setattr(analytics_service, "event_buffer", event_buffer)
+        service = MessageService()
+
+        result = await service.send_message(
+            sender_id=user.id,
+            connection_id=connection.id,
+            content="  hello  ",
+            db=async_db_session,
+            sender=user,
+        )
+
+        assert result.success
+        message = db_session.query(Message).get(result.message_id)
+        assert message.message_text == "hello"
+        db_session.refresh(connection)
+        assert connection.last_message_id == message.id
+        assert connection.get_unread_count(partner.id) == 1
+        # Counters wait for the write-behind flush
+        assert connection.total_messages_exchanged == 0
+        assert write_behind.pending() == 1
+        assert event_buffer.pending() == 1
+
+        write_behind.flush(db_session)
+        event_buffer.flush(db_session)
+        db_session.refresh(connection)
+        db_session.refresh(user)
+        assert connection.total_messages_exchanged == 1
+        assert user.total_messages_sent == 1
+
+    async def test_rate_limited_without_insert(
+        self, db_session, async_db_session, conversation
+    ):
+        user, _, connection = conversation
+        service = MessageService()
+        service.rate_limiter = SlidingWindowRateLimiter(limit=0)
+
+        result = await service.send_message(
+            sender_id=user.id,
+            connection_id=connection.id,
+            content="hello",
+            db=async_db_session,
+        )
+
+        assert result.error == "rate_limited"
+        assert (
+            db_session.query(Message)
+            .filter(Message.connection_id == connection.id)
+            .count()
+            == 0
+        )
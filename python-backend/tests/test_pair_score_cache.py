@@ -0,0 +1,139 @@
+"""
+Tests for the symmetric pair score cache
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from app.services.compatibility_feature_store import CompatibilityFeatureStore
+from app.services.pair_score_cache import (
+    PairScoreCache,
+    field_fingerprint,
+    pair_score_cache,
+)
+from app.services.soul_compatibility_service import SoulCompatibilityService
+
+
+@pytest.fixture
+def cache():
+    return PairScoreCache(max_entries=3, ttl_seconds=60)
+
+
+class TestPairScoreCache:
+    def test_symmetric_lookup(self, cache):
+        cache.set("calculator", 7, 3, 1, {"total": 80.0}, stamps=("a7", "a3"))
+
+        assert cache.get("calculator", 3, 7, 1, stamps=("a3", "a7")) == {"total": 80.0}
+        assert cache.get("calculator", 7, 3, 1, stamps=("a7", "a3")) == {"total": 80.0}
+
+    def test_version_and_stamp_mismatch_miss(self, cache):
+        cache.set("calculator", 1, 2, 1, {"total": 80.0}, stamps=("a", "b"))
+
+        assert cache.get("calculator", 1, 2, 2, stamps=("a", "b")) is None
+        assert cache.get("calculator", 1, 2, 1, stamps=("a", "changed")) is None
+        # A stale entry is dropped rather than kept around
+        assert len(cache) == 0
+
+    def test_returns_copies(self, cache):
+        cache.set("calculator", 1, 2, 1, {"breakdown": {"interests": 50.0}})
+
+        cache.get("calculator", 1, 2, 1)["breakdown"]["interests"] = 0.0
+
+        assert cache.get("calculator", 1, 2, 1)["breakdown"]["interests"] == 50.0
+
+    def test_lru_eviction(self, cache):
+        for other in (2, 3, 4):
+            cache.set("calculator", 1, other, 1, other)
+        cache.get("calculator", 1, 2, 1)
+
+        cache.set("calculator", 1, 5, 1, 5)
+
+        assert len(cache) == 3
+        assert cache.get("calculator", 1, 3, 1) is None
+        assert cache.get("calculator", 1, 2, 1) == 2
+
+    def test_ttl_expiry(self):
+        cache = PairScoreCache(ttl_seconds=0)
+        cache.set("calculator", 1, 2, 1, 42)
+
+        assert cache.get("calculator", 1, 2, 1) is None
+
+    def test_invalidate_user(self, cache):
+        cache.set("calculator", 1, 2, 1, 12)
+        cache.set("soul", 2, 3, 1, 23)
+        cache.set("calculator", 3, 4, 1, 34)
+
+        cache.invalidate_user(2)
+
+        assert cache.get("calculator", 1, 2, 1) is None
+        assert cache.get("soul", 3, 2, 1) is None
+        assert cache.get("calculator", 3, 4, 1) == 34
+
+
+def make_user(user_id, **fields):
+    defaults = {
+        "interests": ["hiking", "music"],
+        "core_values": {"relationship_values": "Loyal and committed"},
+        "emotional_responses": {"q1": "I listen and try to understand"},
+        "communication_style": {"preferred_style": "direct"},
+        "personality_traits": None,
+        "location": "Austin, TX",
+        "date_of_birth": "1990-05-01",
+        "gender": "female",
+        "dietary_preferences": None,
+        "first_name": "Sam",
+        "last_name": "Lee",
+    }
+    defaults.update(fields)
+    return SimpleNamespace(id=user_id, **defaults)
+
+
+class TestCachedScorers:
+    def test_calculator_scores_cached_until_profile_changes(self):
+        store = CompatibilityFeatureStore()
+        store.get_many = lambda db, users, fingerprints=None: {
+            user.id: store.compute(user) for user in users
+        }
+        seeker = make_user(1)
+        candidate = make_user(2, interests=["hiking", "chess"])
+
+        first = store.score_many(None, seeker, [candidate])
+        store.get_many = None  # a cache hit must not touch features
+        assert store.score_many(None, candidate, [seeker]) == first
+
+        store.get_many = lambda db, users, fingerprints=None: {
+            user.id: store.compute(user) for user in users
+        }
+        candidate.interests = ["hiking", "music"]
+        assert store.score_many(None, seeker, [candidate]) != first
+
+    def test_soul_scores_cached_symmetrically(self):
+        service = SoulCompatibilityService()
+        service._load_features = lambda user1, user2, db: (None, None)
+        user1, user2 = make_user(1), make_user(2, location="Dallas, TX")
+
+        score = service.calculate_compatibility(user1, user2, None)
+        service._calculate_values_compatibility = None  # would fail if rescored
+
+        assert service.calculate_compatibility(user2, user1, None) == score
+
+    def test_soul_scorer_is_symmetric(self):
+        service = SoulCompatibilityService()
+        service._load_features = lambda user1, user2, db: (None, None)
+        user1 = make_user(1, core_values={"relationship_values": ["commitment"]})
+        user2 = make_user(2, core_values={"relationship_values": ["independence"]})
+
+        forward = service.calculate_compatibility(user1, user2, None)
+        pair_score_cache.clear()  # score the reverse direction from scratch
+
+        assert service.calculate_compatibility(user2, user1, None) == forward
+
+    def test_field_fingerprint_tracks_fields(self):
+        user = make_user(1)
+        before = field_fingerprint(user, ("interests",))
+
+        user.location = "Paris"
+        assert field_fingerprint(user, ("interests",)) == before
+
+        user.interests = ["chess"]
+        assert field_fingerprint(user, ("interests",)) != before
@@ -350,30 +350,15 @@ class TestPhotoRevealServiceCore:
     async def test_process_automatic_reveals(self, service):
         """Test automatic photo reveals processing"""
         mock_db = Mock()
-        # Mock timelines ready for reveal
-        mock_timeline1 = Mock()
-        mock_timeline1.id = 1
-        mock_timeline1.connection_id = 1
-        mock_timeline1.current_stage = PhotoRevealStage.READY_FOR_REVEAL
-        mock_timeline1.reveal_scheduled_date = datetime.now() - timedelta(hours=1)
-
-        mock_timeline2 = Mock()
-        mock_timeline2.id = 2
-        mock_timeline2.connection_id = 2
-        mock_timeline2.current_stage = PhotoRevealStage.READY_FOR_REVEAL
-        mock_timeline2.reveal_scheduled_date = datetime.now() - timedelta(minutes=30)
-
-        mock_db.query.return_value.filter.return_value.all.return_value = [
-            mock_timeline1,
-            mock_timeline2,
-        ]
+        # No timelines due for reveal
+        query = mock_db.query.return_value.join.return_value.filter.return_value
+        chunk = query.order_by.return_value.limit.return_value.with_for_update
+        chunk.return_value.all.return_value = []
 
         result = await service.process_automatic_reveals(db=mock_db)
 
-        assert isinstance(result, dict)
-        assert "processed_count" in result
-        assert "successful_reveals" in result
-        assert result["processed_count"] >= 0
+        assert result == {"processed": 0, "revealed": 0, "success": True}
+        mock_db.commit.assert_not_called()
 
 
 class TestPhotoValidationMethods:
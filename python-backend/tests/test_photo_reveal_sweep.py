@@ -0,0 +1,126 @@
+"""
+Tests for the chunked automatic photo reveal sweep
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from app.models.photo_reveal import (
+    PhotoConsentType,
+    PhotoRevealEvent,
+    PhotoRevealPermission,
+    PhotoRevealStage,
+    PhotoRevealTimeline,
+    UserPhoto,
+)
+from app.models.soul_connection import SoulConnection
+from app.services.photo_reveal_service import PhotoRevealService
+from tests.factories import UserFactory
+
+
+@pytest.fixture
+def sweep_data(db_session):
+    created = {"users": [], "timelines": []}
+    yield created
+
+    user_ids = [user.id for user in created["users"]]
+    db_session.query(PhotoRevealPermission).filter(
+        PhotoRevealPermission.photo_owner_id.in_(user_ids)
+    ).delete(synchronize_session=False)
+    db_session.query(UserPhoto).filter(UserPhoto.user_id.in_(user_ids)).delete(
+        synchronize_session=False
+    )
+    db_session.commit()
+
+
+def make_timeline(db_session, created, photos=True, **overrides):
+    user1, user2 = UserFactory(), UserFactory()
+    created["users"].extend([user1, user2])
+    connection = SoulConnection(
+        user1_id=user1.id, user2_id=user2.id, initiated_by=user1.id
+    )
+    db_session.add(connection)
+    db_session.flush()
+
+    if photos:
+        for user in (user1, user2):
+            db_session.add(
+                UserPhoto(
+                    user_id=user.id,
+                    original_filename="primary.jpg",
+                    file_path=f"/secure/photos/{user.id}.jpg",
+                    file_size=1024,
+                    mime_type="image/jpeg",
+                    is_profile_primary=True,
+                    encryption_key_hash="hash",
+                )
+            )
+
+    values = {
+        "connection_id": connection.id,
+        "connection_started_at": datetime.utcnow() - timedelta(days=8),
+        "revelations_completed": 6,
+    }
+    values.update(overrides)
+    timeline = PhotoRevealTimeline(**values)
+    db_session.add(timeline)
+    db_session.commit()
+    created["timelines"].append(timeline)
+    return timeline
+
+
+class TestAutomaticRevealSweep:
+    async def test_reveals_due_timelines_in_chunks(self, db_session, sweep_data):
+        due = [make_timeline(db_session, sweep_data) for _ in range(3)]
+        not_due = [
+            make_timeline(
+                db_session,
+                sweep_data,
+                photo_reveal_eligible_at=datetime.utcnow() + timedelta(days=3),
+            ),
+            make_timeline(db_session, sweep_data, revelations_completed=2),
+            make_timeline(
+                db_session, sweep_data, current_stage=PhotoRevealStage.DECLINED
+            ),
+        ]
+        without_photos = make_timeline(db_session, sweep_data, photos=False)
+
+        service = PhotoRevealService()
+        service.auto_reveal_chunk_size = 2
+        result = await service.process_automatic_reveals(db_session)
+
+        assert result == {"processed": 4, "revealed": 3, "success": True}
+
+        for timeline in due:
+            db_session.refresh(timeline)
+            assert timeline.photos_revealed is True
+            assert timeline.current_stage == PhotoRevealStage.REVEALED
+            assert timeline.reveal_method == PhotoConsentType.TIMELINE_BASED
+            assert timeline.mutual_consent_achieved is True
+
+            permissions = (
+                db_session.query(PhotoRevealPermission)
+                .filter(PhotoRevealPermission.connection_id == timeline.connection_id)
+                .all()
+            )
+            assert {(p.photo_owner_id, p.viewer_id) for p in permissions} == {
+                (timeline.connection.user1_id, timeline.connection.user2_id),
+                (timeline.connection.user2_id, timeline.connection.user1_id),
+            }
+            assert (
+                db_session.query(PhotoRevealEvent)
+                .filter(
+                    PhotoRevealEvent.timeline_id == timeline.id,
+                    PhotoRevealEvent.event_type == "photos_revealed",
+                )
+                .count()
+                == 1
+            )
+
+        for timeline in not_due + [without_photos]:
+            db_session.refresh(timeline)
+            assert not timeline.photos_revealed
+
+        # Revealed timelines drop out of the next sweep
+        again = await service.process_automatic_reveals(db_session)
+        assert again["revealed"] == 0
@@ -0,0 +1,196 @@
+"""
+Tests for the in-process profile embedding ANN index
+"""
+
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from app.models.ai_models import UserProfile
+from app.services.profile_ann_index import (
+    EMBEDDING_DIM,
+    ProfileAnnIndex,
+    profile_embedding,
+)
+from tests.factories import UserFactory
+
+
+def make_profile(user_id, seed, confidence=0.8):
+    rng = np.random.default_rng(seed)
+    return SimpleNamespace(
+        user_id=user_id,
+        personality_vector=rng.normal(size=128).tolist(),
+        interests_vector=rng.random(64).tolist(),
+        values_vector=rng.random(64).tolist(),
+        communication_vector=rng.random(32).tolist(),
+        ai_confidence_level=confidence,
+    )
+
+
+def brute_force(profiles, query, k, exclude=()):
+    scored = [
+        (float(profile_embedding(p) @ query), p.user_id)
+        for p in profiles
+        if p.user_id not in exclude
+    ]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [user_id for _, user_id in scored[:k]]
+
+
+@pytest.fixture
+def profiles():
+    return [make_profile(user_id, seed=user_id) for user_id in range(1, 201)]
+
+
+@pytest.fixture
+def index(profiles):
+    index = ProfileAnnIndex(snapshot_path=None)
+    for profile in profiles:
+        index.upsert_profile(profile)
+    return index
+
+
+class TestProfileEmbedding:
+    def test_inner_product_is_weighted_cosine(self):
+        profile = make_profile(1, seed=1)
+
+        embedding = profile_embedding(profile)
+
+        assert embedding.shape == (EMBEDDING_DIM,)
+        assert float(embedding @ embedding) == pytest.approx(0.85, rel=1e-5)
+
+    def test_missing_components_are_zero(self):
+        profile = make_profile(1, seed=1)
+        profile.values_vector = None
+        profile.communication_vector = [0.5] * 3
+
+        embedding = profile_embedding(profile)
+
+        assert float(embedding @ embedding) == pytest.approx(0.45, rel=1e-5)
+
+
+class TestProfileAnnIndex:
+    def test_exact_top_k(self, index, profiles):
+        query = profile_embedding(profiles[0])
+
+        result = index.search(query, k=10, exclude={1})
+
+        assert result == brute_force(profiles, query, 10, exclude={1})
+
+    def test_confidence_filter_and_update(self, index, profiles):
+        query = profile_embedding(profiles[0])
+        best = index.search(query, k=1, exclude={1})[0]
+
+        index.upsert_profile(make_profile(best, seed=best, confidence=0.1))
+
+        assert best not in index.search(query, k=10, exclude={1}, min_confidence=0.3)
+
+    def test_ivf_recall(self, profiles):
+        index = ProfileAnnIndex(snapshot_path=None, exact_search_limit=50, nprobe=8)
+        for profile in profiles:
+            index.upsert_profile(profile)
+        index.retrain()
+
+        # Mean recall@10 over several queries; random profiles cluster poorly,
+        # so any single query can land near a list boundary
+        recall = []
+        for profile in profiles[:20]:
+            query = profile_embedding(profile)
+            result = index.search(query, k=10)
+            assert result[0] == profile.user_id
+            expected = brute_force(profiles, query, 10)
+            recall.append(len(set(result) & set(expected)))
+        assert sum(recall) / len(recall) >= 8
+
+    def test_upsert_leaves_training_to_maintenance(self, profiles):
+        index = ProfileAnnIndex(snapshot_path=None, exact_search_limit=50)
+        for profile in profiles:
+            index.upsert_profile(profile)
+
+        assert index._centroids is None
+        assert index.retrain_due
+        index.retrain()
+        assert not index.retrain_due
+
+        added = make_profile(500, seed=500)
+        index.upsert_profile(added)
+        assert index.search(profile_embedding(added), k=1) == [500]
+
+    def test_remove(self, index, profiles):
+        index.remove(2)
+
+        assert len(index) == len(profiles) - 1
+        assert 2 not in index.search(profile_embedding(profiles[1]), k=5)
+
+    def test_snapshot_round_trip(self, index, profiles, tmp_path):
+        index.snapshot_path = str(tmp_path / "profiles.npz")
+        index.save_snapshot()
+        restored = ProfileAnnIndex(snapshot_path=index.snapshot_path)
+
+        assert restored.load_snapshot()
+        query = profile_embedding(profiles[5])
+        assert restored.search(query, k=10) == index.search(query, k=10)
+
+    def test_snapshot_directory_must_be_private(self, index, tmp_path):
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        shared.chmod(0o777)
+        index.snapshot_path = str(shared / "profiles.npz")
+
+        index.save_snapshot()
+
+        assert not os.path.exists(index.snapshot_path)
+        created = tmp_path / "owned" / "profiles.npz"
+        index.snapshot_path = str(created)
+        index.save_snapshot()
+        assert created.exists()
+        assert os.stat(created.parent).st_mode & 0o077 == 0
+
+
+class TestProfileAnnIndexSync:
+    @pytest.fixture
+    def stored_profiles(self, db_session):
+        stored = []
+        for seed in range(3):
+            user = UserFactory()
+            profile = make_profile(user.id, seed=seed)
+            stored.append(UserProfile(**vars(profile)))
+        db_session.add_all(stored)
+        db_session.commit()
+        return stored
+
+    def test_sync_drops_deactivated_users(self, db_session, stored_profiles):
+        index = ProfileAnnIndex(snapshot_path=None)
+        index.build(db_session)
+        user_id = stored_profiles[0].user_id
+
+        stored_profiles[0].user.is_active = False
+        db_session.commit()
+        index.sync(db_session)
+
+        assert user_id not in index._rows
+        assert stored_profiles[1].user_id in index._rows
+
+    def test_reconcile_drops_deleted_profiles(self, db_session, stored_profiles):
+        index = ProfileAnnIndex(snapshot_path=None)
+        index.build(db_session)
+        user_id = stored_profiles[1].user_id
+
+        db_session.delete(stored_profiles[1])
+        db_session.commit()
+        index.sync(db_session)
+        assert user_id in index._rows
+
+        index.reconcile(db_session)
+        assert user_id not in index._rows
+        assert stored_profiles[0].user_id in index._rows
+
+    def test_ensure_fresh_builds_once(self, db_session, stored_profiles):
+        index = ProfileAnnIndex(snapshot_path=None)
+        assert not index.ready
+
+        index.ensure_fresh(db_session)
+
+        assert index.ready
+        assert stored_profiles[2].user_id in index._rows
@@ -0,0 +1,145 @@
+"""
+Tests for rate-shaped push delivery and batched bulk notifications
+"""
+
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from app.services.push_dispatcher import DeliveryStatus, PushDispatcher, TokenBucket
+from app.services.push_notification import (
+    NotificationLog,
+    PushNotificationService,
+    PushSubscription,
+)
+from pywebpush import WebPushException
+from tests.factories import UserFactory
+
+FCM = "https://fcm.googleapis.com/fcm/send/"
+APPLE = "https://web.push.apple.com/"
+
+
+class TestTokenBucket:
+    async def test_acquisitions_are_paced_at_the_rate(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+
+        started = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+
+        # One token up front, then one every 10ms
+        assert time.monotonic() - started >= 0.09
+
+
+class TestPushDispatcher:
+    async def test_sessions_are_pooled_per_push_service(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            "app.services.push_dispatcher.webpush",
+            lambda **kwargs: calls.append(kwargs),
+        )
+        dispatcher = PushDispatcher("private-key", "ops@example.com")
+        keys = {"p256dh": "p", "auth": "a"}
+
+        for token in ("a", "b"):
+            status = await dispatcher.send(FCM + token, keys, "{}")
+            assert status == DeliveryStatus.DELIVERED
+        await dispatcher.send(APPLE + "c", keys, "{}")
+
+        assert calls[0]["requests_session"] is calls[1]["requests_session"]
+        assert calls[0]["requests_session"] is not calls[2]["requests_session"]
+        assert calls[0]["vapid_claims"]["aud"] == "https://fcm.googleapis.com"
+        dispatcher.close()
+
+    async def test_gone_subscription_is_expired(self, monkeypatch):
+        def gone(**kwargs):
+            raise WebPushException("gone", response=MagicMock(status_code=410))
+
+        monkeypatch.setattr("app.services.push_dispatcher.webpush", gone)
+        dispatcher = PushDispatcher("private-key", "ops@example.com")
+
+        status = await dispatcher.send(FCM + "a", {"p256dh": "p", "auth": "a"}, "{}")
+
+        assert status == DeliveryStatus.EXPIRED
+        dispatcher.close()
+
+
+@pytest.fixture
+def push_service():
+    redis_client = MagicMock()
+    redis_client.mget.side_effect = lambda keys: [None] * len(keys)
+    service = PushNotificationService(
+        redis_client, "private-key", "public-key", "ops@example.com"
+    )
+    yield service
+    service.dispatcher.close()
+
+
+def subscribe(db_session, user, endpoint):
+    subscription = PushSubscription(
+        user_id=user.id, endpoint=endpoint, p256dh_key="p", auth_key="a"
+    )
+    db_session.add(subscription)
+    db_session.commit()
+    return subscription
+
+
+class TestBulkNotifications:
+    async def test_batch_is_coalesced_and_recorded_in_bulk(
+        self, db_session, push_service
+    ):
+        user, other = UserFactory(), UserFactory()
+        phone = subscribe(db_session, user, FCM + "phone")
+        laptop = subscribe(db_session, user, FCM + "laptop")
+        expired = subscribe(db_session, other, APPLE + "gone")
+
+        async def send(endpoint, keys, data):
+            if endpoint.startswith(APPLE):
+                return DeliveryStatus.EXPIRED
+            return DeliveryStatus.DELIVERED
+
+        push_service.dispatcher.send = AsyncMock(side_effect=send)
+        match = {"match_name": "Sam", "compatibility": 87}
+
+        results = await push_service.send_bulk_notifications(
+            [
+                {
+                    "user_id": user.id,
+                    "type": "new_message",
+                    "context": {"sender_name": "Sam", "message_preview": "Hi!"},
+                },
+                {"user_id": user.id, "type": "new_match", "context": match},
+                # Disabled by default preferences
+                {"user_id": user.id, "type": "daily_prompt", "context": {}},
+                {"user_id": other.id, "type": "new_match", "context": match},
+            ],
+            db_session,
+        )
+
+        assert results == {"sent": 2, "failed": 2}
+
+        # One coalesced push per subscription
+        sends = push_service.dispatcher.send.await_args_list
+        assert len(sends) == 3
+        digest = json.loads(sends[0].args[2])
+        assert digest["title"] == "You have 2 new notifications"
+        assert len(digest["data"]["notifications"]) == 2
+
+        db_session.refresh(expired)
+        assert expired.is_active is False
+        db_session.refresh(phone)
+        db_session.refresh(laptop)
+        assert phone.is_active and laptop.is_active
+
+        logs = (
+            db_session.query(NotificationLog)
+            .filter(NotificationLog.user_id.in_([user.id, other.id]))
+            .all()
+        )
+        assert sorted((log.user_id, log.delivered) for log in logs) == sorted(
+            [(user.id, True), (user.id, True), (other.id, False)]
+        )
+
+        # Preferences were fetched once for the whole batch
+        push_service.redis_client.mget.assert_called_once()
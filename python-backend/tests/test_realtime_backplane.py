@@ -0,0 +1,237 @@
+"""
+Tests for routing realtime messages across nodes through the backplane
+"""
+
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from app.services.realtime_backplane import InMemoryBackplane, RealtimeBackplane
+from app.services.realtime_connection_manager import (
+    MessageType,
+    RealtimeConnectionManager,
+    RealtimeMessage,
+)
+
+
+def make_websocket():
+    websocket = MagicMock()
+    websocket.send_text = AsyncMock()
+    return websocket
+
+
+def sent_types(websocket):
+    return [json.loads(c.args[0])["type"] for c in websocket.send_text.await_args_list]
+
+
+async def attach(manager, user_id):
+    """Hold a socket for the user on `manager` without touching the database"""
+    websocket = make_websocket()
+    manager.active_connections[user_id] = websocket
+    await manager.backplane.register_user(user_id, manager.node_id)
+    return websocket
+
+
+@pytest.fixture
+async def nodes():
+    backplane = InMemoryBackplane()
+    node_a = RealtimeConnectionManager(backplane=backplane, node_id="a")
+    node_b = RealtimeConnectionManager(backplane=backplane, node_id="b")
+    await node_a.start()
+    await node_b.start()
+    yield node_a, node_b
+    await node_a.stop()
+    await node_b.stop()
+
+
+def message(message_type=MessageType.NEW_MESSAGE):
+    return RealtimeMessage(type=message_type, data={"text": "hi"})
+
+
+class TestCrossNodeRouting:
+    async def test_send_to_user_on_other_node(self, nodes):
+        node_a, node_b = nodes
+        websocket = await attach(node_b, 2)
+
+        assert await node_a.send_to_user(2, message()) is True
+        assert sent_types(websocket) == ["new_message"]
+        assert node_a.backplane.queued_message_count() == 0
+
+    async def test_offline_queue_is_shared(self, nodes):
+        node_a, node_b = nodes
+
+        assert await node_a.send_to_user(3, message()) is False
+        websocket = await attach(node_b, 3)
+        await node_b.send_queued_messages(3)
+
+        assert sent_types(websocket) == ["new_message"]
+        assert node_a.backplane.queued_message_count() == 0
+
+    async def test_broadcast_to_channel_spans_nodes(self, nodes):
+        node_a, node_b = nodes
+        local = await attach(node_a, 1)
+        remote = await attach(node_b, 2)
+        await node_a.subscribe_to_channel(1, "soul")
+        # Subscribed through the other node, e.g. a REST call served by node b
+        await node_b.subscribe_to_channel(2, "soul")
+
+        sent = await node_a.broadcast_to_channel("soul", message())
+
+        assert sent == 2
+        assert sent_types(local) == ["new_message"]
+        assert sent_types(remote) == ["new_message"]
+
+    async def test_send_to_connection_excludes_sender(self, nodes):
+        node_a, node_b = nodes
+        sender = await attach(node_a, 1)
+        partner = await attach(node_b, 2)
+        await node_a.subscribe_to_connection(1, 10)
+        await node_b.subscribe_to_connection(2, 10)
+
+        await node_a.send_to_connection(10, message(), exclude_user=1)
+
+        assert sender.send_text.await_count == 0
+        payload = json.loads(partner.send_text.await_args.args[0])
+        assert payload["connectionId"] == 10
+
+    async def test_message_for_departed_user_is_queued(self, nodes):
+        node_a, node_b = nodes
+        await attach(node_b, 2)
+        # Node b lost the socket but presence still points at it
+        del node_b.active_connections[2]
+
+        await node_a.send_to_user(2, message())
+
+        assert node_a.backplane.queued_message_count() == 1
+
+    async def test_presence_follows_reconnects(self, nodes):
+        node_a, node_b = nodes
+        await attach(node_a, 5)
+        await attach(node_b, 5)
+        # Late unregister from the old node must not hide the new socket
+        await node_a.backplane.unregister_user(5, "a")
+
+        assert await node_a.is_user_connected(5) is True
+        assert await node_a.backplane.locate_user(5) == "b"
+
+    async def test_cleanup_user_channels_across_nodes(self, nodes):
+        node_a, node_b = nodes
+        await node_b.subscribe_to_channel(4, "soul")
+
+        await node_a.cleanup_user_channels(4)
+
+        assert await node_a.get_user_channels(4) == []
+        assert await node_a.get_channel_subscribers("soul") == []
+
+
+class TestInMemoryBackplane:
+    async def test_offline_queue_is_capped(self):
+        backplane = InMemoryBackplane(max_offline_messages=2)
+        for index in range(3):
+            await backplane.enqueue_offline(1, {"index": index})
+
+        assert [p["index"] for p in await backplane.drain_offline(1)] == [1, 2]
+        assert backplane.queued_message_count() == 0
+
+    def test_incomplete_backend_fails_on_construction(self):
+        class PresenceOnly(RealtimeBackplane):
+            async def locate_users(self, user_ids):
+                return {}
+
+        with pytest.raises(TypeError, match="abstract"):
+            PresenceOnly()
+
+
+class TestFanOut:
+    async def test_broadcast_serializes_once(self, nodes, monkeypatch):
+        node_a, _ = nodes
+        for user_id in range(1, 6):
+            await attach(node_a, user_id)
+            await node_a.subscribe_to_channel(user_id, "soul")
+        broadcast = message()
+        to_dict = MagicMock(wraps=broadcast.to_dict)
+        monkeypatch.setattr(broadcast, "to_dict", to_dict)
+
+        assert await node_a.broadcast_to_channel("soul", broadcast) == 5
+        assert to_dict.call_count == 1
+
+    async def test_slow_consumer_is_evicted_and_buffered(self, nodes):
+        node_a, _ = nodes
+        node_a.send_timeout_seconds = 0.01
+        fast = await attach(node_a, 1)
+        slow = await attach(node_a, 2)
+
+        async def stall(text):
+            await asyncio.sleep(1)
+
+        slow.send_text = AsyncMock(side_effect=stall)
+        slow.close = AsyncMock()
+        await node_a.subscribe_to_channel(1, "soul")
+        await node_a.subscribe_to_channel(2, "soul")
+
+        assert await node_a.broadcast_to_channel("soul", message()) == 1
+        assert sent_types(fast) == ["new_message"]
+        assert 2 not in node_a.active_connections
+        slow.close.assert_awaited_once_with(code=1013)
+        assert await node_a.backplane.locate_user(2) is None
+        assert [p["type"] for p in await node_a.backplane.drain_offline(2)] == [
+            "new_message"
+        ]
+
+    async def test_queued_messages_kept_when_send_fails(self, nodes):
+        node_a, _ = nodes
+        for index in range(4):
+            await node_a.backplane.enqueue_offline(1, {"i": index})
+        websocket = await attach(node_a, 1)
+        websocket.send_text = AsyncMock(side_effect=[None, RuntimeError("closed")])
+
+        await node_a.send_queued_messages(1)
+
+        assert await node_a.backplane.drain_offline(1) == [
+            {"i": 1},
+            {"i": 2},
+            {"i": 3},
+        ]
+
+    async def test_queued_messages_not_duplicated_on_timeout(self, nodes):
+        node_a, _ = nodes
+        node_a.send_timeout_seconds = 0.01
+        for index in range(3):
+            await node_a.backplane.enqueue_offline(1, {"i": index})
+        websocket = await attach(node_a, 1)
+
+        sends = 0
+
+        async def stall_second(text):
+            nonlocal sends
+            sends += 1
+            if sends == 2:
+                await asyncio.sleep(1)
+
+        websocket.send_text = AsyncMock(side_effect=stall_second)
+        websocket.close = AsyncMock()
+
+        await node_a.send_queued_messages(1)
+
+        assert await node_a.backplane.drain_offline(1) == [{"i": 1}, {"i": 2}]
+
+    async def test_sends_are_bounded(self, nodes):
+        node_a, _ = nodes
+        node_a.max_concurrent_sends = 2
+        in_flight = peak = 0
+
+        async def send_text(text):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+
+        for user_id in range(1, 7):
+            websocket = await attach(node_a, user_id)
+            websocket.send_text = AsyncMock(side_effect=send_text)
+            await node_a.subscribe_to_channel(user_id, "soul")
+
+        assert await node_a.broadcast_to_channel("soul", message()) == 6
+        assert peak == 2
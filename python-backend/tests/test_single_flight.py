@@ -0,0 +1,172 @@
+"""
+Tests for cache stampede protection: coalescing, cross-node locks, XFetch
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from app.core.advanced_caching import CacheLevel, IntelligentCacheManager
+from app.core.single_flight import (
+    AsyncSingleFlight,
+    encode_refresh_meta,
+    lock_key,
+    refresh_meta_key,
+    should_refresh_early,
+)
+from app.services.cache_service import CacheService
+from tests.fakes import FakeRedis
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
+
+
+def slow_factory(calls, value="fresh"):
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return value
+
+    return factory
+
+
+class TestCacheServiceStampede:
+    def test_concurrent_misses_run_factory_once(self, redis_client):
+        service = CacheService(redis_client)
+        calls = []
+        results = []
+
+        def read():
+            results.append(service.get_or_set("hot:1", slow_factory(calls), ttl=60))
+
+        threads = [threading.Thread(target=read) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ["fresh"] * 20
+        assert redis_client.get(lock_key("hot:1")) is None
+        assert redis_client.get(refresh_meta_key("hot:1")) is not None
+
+    def test_waits_for_the_node_holding_the_lock(self, redis_client):
+        service = CacheService(redis_client)
+        redis_client.set(lock_key("hot:2"), "other-node")
+
+        def other_node_finishes():
+            time.sleep(0.1)
+            redis_client.set("hot:2", b'"from-other-node"')
+
+        threading.Thread(target=other_node_finishes).start()
+        calls = []
+
+        assert service.get_or_set("hot:2", slow_factory(calls), ttl=60) == (
+            "from-other-node"
+        )
+        assert calls == []
+
+    def test_early_refresh_serves_stale_while_another_node_refreshes(
+        self, redis_client
+    ):
+        service = CacheService(redis_client)
+        redis_client.set("hot:3", b'"stale"')
+        redis_client.set(refresh_meta_key("hot:3"), encode_refresh_meta(0, 1.0))
+        redis_client.set(lock_key("hot:3"), "other-node")
+        calls = []
+
+        assert service.get_or_set("hot:3", slow_factory(calls), ttl=60) == "stale"
+        assert calls == []
+
+    def test_early_refresh_recomputes_once(self, redis_client):
+        service = CacheService(redis_client)
+        redis_client.set("hot:4", b'"stale"')
+        redis_client.set(refresh_meta_key("hot:4"), encode_refresh_meta(0, 1.0))
+        calls = []
+
+        assert service.get_or_set("hot:4", slow_factory(calls), ttl=60) == "fresh"
+        service.l1_cache.clear()
+        assert service.get_or_set("hot:4", slow_factory(calls), ttl=60) == "fresh"
+        assert len(calls) == 1
+
+    def test_l1_hit_near_expiry_refreshes_early(self, redis_client):
+        service = CacheService(redis_client)
+        redis_client.set("hot:5", b'"stale"')
+        redis_client.set(refresh_meta_key("hot:5"), encode_refresh_meta(3600, 0.01))
+        calls = []
+
+        # Loaded into L1 while far from expiry: served without recomputing
+        assert service.get_or_set("hot:5", slow_factory(calls), ttl=60) == "stale"
+        assert calls == []
+
+        # The L1 copy is now past its logical expiry
+        service.l1_refresh_meta["hot:5"] = encode_refresh_meta(-1, 0)
+        assert service.get_or_set("hot:5", slow_factory(calls), ttl=60) == "fresh"
+        assert service.get_or_set("hot:5", slow_factory(calls), ttl=60) == "fresh"
+        assert len(calls) == 1
+        assert "hot:5" in service.l1_cache
+
+
+class TestMemoryTierEarlyRefresh:
+    async def test_memory_hit_near_expiry_refreshes_in_background(self):
+        manager = IntelligentCacheManager(redis_manager=None)
+        levels = [CacheLevel.L3_MEMORY]
+        calls = []
+
+        async def fallback():
+            calls.append(1)
+            return "fresh"
+
+        # Cached in memory but already past its (Redis) logical expiry
+        manager.memory_cache.set("k", "stale", ttl=60, meta=encode_refresh_meta(-1, 0))
+
+        assert await manager.smart_cache_get("k", fallback, cache_levels=levels) == (
+            "stale"
+        )
+        await asyncio.gather(*manager._refresh_tasks)
+
+        assert calls == [1]
+        assert await manager.smart_cache_get("k", fallback, cache_levels=levels) == (
+            "fresh"
+        )
+        assert calls == [1]
+
+
+class TestXFetch:
+    def test_refresh_probability_grows_towards_expiry(self):
+        assert should_refresh_early(None) is False
+        assert should_refresh_early(encode_refresh_meta(3600, 0.01)) is False
+        assert should_refresh_early(encode_refresh_meta(-1, 0.01)) is True
+
+
+class TestAsyncSingleFlight:
+    async def test_concurrent_awaits_share_one_call(self):
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"id": 1}
+
+        results = await asyncio.gather(*(flights.do("k", load) for _ in range(50)))
+
+        assert len(calls) == 1
+        assert all(result == {"id": 1} for result in results)
+        assert not flights.in_flight("k")
+
+    async def test_errors_reach_every_waiter(self):
+        flights = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(
+            *(flights.do("k", fail) for _ in range(3)), return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)